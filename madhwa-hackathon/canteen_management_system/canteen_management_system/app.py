@@ -2,11 +2,13 @@
 CanteenAI Web UI
 Simple Flask-based dashboard for running predictions and viewing insights
 """
-from flask import Flask, render_template, jsonify, request, send_file
+from flask import Flask, render_template, jsonify, request, Response, stream_with_context
 from canteen_ai import CanteenAI
-from data_agent import DataAgent
-from predict_agent import PredictAgent
-from insight_agent import InsightAgent
+from sites import SiteRegistry
+from headcount_feed import expected_onsite
+from export_stream import export_stream
+from config import Config
+from metrics import instrument_app
 import pandas as pd
 import json
 from datetime import datetime
@@ -17,6 +19,16 @@ app = Flask(__name__)
 # Initialize CanteenAI
 ai = CanteenAI()
 
+# Load data in the background so the server starts accepting requests immediately
+ai.warm_up(background=True)
+
+# Every canteen site on disk, with this process's CanteenAI serving the default site
+sites = SiteRegistry()
+sites.attach(ai)
+
+# Request latency / in-flight tracking and the /metrics scrape endpoint
+instrument_app(app, lambda: ai)
+
 @app.route('/')
 def index():
     """Main dashboard page"""
@@ -51,15 +63,27 @@ def status():
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
+@app.route('/api/ready')
+def ready():
+    """Readiness probe: 200 once data is loaded, 503 while warming up"""
+    state = ai.readiness()
+    return jsonify(state), (200 if state['ready'] else 503)
+
 @app.route('/api/update-data', methods=['POST'])
 def update_data():
     """Update data from Firebase or local CSV"""
     try:
         df = ai.update_data()
+        # Source, error and resume point of the Firestore sync (local CSV fallback)
+        sync = ai.data_agent.sync_status
+        message = f'Successfully loaded {len(df)} records'
+        if sync.get('error'):
+            message += f" from the local CSV (Firebase sync: {sync['error']})"
         return jsonify({
             'success': True,
             'records': len(df),
-            'message': f'Successfully loaded {len(df)} records'
+            'sync': sync,
+            'message': message
         })
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
@@ -68,6 +92,7 @@ def update_data():
 def train_models():
     """Train ML models"""
     try:
+        ai.ensure_data()
         results = ai.train_model(force=True)
         return jsonify({
             'success': True,
@@ -83,7 +108,8 @@ def train_models():
 def predict_next_day():
     """Generate next-day predictions"""
     try:
-        predictions = ai.predict_next_day()
+        ai.ensure_data()
+        predictions = ai.forecast_next_day()
         
         if predictions.empty:
             return jsonify({'success': False, 'message': 'No predictions generated'}), 400
@@ -106,7 +132,8 @@ def predict_weekly():
     """Generate weekly predictions"""
     try:
         days = request.json.get('days', 7)
-        predictions = ai.predict_next_week(days=days)
+        ai.ensure_data()
+        predictions = ai.forecast_week(days=days)
         
         if predictions.empty:
             return jsonify({'success': False, 'message': 'No predictions generated'}), 400
@@ -127,10 +154,333 @@ def predict_weekly():
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
+@app.route('/api/predict-hierarchy', methods=['POST'])
+def predict_hierarchy():
+    """Reconciled forecasts per item, category, site and total"""
+    try:
+        days = (request.json or {}).get('days', 7)
+        ai.ensure_data()
+        forecast = ai.forecast_hierarchy(days=days)
+        levels = forecast['levels']
+        
+        if levels.empty:
+            return jsonify({'success': False, 'message': 'No hierarchical forecast (train models first)'}), 400
+        
+        aggregates = levels[levels['level'] != 'item'].astype({'date': str})
+        items = forecast['items'].astype({'date': str})
+        return jsonify({
+            'success': True,
+            'levels': json.loads(aggregates.to_json(orient='records')),
+            'items': json.loads(items.to_json(orient='records')),
+            'total_meals': float(aggregates.loc[aggregates['level'] == 'total', 'reconciled_count'].sum())
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@app.route('/api/predict-new-items', methods=['POST'])
+def predict_new_items():
+    """Cold-start forecasts for new menu items ({"items": [{"menu_item_id", "item_category"}], "days"})"""
+    try:
+        payload = request.json or {}
+        items = pd.DataFrame(payload.get('items', []))
+        if items.empty or 'menu_item_id' not in items.columns:
+            return jsonify({'success': False, 'message': 'items with menu_item_id are required'}), 400
+        
+        ai.ensure_data()
+        predictions = ai.forecast_new_items(items, days=payload.get('days', 7))
+        if predictions.empty:
+            return jsonify({'success': False, 'message': 'No predictions generated'}), 400
+        
+        return jsonify({
+            'success': True,
+            'predictions': json.loads(predictions.astype({'date': str}).to_json(orient='records'))
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@app.route('/api/taps', methods=['POST'])
+def ingest_taps():
+    """RFID reader endpoint: one tap or {"taps": [...]} (card_id, timestamp, menu_item_id, meal_slot)"""
+    try:
+        payload = request.json or {}
+        events = payload.get('taps', [payload] if 'card_id' in payload else [])
+        if not events:
+            return jsonify({'success': False, 'message': 'No taps in request'}), 400
+        
+        result = ai.tap_ingestion.ingest(events)
+        return jsonify({'success': True, **result})
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@app.route('/api/served')
+def get_served_counts():
+    """Live served counts per item (?date=YYYY-MM-DD, default today)"""
+    try:
+        date = request.args.get('date') or datetime.now().date().isoformat()
+        counts = ai.tap_ingestion.served_counts(date)
+        return jsonify({
+            'success': True,
+            'date': date,
+            'served': [{'menu_item_id': item_id, 'served_count': n} for item_id, n in sorted(counts.items())],
+            'total_served': sum(counts.values())
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@app.route('/api/surplus')
+def get_surplus():
+    """NGO polling: live surplus per item (?date=YYYY-MM-DD, default today; ?all=1 includes items without surplus)"""
+    try:
+        date = request.args.get('date') or datetime.now().date().isoformat()
+        estimates = ai.surplus(date)
+        if estimates.empty:
+            return jsonify({'success': False, 'message': f'No forecasts or prepared quantities for {date}'}), 404
+        
+        if request.args.get('all') != '1':
+            estimates = estimates[estimates['surplus_count'] > 0]
+        return jsonify({
+            'success': True,
+            'date': date,
+            **ai.surplus_engine.plan_info(date),
+            'total_surplus': int(estimates['surplus_count'].sum()),
+            'items': json.loads(estimates.to_json(orient='records'))
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@app.route('/api/surplus/prepared', methods=['POST'])
+def set_prepared_quantities():
+    """Kitchen report of portions prepared: {"date": ..., "items": [{"menu_item_id", "prepared_count"}]}"""
+    try:
+        data = request.json or {}
+        date = data.get('date') or datetime.now().date().isoformat()
+        prepared = {int(i['menu_item_id']): int(i['prepared_count']) for i in data.get('items', [])}
+        if not prepared:
+            return jsonify({'success': False, 'message': 'No prepared quantities in request'}), 400
+        
+        estimates = ai.surplus(date, prepared=prepared)
+        return jsonify({
+            'success': True,
+            'date': date,
+            'total_surplus': int(estimates['surplus_count'].sum()) if not estimates.empty else 0
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@app.route('/api/working-modes', methods=['POST'])
+def record_working_modes():
+    """Employees' office/home (or wfh) choices: {"selections": [{"date", "user_id" or "email", "mode"}]} or one selection"""
+    try:
+        data = request.json or {}
+        selections = data.get('selections') or [data]
+        stored = ai.headcount_feed.record_many(selections)
+        if not stored:
+            return jsonify({'success': False, 'message': 'No valid selections (need date, user_id or email and mode office/home/wfh)'}), 400
+        return jsonify({'success': True, 'stored': stored, 'skipped': len(selections) - stored})
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@app.route('/api/headcount')
+def get_headcount():
+    """Per-date working-mode counts and expected on-site headcount (?start=&end=)"""
+    try:
+        counts = ai.headcount_feed.counts(request.args.get('start'), request.args.get('end'))
+        history = ai.ensure_data()
+        total = float(history['total_employees'].iloc[-1]) \
+            if history is not None and not history.empty and 'total_employees' in history.columns else 0.0
+        counts['onsite_employees'] = expected_onsite(counts['office'], counts['responses'], total)
+        return jsonify({
+            'success': True,
+            'total_employees': total,
+            'dates': json.loads(counts.to_json(orient='records'))
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+def _export_response(chunks, name: str):
+    """
+    Stream DataFrame chunks as an attachment (?format=csv|ndjson, ?gzip=1,
+    ?columns=a,b); the body is produced while it is sent
+    """
+    columns = [c.strip() for c in request.args.get('columns', '').split(',') if c.strip()]
+    body, mimetype, extension = export_stream(
+        chunks,
+        fmt=request.args.get('format', 'csv'),
+        compress=request.args.get('gzip') == '1',
+        columns=columns or None
+    )
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={name}.{extension}'}
+    )
+
+def _export_filters():
+    """
+    start, end (YYYY-MM-DD) and items (comma-separated ids) query filters
+    
+    Checked before the response starts streaming, so bad input is a 400
+    instead of an error in the middle of the body.
+    """
+    try:
+        items = [int(i) for i in request.args.get('items', '').split(',') if i.strip()]
+    except ValueError:
+        raise ValueError("items must be comma-separated menu item ids") from None
+    dates = []
+    for name in ('start', 'end'):
+        value = request.args.get(name) or None
+        if value:
+            try:
+                value = datetime.strptime(value, '%Y-%m-%d').date().isoformat()
+            except ValueError:
+                raise ValueError(f"{name} must be a date as YYYY-MM-DD, got '{value}'") from None
+        dates.append(value)
+    start, end = dates
+    if start and end and start > end:
+        raise ValueError(f"start ({start}) is after end ({end})")
+    return start, end, items or None
+
+@app.route('/api/export/predictions')
+def export_predictions():
+    """
+    Stream stored predictions (?start, ?end target dates, ?items=101,102,
+    ?latest=1 for the newest prediction per item and date)
+    """
+    try:
+        start, end, items = _export_filters()
+        chunks = ai.predict_agent.store.iter_chunks(
+            start_date=start, end_date=end, menu_item_ids=items,
+            latest_only=request.args.get('latest') == '1', chunksize=Config.EXPORT_CHUNK_ROWS
+        )
+        return _export_response(chunks, f"predictions_{start or 'all'}_{end or 'latest'}")
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@app.route('/api/export/history')
+def export_history():
+    """Stream the feature history (?start, ?end, ?items=101,102)"""
+    try:
+        start, end, items = _export_filters()
+        ai.refresh_snapshot()
+        chunks = ai.iter_history(start, end, items)
+        return _export_response(chunks, f"history_{start or 'all'}_{end or 'latest'}")
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@app.route('/api/prep-plan')
+def get_prep_plan():
+    """
+    Kitchen prep quantities (?days=7, ?date=YYYY-MM-DD for one day,
+    ?view=ingredients for the bill of materials, ?format=csv)
+    """
+    try:
+        plan = ai.plan_prep(days=request.args.get('days', default=7, type=int))
+        if plan.empty:
+            return jsonify({'success': False, 'message': 'No forecasts available'}), 404
+        date = request.args.get('date')
+        if date:
+            plan = plan[plan['date'] == date]
+        
+        table = ai.prep_planner.ingredients(plan) if request.args.get('view') == 'ingredients' else plan
+        if request.args.get('format') == 'csv':
+            return Response(table.to_csv(index=False), mimetype='text/csv',
+                            headers={'Content-Disposition': 'attachment; filename=prep_plan.csv'})
+        return jsonify({
+            'success': True,
+            'total_portions': int(plan['prep_quantity'].sum()),
+            'rows': json.loads(table.to_json(orient='records'))
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@app.route('/api/scenarios', methods=['POST'])
+def run_scenarios():
+    """
+    What-if demand: {"grid": {"precipitation": [0, 20], "wfh_share": [0, 0.3]},
+    "scenarios": [{...}], "days": 7, "by": ["date"], "items": false}
+    """
+    try:
+        data = request.json or {}
+        if not data.get('grid') and not data.get('scenarios'):
+            return jsonify({'success': False, 'message': 'grid or scenarios is required'}), 400
+        
+        results = ai.what_if(data.get('scenarios'), data.get('grid'), int(data.get('days', 7)))
+        if results.empty:
+            return jsonify({'success': False, 'message': 'No trained models or data available'}), 404
+        
+        summary = ai.scenario_agent.summarize(results, by=data.get('by'))
+        response = {
+            'success': True,
+            'scenarios': results.attrs['scenarios'],
+            'summary': json.loads(summary.to_json(orient='records'))
+        }
+        if data.get('items'):
+            response['items'] = json.loads(results.to_json(orient='records'))
+        return jsonify(response)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@app.route('/api/sites/forecast')
+def get_site_forecasts():
+    """Cross-site forecast totals (?days=7&by=site_id,item_category)"""
+    try:
+        days = request.args.get('days', default=7, type=int)
+        by = [c.strip() for c in request.args.get('by', '').split(',') if c.strip()]
+        totals = sites.aggregate_forecasts(days=days, by=by)
+        return jsonify({
+            'success': True,
+            'sites': sites.site_ids,
+            'totals': json.loads(totals.to_json(orient='records'))
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@app.route('/api/sites/train', methods=['POST'])
+def train_sites():
+    """Retrain every site in parallel worker processes ({"workers": N} optional)"""
+    try:
+        data = request.json or {}
+        results = sites.train_all(max_workers=data.get('workers', Config.SITE_TRAIN_MAX_WORKERS))
+        return jsonify({
+            'success': True,
+            'sites': json.loads(results.to_json(orient='records'))
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@app.route('/api/forecast')
+def get_forecast():
+    """Materialized forecast for one item and date (?date=YYYY-MM-DD&item_id=N)"""
+    try:
+        date = request.args.get('date')
+        item_id = request.args.get('item_id', type=int)
+        if not date or item_id is None:
+            return jsonify({'success': False, 'message': 'date and item_id are required'}), 400
+        
+        ai.ensure_data()
+        forecast = ai.lookup_forecast(date, item_id)
+        if forecast is None:
+            # Stale table: recompute and re-materialize it, then look up again
+            ai.forecast_week(days=Config.FORECAST_TABLE_DAYS)
+            forecast = ai.forecast_table.lookup(date, item_id)
+        if forecast is None:
+            return jsonify({'success': False, 'message': f'No forecast for item {item_id} on {date}'}), 404
+        
+        return jsonify({'success': True, 'forecast': forecast})
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
 @app.route('/api/insights')
 def get_insights():
     """Get trend insights"""
     try:
+        ai.ensure_data()
         insights = ai.analyze_trends()
         return jsonify({
             'success': True,
@@ -155,15 +505,18 @@ def run_pipeline():
 def download_predictions():
     """Download latest predictions as CSV"""
     try:
-        # Find latest prediction file
-        pred_files = [f for f in os.listdir('models_per_item') if f.startswith('predictions_')]
-        if not pred_files:
+        store = ai.predict_agent.store
+        latest_date = store.latest_target_date()
+        if not latest_date:
             return jsonify({'success': False, 'message': 'No predictions found'}), 404
         
-        latest_file = sorted(pred_files)[-1]
-        file_path = os.path.join('models_per_item', latest_file)
-        
-        return send_file(file_path, as_attachment=True)
+        # Stream straight from the prediction store
+        csv_chunks = store.iter_csv(start_date=latest_date, end_date=latest_date, latest_only=True)
+        return Response(
+            stream_with_context(csv_chunks),
+            mimetype='text/csv',
+            headers={'Content-Disposition': f'attachment; filename=predictions_{latest_date}.csv'}
+        )
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
@@ -0,0 +1,257 @@
+"""
+BacktestAgent - Rolling-origin backtesting of forecasting strategies
+"""
+import pandas as pd
+import numpy as np
+import joblib
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from config import Config
+from train_agent import get_feature_columns, fit_item_model
+from recursive_forecast import item_windows, roll_forward
+
+# Feature table shared with each worker process once, instead of per fold
+_worker_df = None
+_worker_models = {}
+
+
+def _init_worker(df: pd.DataFrame):
+    """Process pool initializer: keep the feature table resident in the worker"""
+    global _worker_df, _worker_models
+    _worker_df = df
+    _worker_models = {}
+
+
+def _load_reused_model(model_dir: str, item_id) -> Optional[Dict]:
+    """Load a saved model bundle once per worker"""
+    if item_id not in _worker_models:
+        model_path = os.path.join(model_dir, f"lgb_item_{item_id}.pkl")
+        _worker_models[item_id] = joblib.load(model_path) if os.path.exists(model_path) else None
+    return _worker_models[item_id]
+
+
+def _run_fold(origin: pd.Timestamp,
+              horizon: int,
+              strategy: str,
+              model_dir: str,
+              validation_days: int,
+              target_col: str) -> List[Dict]:
+    """
+    Replay a single forecast origin
+    
+    Models only see rows dated on or before the origin. Each item is then
+    forecast recursively for 1..horizon days, feeding predictions back in as
+    lags exactly like PredictAgent.forecast does.
+    
+    Returns:
+        List of per (item, horizon) error records
+    """
+    df = _worker_df
+    history = df[df['date'] <= origin]
+    future = df[(df['date'] > origin) & (df['date'] <= origin + pd.Timedelta(days=horizon))]
+    feature_cols = get_feature_columns(df, target_col)
+    cutoff = origin - pd.Timedelta(days=validation_days)
+    
+    records = []
+    
+    for item_id, item_hist in history.groupby('menu_item_id'):
+        item_future = future[future['menu_item_id'] == item_id].set_index('date')[target_col]
+        if item_future.empty:
+            continue
+        
+        if strategy == 'retrain':
+            train_df = item_hist[item_hist['date'] <= cutoff]
+            val_df = item_hist[item_hist['date'] > cutoff]
+            if len(train_df) < Config.MIN_TRAINING_SAMPLES or len(val_df) < Config.MIN_VALIDATION_SAMPLES:
+                continue
+            model = fit_item_model(
+                train_df[feature_cols].fillna(0), train_df[target_col].values,
+                val_df[feature_cols].fillna(0), val_df[target_col].values,
+                n_jobs=1, verbose=False
+            )
+            features = feature_cols
+        else:
+            bundle = _load_reused_model(model_dir, item_id)
+            if bundle is None:
+                continue
+            model = bundle['model']
+            features = bundle['features']
+        
+        item_hist = item_hist.sort_values('date').reset_index(drop=True)
+        templates, windows = item_windows(item_hist, features, [len(item_hist) - 1], target_col)
+        predicted, _ = roll_forward(model, features, templates, windows, pd.DatetimeIndex([origin]), horizon)
+        
+        for step in range(1, horizon + 1):
+            target_date = origin + pd.Timedelta(days=step)
+            if target_date in item_future.index:
+                records.append({
+                    'origin': origin,
+                    'date': target_date,
+                    'horizon': step,
+                    'menu_item_id': item_id,
+                    'actual': float(item_future.loc[target_date]),
+                    'predicted': float(predicted[0, step - 1]),
+                })
+    
+    return records
+
+
+def summarize_errors(errors: pd.DataFrame, by: List[str]) -> pd.DataFrame:
+    """
+    Aggregate backtest errors
+    
+    Args:
+        errors: Per (origin, item, horizon) error table
+        by: Grouping columns, e.g. ['menu_item_id', 'horizon']
+    
+    Returns:
+        DataFrame with MAE, RMSE, MAPE, bias and sample count per group
+    """
+    return errors.groupby(by).agg(
+        mae=('abs_error', 'mean'),
+        rmse=('sq_error', lambda s: float(np.sqrt(s.mean()))),
+        mape=('ape', 'mean'),
+        bias=('error', 'mean'),
+        samples=('error', 'size')
+    ).reset_index()
+
+
+class BacktestAgent:
+    """Agent responsible for replaying historical forecast origins"""
+    
+    def __init__(self, model_dir: str = "models_per_item", output_dir: str = Config.REPORT_OUTPUT_DIR):
+        self.model_dir = model_dir
+        self.output_dir = output_dir
+    
+    def get_origins(self,
+                    df: pd.DataFrame,
+                    n_origins: int = Config.BACKTEST_ORIGINS,
+                    horizon: int = Config.DEFAULT_FORECAST_DAYS,
+                    step_days: int = Config.BACKTEST_STEP_DAYS) -> List[pd.Timestamp]:
+        """
+        Forecast origins, oldest first, spaced step_days apart
+        
+        The latest origin leaves a full horizon of actuals after it.
+        """
+        dates = pd.to_datetime(df['date'])
+        last_origin = dates.max() - pd.Timedelta(days=horizon)
+        origins = [last_origin - pd.Timedelta(days=i * step_days) for i in range(n_origins)]
+        return sorted(o for o in origins if o > dates.min())
+    
+    def run_backtest(self,
+                     df: pd.DataFrame,
+                     n_origins: int = Config.BACKTEST_ORIGINS,
+                     horizon: int = Config.DEFAULT_FORECAST_DAYS,
+                     step_days: int = Config.BACKTEST_STEP_DAYS,
+                     strategy: str = 'retrain',
+                     validation_days: int = Config.VALIDATION_DAYS,
+                     target_col: str = 'confirmed_count',
+                     max_workers: Optional[int] = Config.BACKTEST_MAX_WORKERS,
+                     save: bool = True) -> Dict:
+        """
+        Run a rolling-origin backtest with one process per fold
+        
+        Args:
+            df: Feature-engineered DataFrame (DataAgent.prepare_features output)
+            n_origins: Number of forecast origins to replay
+            horizon: Days forecast from each origin
+            step_days: Spacing between origins
+            strategy: 'retrain' fits fresh models on data up to each origin,
+                      'reuse' replays the saved models in model_dir (these have
+                      seen later data, so errors are optimistic)
+            validation_days: Early-stopping window when retraining
+            target_col: Target column name
+            max_workers: Worker processes (None = CPU count, 1 = in-process)
+            save: Write error tables to output_dir
+        
+        Returns:
+            Dict with 'errors', 'by_item_horizon', 'by_horizon', 'by_item'
+            DataFrames and an overall 'summary'
+        """
+        if strategy not in ('retrain', 'reuse'):
+            raise ValueError(f"Unknown backtest strategy: {strategy}")
+        
+        df = df.copy()
+        df['date'] = pd.to_datetime(df['date'])
+        origins = self.get_origins(df, n_origins, horizon, step_days)
+        
+        print(f"\n🧪 Backtesting {len(origins)} origins × {horizon} days ({strategy})...")
+        
+        if not origins:
+            print("❌ Not enough history to backtest")
+            return {'error': 'insufficient_data'}
+        
+        started = datetime.now()
+        fold_args = [(o, horizon, strategy, self.model_dir, validation_days, target_col) for o in origins]
+        
+        if max_workers == 1:
+            _init_worker(df)
+            fold_results = [_run_fold(*args) for args in fold_args]
+        else:
+            with ProcessPoolExecutor(max_workers=max_workers,
+                                     initializer=_init_worker,
+                                     initargs=(df,)) as executor:
+                futures = [executor.submit(_run_fold, *args) for args in fold_args]
+                fold_results = [f.result() for f in futures]
+        
+        errors = pd.DataFrame([r for fold in fold_results for r in fold])
+        if errors.empty:
+            print("❌ No backtest forecasts produced")
+            return {'error': 'no_forecasts'}
+        
+        errors['error'] = errors['actual'] - errors['predicted']
+        errors['abs_error'] = errors['error'].abs()
+        errors['sq_error'] = errors['error'] ** 2
+        errors['ape'] = errors['abs_error'] / (errors['actual'] + 1) * 100
+        
+        results = {
+            'errors': errors,
+            'by_item_horizon': summarize_errors(errors, ['menu_item_id', 'horizon']),
+            'by_horizon': summarize_errors(errors, ['horizon']),
+            'by_item': summarize_errors(errors, ['menu_item_id']),
+            'summary': {
+                'strategy': strategy,
+                'origins': len(origins),
+                'horizon': horizon,
+                'forecasts': len(errors),
+                'mae': float(errors['abs_error'].mean()),
+                'rmse': float(np.sqrt(errors['sq_error'].mean())),
+                'mape': float(errors['ape'].mean()),
+                'elapsed_seconds': (datetime.now() - started).total_seconds()
+            }
+        }
+        
+        summary = results['summary']
+        print(f"✅ Backtest complete: {summary['forecasts']} forecasts in {summary['elapsed_seconds']:.1f}s")
+        print(f"   MAE: {summary['mae']:.2f} | RMSE: {summary['rmse']:.2f} | MAPE: {summary['mape']:.1f}%")
+        
+        if save:
+            self._save_results(results)
+        
+        return results
+    
+    def _save_results(self, results: Dict):
+        """Save backtest error tables as CSV"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        strategy = results['summary']['strategy']
+        for name in ('errors', 'by_item_horizon', 'by_horizon'):
+            path = os.path.join(self.output_dir, f"backtest_{strategy}_{name}.csv")
+            results[name].to_csv(path, index=False)
+        print(f"💾 Backtest tables saved to {self.output_dir}/")
+
+
+if __name__ == "__main__":
+    # Backtest the current feature pipeline
+    from data_agent import DataAgent
+    
+    data_agent = DataAgent()
+    df = data_agent.update_data()
+    
+    if not df.empty:
+        backtest_agent = BacktestAgent()
+        results = backtest_agent.run_backtest(df)
+        if 'by_horizon' in results:
+            print(results['by_horizon'])
@@ -0,0 +1,145 @@
+"""
+BatchCommitter - Concurrent Firestore batch writes
+
+Documents are grouped into batches of at most 500 writes (Firestore's limit)
+as they are produced, and up to max_in_flight batches are committed at once
+from a thread pool, so a large push costs roughly total / max_in_flight round
+trips instead of one per batch. A batch that fails is retried on its own with
+exponential backoff; the other batches are not affected. Failures are reported
+in batch order once every batch has finished.
+"""
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple
+
+import pandas as pd
+
+from config import Config
+
+# Bad documents or a batch over the size limit; retrying cannot help
+NON_RETRYABLE = (ValueError, TypeError)
+
+
+def _chunked(documents: Iterable, size: int) -> Iterator[List]:
+    iterator = iter(documents)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def frame_documents(df: pd.DataFrame,
+                    doc_id: Callable[[Dict], str],
+                    chunk_size: int = Config.FIRESTORE_BATCH_SIZE) -> Iterator[Tuple[str, Dict]]:
+    """
+    (doc_id, data) pairs for the rows of a DataFrame, converted a slice at a time
+    
+    Missing values become None and numpy scalars plain Python values.
+    """
+    for start in range(0, len(df), chunk_size):
+        part = df.iloc[start:start + chunk_size]
+        for record in part.astype(object).where(pd.notna(part), None).to_dict('records'):
+            yield doc_id(record), record
+
+
+class BatchCommitter:
+    """
+    Commits (doc_id, data) pairs to one collection with several batches in flight
+    
+    Usage:
+        committer = BatchCommitter(db)
+        result = committer.commit("canteen_predictions", ((doc_id, data) for ...))
+        result['committed'], result['errors']
+    """
+    
+    def __init__(self,
+                 db,
+                 max_in_flight: int = Config.FIRESTORE_MAX_IN_FLIGHT,
+                 batch_size: int = Config.FIRESTORE_BATCH_SIZE,
+                 max_retries: int = Config.FIRESTORE_COMMIT_RETRIES,
+                 backoff_seconds: float = Config.FIRESTORE_RETRY_BACKOFF_SECONDS):
+        self.db = db
+        self.max_in_flight = max(1, max_in_flight)
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+    
+    def _commit_batch(self, collection_ref, chunk: List[Tuple[str, Dict]], merge: bool) -> Tuple[int, str]:
+        """Commit one batch, retrying it alone; returns (attempts, error or '')"""
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                batch = self.db.batch()
+                for doc_id, data in chunk:
+                    batch.set(collection_ref.document(doc_id), data, merge=merge)
+                batch.commit()
+                return attempt, ''
+            except NON_RETRYABLE as e:
+                return attempt, f"{type(e).__name__}: {e}"
+            except Exception as e:
+                if attempt > self.max_retries:
+                    return attempt, f"{type(e).__name__}: {e}"
+                time.sleep(self.backoff_seconds * 2 ** (attempt - 1))
+    
+    def commit(self, collection: str, documents: Iterable[Tuple[str, Dict]], merge: bool = True) -> Dict:
+        """
+        Write documents in concurrent batches
+        
+        Args:
+            collection: Collection name
+            documents: (doc_id, data) pairs; consumed lazily, so at most
+                       max_in_flight + 1 batches are held in memory
+            merge: Merge into existing documents instead of replacing them
+        
+        Returns:
+            Dict with committed / failed document counts, batches, retries and
+            errors (one per failed batch, in batch order: batch, first_doc_id,
+            last_doc_id, documents, attempts, error)
+        """
+        collection_ref = self.db.collection(collection)
+        committed = failed = batches = retries = 0
+        errors = []
+        
+        def _collect(futures):
+            nonlocal committed, failed, retries
+            for future in futures:
+                index, chunk = running.pop(future)
+                attempts, error = future.result()
+                retries += attempts - 1
+                if error:
+                    failed += len(chunk)
+                    errors.append({
+                        'batch': index,
+                        'first_doc_id': chunk[0][0],
+                        'last_doc_id': chunk[-1][0],
+                        'documents': len(chunk),
+                        'attempts': attempts,
+                        'error': error
+                    })
+                else:
+                    committed += len(chunk)
+        
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as pool:
+            running = {}
+            for index, chunk in enumerate(_chunked(documents, self.batch_size)):
+                if len(running) >= self.max_in_flight:
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    _collect(done)
+                running[pool.submit(self._commit_batch, collection_ref, chunk, merge)] = (index, chunk)
+                batches += 1
+            _collect(list(running))
+        
+        errors.sort(key=lambda e: e['batch'])
+        for e in errors:
+            print(f"❌ Batch {e['batch']} ({e['first_doc_id']} … {e['last_doc_id']}) failed "
+                  f"after {e['attempts']} attempts: {e['error']}")
+        return {
+            'committed': committed,
+            'failed': failed,
+            'batches': batches,
+            'retries': retries,
+            'errors': errors
+        }
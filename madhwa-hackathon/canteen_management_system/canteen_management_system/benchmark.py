@@ -0,0 +1,297 @@
+"""
+CanteenAI - End-to-end benchmark suite
+
+Times and memory-profiles every pipeline stage on generated datasets of
+several sizes and compares the results with a saved baseline.
+
+Usage:
+    python benchmark.py                                  # small + medium scales
+    python benchmark.py --scales small,medium,large --repeat 3
+    python benchmark.py --save-baseline                  # record benchmarks/baseline.json
+    python benchmark.py --threshold 0.25                 # fail on >25% slowdowns
+    python benchmark.py --firestore-latency 40           # simulated Firestore round trip (ms)
+
+Every scale runs in its own temporary working directory, so the benchmark
+never touches the real canteen_history.csv, models or prediction store, and
+Firebase is disabled for the whole run. The Firestore push and sync stages
+run against an in-memory LocalFirestore with a fixed simulated latency.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Stages run from temporary directories; keep this package importable from there
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from firebase_config import FirebaseConfig
+from generate_dummy_data import generate_canteen_data
+
+BENCHMARK_DIR = "benchmarks"
+BASELINE_PATH = os.path.join(BENCHMARK_DIR, "baseline.json")
+
+# Dataset sizes: menu items × days of history
+SCALES = {
+    'small': {'n_items': 5, 'start': '2025-07-01', 'end': '2025-10-31'},
+    'medium': {'n_items': 50, 'start': '2024-11-01', 'end': '2025-10-31'},
+    'large': {'n_items': 500, 'start': '2023-11-01', 'end': '2025-10-31'},
+}
+
+# Stages faster than this are too noisy to flag as regressions
+MIN_SECONDS = 0.05
+
+# Simulated Firestore latency for the push / sync stages
+FIRESTORE_LATENCY_MS = 20.0
+FIRESTORE_PER_DOCUMENT_MS = 0.01
+
+
+def measure(func: Callable, repeat: int = 1, memory: bool = True, verbose: bool = False) -> Tuple[Dict, object]:
+    """
+    Time a callable and record its peak traced memory
+    
+    Timing runs happen without tracing (tracemalloc slows Python code down);
+    peak memory comes from one extra traced run.
+    
+    Returns:
+        (measurement dict, result of the last call)
+    """
+    output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    timings = []
+    result = None
+    
+    with output:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = func()
+            timings.append(time.perf_counter() - started)
+        
+        peak_mb = None
+        if memory:
+            tracemalloc.start()
+            try:
+                result = func()
+                peak_mb = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+            finally:
+                tracemalloc.stop()
+    
+    timings.sort()
+    return {
+        'seconds': timings[len(timings) // 2],
+        'min_seconds': timings[0],
+        'peak_mb': peak_mb,
+        'runs': repeat
+    }, result
+
+
+def _load_app(ai):
+    """Import the Flask app and point it at this scale's CanteenAI"""
+    import app as app_module
+    
+    # The app starts its own warm-up on import; let it finish before timing
+    thread = app_module.ai.warm_up(background=True)
+    if thread is not None:
+        thread.join()
+    app_module.ai = ai
+    return app_module.app.test_client()
+
+
+def _request(client, method: str, url: str, **kwargs):
+    response = getattr(client, method)(url, **kwargs)
+    if response.status_code != 200:
+        raise RuntimeError(f"{method.upper()} {url} returned {response.status_code}")
+    return response
+
+
+def benchmark_scale(name: str, spec: Dict, repeat: int = 1, memory: bool = True,
+                    verbose: bool = False, keep: bool = False,
+                    firestore_latency_ms: float = FIRESTORE_LATENCY_MS) -> Dict:
+    """
+    Run every stage on one generated dataset
+    
+    Returns:
+        Dict with dataset size and per-stage measurements
+    """
+    from canteen_ai import CanteenAI
+    
+    df_raw = generate_canteen_data(n_items=spec['n_items'], start=spec['start'], end=spec['end'])
+    workdir = tempfile.mkdtemp(prefix=f"canteen_bench_{name}_")
+    cwd = os.getcwd()
+    stages = {}
+    
+    print(f"\n📏 Scale '{name}': {len(df_raw)} rows ({spec['n_items']} items × {df_raw['date'].nunique()} days)")
+    
+    def run(stage: str, func: Callable, rows: Optional[int] = None):
+        stages[stage], result = measure(func, repeat=repeat, memory=memory, verbose=verbose)
+        stages[stage]['rows'] = rows
+        peak = f" | peak {stages[stage]['peak_mb']:.1f} MB" if stages[stage]['peak_mb'] is not None else ""
+        print(f"   ⏱️  {stage:<26} {stages[stage]['seconds']:8.3f}s{peak}")
+        return result
+    
+    try:
+        os.chdir(workdir)
+        df_raw.to_csv("canteen_history.csv", index=False)
+        
+        with contextlib.redirect_stdout(io.StringIO()):
+            ai = CanteenAI()
+        data_agent = ai.data_agent
+        
+        df = run('update_data', ai.update_data, len(df_raw))
+        df_clean, _ = data_agent.validate_data(df_raw)
+        run('prepare_features', lambda: data_agent.prepare_features(df_clean), len(df_clean))
+        run('train_model', lambda: ai.train_agent.train_model(df), len(df))
+        
+        # Predictions pick up the models just trained
+        ai.predict_agent.clear_model_cache()
+        run('predict_next_day', lambda: ai.predict_agent.predict_next_day(df), spec['n_items'])
+        run('predict_weekly', lambda: ai.predict_agent.predict_weekly(df, days=7), spec['n_items'] * 7)
+        run('analyze_trends', lambda: ai.insight_agent.analyze_trends(df), len(df))
+        
+        with contextlib.redirect_stdout(io.StringIO()):
+            client = _load_app(ai)
+        run('api_predict_next_day', lambda: _request(client, 'post', '/api/predict-next-day'), spec['n_items'])
+        run('api_predict_weekly', lambda: _request(client, 'post', '/api/predict-weekly', json={'days': 7}),
+            spec['n_items'] * 7)
+        run('api_insights', lambda: _request(client, 'get', '/api/insights'), len(df))
+        
+        # Last: the sync rewrites canteen_history.csv
+        with contextlib.redirect_stdout(io.StringIO()):
+            FirebaseConfig.use_local(":memory:", latency_ms=firestore_latency_ms,
+                                     per_document_ms=FIRESTORE_PER_DOCUMENT_MS)
+            predictions = ai.predict_agent.predict_weekly(df, days=7)
+        run('firestore_push', lambda: data_agent.push_to_firebase(df_raw), len(df_raw))
+        run('firestore_sync', lambda: data_agent.fetch_from_firebase(), len(df_raw))
+        run('firestore_push_predictions', lambda: ai.predict_agent.push_predictions_to_firebase(predictions),
+            len(predictions))
+    finally:
+        FirebaseConfig.disable()
+        os.chdir(cwd)
+        if keep:
+            print(f"   📁 Kept working directory {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+    
+    return {
+        'rows': len(df_raw),
+        'items': spec['n_items'],
+        'days': int(df_raw['date'].nunique()),
+        'stages': stages
+    }
+
+
+def compare_with_baseline(results: Dict, baseline: Dict, threshold: float) -> List[Dict]:
+    """
+    Stage timings that slowed down by more than threshold (e.g. 0.2 = 20%)
+    
+    Only scales and stages present in both runs are compared.
+    """
+    regressions = []
+    for scale, current in results['scales'].items():
+        previous = baseline.get('scales', {}).get(scale)
+        if previous is None:
+            continue
+        for stage, m in current['stages'].items():
+            before = previous['stages'].get(stage)
+            if before is None or before['seconds'] <= 0:
+                continue
+            ratio = m['seconds'] / before['seconds']
+            if ratio > 1 + threshold and m['seconds'] - before['seconds'] > MIN_SECONDS:
+                regressions.append({
+                    'scale': scale,
+                    'stage': stage,
+                    'baseline_seconds': before['seconds'],
+                    'seconds': m['seconds'],
+                    'ratio': ratio
+                })
+    return regressions
+
+
+def run_benchmarks(scales: List[str], repeat: int = 1, memory: bool = True,
+                   verbose: bool = False, keep: bool = False,
+                   firestore_latency_ms: float = FIRESTORE_LATENCY_MS) -> Dict:
+    """Benchmark the requested scales"""
+    FirebaseConfig.disable()
+    
+    results = {
+        'created_at': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'repeat': repeat,
+        'firestore_latency_ms': firestore_latency_ms,
+        'scales': {}
+    }
+    for name in scales:
+        results['scales'][name] = benchmark_scale(name, SCALES[name], repeat, memory, verbose, keep,
+                                                  firestore_latency_ms)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the CanteenAI pipeline stages')
+    parser.add_argument('--scales', type=str, default='small,medium',
+                        help=f"Comma-separated scales: {', '.join(SCALES)}")
+    parser.add_argument('--repeat', type=int, default=1, help='Timed runs per stage (median is kept)')
+    parser.add_argument('--no-memory', action='store_true', help='Skip the traced memory run')
+    parser.add_argument('--baseline', type=str, default=BASELINE_PATH, help='Baseline JSON to compare with')
+    parser.add_argument('--save-baseline', action='store_true', help='Store this run as the new baseline')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='Relative slowdown that counts as a regression')
+    parser.add_argument('--keep', action='store_true', help='Keep the temporary working directories')
+    parser.add_argument('--firestore-latency', type=float, default=FIRESTORE_LATENCY_MS,
+                        help='Simulated Firestore round trip in ms for the push / sync stages')
+    parser.add_argument('--verbose', action='store_true', help='Show agent output')
+    args = parser.parse_args()
+    
+    scales = [s.strip() for s in args.scales.split(',') if s.strip()]
+    unknown = [s for s in scales if s not in SCALES]
+    if unknown:
+        parser.error(f"Unknown scale(s): {', '.join(unknown)}")
+    
+    print("\n" + "=" * 60)
+    print("🏁 CANTEEN AI BENCHMARK")
+    print("=" * 60)
+    
+    results = run_benchmarks(scales, args.repeat, not args.no_memory, args.verbose, args.keep,
+                             args.firestore_latency)
+    
+    os.makedirs(BENCHMARK_DIR, exist_ok=True)
+    output_path = os.path.join(BENCHMARK_DIR, f"results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(output_path, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\n💾 Results saved to {output_path}")
+    
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"📌 Baseline updated: {args.baseline}")
+        return 0
+    
+    if not os.path.exists(args.baseline):
+        print("💡 No baseline yet; run with --save-baseline to record one")
+        return 0
+    
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare_with_baseline(results, baseline, args.threshold)
+    
+    if not regressions:
+        print(f"✅ No regressions beyond {args.threshold:.0%} against {args.baseline}")
+        return 0
+    
+    print(f"\n⚠️ {len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+    for r in regressions:
+        print(f"   {r['scale']}/{r['stage']}: {r['baseline_seconds']:.3f}s → {r['seconds']:.3f}s ({r['ratio']:.2f}x)")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,14 +4,34 @@ Intelligent agent for managing canteen meal demand forecasting
 """
 import pandas as pd
 from datetime import datetime, timedelta
-from typing import Dict, Optional
+from typing import TYPE_CHECKING, Callable, Dict, Iterator, List, Optional
 import argparse
+import os
+import sys
+import threading
 
-from firebase_config import FirebaseConfig
-from data_agent import DataAgent
-from train_agent import TrainAgent
-from predict_agent import PredictAgent
-from insight_agent import InsightAgent
+from config import Config
+from snapshot_store import SnapshotStore, describe_snapshot
+from profiler import PipelineProfiler, NULL_PROFILER, run_profiled
+from pipeline_dag import PipelineDAG, StageCache, directory_fingerprint
+from forecast_table import ForecastTable
+from firebase_config import FirebaseCollections
+from sites import SitePartition
+
+# Agent modules (and the model libraries behind them) are imported by the
+# properties that create the agents, so startup only pays for what it uses
+if TYPE_CHECKING:
+    from data_agent import DataAgent
+    from train_agent import TrainAgent
+    from predict_agent import PredictAgent
+    from insight_agent import InsightAgent
+    from backtest_agent import BacktestAgent
+    from hierarchy_agent import HierarchyAgent
+    from tap_ingestion import TapIngestionService
+    from headcount_feed import HeadcountFeed
+    from surplus_engine import SurplusEngine
+    from scenario_agent import ScenarioAgent
+    from prep_planner import PrepPlanner
 
 
 class CanteenAI:
@@ -23,34 +43,325 @@ class CanteenAI:
         ai.run_full_pipeline()
     """
     
-    def __init__(self, firebase_credentials: Optional[str] = None):
+    def __init__(self, firebase_credentials: Optional[str] = None, site_id: Optional[str] = None):
         """
         Initialize CanteenAI
         
         Args:
             firebase_credentials: Path to Firebase credentials JSON
+            site_id: Canteen site whose partition to use (see sites.py);
+                     None = the default site (single-canteen layout)
         """
         print("\n" + "=" * 60)
         print("🤖 CANTEEN AI - Intelligent Meal Demand Forecasting")
         print("=" * 60)
         
-        # Initialize Firebase
+        # Firebase connects lazily, the first time an agent needs it
         if firebase_credentials:
-            FirebaseConfig.initialize(firebase_credentials)
-        else:
-            FirebaseConfig.initialize()
+            Config.set_firebase_credentials(firebase_credentials)
         
-        # Initialize agents
-        self.data_agent = DataAgent()
-        self.train_agent = TrainAgent()
-        self.predict_agent = PredictAgent()
-        self.insight_agent = InsightAgent()
+        # Storage partition and model namespace of this canteen
+        self.site = SitePartition(site_id)
+        
+        # Agents are created on first use
+        self._agents = {}
+        self._agent_lock = threading.Lock()
         
         self.last_training_date = None
+        self.last_sync_date = None
         self.data_cache = None
+        # Pipeline stage outputs keyed by input fingerprints, kept on disk so
+        # the next run (e.g. another CLI invocation) reuses them (see pipeline_dag.py)
+        self._stage_cache = StageCache(self.site.pipeline_cache_dir)
+        # Forecasts materialized for the prediction endpoints
+        self.forecast_table = ForecastTable(self.site.forecast_table_path)
+        self._data_through = (None, None)
+        # (model_dir, fingerprint) of the served models, see models_fingerprint
+        self._models_fingerprint = (None, None)
+        
+        # Shared read-only snapshot used in multi-worker serving mode
+        self.snapshot_store = None
+        self.snapshot = None
+        
+        # Background warm-up / readiness state
+        self._ready = threading.Event()
+        self._warmup_thread = None
+        self.warmup_error = None
         
         print("✅ CanteenAI initialized successfully")
     
+    def _get_agent(self, name: str, factory: Callable):
+        """Create an agent on first access"""
+        agent = self._agents.get(name)
+        if agent is None:
+            with self._agent_lock:
+                agent = self._agents.get(name)
+                if agent is None:
+                    agent = self._agents[name] = factory()
+        return agent
+    
+    @property
+    def headcount_feed(self) -> 'HeadcountFeed':
+        from headcount_feed import HeadcountFeed
+        return self._get_agent('headcount', lambda: HeadcountFeed(
+            self.site.headcount_store_path,
+            collection=self.site.collection(FirebaseCollections.WORKING_MODES),
+            app_collection=self.site.collection(FirebaseCollections.WORK_MODES)
+        ))
+    
+    @property
+    def data_agent(self) -> 'DataAgent':
+        from data_agent import DataAgent
+        return self._get_agent('data', lambda: DataAgent(
+            self.site.local_csv,
+            collection=self.site.collection(FirebaseCollections.MEAL_DATA),
+            processed_csv=self.site.processed_csv,
+            checkpoint_dir=self.site.sync_checkpoint_dir
+        ))
+    
+    @property
+    def train_agent(self) -> 'TrainAgent':
+        from train_agent import TrainAgent
+        return self._get_agent('train', lambda: TrainAgent(self.site.model_dir))
+    
+    @property
+    def predict_agent(self) -> 'PredictAgent':
+        from predict_agent import PredictAgent
+        from prediction_store import PredictionStore
+        headcount = self.headcount_feed
+        return self._get_agent('predict', lambda: PredictAgent(
+            self.site.model_dir,
+            store=PredictionStore(self.site.prediction_store_path),
+            collection=self.site.collection(FirebaseCollections.PREDICTIONS),
+            headcount=headcount
+        ))
+    
+    @property
+    def insight_agent(self) -> 'InsightAgent':
+        from insight_agent import InsightAgent
+        return self._get_agent('insight', InsightAgent)
+    
+    @property
+    def backtest_agent(self) -> 'BacktestAgent':
+        from backtest_agent import BacktestAgent
+        return self._get_agent('backtest', lambda: BacktestAgent(self.site.model_dir))
+    
+    @property
+    def hierarchy_agent(self) -> 'HierarchyAgent':
+        from hierarchy_agent import HierarchyAgent
+        return self._get_agent('hierarchy', lambda: HierarchyAgent(self.site.hierarchy_model_path))
+    
+    @property
+    def tap_ingestion(self) -> 'TapIngestionService':
+        """RFID tap ingestion, flushing in the background once created"""
+        from tap_ingestion import TapIngestionService
+        
+        def _create():
+            # serve.py workers share the tap store, so dedupe and count in it
+            service = TapIngestionService(self.site.tap_store_path,
+                                          collection=self.site.collection(FirebaseCollections.SERVED_COUNTS),
+                                          shared=Config.SERVE_FROM_SNAPSHOT)
+            service.start()
+            return service
+        return self._get_agent('taps', _create)
+    
+    @property
+    def surplus_engine(self) -> 'SurplusEngine':
+        from surplus_engine import SurplusEngine
+        taps = self.tap_ingestion
+        return self._get_agent('surplus', lambda: SurplusEngine(taps))
+    
+    @property
+    def scenario_agent(self) -> 'ScenarioAgent':
+        from scenario_agent import ScenarioAgent
+        predict_agent = self.predict_agent
+        return self._get_agent('scenario', lambda: ScenarioAgent(predict_agent))
+    
+    @property
+    def prep_planner(self) -> 'PrepPlanner':
+        from prep_planner import PrepPlanner
+        return self._get_agent('prep', PrepPlanner)
+    
+    def warm_up(self, background: bool = True) -> Optional[threading.Thread]:
+        """
+        Load data (and with it Firebase and the feature table) ahead of the first request
+        
+        Args:
+            background: Run in a daemon thread so a server can start accepting requests
+        
+        Returns:
+            The warm-up thread when running in the background
+        """
+        if self._warmup_thread is not None:
+            return self._warmup_thread
+        
+        # Worker processes map the published snapshot instead of loading data
+        if Config.SERVE_FROM_SNAPSHOT and self.attach_snapshot():
+            self._ready.set()
+            return None
+        
+        def _warm():
+            try:
+                self.update_data()
+            except Exception as e:
+                print(f"⚠️ Warm-up failed: {e}")
+                self.warmup_error = str(e)
+            finally:
+                self._ready.set()
+        
+        if not background:
+            _warm()
+            return None
+        
+        self._warmup_thread = threading.Thread(target=_warm, name='canteen-ai-warmup', daemon=True)
+        self._warmup_thread.start()
+        return self._warmup_thread
+    
+    def is_ready(self) -> bool:
+        """True once data has been loaded"""
+        return self.data_cache is not None and not self.data_cache.empty
+    
+    def readiness(self) -> Dict:
+        """Readiness details for health checks"""
+        return {
+            'ready': self.is_ready(),
+            'warming_up': self._warmup_thread is not None and not self._ready.is_set(),
+            'data_records': 0 if self.data_cache is None else len(self.data_cache),
+            'agents_loaded': sorted(self._agents),
+            'snapshot': describe_snapshot(self.snapshot) if self.snapshot is not None else None,
+            'error': self.warmup_error
+        }
+    
+    def ensure_data(self, timeout: Optional[float] = None) -> pd.DataFrame:
+        """
+        Return the cached data, waiting for a running warm-up or loading it now
+        
+        Args:
+            timeout: Seconds to wait for an in-progress warm-up
+        
+        Returns:
+            Cached feature DataFrame
+        """
+        if self.snapshot_store is not None:
+            self.refresh_snapshot()
+        
+        if self.is_ready():
+            return self.data_cache
+        
+        if self._warmup_thread is not None and not self._ready.is_set():
+            self._ready.wait(timeout)
+        
+        if not self.is_ready():
+            self.update_data()
+        return self.data_cache
+    
+    def runtime_stats(self) -> Dict:
+        """
+        Cheap counters and gauges for monitoring
+        
+        Never creates agents or loads data, so it is safe to call on every scrape.
+        """
+        predict_agent = self._agents.get('predict')
+        if self.snapshot is not None:
+            models_available = len(self.snapshot.meta['model_files'])
+            data_rows = len(self.snapshot)
+        else:
+            model_dir = predict_agent.model_dir if predict_agent else self.site.model_dir
+            models_available = len([f for f in os.listdir(model_dir)
+                                    if f.startswith("lgb_item_") and f.endswith(".pkl")]) if os.path.isdir(model_dir) else 0
+            data_rows = 0 if self.data_cache is None else len(self.data_cache)
+        
+        stats = predict_agent.stats if predict_agent else {}
+        tap_stats = self._agents['taps'].stats if 'taps' in self._agents else {}
+        return {
+            'data_rows': data_rows,
+            'models_available': models_available,
+            'models_cached': predict_agent.cached_model_count if predict_agent else 0,
+            'predictions': stats.get('predictions', 0),
+            'model_loads': stats.get('model_loads', 0),
+            'model_cache_hits': stats.get('model_cache_hits', 0),
+            'last_sync_date': self.last_sync_date,
+            'last_training_date': self.last_training_date,
+            'taps_accepted': tap_stats.get('accepted', 0),
+            'taps_duplicates': tap_stats.get('duplicates', 0),
+            'background_jobs': int(self._warmup_thread is not None and self._warmup_thread.is_alive())
+        }
+    
+    def attach_snapshot(self, store: Optional[SnapshotStore] = None) -> bool:
+        """
+        Serve from the shared, memory-mapped snapshot instead of per-process data
+        
+        In this mode data_cache only holds the last few rows per item needed for
+        predictions; history() materialises the full table when required.
+        
+        Args:
+            store: Snapshot store (default: the site's Config.SNAPSHOT_DIR)
+        
+        Returns:
+            True if a snapshot was attached
+        """
+        self.snapshot_store = store or SnapshotStore(self.site.snapshot_dir)
+        return self.refresh_snapshot()
+    
+    def refresh_snapshot(self) -> bool:
+        """Switch to the newest published snapshot if the CURRENT pointer moved"""
+        if self.snapshot_store is None:
+            return False
+        
+        version = self.snapshot_store.current_version()
+        if version is None:
+            return False
+        if self.snapshot is not None and self.snapshot.version == version:
+            return True
+        
+        snapshot = self.snapshot_store.open(version)
+        self.data_cache = snapshot.recent_frame(Config.SNAPSHOT_RECENT_ROWS)
+        self.predict_agent.model_dir = snapshot.model_dir
+        self.predict_agent.clear_model_cache()
+        self.snapshot = snapshot
+        print(f"📸 Serving snapshot {version}")
+        return True
+    
+    def publish_snapshot(self, df: Optional[pd.DataFrame] = None) -> Optional[str]:
+        """
+        Publish a feature table and the current models as a new snapshot
+        
+        Args:
+            df: Feature table to publish (default: current history)
+        
+        Returns:
+            New snapshot version, or None if there is no data
+        """
+        history = df if df is not None else self.history()
+        if history is None or history.empty:
+            print("❌ No data available for snapshot")
+            return None
+        
+        store = self.snapshot_store or SnapshotStore(self.site.snapshot_dir)
+        version = store.publish(history, self.train_agent.model_dir)
+        if self.snapshot_store is not None:
+            self.refresh_snapshot()
+        return version
+    
+    def history(self) -> Optional[pd.DataFrame]:
+        """Full feature history; materialised from the snapshot in serving mode"""
+        if self.snapshot is not None:
+            return self.snapshot.frame()
+        return self.data_cache
+    
+    def iter_history(self,
+                     start_date: Optional[str] = None,
+                     end_date: Optional[str] = None,
+                     menu_item_ids: Optional[List[int]] = None,
+                     chunksize: int = Config.EXPORT_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+        """
+        Stream the feature history in filtered chunks without materialising it
+        (from the snapshot in serving mode, else from the local files)
+        """
+        if self.snapshot is not None:
+            return self.snapshot.iter_chunks(start_date, end_date, menu_item_ids, chunksize)
+        return self.data_agent.iter_local_chunks(start_date, end_date, menu_item_ids, chunksize)
+    
     def update_data(self, days_back: Optional[int] = None) -> pd.DataFrame:
         """
         Fetch and update data from Firebase
@@ -62,15 +373,30 @@ class CanteenAI:
             Updated DataFrame
         """
         print("\n📥 STEP 1: Updating data from Firebase...")
-        self.data_cache = self.data_agent.update_data()
+        # Working-mode selections first, so forecasts are scaled by the latest headcount
+        try:
+            self.headcount_feed.sync_from_firebase()
+        except Exception as e:
+            print(f"⚠️ Working-mode sync failed: {e}")
+        df = self.data_agent.update_data()
+        if not df.empty:
+            self.last_sync_date = datetime.now()
+        
+        # In serving mode fresh data reaches every worker through a new snapshot
+        if self.snapshot_store is not None and not df.empty:
+            self.publish_snapshot(df)
+            return df
+        
+        self.data_cache = df
         return self.data_cache
     
-    def train_model(self, force: bool = False) -> Dict:
+    def train_model(self, force: bool = False, new_records_count: int = 0) -> Dict:
         """
         Train or retrain models
         
         Args:
             force: Force retraining even if not needed
+            new_records_count: Rows added since the last training (retrain trigger)
         
         Returns:
             Training results dictionary
@@ -87,13 +413,29 @@ class CanteenAI:
             if self.last_training_date:
                 days_since = (datetime.now() - self.last_training_date).days
             
-            if not self.train_agent.should_retrain(days_since_training=days_since):
+            if not self.train_agent.should_retrain(new_records_count=new_records_count,
+                                                   days_since_training=days_since):
                 print("ℹ️ Retraining not needed yet")
                 return {'status': 'skipped', 'reason': 'not_needed'}
         
         # Train models
-        results = self.train_agent.train_model(self.data_cache)
+        history = self.history()
+        results = self.train_agent.train_model(history)
         self.last_training_date = datetime.now()
+        if results.get('models_trained'):
+            self.models_fingerprint(refresh=True)
+        
+        # Aggregate-level models over the items that now have models
+        if Config.TRAIN_HIERARCHY and results.get('models_trained'):
+            results['hierarchy'] = self.hierarchy_agent.train(history, results['summary'])
+        
+        # Atomically swap every serving worker onto the new models
+        if self.snapshot_store is not None and results.get('models_trained'):
+            self.publish_snapshot()
+        
+        # Refresh the served forecasts for the new models
+        if Config.MATERIALIZE_AFTER_TRAINING and results.get('models_trained'):
+            self.materialize_forecasts()
         
         return results
     
@@ -132,6 +474,235 @@ class CanteenAI:
         predictions = self.predict_agent.predict_weekly(self.data_cache, days=days)
         return predictions
     
+    def forecast_hierarchy(self, days: int = 7) -> Dict:
+        """
+        Coherent forecasts for items, categories, sites and the total
+        
+        Args:
+            days: Number of days to forecast
+        
+        Returns:
+            Dict with reconciled 'items' and per-node 'levels' DataFrames
+        """
+        print(f"\n🧮 Generating {days}-day hierarchical forecast...")
+        items = self.forecast_week(days=days)
+        if items.empty:
+            return {'items': items, 'levels': pd.DataFrame()}
+        return self.hierarchy_agent.reconcile(self.data_cache, items)
+    
+    def forecast_new_items(self, items: pd.DataFrame, days: int = 7) -> pd.DataFrame:
+        """
+        Cold-start forecasts for menu items that have no history yet
+        
+        Neighbours' forecasts come from the forecast table, so this does not
+        rerun the item models.
+        
+        Args:
+            items: New items (menu_item_id, item_category, optional meal_slot)
+            days: Number of days to forecast
+        
+        Returns:
+            DataFrame with the new items' predictions
+        """
+        base = self.forecast_week(days=days)
+        if base.empty:
+            return base
+        if 'forecast_source' in base.columns:
+            base = base[base['forecast_source'] == 'model']
+        
+        frames = [self.predict_agent.cold_start.forecast(self.data_cache, group, pd.Timestamp(date), items)
+                  for date, group in base.groupby('date')]
+        frames = [f for f in frames if not f.empty]
+        if not frames:
+            return pd.DataFrame()
+        predictions = pd.concat(frames, ignore_index=True)
+        return predictions[predictions['menu_item_id'].isin(items['menu_item_id'])].reset_index(drop=True)
+    
+    # ---------- Materialized forecasts ----------
+    
+    def data_through(self) -> Optional[str]:
+        """Latest date in the cached data (memoised per data_cache)"""
+        if self.data_cache is None or self.data_cache.empty:
+            return None
+        cache_id, value = self._data_through
+        if cache_id != id(self.data_cache):
+            value = str(pd.to_datetime(self.data_cache['date']).max().date())
+            self._data_through = (id(self.data_cache), value)
+        return value
+    
+    def models_fingerprint(self, refresh: bool = False) -> str:
+        """
+        Fingerprint of the served model files
+        
+        Cached rather than stat-ing every model file per request; re-read after
+        training, when the snapshot swaps (model_dir moves) and with refresh=True.
+        """
+        model_dir = self.predict_agent.model_dir
+        cached_dir, value = self._models_fingerprint
+        if refresh or cached_dir != model_dir:
+            value = directory_fingerprint(model_dir, "lgb_item_", ".pkl")
+            self._models_fingerprint = (model_dir, value)
+        return value
+    
+    def headcount_fingerprint(self) -> str:
+        """Working-mode counts the forecast table's scaling depends on (reference days and forecast days)"""
+        latest = pd.to_datetime(self.data_through())
+        start = latest - timedelta(days=Config.HEADCOUNT_REFERENCE_DAYS - 1)
+        end = latest + timedelta(days=Config.FORECAST_TABLE_DAYS)
+        return self.headcount_feed.fingerprint(str(start.date()), str(end.date()))
+    
+    def forecast_table_is_fresh(self) -> bool:
+        """True if the table was built from the current data, models and working-mode counts"""
+        data_through = self.data_through()
+        return data_through is not None and self.forecast_table.is_fresh(
+            data_through, self.models_fingerprint(), self.headcount_fingerprint())
+    
+    def materialize_forecasts(self, days: int = Config.FORECAST_TABLE_DAYS,
+                              predictions: Optional[pd.DataFrame] = None) -> int:
+        """
+        Compute forecasts for the next N days for all items and store them in
+        the forecast table
+        
+        Args:
+            days: Days to materialize
+            predictions: Already computed forecasts to store instead
+        
+        Returns:
+            Number of forecasts stored
+        """
+        if predictions is None:
+            predictions = self.predict_next_week(days=days)
+        if predictions.empty:
+            return 0
+        return self.forecast_table.write(predictions, self.data_through(), self.models_fingerprint(),
+                                         self.headcount_fingerprint())
+    
+    def _forecast_dates(self, days: int) -> list:
+        latest = pd.to_datetime(self.data_through())
+        return [str((latest + timedelta(days=offset)).date()) for offset in range(1, days + 1)]
+    
+    def forecast_next_day(self) -> pd.DataFrame:
+        """
+        Next-day forecasts from the forecast table, computed on demand if it is stale
+        
+        Returns:
+            DataFrame with predictions
+        """
+        if self.forecast_table_is_fresh():
+            served = self.forecast_table.for_date(self._forecast_dates(1)[0])
+            if not served.empty:
+                return served
+        return self.predict_next_day()
+    
+    def forecast_week(self, days: int = 7) -> pd.DataFrame:
+        """
+        N-day forecasts from the forecast table; a stale or too short table is
+        recomputed on demand and re-materialized
+        
+        Args:
+            days: Number of days to forecast
+        
+        Returns:
+            DataFrame with weekly predictions
+        """
+        if self.forecast_table_is_fresh():
+            dates = self._forecast_dates(days)
+            if set(dates) <= set(self.forecast_table.dates()):
+                return self.forecast_table.for_dates(dates)
+        
+        predictions = self.predict_next_week(days=days)
+        if not predictions.empty:
+            self.materialize_forecasts(days, predictions=predictions)
+        return predictions
+    
+    def lookup_forecast(self, date: str, item_id: int) -> Optional[Dict]:
+        """
+        One item's forecast for one date, from the forecast table
+        
+        Returns:
+            Forecast record, or None if it is not materialized or stale
+        """
+        if not self.forecast_table_is_fresh():
+            return None
+        return self.forecast_table.lookup(date, item_id)
+    
+    def surplus(self, date: Optional[str] = None, prepared: Optional[Dict[int, int]] = None) -> pd.DataFrame:
+        """
+        Live surplus estimates for a service date
+        
+        The day's plan is set up on first use from the forecast table and any
+        confirmed counts in the history, and set up again (keeping the
+        kitchen's figures) when the table is re-materialized or the history
+        is reloaded; served counts then arrive with every tap batch.
+        
+        Args:
+            date: Service date (YYYY-MM-DD, default today)
+            prepared: Optional {menu_item_id: portions prepared} from the kitchen
+        
+        Returns:
+            DataFrame with prepared, served, expected remaining and surplus per item
+        """
+        date = date or datetime.now().date().isoformat()
+        engine = self.surplus_engine
+        self.forecast_table.refresh()
+        inputs = self._surplus_inputs()
+        if engine.plan_inputs(date) != inputs:
+            engine.load_plan(date, self.forecast_table.for_date(date), self.history(), prepared, inputs=inputs)
+        elif prepared:
+            engine.set_prepared(date, prepared)
+        return engine.estimates(date)
+    
+    def _surplus_inputs(self) -> tuple:
+        """What a surplus plan is built from: the forecast table build and the history (snapshot or cache)"""
+        built_at = self.forecast_table.meta['built_at'] if self.forecast_table.meta else None
+        history = self.snapshot.version if self.snapshot is not None else id(self.data_cache)
+        return built_at, history
+    
+    def plan_prep(self,
+                  days: int = 7,
+                  forecasts: Optional[pd.DataFrame] = None,
+                  costs: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+        """
+        Recommended prep quantity per item and day (see prep_planner.py)
+        
+        Args:
+            days: Days ahead, served from the forecast table
+            forecasts: Already computed forecasts to plan instead
+            costs: Optional per-item waste_cost / shortage_cost overrides
+        
+        Returns:
+            DataFrame with quantiles, service_level, prep_quantity and buffer per item and day
+        """
+        if forecasts is None:
+            self.ensure_data()
+            forecasts = self.forecast_week(days)
+        plan = self.prep_planner.plan(forecasts, costs)
+        if not plan.empty:
+            print(f"🍳 Prep plan: {len(plan)} item-days, {int(plan['prep_quantity'].sum())} portions")
+        return plan
+    
+    def what_if(self,
+                scenarios: Optional[list] = None,
+                grid: Optional[Dict[str, list]] = None,
+                days: int = 7) -> pd.DataFrame:
+        """
+        Demand under feature-override scenarios versus the baseline forecast
+        
+        Args:
+            scenarios: Overrides per scenario, e.g. [{'precipitation': 15, 'wfh_share': 0.3}]
+            grid: Override values to combine, e.g. {'is_holiday': [0, 1], 'wfh_share': [0, 0.3]}
+            days: Days ahead
+        
+        Returns:
+            DataFrame with baseline_count, scenario_count and delta per
+            scenario x item x day (see ScenarioAgent.summarize for totals)
+        """
+        # The recent rows kept in serving mode cover every lag and rolling window
+        recent = self.ensure_data()
+        if recent is None or recent.empty:
+            return pd.DataFrame()
+        return self.scenario_agent.simulate(recent, scenarios, grid, days, self.models_fingerprint())
+    
     def analyze_trends(self) -> Dict:
         """
         Generate insights and trend analysis
@@ -145,7 +716,7 @@ class CanteenAI:
             print("❌ No data available for analysis")
             return {}
         
-        insights = self.insight_agent.analyze_trends(self.data_cache)
+        insights = self.insight_agent.analyze_trends(self.history())
         return insights
     
     def evaluate_model(self) -> pd.DataFrame:
@@ -161,9 +732,55 @@ class CanteenAI:
             print("❌ No data available for evaluation")
             return pd.DataFrame()
         
-        eval_results = self.train_agent.evaluate_model(self.data_cache)
+        eval_results = self.train_agent.evaluate_model(self.history())
         return eval_results
     
+    def backtest(self, n_origins: int = 8, horizon: int = 7, strategy: str = 'retrain') -> Dict:
+        """
+        Replay historical forecast origins and measure real accuracy
+        
+        Args:
+            n_origins: Number of forecast origins
+            horizon: Days forecast from each origin
+            strategy: 'retrain' or 'reuse' saved models
+        
+        Returns:
+            Dictionary with per-item / per-horizon error tables
+        """
+        print("\n🧪 Backtesting forecasting strategy...")
+        
+        if self.data_cache is None or self.data_cache.empty:
+            self.update_data()
+        
+        if self.data_cache is None or self.data_cache.empty:
+            print("❌ No data available for backtesting")
+            return {'error': 'no_data'}
+        
+        return self.backtest_agent.run_backtest(
+            self.history(), n_origins=n_origins, horizon=horizon, strategy=strategy
+        )
+    
+    def accuracy_report(self, start_date: str, end_date: str, source: str = 'auto') -> Dict:
+        """
+        Compare stored predictions with actuals over a date window
+        
+        Args:
+            start_date: First date (YYYY-MM-DD)
+            end_date: Last date (YYYY-MM-DD)
+            source: 'firebase', 'local', or 'auto'
+        
+        Returns:
+            Dictionary with per-day, per-item and per-horizon error tables
+        """
+        print(f"\n📏 Accuracy report {start_date} to {end_date}...")
+        
+        if self.data_cache is None or self.data_cache.empty:
+            self.update_data()
+        
+        return self.predict_agent.compare_predictions_range(
+            self.history(), start_date, end_date, source=source
+        )
+    
     def push_prediction_to_firebase(self, predictions: pd.DataFrame) -> int:
         """
         Upload predictions to Firebase
@@ -177,17 +794,78 @@ class CanteenAI:
         print("\n☁️ Pushing predictions to Firebase...")
         return self.predict_agent.push_predictions_to_firebase(predictions)
     
-    def run_full_pipeline(self, retrain: bool = True, forecast_days: int = 7) -> Dict:
+    def build_pipeline(self,
+                       retrain: bool = True,
+                       forecast_days: int = 7,
+                       profiler: PipelineProfiler = NULL_PROFILER) -> PipelineDAG:
+        """
+        Pipeline stages after the data update, as a DAG over the feature table
+        
+        Training depends on the data; forecasts and evaluation depend on the
+        data and the model registry; insights only on the data. Forecasts are
+        scaled by working-mode headcount, so they (and the prep plan) also
+        depend on the 'headcount' source, a headcount_fingerprint(). Stages
+        reuse their previous output while their inputs are unchanged.
+        """
+        dag = PipelineDAG(cache=self._stage_cache, profiler=profiler)
+        dag.add_source('data')
+        dag.add_source('headcount', lambda fingerprint: fingerprint)
+        
+        registry_inputs = []
+        if retrain:
+            dag.add_stage('train_model', lambda data: self.train_model(force=True),
+                          inputs=['data'], rows=lambda _: len(self.data_cache))
+            registry_inputs = ['train_model']
+        
+        # Models may also change outside the pipeline (e.g. another process), so
+        # the registry is fingerprinted from disk on every run
+        dag.add_stage('model_registry', lambda **_: self.models_fingerprint(refresh=True),
+                      inputs=registry_inputs, always_run=True, output_fingerprint=lambda fp: fp)
+        
+        dag.add_stage('predict_next_day', lambda **_: self.forecast_next_day(),
+                      inputs=['data', 'model_registry', 'headcount'], rows=len)
+        if forecast_days > 1:
+            dag.add_stage('predict_weekly', lambda **_: self.forecast_week(days=forecast_days),
+                          inputs=['data', 'model_registry', 'headcount'], params={'days': forecast_days}, rows=len)
+        # Prep quantities follow every forecast refresh
+        forecast_stage = 'predict_weekly' if forecast_days > 1 else 'predict_next_day'
+        dag.add_stage('plan_prep', lambda **forecasts: self.plan_prep(forecasts=forecasts[forecast_stage]),
+                      inputs=[forecast_stage], params={'recipes': self.prep_planner.recipes_version()}, rows=len)
+        dag.add_stage('analyze_trends', lambda data: self.analyze_trends(),
+                      inputs=['data'], rows=lambda _: len(self.data_cache))
+        dag.add_stage('evaluate_model', lambda data, model_registry: self.evaluate_model(),
+                      inputs=['data', 'model_registry'], rows=lambda _: len(self.data_cache))
+        return dag
+    
+    def run_full_pipeline(self,
+                          retrain: bool = True,
+                          forecast_days: int = 7,
+                          profile: bool = False,
+                          profile_output: Optional[str] = None,
+                          force: bool = False) -> Dict:
         """
         Run the complete CanteenAI pipeline
         
+        After the data update the remaining stages run as a DAG (see
+        build_pipeline): unchanged data reuses the previous outputs, and the
+        forecasts, insights and evaluation run concurrently.
+        
         Args:
-            retrain: Whether to retrain models
+            retrain: Whether to retrain models (when the data changed)
             forecast_days: Number of days to forecast
+            profile: Add a detailed 'profile' (per-item times, counters,
+                     traced peak memory) to the results and print it
+            profile_output: Also write a call profile here ('.html' uses
+                            pyinstrument if installed, otherwise cProfile stats)
+            force: Re-run every stage even if its inputs are unchanged
         
         Returns:
-            Dictionary with all results
+            Dictionary with all results; 'stage_seconds' is always included
         """
+        if profile_output:
+            return run_profiled(lambda: self.run_full_pipeline(retrain, forecast_days, profile, force=force),
+                                profile_output)
+        
         print("\n" + "=" * 60)
         print("🚀 RUNNING FULL CANTEEN AI PIPELINE")
         print("=" * 60)
@@ -197,9 +875,15 @@ class CanteenAI:
             'status': 'success'
         }
         
+        profiler = PipelineProfiler(trace_memory=profile)
+        self.train_agent.profiler = profiler
+        self.predict_agent.profiler = profiler
+        
         try:
             # Step 1: Update data
-            df = self.update_data()
+            with profiler.stage('update_data') as stage:
+                df = self.update_data()
+                stage['rows'] = len(df)
             results['data_records'] = len(df)
             
             if df.empty:
@@ -207,25 +891,22 @@ class CanteenAI:
                 results['error'] = 'no_data'
                 return results
             
-            # Step 2: Train models
-            if retrain:
-                training_results = self.train_model(force=True)
-                results['training'] = training_results
-            
-            # Step 3: Generate predictions
-            next_day_pred = self.predict_next_day()
-            results['next_day_predictions'] = len(next_day_pred)
+            # Steps 2-5: train, predict, analyze and evaluate as a DAG
+            dag = self.build_pipeline(retrain, forecast_days, profiler)
+            run = dag.run(sources={'data': df, 'headcount': self.headcount_fingerprint()}, force=force)
+            outputs = run['outputs']
+            results['stages_executed'] = run['executed']
+            results['stages_cached'] = run['cached']
             
+            if retrain:
+                results['training'] = outputs['train_model']
+            results['next_day_predictions'] = len(outputs['predict_next_day'])
             if forecast_days > 1:
-                weekly_pred = self.predict_next_week(days=forecast_days)
-                results['weekly_predictions'] = len(weekly_pred)
-            
-            # Step 4: Analyze trends
-            insights = self.analyze_trends()
-            results['insights'] = insights.get('summary', [])
+                results['weekly_predictions'] = len(outputs['predict_weekly'])
+            results['prep_plan'] = len(outputs['plan_prep'])
+            results['insights'] = outputs['analyze_trends'].get('summary', [])
             
-            # Step 5: Evaluate models
-            eval_results = self.evaluate_model()
+            eval_results = outputs['evaluate_model']
             if not eval_results.empty:
                 results['model_accuracy'] = {
                     'avg_mae': float(eval_results['mae'].mean()),
@@ -238,6 +919,8 @@ class CanteenAI:
             print(f"📊 Data records: {results['data_records']}")
             print(f"🎯 Models trained: {results.get('training', {}).get('models_trained', 0)}")
             print(f"🔮 Predictions generated: {results['next_day_predictions']}")
+            if run['cached']:
+                print(f"♻️ Reused unchanged stages: {', '.join(run['cached'])}")
             print("\n💡 Key Insights:")
             for insight in results.get('insights', []):
                 print(f"   {insight}")
@@ -250,6 +933,14 @@ class CanteenAI:
             results['status'] = 'failed'
             results['error'] = str(e)
             return results
+        
+        finally:
+            self.train_agent.profiler = NULL_PROFILER
+            self.predict_agent.profiler = NULL_PROFILER
+            results['stage_seconds'] = {name: round(stage['seconds'], 4) for name, stage in profiler.stages.items()}
+            if profile:
+                results['profile'] = profiler.report()
+                profiler.print_report()
     
     def generate_report(self, output_format: str = 'text') -> str:
         """
@@ -264,30 +955,49 @@ class CanteenAI:
         if self.data_cache is None or self.data_cache.empty:
             self.update_data()
         
-        return self.insight_agent.generate_report(self.data_cache, output_format)
+        return self.insight_agent.generate_report(self.history(), output_format)
 
 
 def main():
     """Command-line interface for CanteenAI"""
     parser = argparse.ArgumentParser(description='CanteenAI - Intelligent Meal Demand Forecasting')
     parser.add_argument('--action', type=str, default='full',
-                       choices=['full', 'update', 'train', 'predict', 'analyze', 'report'],
+                       choices=['full', 'update', 'train', 'predict', 'plan', 'analyze', 'report', 'backtest', 'schedule'],
                        help='Action to perform')
     parser.add_argument('--days', type=int, default=7,
                        help='Number of days to forecast')
     parser.add_argument('--credentials', type=str, default=None,
                        help='Path to Firebase credentials JSON')
+    parser.add_argument('--site', type=str, default=None,
+                       help='Canteen site to run for (default: the single-canteen layout)')
     parser.add_argument('--no-retrain', action='store_true',
                        help='Skip model retraining')
+    parser.add_argument('--origins', type=int, default=8,
+                       help='Number of forecast origins to backtest')
+    parser.add_argument('--strategy', type=str, default='retrain',
+                       choices=['retrain', 'reuse'],
+                       help='Backtest strategy: retrain per origin or reuse saved models')
+    parser.add_argument('--profile', action='store_true',
+                       help='Record per-stage/per-item timings and peak memory for the full pipeline')
+    parser.add_argument('--profile-output', type=str, default=None,
+                       help='Write a cProfile (.prof) or pyinstrument (.html) call profile of the full pipeline')
+    parser.add_argument('--force', action='store_true',
+                       help='Re-run every pipeline stage even if its inputs are unchanged')
+    parser.add_argument('--sync-interval', type=int, default=Config.SCHEDULER_SYNC_INTERVAL_MINUTES,
+                       help='Scheduler: minutes between data syncs')
+    parser.add_argument('--once', action='store_true',
+                       help='Scheduler: run the jobs that are due and exit (for cron)')
     
     args = parser.parse_args()
     
     # Initialize CanteenAI
-    ai = CanteenAI(firebase_credentials=args.credentials)
+    ai = CanteenAI(firebase_credentials=args.credentials, site_id=args.site)
     
     # Execute requested action
     if args.action == 'full':
-        results = ai.run_full_pipeline(retrain=not args.no_retrain, forecast_days=args.days)
+        results = ai.run_full_pipeline(retrain=not args.no_retrain, forecast_days=args.days,
+                                       profile=args.profile, profile_output=args.profile_output,
+                                       force=args.force)
         
     elif args.action == 'update':
         df = ai.update_data()
@@ -305,6 +1015,11 @@ def main():
         print(f"✅ Generated {len(predictions)} predictions")
         print(predictions)
         
+    elif args.action == 'plan':
+        plan = ai.plan_prep(days=args.days)
+        print(plan)
+        print(ai.prep_planner.ingredients(plan))
+    
     elif args.action == 'analyze':
         insights = ai.analyze_trends()
         print("\n💡 Key Insights:")
@@ -314,9 +1029,27 @@ def main():
     elif args.action == 'report':
         report = ai.generate_report(output_format='text')
         print(report)
+        
+    elif args.action == 'backtest':
+        results = ai.backtest(n_origins=args.origins, horizon=args.days, strategy=args.strategy)
+        if 'by_item_horizon' in results:
+            print(results['by_item_horizon'])
+        
+    elif args.action == 'schedule':
+        from scheduler import CanteenScheduler
+        scheduler = CanteenScheduler(ai, sync_interval_minutes=args.sync_interval, forecast_days=args.days)
+        if args.once:
+            print(scheduler.run_once())
+        else:
+            scheduler.run_forever()
 
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        # Command-line usage: python canteen_ai.py --action ...
+        main()
+        sys.exit(0)
+    
     # Example usage without command line
     print("\n🤖 Starting CanteenAI...")
     
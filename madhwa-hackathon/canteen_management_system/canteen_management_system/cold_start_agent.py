@@ -0,0 +1,190 @@
+"""
+ColdStartAgent - Forecasts for new menu items from similar established items
+
+Items without a model (too little history for TrainAgent) or with too few rows
+for PredictAgent are forecast from their nearest neighbours among items that
+do have model forecasts. Similarity uses the item category, meal slot and
+weekday opt-in profile; the neighbours' forecasts are scaled by how the new
+item's demand compares with theirs so far. Once an item has enough history
+TrainAgent trains its own model and PredictAgent uses that instead.
+"""
+import pandas as pd
+import numpy as np
+from datetime import datetime
+from typing import Optional
+
+from config import Config
+
+# Distance penalties; opt-in profile distance is in units of RATE_SCALE
+CATEGORY_MISMATCH = 1.0
+SLOT_MISMATCH = 0.5
+RATE_SCALE = 0.1
+
+
+def meal_slot(categories: pd.Series) -> pd.Series:
+    """Meal slot (the web app's menu sections) for item categories"""
+    return categories.map(Config.MEAL_SLOT_BY_CATEGORY).fillna('other')
+
+
+class ColdStartAgent:
+    """Agent responsible for forecasting items that have no usable model"""
+    
+    def item_profiles(self, df: pd.DataFrame, new_items: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+        """
+        Similarity features per item
+        
+        Args:
+            df: Feature history
+            new_items: Optional items without history yet (menu_item_id,
+                       item_category, optional meal_slot)
+        
+        Returns:
+            DataFrame indexed by menu_item_id with item_category, meal_slot,
+            rate_dow0..rate_dow6 (mean opt-in rate per weekday), mean_count
+            and days (rows of history)
+        """
+        recent = df[pd.to_datetime(df['date']) > pd.to_datetime(df['date']).max()
+                    - pd.Timedelta(days=Config.COLD_START_PROFILE_DAYS)]
+        dates = pd.to_datetime(recent['date'])
+        rate = recent[Config.TARGET_COLUMN] / recent['total_employees'].clip(lower=1)
+        
+        by_item = recent.groupby('menu_item_id')
+        profiles = pd.DataFrame({
+            'item_category': by_item['item_category'].first() if 'item_category' in recent.columns else 'Other',
+            'mean_count': by_item[Config.TARGET_COLUMN].mean(),
+            'days': by_item.size()
+        })
+        if 'meal_slot' in recent.columns:
+            profiles['meal_slot'] = by_item['meal_slot'].first()
+        dow_rates = rate.groupby([recent['menu_item_id'], dates.dt.weekday]).mean().unstack()
+        dow_rates = dow_rates.reindex(columns=range(7))
+        dow_rates.columns = [f'rate_dow{d}' for d in range(7)]
+        profiles = profiles.join(dow_rates)
+        
+        if new_items is not None and not new_items.empty:
+            given = new_items.set_index('menu_item_id')
+            profiles = pd.concat([profiles, given[~given.index.isin(profiles.index)].assign(days=0)])
+            # Rows forecast for new items (predict_weekly) carry no category
+            for col in ('item_category', 'meal_slot'):
+                if col in given.columns:
+                    if col not in profiles.columns:
+                        profiles[col] = np.nan
+                    profiles[col] = profiles[col].fillna(given[col])
+        
+        profiles['item_category'] = profiles['item_category'].fillna('Other')
+        if 'meal_slot' not in profiles.columns:
+            profiles['meal_slot'] = np.nan
+        profiles['meal_slot'] = profiles['meal_slot'].fillna(meal_slot(profiles['item_category']))
+        profiles['days'] = profiles['days'].fillna(0).astype(int)
+        return profiles
+    
+    def neighbours(self, query: pd.DataFrame, candidates: pd.DataFrame, k: int = Config.COLD_START_NEIGHBOURS):
+        """
+        k nearest candidates for every query item, all at once
+        
+        Returns:
+            (index, distance): arrays of shape (len(query), k) with positions in
+            candidates and their distances, nearest first
+        """
+        rate_cols = [f'rate_dow{d}' for d in range(7)]
+        q_rates = query[rate_cols].to_numpy(dtype=float)[:, None, :]
+        c_rates = candidates[rate_cols].to_numpy(dtype=float)[None, :, :]
+        
+        # RMS opt-in difference over the weekdays both items have; 0 when none overlap
+        squared = (q_rates - c_rates) ** 2
+        overlap = ~np.isnan(squared)
+        rate_distance = np.sqrt(np.where(overlap, squared, 0).sum(axis=2) / np.maximum(overlap.sum(axis=2), 1)) / RATE_SCALE
+        
+        distance = (
+            CATEGORY_MISMATCH * (query['item_category'].to_numpy()[:, None] != candidates['item_category'].to_numpy()[None, :])
+            + SLOT_MISMATCH * (query['meal_slot'].to_numpy()[:, None] != candidates['meal_slot'].to_numpy()[None, :])
+            + rate_distance
+        )
+        
+        k = min(k, len(candidates))
+        index = np.argsort(distance, axis=1, kind='stable')[:, :k]
+        return index, np.take_along_axis(distance, index, axis=1)
+    
+    def forecast(self,
+                 df: pd.DataFrame,
+                 model_predictions: pd.DataFrame,
+                 target_date: datetime,
+                 new_items: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+        """
+        Forecast every item in df (or new_items) that has no model prediction
+        
+        Args:
+            df: Feature history
+            model_predictions: PredictAgent's model forecasts for target_date
+            target_date: Date being forecast
+            new_items: Optional menu items without history yet
+        
+        Returns:
+            DataFrame in PredictAgent's prediction format with
+            forecast_source 'cold_start' (empty if nothing is cold)
+        """
+        if model_predictions.empty:
+            return pd.DataFrame()
+        
+        known = set(df['menu_item_id'].unique())
+        if new_items is not None and not new_items.empty:
+            known |= set(new_items['menu_item_id'])
+        if known <= set(model_predictions['menu_item_id']):
+            return pd.DataFrame()
+        
+        # Items absent from the recent profile window are retired, not cold
+        profiles = self.item_profiles(df, new_items)
+        cold_items = sorted(set(profiles.index) - set(model_predictions['menu_item_id']))
+        if not cold_items:
+            return pd.DataFrame()
+        
+        established = model_predictions.set_index('menu_item_id')
+        candidates = profiles.reindex(established.index)
+        candidates = candidates[candidates['mean_count'].notna()]
+        if candidates.empty:
+            return pd.DataFrame()
+        query = profiles.loc[cold_items]
+        index, distance = self.neighbours(query, candidates)
+        
+        # Scale neighbour demand to the new item's level, shrunk towards the
+        # neighbours' own level while the item has few days of history
+        neighbour_ids = candidates.index.to_numpy()[index]
+        neighbour_mean = candidates['mean_count'].to_numpy()[index]
+        own_mean = query['mean_count'].to_numpy(dtype=float)[:, None]
+        days = query['days'].to_numpy()[:, None]
+        raw_scale = np.where(np.isnan(own_mean), 1.0, own_mean / np.maximum(neighbour_mean, 1e-9))
+        scale = (days * raw_scale + Config.COLD_START_PRIOR_DAYS) / (days + Config.COLD_START_PRIOR_DAYS)
+        weights = 1.0 / (1.0 + distance)
+        weights /= weights.sum(axis=1, keepdims=True)
+        
+        quantile_cols = [c for c in established.columns if c[:1] == 'p' and c[1:].isdigit()]
+        value_cols = ['predicted_count', 'lower_bound', 'upper_bound'] + quantile_cols
+        values = established.loc[neighbour_ids.ravel(), value_cols].to_numpy(dtype=float)
+        values = values.reshape(len(cold_items), index.shape[1], len(value_cols))
+        blended = (weights[:, :, None] * scale[:, :, None] * values).sum(axis=1)
+        
+        # Wider intervals than the neighbours': the item's own error is unknown
+        point = blended[:, [0]]
+        blended[:, 1:] = np.maximum(point + (blended[:, 1:] - point) * Config.COLD_START_INTERVAL_WIDEN, 0)
+        confidence = (weights * established.loc[neighbour_ids.ravel(), 'confidence'].to_numpy()
+                      .reshape(index.shape)).sum(axis=1) * Config.COLD_START_CONFIDENCE_FACTOR
+        
+        total_employees = df.sort_values('date').groupby('menu_item_id')['total_employees'].last() \
+            if 'total_employees' in df.columns else pd.Series(dtype=float)
+        result = pd.DataFrame({
+            'date': target_date.date(),
+            'menu_item_id': cold_items,
+            'predicted_count': np.round(blended[:, 0]).astype(int),
+            'predicted_opt_in_rate': blended[:, 0] / total_employees.reindex(cold_items).fillna(
+                total_employees.median() if len(total_employees) else np.nan).to_numpy(),
+            'confidence': np.round(confidence, 3),
+            'lower_bound': np.round(blended[:, 1]).astype(int),
+            'upper_bound': np.round(blended[:, 2]).astype(int),
+            **{col: np.round(blended[:, 3 + j], 1) for j, col in enumerate(quantile_cols)},
+            'model_version': model_predictions['model_version'].iloc[0],
+            'forecast_source': 'cold_start',
+            'neighbours': [','.join(str(int(i)) for i in row) for row in neighbour_ids],
+            'predicted_at': datetime.now().isoformat()
+        })
+        print(f"🧊 Cold-start forecasts for {len(result)} items from {index.shape[1]} neighbours each")
+        return result
@@ -14,11 +14,18 @@ class Config:
     # Data Configuration
     LOCAL_CSV_PATH = "canteen_history.csv"
     PROCESSED_CSV_PATH = "canteen_history_processed.csv"
+    PREDICTION_STORE_PATH = "data/predictions.db"
     
     # Model Configuration
     MODEL_DIR = "models_per_item"
     MODEL_VERSION = "v2.1"
     
+    # Serving Configuration (see serve.py)
+    SNAPSHOT_DIR = "snapshots"
+    SNAPSHOT_KEEP = 3
+    SNAPSHOT_RECENT_ROWS = 60  # history rows per item kept resident for predictions
+    SERVE_FROM_SNAPSHOT = os.getenv('CANTEENAI_SERVE_FROM_SNAPSHOT') == '1'
+    
     # Training Configuration
     VALIDATION_DAYS = 28
     MIN_TRAINING_SAMPLES = 30
@@ -42,6 +49,9 @@ class Config:
     # Feature Engineering
     LAG_PERIODS = [1, 2, 3, 7, 14]
     ROLLING_WINDOWS = [3, 7, 14]
+    # Never model inputs: same-day outcomes (known only after the meal) and
+    # precomputed lags that cannot be rolled forward past the data
+    EXCLUDED_FEATURES = ['confirmed_optin_rate', 'opt_in_rate', 'prev_day_count', 'prev_7day_avg']
     
     # Retraining Triggers
     RETRAIN_NEW_RECORDS_THRESHOLD = 20
@@ -50,6 +60,103 @@ class Config:
     # Prediction Configuration
     DEFAULT_FORECAST_DAYS = 7
     CONFIDENCE_THRESHOLD = 0.80
+    # Quantiles forecast per item; lower_bound/upper_bound are the outer two
+    FORECAST_QUANTILES = [0.1, 0.5, 0.9]
+    # "conformal": residual quantiles of recursive forecasts replayed over the
+    # validation window, per horizon (no extra training); "lightgbm": one
+    # quantile-objective model per extra quantile, widened like the conformal band
+    QUANTILE_METHOD = "conformal"
+    QUANTILE_CALIBRATION_DAYS = 7  # horizons calibrated; later days widen by sqrt(h / 7)
+    
+    # Backtesting Configuration
+    BACKTEST_ORIGINS = 8
+    BACKTEST_STEP_DAYS = 7
+    BACKTEST_MAX_WORKERS = None  # None = one process per CPU
+    
+    # Pipeline Configuration
+    PIPELINE_MAX_WORKERS = 3  # Stages run concurrently (forecasts, insights, evaluation)
+    PIPELINE_CACHE_DIR = "data/pipeline_cache"  # stage outputs reused by the next run
+    
+    # Scheduler Configuration (python canteen_ai.py --action schedule)
+    SCHEDULER_SYNC_INTERVAL_MINUTES = 30
+    SCHEDULER_JITTER_SECONDS = 120
+    SCHEDULER_STATE_PATH = "data/scheduler_state.json"
+    MEAL_SELECTION_DEADLINE = "21:00"  # Fallback when Firestore settings/deadline is unavailable
+    FORECAST_LEAD_MINUTES = 60  # Precompute forecasts this long before the deadline
+    
+    # Materialized Forecasts (served by the prediction endpoints)
+    FORECAST_TABLE_PATH = "data/forecast_table.json"
+    FORECAST_TABLE_DAYS = 7
+    FORECAST_TABLE_MAX_AGE_HOURS = 24
+    MATERIALIZE_AFTER_TRAINING = True
+    
+    # Hierarchical Forecasting (item -> item_category -> site -> total)
+    TRAIN_HIERARCHY = True
+    HIERARCHY_MODEL_PATH = "models_per_item/hierarchy_models.pkl"
+    RECONCILIATION_METHOD = "wls"  # "wls" (validation MAE² weights), "structural" or "ols"
+    DEFAULT_SITE_ID = "main"  # site of data without a site_id column
+    
+    # Multi-site partitions (see sites.py); the default site keeps the paths above
+    SITES_DIR = "sites"  # sites/<site_id>/ holds each other site's data, models and forecasts
+    SITE_TRAIN_MAX_WORKERS = None  # None = one process per site, up to the CPU count
+    
+    # Cold Start (items without a usable model, see cold_start_agent.py)
+    COLD_START_ENABLED = True
+    COLD_START_NEIGHBOURS = 3
+    COLD_START_PROFILE_DAYS = 90  # history window for similarity profiles
+    COLD_START_PRIOR_DAYS = 7  # days of own history weighted like the neighbours' level
+    COLD_START_INTERVAL_WIDEN = 1.5
+    COLD_START_CONFIDENCE_FACTOR = 0.8
+    # Web app menu sections (Firestore menus/<date>) per item category
+    MEAL_SLOT_BY_CATEGORY = {'Breakfast': 'breakfast', 'Lunch': 'lunch', 'Snack': 'snacks'}
+    
+    # RFID Tap Ingestion (see tap_ingestion.py)
+    TAP_STORE_PATH = "data/taps.db"
+    TAP_FLUSH_INTERVAL_SECONDS = 10
+    TAP_FLUSH_MAX_PENDING = 2000  # flush early when this many taps are waiting
+    TAP_INDEX_DAYS = 2  # days of dedupe index kept in memory
+    # Service windows used when a tap carries no meal_slot
+    MEAL_SLOT_WINDOWS = {
+        'breakfast': ('07:00', '10:30'),
+        'lunch': ('11:30', '15:00'),
+        'snacks': ('16:00', '18:30')
+    }
+    
+    # Streaming exports (see export_stream.py)
+    EXPORT_CHUNK_ROWS = 5000  # rows read, formatted and sent at a time
+    EXPORT_GZIP_LEVEL = 6
+    
+    # Working-mode headcount (see headcount_feed.py)
+    HEADCOUNT_STORE_PATH = "data/headcount.db"
+    HEADCOUNT_SYNC_DAYS = 14  # past days re-read from Firestore on every sync (plus tomorrow)
+    HEADCOUNT_MIN_RESPONSES = 10  # fewer selections than this say too little about a date
+    HEADCOUNT_REFERENCE_DAYS = 28  # history days giving the usual on-site share forecasts are scaled against
+    
+    # Prep Planning (see prep_planner.py); costs in the currency of the recipes' cost_per_unit
+    RECIPES_PATH = "recipes.csv"  # menu_item_id, ingredient, unit, quantity_per_portion, cost_per_unit
+    PREP_WASTE_COST = 40.0  # per portion thrown away, for items without priced recipes
+    PREP_SHORTAGE_COST = 120.0  # per employee who opted in but missed the meal
+    
+    # What-if Scenarios (see scenario_agent.py)
+    SCENARIO_FEATURES = ['is_holiday', 'is_company_event', 'temperature', 'precipitation', 'total_employees']
+    SCENARIO_MAX_SCENARIOS = 256  # scenarios per request (each adds items x days rows)
+    
+    # Surplus Estimation (see surplus_engine.py)
+    SURPLUS_CURVE_DAYS = 28  # days of taps used to learn each slot's service curve
+    SURPLUS_CURVE_BINS = 24
+    SURPLUS_CURVE_MIN_TAPS = 200  # fewer taps: assume an even pace through the slot
+    
+    # Firestore Sync (see DataAgent.fetch_from_firebase)
+    FIRESTORE_PAGE_SIZE = 1000
+    SYNC_CHECKPOINT_DIR = "data/sync_checkpoint"
+    SYNC_CHECKPOINT_MAX_AGE_HOURS = 24  # older interrupted syncs start over
+    # Batched writes (see batch_committer.py)
+    FIRESTORE_BATCH_SIZE = 500  # Firestore's per-batch write limit
+    FIRESTORE_MAX_IN_FLIGHT = 8  # batches committed concurrently
+    FIRESTORE_COMMIT_RETRIES = 3  # per failed batch
+    FIRESTORE_RETRY_BACKOFF_SECONDS = 0.5  # doubled on every retry
+    # SQLite stand-in for Firestore (FirebaseConfig.use_local / CANTEENAI_FIRESTORE_BACKEND=local)
+    LOCAL_FIRESTORE_PATH = "data/local_firestore.db"
     
     # Firebase Collections
     COLLECTION_MEAL_DATA = "canteen_meal_data"
@@ -57,6 +164,7 @@ class Config:
     COLLECTION_MODEL_METADATA = "model_metadata"
     COLLECTION_INSIGHTS = "canteen_insights"
     COLLECTION_TRAINING_LOGS = "training_logs"
+    COLLECTION_SERVED_COUNTS = "canteen_served_counts"
     
     # Target Column
     TARGET_COLUMN = "confirmed_count"
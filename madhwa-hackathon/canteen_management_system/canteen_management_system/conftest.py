@@ -0,0 +1,60 @@
+"""
+Shared pytest fixtures for the focused test_*.py checks
+
+Run with: python -m pytest -q
+
+Every test runs offline in its own temporary directory, so the relative
+data/, models_per_item/ and CSV paths in Config never touch the real files.
+"""
+import pandas as pd
+import pytest
+
+from firebase_config import FirebaseConfig
+
+# Run-as-script smoke checks against a live setup, not pytest tests
+collect_ignore = [
+    "test_firebase_connection.py",
+    "test_installation.py",
+    "test_model_accuracy.py",
+    "test_weekly_forecast.py",
+]
+
+
+@pytest.fixture(autouse=True)
+def offline_workdir(tmp_path, monkeypatch):
+    """Temporary working directory with Firestore disabled"""
+    monkeypatch.chdir(tmp_path)
+    state = (FirebaseConfig._db, FirebaseConfig._initialized, FirebaseConfig._attempted)
+    FirebaseConfig.disable()
+    yield tmp_path
+    FirebaseConfig._db, FirebaseConfig._initialized, FirebaseConfig._attempted = state
+
+
+@pytest.fixture(scope="session")
+def raw_history() -> pd.DataFrame:
+    """Six months of generated history for four items"""
+    from generate_dummy_data import generate_canteen_data
+    
+    return generate_canteen_data(n_items=4, start="2025-01-01", end="2025-06-30", seed=7)
+
+
+@pytest.fixture(scope="session")
+def features(raw_history) -> pd.DataFrame:
+    """Feature-engineered history (DataAgent.prepare_features output)"""
+    from data_agent import DataAgent
+    
+    agent = DataAgent()
+    df_clean, _ = agent.validate_data(raw_history)
+    return agent.prepare_features(df_clean)
+
+
+@pytest.fixture(scope="session")
+def model_dir(tmp_path_factory, features) -> str:
+    """Per-item models trained once on the generated history"""
+    from train_agent import TrainAgent
+    
+    path = str(tmp_path_factory.mktemp("models"))
+    agent = TrainAgent(path)
+    agent.push_training_log_to_firebase = lambda summary_df: None
+    agent.train_model(features)
+    return path
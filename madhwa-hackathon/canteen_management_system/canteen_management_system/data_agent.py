@@ -4,50 +4,192 @@ DataAgent - Handles Firebase data ingestion, validation, and synchronization
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
-from firebase_config import FirebaseConfig, FirebaseCollections
+from typing import Dict, Iterator, List, Optional, Tuple
+from config import Config
+from batch_committer import BatchCommitter, frame_documents
+from firebase_config import DOCUMENT_ID, FirebaseConfig, FirebaseCollections
+import json
 import os
+import shutil
 
 
 class DataAgent:
     """Agent responsible for data management and Firebase synchronization"""
     
-    def __init__(self, local_csv: str = "canteen_history.csv"):
+    def __init__(self,
+                 local_csv: str = "canteen_history.csv",
+                 collection: str = FirebaseCollections.MEAL_DATA,
+                 processed_csv: str = Config.PROCESSED_CSV_PATH,
+                 checkpoint_dir: str = Config.SYNC_CHECKPOINT_DIR):
         self.local_csv = local_csv
-        self.db = FirebaseConfig.get_db()
+        self.collection = collection
+        self.processed_csv = processed_csv
+        self.checkpoint_dir = checkpoint_dir
         self.data_cache = None
         self.last_sync = None
+        # Outcome of the last fetch_from_firebase (see there)
+        self.sync_status = {}
     
-    def fetch_from_firebase(self, days_back: Optional[int] = None) -> pd.DataFrame:
-        """Fetch meal data from Firebase Firestore"""
+    @property
+    def db(self):
+        """Firestore client, connected lazily on first use"""
+        return FirebaseConfig.get_db()
+    
+    def fetch_from_firebase(self,
+                            days_back: Optional[int] = None,
+                            page_size: int = Config.FIRESTORE_PAGE_SIZE,
+                            resume: bool = True) -> Tuple[pd.DataFrame, Dict]:
+        """
+        Fetch meal data from Firebase Firestore, one page at a time
+        
+        Documents are read in document id order ({date}_{menu_item_id}, so a
+        days_back window is an id range) with a cursor after the last id seen.
+        Each page becomes a DataFrame chunk as soon as it arrives and is
+        written to self.checkpoint_dir, so only one page is held at a time and
+        a sync that fails part-way resumes after the last saved page. Once
+        every page is in, the chunks are streamed into the local CSV one at a
+        time and the result is read back once.
+        
+        Args:
+            days_back: Only fetch the last N days (None = all data)
+            page_size: Documents per request
+            resume: Continue an interrupted sync of the same window
+        
+        Returns:
+            (records, status): the fetched records (the local CSV if Firebase is
+            unavailable or fails) and a dict with source ('firebase' or
+            'local'), records, pages, error (None on success) and, after a
+            failure, resume_after (last saved document id) and checkpointed_rows.
+            The status is also kept in self.sync_status.
+        """
         if not self.db:
             print("⚠️ Firebase not connected. Loading from local CSV...")
-            return self.load_local_data()
+            df = self.load_local_data()
+            return df, self._set_status('local', len(df), error="Firebase not connected")
+        
+        cutoff = (datetime.now() - timedelta(days=days_back)).strftime('%Y-%m-%d') if days_back else None
+        checkpoint = self._load_checkpoint(cutoff) if resume else None
+        if checkpoint is None:
+            checkpoint = self._new_checkpoint(cutoff)
+        else:
+            print(f"⏩ Resuming sync after {checkpoint['last_doc_id']} ({checkpoint['rows']} records saved)")
         
         try:
-            collection_ref = self.db.collection(FirebaseCollections.MEAL_DATA)
-            query = collection_ref
-            
-            if days_back:
-                cutoff_date = datetime.now() - timedelta(days=days_back)
-                query = query.where('date', '>=', cutoff_date.strftime('%Y-%m-%d'))
-            
-            docs = query.stream()
-            records = [doc.to_dict() for doc in docs]
-            
-            if not records:
-                return self.load_local_data()
-            
-            df = pd.DataFrame(records)
-            print(f"✅ Fetched {len(df)} records from Firebase")
-            self.data_cache = df
-            self.last_sync = datetime.now()
-            self.save_to_local(df)
-            return df
-            
+            query = self.db.collection(self.collection).order_by(DOCUMENT_ID).limit(page_size)
+            while True:
+                if checkpoint['last_doc_id']:
+                    page_query = query.start_after({DOCUMENT_ID: checkpoint['last_doc_id']})
+                elif cutoff:
+                    page_query = query.start_at({DOCUMENT_ID: cutoff})
+                else:
+                    page_query = query
+                
+                page = list(page_query.stream())
+                if not page:
+                    break
+                chunk = pd.DataFrame.from_records([doc.to_dict() for doc in page])
+                last_doc_id = page[-1].id
+                del page
+                if cutoff and 'date' in chunk.columns:
+                    chunk = chunk[chunk['date'].astype(str) >= cutoff].reset_index(drop=True)
+                self._save_chunk(checkpoint, chunk, last_doc_id)
+                if len(chunk) and checkpoint['pages'] % 10 == 0:
+                    print(f"   📄 {checkpoint['rows']} records fetched...")
+                del chunk
+        
         except Exception as e:
             print(f"❌ Error fetching from Firebase: {e}")
-            return self.load_local_data()
+            if checkpoint['rows']:
+                print(f"   💾 {checkpoint['rows']} records checkpointed; the next sync resumes after "
+                      f"{checkpoint['last_doc_id']}")
+            print("⚠️ Loading from local CSV instead")
+            df = self.load_local_data()
+            return df, self._set_status('local', len(df), checkpoint['pages'], error=str(e),
+                                        resume_after=checkpoint['last_doc_id'],
+                                        checkpointed_rows=checkpoint['rows'])
+        
+        if not checkpoint['rows']:
+            self._clear_checkpoint()
+            print("⚠️ No records in Firebase. Loading from local CSV...")
+            df = self.load_local_data()
+            return df, self._set_status('local', len(df), checkpoint['pages'])
+        
+        self._write_chunks(checkpoint, self.local_csv)
+        df = pd.read_csv(self.local_csv)
+        print(f"✅ Fetched {len(df)} records from Firebase in {checkpoint['pages']} pages")
+        self.data_cache = df
+        self.last_sync = datetime.now()
+        self._clear_checkpoint()
+        return df, self._set_status('firebase', len(df), checkpoint['pages'])
+    
+    def _set_status(self, source: str, records: int, pages: int = 0, error: Optional[str] = None, **extra) -> Dict:
+        self.sync_status = {'source': source, 'records': records, 'pages': pages, 'error': error, **extra}
+        return self.sync_status
+    
+    # ---------- Sync checkpoints ----------
+    
+    def _checkpoint_path(self) -> str:
+        return os.path.join(self.checkpoint_dir, "checkpoint.json")
+    
+    def _new_checkpoint(self, cutoff: Optional[str]) -> Dict:
+        self._clear_checkpoint()
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+        return {
+            'collection': self.collection,
+            'cutoff': cutoff,
+            'started_at': datetime.now().isoformat(),
+            'last_doc_id': None,
+            'pages': 0,
+            'rows': 0,
+            'chunks': [],
+            'columns': []
+        }
+    
+    def _load_checkpoint(self, cutoff: Optional[str]) -> Optional[Dict]:
+        """Checkpoint of an interrupted sync of the same window, if recent enough"""
+        try:
+            with open(self._checkpoint_path()) as f:
+                checkpoint = json.load(f)
+        except (OSError, ValueError):
+            return None
+        age = datetime.now() - datetime.fromisoformat(checkpoint['started_at'])
+        if (checkpoint['collection'] != self.collection or checkpoint['cutoff'] != cutoff
+                or age > timedelta(hours=Config.SYNC_CHECKPOINT_MAX_AGE_HOURS) or not checkpoint['last_doc_id']
+                or 'columns' not in checkpoint):
+            return None
+        return checkpoint
+    
+    def _save_chunk(self, checkpoint: Dict, chunk: pd.DataFrame, last_doc_id: str):
+        """Write one page's chunk, then advance the cursor (atomically)"""
+        file = f"chunk_{checkpoint['pages']:05d}.pkl"
+        chunk.to_pickle(os.path.join(self.checkpoint_dir, file))
+        checkpoint['chunks'].append(file)
+        checkpoint['pages'] += 1
+        checkpoint['rows'] += len(chunk)
+        checkpoint['last_doc_id'] = last_doc_id
+        # Documents may differ in fields: the CSV gets every column seen
+        checkpoint['columns'] += [c for c in chunk.columns if c not in checkpoint['columns']]
+        tmp_path = f"{self._checkpoint_path()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(checkpoint, f, indent=2)
+        os.replace(tmp_path, self._checkpoint_path())
+    
+    def _write_chunks(self, checkpoint: Dict, path: str):
+        """Stream the saved chunks into one CSV (written then renamed), one chunk in memory at a time"""
+        tmp_path = f"{path}.tmp"
+        header = True
+        for file in checkpoint['chunks']:
+            chunk = pd.read_pickle(os.path.join(self.checkpoint_dir, file))
+            if chunk.empty:
+                continue
+            chunk.reindex(columns=checkpoint['columns']).to_csv(
+                tmp_path, mode='w' if header else 'a', header=header, index=False)
+            header = False
+        os.replace(tmp_path, path)
+        print(f"💾 Saved {checkpoint['rows']} records to {path}")
+    
+    def _clear_checkpoint(self):
+        shutil.rmtree(self.checkpoint_dir, ignore_errors=True)
     
     def load_local_data(self) -> pd.DataFrame:
         """Load data from local CSV file"""
@@ -57,6 +199,32 @@ class DataAgent:
         print(f"✅ Loaded {len(df)} records from local CSV")
         return df
     
+    def iter_local_chunks(self,
+                          start_date: Optional[str] = None,
+                          end_date: Optional[str] = None,
+                          menu_item_ids: Optional[List[int]] = None,
+                          chunksize: int = Config.EXPORT_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+        """
+        Stream the local history (processed features if saved, else the raw
+        CSV) in filtered chunks without loading the file
+        """
+        path = self.processed_csv if os.path.exists(self.processed_csv) else self.local_csv
+        if not os.path.exists(path):
+            return
+        start = pd.Timestamp(start_date) if start_date else None
+        end = pd.Timestamp(end_date) if end_date else None
+        for chunk in pd.read_csv(path, chunksize=chunksize):
+            dates = pd.to_datetime(chunk['date'])
+            mask = pd.Series(True, index=chunk.index)
+            if start is not None:
+                mask &= dates >= start
+            if end is not None:
+                mask &= dates.dt.normalize() <= end
+            if menu_item_ids:
+                mask &= chunk['menu_item_id'].isin([int(i) for i in menu_item_ids])
+            if mask.any():
+                yield chunk[mask]
+    
     def save_to_local(self, df: pd.DataFrame, path: Optional[str] = None):
         """Save DataFrame to local CSV"""
         save_path = path or self.local_csv
@@ -68,31 +236,22 @@ class DataAgent:
         if not self.db:
             return 0
         
-        collection = collection or FirebaseCollections.MEAL_DATA
-        collection_ref = self.db.collection(collection)
-        pushed_count = 0
-        batch = self.db.batch()
+        collection = collection or self.collection
+        updated_at = datetime.now().isoformat()
+        
+        def _doc_id(data: Dict) -> str:
+            data['updated_at'] = updated_at
+            return f"{data.get('date', '')}_{data.get('menu_item_id')}"
         
         try:
-            for idx, row in df.iterrows():
-                data = {k: (None if pd.isna(v) else v) for k, v in row.to_dict().items()}
-                data['updated_at'] = datetime.now().isoformat()
-                doc_id = f"{data.get('date', '')}_{data.get('menu_item_id', idx)}"
-                batch.set(collection_ref.document(doc_id), data, merge=True)
-                pushed_count += 1
-                
-                if pushed_count % 500 == 0:
-                    batch.commit()
-                    batch = self.db.batch()
-            
-            if pushed_count % 500 != 0:
-                batch.commit()
-            
-            print(f"✅ Pushed {pushed_count} records to Firebase")
-            return pushed_count
+            result = BatchCommitter(self.db).commit(collection, frame_documents(df, _doc_id))
         except Exception as e:
             print(f"❌ Error: {e}")
-            return pushed_count
+            return 0
+        
+        print(f"✅ Pushed {result['committed']} records to Firebase"
+              + (f" ({result['failed']} failed)" if result['failed'] else ""))
+        return result['committed']
     
     def validate_data(self, df: pd.DataFrame) -> Tuple[pd.DataFrame, List[str]]:
         """Validate and clean data"""
@@ -107,6 +266,13 @@ class DataAgent:
         
         df_clean['date'] = pd.to_datetime(df_clean['date'])
         
+        # Partial documents (e.g. served counts merged into the meal history
+        # by older tap services) would look like days with zero demand
+        incomplete = df_clean[['total_employees', 'confirmed_count']].isna().any(axis=1)
+        if incomplete.any():
+            warnings.append(f"Dropped {int(incomplete.sum())} rows without confirmed_count or total_employees")
+            df_clean = df_clean[~incomplete].reset_index(drop=True)
+        
         if 'opt_in_rate' not in df_clean.columns:
             df_clean['opt_in_rate'] = df_clean['confirmed_count'] / df_clean['total_employees']
             df_clean['opt_in_rate'] = df_clean['opt_in_rate'].clip(0, 1)
@@ -144,10 +310,10 @@ class DataAgent:
     def update_data(self) -> pd.DataFrame:
         """Update data from Firebase and prepare features"""
         print("\n🔄 Updating data...")
-        df_raw = self.fetch_from_firebase()
+        df_raw, _ = self.fetch_from_firebase()
         if df_raw.empty:
             return pd.DataFrame()
         df_clean, warnings = self.validate_data(df_raw)
         df_features = self.prepare_features(df_clean)
-        self.save_to_local(df_features, "canteen_history_processed.csv")
+        self.save_to_local(df_features, self.processed_csv)
         return df_features
@@ -119,8 +119,8 @@ def example_6_custom_workflow():
     predict_agent = PredictAgent()
     
     # Fetch last 90 days
-    df = data_agent.fetch_from_firebase(days_back=90)
-    print(f"✅ Fetched {len(df)} records")
+    df, sync = data_agent.fetch_from_firebase(days_back=90)
+    print(f"✅ Fetched {len(df)} records ({sync['source']})")
     
     # Prepare features
     df_features = data_agent.prepare_features(df)
@@ -0,0 +1,96 @@
+"""
+Streaming exports - CSV or NDJSON (optionally gzipped) from DataFrame chunks
+
+Exports read their source a chunk at a time (PredictionStore.iter_chunks,
+CanteenAI.iter_history), format each chunk as text and hand it to the web
+server as soon as it is ready, so memory stays at one chunk however large
+the date range is. Gzip uses a single streaming compressor over all chunks,
+giving one valid .gz file.
+
+Usage:
+    body, mimetype, extension = export_stream(ai.iter_history(start_date="2025-01-01"),
+                                              fmt="ndjson", compress=True)
+"""
+import zlib
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+from config import Config
+
+FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson')
+}
+
+
+def _normalise(chunk: pd.DataFrame, columns: Optional[List[str]]) -> pd.DataFrame:
+    """Selected columns, with dates written as YYYY-MM-DD"""
+    if columns:
+        chunk = chunk[[c for c in columns if c in chunk.columns]]
+    if 'date' in chunk.columns and pd.api.types.is_datetime64_any_dtype(chunk['date']):
+        chunk = chunk.assign(date=chunk['date'].dt.strftime('%Y-%m-%d'))
+    return chunk
+
+
+def iter_csv(chunks: Iterable[pd.DataFrame], columns: Optional[List[str]] = None) -> Iterator[str]:
+    """CSV text per chunk, header with the first non-empty chunk"""
+    header = None
+    for chunk in chunks:
+        chunk = _normalise(chunk, columns)
+        if chunk.empty:
+            continue
+        if header is None:
+            header = list(chunk.columns)
+            yield chunk.to_csv(index=False)
+        else:
+            # Later chunks follow the first chunk's column order
+            yield chunk.reindex(columns=header).to_csv(index=False, header=False)
+
+
+def iter_ndjson(chunks: Iterable[pd.DataFrame], columns: Optional[List[str]] = None) -> Iterator[str]:
+    """One JSON object per row and line"""
+    for chunk in chunks:
+        chunk = _normalise(chunk, columns)
+        if chunk.empty:
+            continue
+        text = chunk.to_json(orient='records', lines=True, date_format='iso')
+        yield text if text.endswith('\n') else text + '\n'
+
+
+def gzip_chunks(texts: Iterable[str], level: int = Config.EXPORT_GZIP_LEVEL) -> Iterator[bytes]:
+    """Compress a text stream into one gzip stream"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits 31 = gzip container
+    for text in texts:
+        data = compressor.compress(text.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_stream(chunks: Iterable[pd.DataFrame],
+                  fmt: str = 'csv',
+                  compress: bool = False,
+                  columns: Optional[List[str]] = None) -> Tuple[Iterator, str, str]:
+    """
+    Lazily formatted export body
+    
+    Args:
+        chunks: DataFrame chunks to export
+        fmt: 'csv' or 'ndjson'
+        compress: Gzip the output
+        columns: Only these columns (default: all)
+    
+    Returns:
+        (body iterator, mimetype, file extension)
+    
+    Raises:
+        ValueError: If fmt is not a supported format
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}' (use {', '.join(FORMATS)})")
+    mimetype, extension = FORMATS[fmt]
+    body = iter_csv(chunks, columns) if fmt == 'csv' else iter_ndjson(chunks, columns)
+    if compress:
+        return gzip_chunks(body), 'application/gzip', f"{extension}.gz"
+    return body, mimetype, extension
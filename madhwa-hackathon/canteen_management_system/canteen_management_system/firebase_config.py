@@ -2,13 +2,15 @@
 Firebase Configuration Module
 Handles Firebase Firestore connection and authentication
 """
-import firebase_admin
-from firebase_admin import credentials, firestore
 import os
 import json
-from typing import Optional
+import threading
+from typing import Optional, TYPE_CHECKING
 from datetime import datetime
 
+if TYPE_CHECKING:
+    from firebase_admin import firestore
+
 
 # Your Firebase Project Configuration
 FIREBASE_PROJECT_CONFIG = {
@@ -22,14 +24,20 @@ FIREBASE_PROJECT_CONFIG = {
 }
 
 
+# FieldPath.document_id(): order_by / cursor field for document ids
+DOCUMENT_ID = "__name__"
+
+
 class FirebaseConfig:
     """Manages Firebase connection and configuration"""
     
     _db = None
     _initialized = False
+    _attempted = False  # set once a connection attempt has finished
+    _lock = threading.RLock()
     
     @classmethod
-    def initialize(cls, credentials_path: Optional[str] = None, use_project_config: bool = True) -> firestore.Client:
+    def initialize(cls, credentials_path: Optional[str] = None, use_project_config: bool = True) -> Optional['firestore.Client']:
         """
         Initialize Firebase connection
         
@@ -41,10 +49,24 @@ class FirebaseConfig:
         Returns:
             Firestore client instance
         """
-        if cls._initialized:
-            return cls._db
-        
+        # Other threads wait here until the attempt is over instead of seeing no client
+        with cls._lock:
+            if cls._initialized:
+                return cls._db
+            try:
+                return cls._connect(credentials_path, use_project_config)
+            finally:
+                cls._attempted = True
+    
+    @classmethod
+    def _connect(cls, credentials_path: Optional[str], use_project_config: bool) -> Optional['firestore.Client']:
+        if os.getenv('CANTEENAI_FIRESTORE_BACKEND') == 'local':
+            return cls.use_local()
         try:
+            # Imported here so processes that never touch Firestore don't pay for it
+            import firebase_admin
+            from firebase_admin import credentials, firestore
+            
             # Try to get credentials from environment or parameter
             if credentials_path is None:
                 credentials_path = os.getenv('FIREBASE_CREDENTIALS')
@@ -77,11 +99,63 @@ class FirebaseConfig:
             return None
     
     @classmethod
-    def get_db(cls) -> Optional[firestore.Client]:
-        """Get Firestore client instance"""
-        if not cls._initialized:
-            return cls.initialize()
-        return cls._db
+    def get_db(cls) -> Optional['firestore.Client']:
+        """Get Firestore client instance, connecting on first use"""
+        if cls._initialized or cls._attempted:
+            return cls._db
+        with cls._lock:
+            if not cls._initialized and not cls._attempted:
+                cls.initialize()
+            return cls._db
+    
+    @classmethod
+    def use_backend(cls, db) -> object:
+        """
+        Route every agent to a Firestore-compatible client instead of Firebase
+        
+        Args:
+            db: Object with the firestore.Client methods the agents use
+                (collection, batch, document queries), e.g. LocalFirestore
+        
+        Returns:
+            The client
+        """
+        cls._db = db
+        cls._initialized = True
+        cls._attempted = True
+        return db
+    
+    @classmethod
+    def use_local(cls, path: Optional[str] = None, latency_ms: float = 0.0,
+                  per_document_ms: float = 0.0) -> object:
+        """
+        Use the SQLite stand-in (local_firestore.py) for offline development
+        and benchmarking; also selected by CANTEENAI_FIRESTORE_BACKEND=local
+        
+        Args:
+            path: Database file (default Config.LOCAL_FIRESTORE_PATH, ":memory:" in process)
+            latency_ms: Simulated round-trip time per request
+            per_document_ms: Simulated transfer time per document read or written
+        
+        Returns:
+            LocalFirestore client
+        """
+        from config import Config
+        from local_firestore import LocalFirestore
+        
+        path = path or Config.LOCAL_FIRESTORE_PATH
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        print(f"🗃️ Using local Firestore backend: {path}")
+        return cls.use_backend(LocalFirestore(path, latency_ms=latency_ms, per_document_ms=per_document_ms))
+    
+    @classmethod
+    def disable(cls):
+        """Run offline: agents see no Firestore client and use local fallbacks"""
+        cls._db = None
+        cls._initialized = False
+        cls._attempted = True
     
     @classmethod
     def is_connected(cls) -> bool:
@@ -96,6 +170,20 @@ class FirebaseCollections:
     MODEL_METADATA = "model_metadata"
     INSIGHTS = "canteen_insights"
     TRAINING_LOGS = "training_logs"
+    SERVED_COUNTS = "canteen_served_counts"  # {date}_{menu_item_id}: RFID served counts
+    SETTINGS = "settings"  # Admin settings written by the web app (e.g. 'deadline')
+    WORKING_MODES = "workingModes"  # web app: workingModes/<date>/users/<uid>: {"mode": "office" | "home", "userEmail"}
+    WORK_MODES = "workModes"  # mobile app: workModes/<date>/modes/<email>: {"mode": "office" | "wfh", "email"}
+    SITES = "sites"  # sites/<site_id>/<collection> for every site but the default
+    
+    @classmethod
+    def for_site(cls, collection: str, site_id: Optional[str] = None) -> str:
+        """Collection path of a site; the default site uses the top-level collections"""
+        from config import Config
+        
+        if site_id is None or str(site_id) == Config.DEFAULT_SITE_ID:
+            return collection
+        return f"{cls.SITES}/{site_id}/{collection}"
 
 
 def create_sample_credentials_template():
@@ -0,0 +1,128 @@
+"""
+ForecastTable - Materialized forecasts for the next N days, served from memory
+
+The scheduler (or the post-training hook) writes every item's forecast for
+the coming days to one file; API processes load it once, index it by date and
+(date, item) and re-read it only when the file changes. Each table records
+which data, models and working-mode counts it was computed from so readers
+can tell when it is stale and fall back to computing forecasts on demand.
+"""
+import json
+import os
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from config import Config
+
+
+class ForecastTable:
+    """
+    File-backed forecast table with O(1) lookups
+    
+    Usage:
+        table = ForecastTable()
+        table.write(weekly_df, data_through="2025-10-31", models="ab12...", headcount="cd34...")
+        table.for_date("2025-11-01")          # DataFrame of every item
+        table.lookup("2025-11-01", 101)       # one item's forecast
+    """
+    
+    def __init__(self, path: str = Config.FORECAST_TABLE_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.meta = None
+        self._by_date = {}
+        self._by_key = {}
+        self._loaded_mtime = None
+    
+    def write(self, pred_df: pd.DataFrame, data_through: str, models: str, headcount: str = "") -> int:
+        """
+        Replace the table with new forecasts (atomically)
+        
+        Args:
+            pred_df: Forecasts with 'date' and 'menu_item_id' columns
+            data_through: Latest history date the forecasts were computed from
+            models: Fingerprint of the model registry used
+            headcount: Fingerprint of the working-mode counts used
+        
+        Returns:
+            Number of rows written
+        """
+        df = pred_df.copy()
+        df['date'] = pd.to_datetime(df['date']).dt.strftime('%Y-%m-%d')
+        # Keep the newest forecast per (date, item)
+        df = df.drop_duplicates(['date', 'menu_item_id'], keep='last').sort_values(['date', 'menu_item_id'])
+        rows = json.loads(df.to_json(orient='records'))
+        
+        payload = {
+            'meta': {
+                'built_at': datetime.now().isoformat(),
+                'data_through': str(data_through),
+                'models': models,
+                'headcount': headcount,
+                'dates': sorted(df['date'].unique().tolist()),
+                'rows': len(rows)
+            },
+            'rows': rows
+        }
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(payload, f)
+        os.replace(tmp_path, self.path)
+        
+        self._index(payload)
+        self._loaded_mtime = os.path.getmtime(self.path)
+        print(f"🗄️ Materialized {len(rows)} forecasts for {len(payload['meta']['dates'])} days")
+        return len(rows)
+    
+    def _index(self, payload: Dict):
+        self.meta = payload['meta']
+        rows = payload['rows']
+        self._by_key = {(r['date'], int(r['menu_item_id'])): r for r in rows}
+        frame = pd.DataFrame(rows)
+        self._by_date = {date: group.reset_index(drop=True) for date, group in frame.groupby('date')} if rows else {}
+    
+    def refresh(self) -> bool:
+        """Re-read the file if another process rewrote it; True if a table is loaded"""
+        try:
+            mtime = os.path.getmtime(self.path)
+        except FileNotFoundError:
+            return self.meta is not None
+        if mtime != self._loaded_mtime:
+            with open(self.path) as f:
+                self._index(json.load(f))
+            self._loaded_mtime = mtime
+        return True
+    
+    def age_hours(self) -> Optional[float]:
+        if self.meta is None:
+            return None
+        return (datetime.now() - datetime.fromisoformat(self.meta['built_at'])).total_seconds() / 3600
+    
+    def is_fresh(self, data_through: str, models: str, headcount: str = "") -> bool:
+        """True if the table was built from this data, models and headcount, recently enough"""
+        if not self.refresh():
+            return False
+        return (self.meta['data_through'] == str(data_through)
+                and self.meta['models'] == models
+                and self.meta.get('headcount', "") == headcount
+                and self.age_hours() <= Config.FORECAST_TABLE_MAX_AGE_HOURS)
+    
+    def dates(self) -> List[str]:
+        return self.meta['dates'] if self.meta else []
+    
+    def for_date(self, date) -> pd.DataFrame:
+        """All items' forecasts for one date (empty if not materialized)"""
+        return self._by_date.get(str(pd.to_datetime(date).date()), pd.DataFrame())
+    
+    def for_dates(self, dates) -> pd.DataFrame:
+        frames = [self.for_date(d) for d in dates]
+        frames = [f for f in frames if not f.empty]
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    
+    def lookup(self, date, item_id: int) -> Optional[Dict]:
+        """One item's forecast for one date"""
+        return self._by_key.get((str(pd.to_datetime(date).date()), int(item_id)))
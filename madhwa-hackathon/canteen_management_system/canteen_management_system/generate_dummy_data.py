@@ -1,41 +1,234 @@
 # generate_dummy_data.py
+"""
+Synthetic canteen history generator
+
+Builds every (date, site, item) row at once with numpy broadcasting, so
+thousands of items over several years are generated in seconds. Demand follows
+site headcount with weekly seasonality, holidays, company events, weather and a
+slow trend, and the whole dataset is reproducible from its seed.
+
+Usage:
+    python generate_dummy_data.py                          # 5 items, Jul-Oct 2025
+    python generate_dummy_data.py --items 2000 --sites 3 --start 2022-01-01 --end 2025-12-31 --output all_sites.csv
+    python generate_dummy_data.py --items 500 --output snapshot
+    python generate_dummy_data.py --recipes recipes.csv     # plus a recipe table
+"""
+import argparse
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
-
-np.random.seed(42)
-start = datetime(2025, 7, 1)
-end = datetime(2025, 10, 31)
-dates = pd.date_range(start, end)
-
-menu_items = [
-    (101, "Masala Dosa", "Breakfast"),
-    (102, "Poori Bhaji", "Breakfast"),
-    (201, "Paneer Curry", "Lunch"),
-    (202, "Veg Biryani", "Lunch"),
-    (301, "Samosa", "Snack"),
-]
-
-rows = []
-for d in dates:
-    for mid, name, cat in menu_items:
-        base = 40 if cat == "Breakfast" else 60 if cat == "Lunch" else 70
-        noise = np.random.randint(-10, 10)
-        confirmed = max(10, base + noise)
-        prev_day = confirmed + np.random.randint(-5, 5)
-        avg7 = base + np.random.randn() * 5
-        rows.append([
-            d.date(), mid, name, cat,
-            confirmed, 120, confirmed / 120,
-            prev_day, avg7, 0, 0, 30 + np.random.randn(), 0
-        ])
-
-df = pd.DataFrame(rows, columns=[
-    "date", "menu_item_id", "item_name", "item_category",
-    "confirmed_count", "total_employees", "confirmed_optin_rate",
-    "prev_day_count", "prev_7day_avg", "is_holiday",
-    "is_company_event", "temperature", "precipitation"
-])
-
-df.to_csv("canteen_history.csv", index=False)
-print(f"✅ Dummy dataset created with {len(df)} rows ({df['date'].nunique()} days).")
+from datetime import datetime
+from typing import Optional
+
+CATEGORIES = ["Breakfast", "Lunch", "Snack"]
+
+# Share of on-site employees who opt in to an average item, per category
+CATEGORY_BASE_RATE = {"Breakfast": 0.33, "Lunch": 0.50, "Snack": 0.58}
+
+ITEM_NAMES = {
+    "Breakfast": ["Masala Dosa", "Poori Bhaji", "Idli Vada", "Upma", "Poha", "Aloo Paratha"],
+    "Lunch": ["Paneer Curry", "Veg Biryani", "Dal Rice", "Rajma Chawal", "Veg Thali", "Curd Rice"],
+    "Snack": ["Samosa", "Vada Pav", "Pakora", "Sandwich", "Bhel Puri", "Kachori"],
+}
+
+# Ingredient pool per category: (ingredient, unit, quantity per portion, cost per unit)
+RECIPE_INGREDIENTS = {
+    "Breakfast": [("Rice", "kg", 0.08, 55), ("Urad dal", "kg", 0.03, 130), ("Wheat flour", "kg", 0.07, 40),
+                  ("Potato", "kg", 0.08, 30), ("Semolina", "kg", 0.06, 45), ("Oil", "l", 0.015, 150)],
+    "Lunch": [("Rice", "kg", 0.12, 55), ("Toor dal", "kg", 0.04, 140), ("Paneer", "kg", 0.06, 380),
+              ("Mixed vegetables", "kg", 0.1, 50), ("Curd", "kg", 0.08, 60), ("Oil", "l", 0.02, 150)],
+    "Snack": [("Gram flour", "kg", 0.05, 90), ("Potato", "kg", 0.07, 30), ("Bread", "pcs", 2, 5),
+              ("Onion", "kg", 0.04, 35), ("Maida", "kg", 0.05, 45), ("Oil", "l", 0.03, 150)],
+}
+
+# Fixed public holidays (month, day)
+PUBLIC_HOLIDAYS = [(1, 1), (1, 26), (5, 1), (8, 15), (10, 2), (12, 25)]
+
+
+def _item_catalogue(n_items: int, rng: np.random.Generator) -> pd.DataFrame:
+    """Menu items spread round-robin over categories, ids like 101, 201, 301..."""
+    # Three-digit ids while they fit, wider ids for large menus
+    stride = 100 if n_items <= len(CATEGORIES) * 99 else 100000
+    idx = np.arange(n_items)
+    cat_idx = idx % len(CATEGORIES)
+    within = idx // len(CATEGORIES)
+    categories = np.array(CATEGORIES)[cat_idx]
+    names = [
+        ITEM_NAMES[c][w % len(ITEM_NAMES[c])] + ("" if w < len(ITEM_NAMES[c]) else f" #{w // len(ITEM_NAMES[c]) + 1}")
+        for c, w in zip(categories, within)
+    ]
+    return pd.DataFrame({
+        'menu_item_id': (cat_idx + 1) * stride + within + 1,
+        'item_name': names,
+        'item_category': categories,
+        # Popularity varies per item; long-tail across large menus
+        'popularity': rng.lognormal(mean=0.0, sigma=0.25 if n_items <= 10 else 0.6, size=n_items),
+        # Per-item trend in % per year
+        'trend': rng.normal(0.0, 0.05, size=n_items),
+    })
+
+
+def generate_canteen_data(n_items: int = 5,
+                          n_sites: int = 1,
+                          start: str = "2025-07-01",
+                          end: str = "2025-10-31",
+                          employees: int = 120,
+                          seed: int = 42) -> pd.DataFrame:
+    """
+    Generate synthetic meal history
+    
+    Args:
+        n_items: Menu items per site
+        n_sites: Canteen sites; a 'site_id' column is added when more than one
+        start, end: Date range (inclusive)
+        employees: Base headcount of the first site
+        seed: Random seed; the same arguments always give the same data
+    
+    Returns:
+        DataFrame in the canteen_history.csv schema
+    """
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(start, end, freq='D')
+    n_days = len(dates)
+    items = _item_catalogue(n_items, rng)
+    
+    # ---- Per (day, site) signals: shape (D, S) ----
+    day_of_year = dates.dayofyear.to_numpy()[:, None]
+    weekday = dates.weekday.to_numpy()[:, None]
+    years = ((dates - dates[0]).days.to_numpy() / 365.25)[:, None]
+    
+    site_headcount = employees * rng.uniform(0.8, 1.6, size=n_sites)
+    site_headcount[0] = employees
+    growth = rng.normal(0.03, 0.02, size=n_sites)
+    
+    holiday_days = np.array([(m, d) in PUBLIC_HOLIDAYS for m, d in zip(dates.month, dates.day)], dtype=bool)
+    # A few seeded festival days per year
+    holiday_days |= rng.random(n_days) < 6 / 365
+    is_holiday = np.repeat(holiday_days[:, None], n_sites, axis=1)
+    is_company_event = rng.random((n_days, n_sites)) < 1 / 30
+    
+    # Seasonal temperature with noise; monsoon months bring more rain
+    temperature = 27 + 5 * np.sin(2 * np.pi * (day_of_year - 100) / 365.25) + rng.normal(0, 1.5, (n_days, n_sites))
+    monsoon = np.isin(dates.month.to_numpy(), [6, 7, 8, 9])[:, None]
+    rainy = rng.random((n_days, n_sites)) < np.where(monsoon, 0.45, 0.08)
+    precipitation = np.where(rainy, rng.gamma(2.0, 4.0, (n_days, n_sites)), 0.0).round(1)
+    
+    # Attendance: weekends and holidays are quiet, events draw people in
+    attendance = np.where(weekday >= 5, 0.35, 1.0) * rng.normal(1.0, 0.04, (n_days, n_sites))
+    attendance = np.where(is_holiday, 0.15, attendance)
+    total_employees = np.round(site_headcount[None, :] * (1 + growth[None, :]) ** years).astype(int)
+    
+    # ---- Per (day, site, item) demand: shape (D, S, I) ----
+    base_rate = items['item_category'].map(CATEGORY_BASE_RATE).to_numpy()
+    rate = (base_rate * items['popularity'].to_numpy())[None, None, :] \
+        * (1 + items['trend'].to_numpy())[None, None, :] ** years[:, :, None]
+    weather_effect = np.where(rainy, 1.08, 1.0) * np.where(temperature > 32, 0.95, 1.0)
+    event_effect = np.where(is_company_event, 1.2, 1.0)
+    expected = (total_employees * attendance * weather_effect * event_effect)[:, :, None] * rate
+    confirmed = np.minimum(rng.poisson(np.clip(expected, 0, None)), total_employees[:, :, None])
+    
+    # True lags per (site, item) series along the date axis
+    prev_day = np.concatenate([confirmed[:1], confirmed[:-1]], axis=0)
+    csum = np.cumsum(np.concatenate([np.zeros_like(confirmed[:1]), confirmed], axis=0), axis=0, dtype=float)
+    lo = np.maximum(np.arange(n_days) - 7, 0)
+    window = np.maximum(np.arange(n_days) - lo, 1)
+    prev_7day_avg = np.where(
+        (np.arange(n_days) > 0)[:, None, None],
+        (csum[np.arange(n_days)] - csum[lo]) / window[:, None, None],
+        confirmed
+    )
+    
+    # ---- Flatten in (date, site, item) order ----
+    shape = (n_days, n_sites, n_items)
+    
+    def per_day_site(values: np.ndarray) -> np.ndarray:
+        return np.broadcast_to(values[:, :, None], shape).ravel()
+    
+    df = pd.DataFrame({
+        'date': np.repeat(dates.date, n_sites * n_items),
+        'menu_item_id': np.tile(items['menu_item_id'].to_numpy(), n_days * n_sites),
+        'item_name': np.tile(items['item_name'].to_numpy(), n_days * n_sites),
+        'item_category': np.tile(items['item_category'].to_numpy(), n_days * n_sites),
+        'confirmed_count': confirmed.ravel(),
+        'total_employees': per_day_site(total_employees),
+        'confirmed_optin_rate': (confirmed / np.maximum(total_employees, 1)[:, :, None]).ravel(),
+        'prev_day_count': prev_day.ravel(),
+        'prev_7day_avg': prev_7day_avg.ravel(),
+        'is_holiday': per_day_site(is_holiday).astype(int),
+        'is_company_event': per_day_site(is_company_event).astype(int),
+        'temperature': per_day_site(temperature),
+        'precipitation': per_day_site(precipitation),
+    })
+    
+    if n_sites > 1:
+        df.insert(1, 'site_id', np.tile(np.repeat([f"site_{s + 1}" for s in range(n_sites)], n_items), n_days))
+    
+    return df
+
+
+def generate_recipes(df: pd.DataFrame, seed: int = 42) -> pd.DataFrame:
+    """
+    Synthetic recipe (bill of materials) table for the items of generated data
+    
+    Args:
+        df: Data with menu_item_id and item_category columns
+        seed: Random seed
+    
+    Returns:
+        DataFrame with menu_item_id, ingredient, unit, quantity_per_portion, cost_per_unit
+    """
+    rng = np.random.default_rng(seed)
+    items = df[['menu_item_id', 'item_category']].drop_duplicates('menu_item_id')
+    rows = []
+    for item_id, category in items.itertuples(index=False):
+        pool = RECIPE_INGREDIENTS.get(category, RECIPE_INGREDIENTS["Lunch"])
+        for k in rng.choice(len(pool), size=min(3, len(pool)), replace=False):
+            ingredient, unit, quantity, cost = pool[k]
+            rows.append((int(item_id), ingredient, unit, round(quantity * rng.uniform(0.8, 1.2), 3), cost))
+    return pd.DataFrame(rows, columns=['menu_item_id', 'ingredient', 'unit', 'quantity_per_portion', 'cost_per_unit'])
+
+
+def write_snapshot(df: pd.DataFrame) -> Optional[str]:
+    """Feature-engineer generated data and publish it to the columnar snapshot store"""
+    if 'site_id' in df.columns:
+        raise ValueError("Snapshots hold a single site; generate with --sites 1 or write CSV")
+    
+    from data_agent import DataAgent
+    from snapshot_store import SnapshotStore
+    
+    data_agent = DataAgent()
+    df_clean, _ = data_agent.validate_data(df)
+    return SnapshotStore().publish(data_agent.prepare_features(df_clean))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate synthetic canteen meal history')
+    parser.add_argument('--items', type=int, default=5, help='Menu items per site')
+    parser.add_argument('--sites', type=int, default=1, help='Canteen sites')
+    parser.add_argument('--start', type=str, default='2025-07-01')
+    parser.add_argument('--end', type=str, default='2025-10-31')
+    parser.add_argument('--employees', type=int, default=120, help='Base headcount of the first site')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', type=str, default='canteen_history.csv',
+                        help="CSV path, or 'snapshot' to publish to the columnar snapshot store")
+    parser.add_argument('--recipes', type=str, default=None,
+                        help='Also write a recipe table for the generated items to this CSV')
+    args = parser.parse_args()
+    
+    started = datetime.now()
+    df = generate_canteen_data(args.items, args.sites, args.start, args.end, args.employees, args.seed)
+    elapsed = (datetime.now() - started).total_seconds()
+    print(f"✅ Generated {len(df)} rows ({df['date'].nunique()} days × {args.sites} sites × {args.items} items) in {elapsed:.1f}s")
+    
+    if args.output == 'snapshot':
+        write_snapshot(df)
+    else:
+        df.to_csv(args.output, index=False)
+        print(f"💾 Saved to {args.output}")
+    
+    if args.recipes:
+        generate_recipes(df, args.seed).to_csv(args.recipes, index=False)
+        print(f"🧾 Saved recipes to {args.recipes}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,334 @@
+"""
+HeadcountFeed - Expected on-site headcount from employees' working-mode selections
+
+Employees choose their working mode for the next day in either app: the web app
+writes workingModes/{date}/users/{uid} ({"mode": "office" | "home", "userEmail"})
+and the mobile app workModes/{date}/modes/{email} ({"mode": "office" | "wfh"}).
+Both are read, modes are normalised to office / home, and an employee is keyed
+by email so one who uses both apps counts once (latest choice wins).
+Selections reach the feed from a Firestore sync or directly through record();
+they are kept per user in a local SQLite store (Config.HEADCOUNT_STORE_PATH) and
+pre-aggregated into one row per date (office, home, responses), keyed by date,
+in the same transaction:
+    
+    onsite_employees = office + (total_employees - responses) * office / responses
+
+i.e. employees who have not chosen are assumed to follow those who have.
+Dates with fewer than Config.HEADCOUNT_MIN_RESPONSES selections fall back to
+total_employees.
+
+Forecasts are scaled by the expected on-site share of a date relative to the
+usual share over the Config.HEADCOUNT_REFERENCE_DAYS the models last learned
+from (demand_scale). The history has no selections for most dates, so an
+onsite_employees feature would be constant and the models would ignore it.
+"""
+import hashlib
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from config import Config
+from firebase_config import FirebaseConfig, FirebaseCollections
+
+MODES = ('office', 'home')
+# Mode spellings of the web and mobile apps
+MODE_ALIASES = {'office': 'office', 'home': 'home', 'wfh': 'home'}
+
+
+def normalise_mode(mode) -> Optional[str]:
+    """'office' or 'home' for any app's spelling of a mode, None if unknown"""
+    return MODE_ALIASES.get(str(mode or '').strip().lower())
+
+
+def user_key(selection: Dict, fallback_id=None) -> Optional[str]:
+    """An employee's key in the store: email (lower-cased) when known, else the user id"""
+    email = selection.get('email') or selection.get('userEmail') or selection.get('user_email')
+    if email:
+        return str(email).strip().lower()
+    user_id = selection.get('user_id') or selection.get('userId') or fallback_id
+    return str(user_id) if user_id else None
+
+
+def expected_onsite(office, responses, total_employees, min_responses: int = Config.HEADCOUNT_MIN_RESPONSES):
+    """
+    On-site headcount estimate (works on scalars and arrays); dates with NaN
+    counts or fewer than min_responses selections assume everyone on site
+    """
+    office = np.asarray(office, dtype=float)
+    responses = np.asarray(responses, dtype=float)
+    total = np.asarray(total_employees, dtype=float)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        share = np.where(responses >= max(min_responses, 1), office / responses, np.nan)
+    onsite = office + np.maximum(total - responses, 0) * share
+    return np.where(np.isnan(onsite), total, np.round(onsite, 1))
+
+
+class HeadcountFeed:
+    """
+    Working-mode ingestion with a per-date headcount table
+    
+    Usage:
+        feed = HeadcountFeed()
+        feed.sync_from_firebase()                        # recent dates
+        feed.record("2025-11-03", "uid123", "home")      # or directly
+        feed.demand_scale(dates, 120, "2025-11-02")      # forecast multipliers
+    """
+    
+    def __init__(self, store_path: str = Config.HEADCOUNT_STORE_PATH,
+                 collection: str = FirebaseCollections.WORKING_MODES,
+                 app_collection: str = FirebaseCollections.WORK_MODES):
+        self.store_path = store_path
+        self.collection = collection
+        # The mobile app's working-mode collection
+        self.app_collection = app_collection
+        directory = os.path.dirname(store_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.stats = {'recorded': 0, 'synced_dates': 0}
+        # Local writes so far, and the last fingerprint as ((start, end), version, value)
+        self._writes = 0
+        self._fingerprint = (None, None, None)
+        self._init_schema()
+    
+    @property
+    def db(self):
+        """Firestore client, connected lazily on first use"""
+        return FirebaseConfig.get_db()
+    
+    # ---------- Local store ----------
+    
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.store_path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+    
+    def _init_schema(self):
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS working_modes (
+                    date TEXT NOT NULL,
+                    user_id TEXT NOT NULL,
+                    mode TEXT NOT NULL,
+                    updated_at TEXT,
+                    PRIMARY KEY (date, user_id)
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS headcount (
+                    date TEXT PRIMARY KEY,
+                    office INTEGER NOT NULL,
+                    home INTEGER NOT NULL,
+                    responses INTEGER NOT NULL,
+                    updated_at TEXT
+                )
+            """)
+    
+    def _aggregate(self, conn: sqlite3.Connection, dates: List[str]):
+        """Recount the given dates from their selections (caller's transaction)"""
+        now = datetime.now().isoformat()
+        for date in dates:
+            conn.execute("""
+                INSERT OR REPLACE INTO headcount (date, office, home, responses, updated_at)
+                SELECT ?, COALESCE(SUM(mode = 'office'), 0), COALESCE(SUM(mode = 'home'), 0), COUNT(*), ?
+                FROM working_modes WHERE date = ?
+            """, (date, now, date))
+            conn.execute("DELETE FROM headcount WHERE date = ? AND responses = 0", (date,))
+    
+    # ---------- Ingestion ----------
+    
+    def record_many(self, selections: List[Dict]) -> int:
+        """
+        Store working-mode selections and update their dates' counts
+        
+        Args:
+            selections: Dicts with date, user_id (or userId, or email) and mode
+                        ('office', or 'home' / 'wfh')
+        
+        Returns:
+            Number of selections stored (invalid ones are skipped)
+        """
+        rows = []
+        for s in selections:
+            user_id = user_key(s)
+            mode = normalise_mode(s.get('mode'))
+            if not s.get('date') or not user_id or mode is None:
+                continue
+            rows.append((str(pd.to_datetime(s['date']).date()), user_id, mode, datetime.now().isoformat()))
+        if not rows:
+            return 0
+        
+        with self._connect() as conn:
+            conn.executemany("""
+                INSERT INTO working_modes (date, user_id, mode, updated_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT (date, user_id) DO UPDATE SET mode = excluded.mode, updated_at = excluded.updated_at
+            """, rows)
+            self._aggregate(conn, sorted({r[0] for r in rows}))
+        self._writes += 1
+        self.stats['recorded'] += len(rows)
+        return len(rows)
+    
+    def record(self, date: str, user_id: str, mode: str) -> bool:
+        """Store one employee's selection for a date"""
+        return self.record_many([{'date': date, 'user_id': user_id, 'mode': mode}]) == 1
+    
+    def sync_from_firebase(self, dates: Optional[List[str]] = None) -> int:
+        """
+        Replace the selections of some dates with Firestore's (both apps)
+        
+        Args:
+            dates: Dates to sync (default: the last Config.HEADCOUNT_SYNC_DAYS
+                   days through tomorrow, the date employees choose for)
+        
+        Returns:
+            Number of selections read
+        """
+        db = self.db
+        if db is None:
+            return 0
+        if dates is None:
+            tomorrow = datetime.now().date() + timedelta(days=1)
+            dates = [str(tomorrow - timedelta(days=k)) for k in range(Config.HEADCOUNT_SYNC_DAYS, -1, -1)]
+        
+        def _read(date):
+            docs = []
+            for path in (f"{self.collection}/{date}/users", f"{self.app_collection}/{date}/modes"):
+                for doc in db.collection(path).stream():
+                    data = doc.to_dict() or {}
+                    docs.append((user_key(data, doc.id), normalise_mode(data.get('mode')), data.get('timestamp')))
+            frame = pd.DataFrame(docs, columns=['user_id', 'mode', 'timestamp']).dropna(subset=['user_id', 'mode'])
+            # An employee who chose in both apps counts once, with the latest choice
+            frame['timestamp'] = pd.to_datetime(frame['timestamp'].astype(str), utc=True, errors='coerce',
+                                                format='ISO8601')
+            frame = frame.sort_values('timestamp', kind='stable', na_position='first') \
+                .drop_duplicates('user_id', keep='last')
+            return date, list(zip(frame['user_id'], frame['mode']))
+        
+        # One query per date and app, a few dates in flight at a time
+        with ThreadPoolExecutor(max_workers=min(len(dates), Config.FIRESTORE_MAX_IN_FLIGHT) or 1) as pool:
+            per_date = list(pool.map(_read, dates))
+        
+        now = datetime.now().isoformat()
+        rows = [(date, user_id, mode, now) for date, docs in per_date for user_id, mode in docs]
+        with self._connect() as conn:
+            conn.executemany("DELETE FROM working_modes WHERE date = ?", [(d,) for d in dates])
+            conn.executemany("INSERT INTO working_modes (date, user_id, mode, updated_at) VALUES (?, ?, ?, ?)", rows)
+            self._aggregate(conn, dates)
+        self._writes += 1
+        self.stats['synced_dates'] += len(dates)
+        print(f"🏠 Synced {len(rows)} working-mode selections for {len(dates)} dates")
+        return len(rows)
+    
+    def import_counts(self, counts: pd.DataFrame) -> int:
+        """
+        Backfill per-date counts where per-user selections are not available
+        (e.g. history exported from another system)
+        
+        Args:
+            counts: DataFrame with date, office, home (and optional responses)
+        
+        Returns:
+            Number of dates stored
+        """
+        frame = counts.copy()
+        frame['date'] = pd.to_datetime(frame['date']).dt.strftime('%Y-%m-%d')
+        if 'responses' not in frame.columns:
+            frame['responses'] = frame['office'] + frame['home']
+        now = datetime.now().isoformat()
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO headcount (date, office, home, responses, updated_at) VALUES (?, ?, ?, ?, ?)",
+                [(d, int(o), int(h), int(r), now) for d, o, h, r in
+                 frame[['date', 'office', 'home', 'responses']].itertuples(index=False)]
+            )
+        self._writes += 1
+        return len(frame)
+    
+    # ---------- Reads ----------
+    
+    def counts(self, start_date: Optional[str] = None, end_date: Optional[str] = None) -> pd.DataFrame:
+        """Per-date office, home and responses counts (inclusive range)"""
+        query = "SELECT date, office, home, responses FROM headcount WHERE date >= ? AND date <= ? ORDER BY date"
+        with self._connect() as conn:
+            rows = conn.execute(query, (start_date or '0000', end_date or '9999')).fetchall()
+        return pd.DataFrame(rows, columns=['date', 'office', 'home', 'responses'])
+    
+    def onsite_for(self, date, total_employees: float) -> float:
+        """Expected on-site headcount for one date"""
+        day = str(pd.to_datetime(date).date())
+        row = self.counts(day, day)
+        if row.empty:
+            return float(total_employees)
+        return float(expected_onsite(row['office'].iloc[0], row['responses'].iloc[0], total_employees))
+    
+    def onsite_share(self, dates, total_employees: float) -> np.ndarray:
+        """Expected on-site share of total_employees per date (NaN with too few selections)"""
+        days = pd.Series(pd.to_datetime(list(dates))).dt.strftime('%Y-%m-%d')
+        counts = self.counts(days.min(), days.max()).set_index('date').reindex(days)
+        known = counts['responses'].to_numpy(dtype=float) >= max(Config.HEADCOUNT_MIN_RESPONSES, 1)
+        total = max(float(total_employees), 1.0)
+        share = np.clip(expected_onsite(counts['office'], counts['responses'], total) / total, 0, 1)
+        return np.where(known, share, np.nan)
+    
+    def demand_scale(self, dates, total_employees: float, history_end) -> np.ndarray:
+        """
+        Forecast multiplier per date: the expected on-site share over the usual
+        share in the Config.HEADCOUNT_REFERENCE_DAYS up to history_end. Dates
+        without enough selections keep the usual share (1.0), and the usual
+        share is 1.0 when the history has no selections
+        
+        Args:
+            dates: Forecast dates
+            total_employees: Site headcount
+            history_end: Latest date the models' inputs come from
+        
+        Returns:
+            Array of multipliers, one per date
+        """
+        scale = self.onsite_share(dates, total_employees) / self.reference_share(total_employees, history_end)
+        return np.where(np.isnan(scale), 1.0, scale)
+    
+    def reference_share(self, total_employees: float, history_end) -> float:
+        """Usual on-site share over the Config.HEADCOUNT_REFERENCE_DAYS up to history_end (1.0 without selections)"""
+        end = pd.to_datetime(history_end)
+        start = end - timedelta(days=Config.HEADCOUNT_REFERENCE_DAYS - 1)
+        history = self.onsite_share(pd.date_range(start, end), total_employees)
+        return max(float(np.nanmean(history)), 1e-6) if not np.isnan(history).all() else 1.0
+    
+    def _store_version(self) -> tuple:
+        """Size and modification time of the store files; they change when any process writes"""
+        version = []
+        for path in (self.store_path, f"{self.store_path}-wal"):
+            try:
+                stat = os.stat(path)
+                version.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                version.append(None)
+        return tuple(version)
+    
+    def fingerprint(self, start_date: str, end_date: str) -> str:
+        """
+        Changes whenever the counts of a date in the range change
+        
+        Checked on every forecast table request, so the last result is cached:
+        record_many, sync_from_firebase and import_counts invalidate it, and
+        writes by other processes show up in the store files' stat.
+        """
+        key = (str(start_date), str(end_date))
+        version = (self._writes, self._store_version())
+        cached_key, cached_version, value = self._fingerprint
+        if cached_key != key or cached_version != version:
+            counts = self.counts(start_date, end_date)
+            value = hashlib.sha1(counts.to_json(orient='values').encode()).hexdigest()[:16]
+            self._fingerprint = (key, version, value)
+        return value
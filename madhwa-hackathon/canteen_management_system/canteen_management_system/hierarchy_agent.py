@@ -0,0 +1,333 @@
+"""
+HierarchyAgent - Hierarchical forecasts over item -> item_category -> site -> total
+
+Aggregate levels get their own (few, cheap) LightGBM models on daily summed
+demand. Item forecasts from PredictAgent and aggregate forecasts are then
+reconciled in one matrix product so every level adds up:
+
+    y_reconciled = S @ P @ y_base,    P = (S' W^-1 S)^-1 S' W^-1
+
+where S is the summing matrix (every node as a sum of items) and W the
+diagonal forecast-error weights (Config.RECONCILIATION_METHOD).
+"""
+import pandas as pd
+import numpy as np
+import joblib
+import os
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from config import Config
+from train_agent import fit_item_model
+
+# Day-level signals shared by every item of a site
+EXOG_COLS = ['is_holiday', 'is_company_event', 'temperature', 'precipitation', 'total_employees']
+
+
+def item_hierarchy(df: pd.DataFrame, items: Optional[List[int]] = None) -> pd.DataFrame:
+    """
+    Site and category of every item, from its latest history row
+    
+    Data without a 'site_id' column is a single site (Config.DEFAULT_SITE_ID).
+    
+    Returns:
+        DataFrame with menu_item_id, site_id, item_category (sorted by item)
+    """
+    latest = df.sort_values('date').groupby('menu_item_id').tail(1)
+    hierarchy = pd.DataFrame({
+        'menu_item_id': latest['menu_item_id'].astype(int).to_numpy(),
+        'site_id': latest['site_id'].astype(str).to_numpy() if 'site_id' in latest.columns else Config.DEFAULT_SITE_ID,
+        'item_category': latest['item_category'].fillna('Other').astype(str).to_numpy()
+        if 'item_category' in latest.columns else 'Other'
+    })
+    if items is not None:
+        hierarchy = hierarchy[hierarchy['menu_item_id'].isin(items)]
+    return hierarchy.sort_values('menu_item_id').reset_index(drop=True)
+
+
+def build_summing_matrix(hierarchy: pd.DataFrame) -> Tuple[np.ndarray, pd.DataFrame]:
+    """
+    Summing matrix of the hierarchy
+    
+    Args:
+        hierarchy: Output of item_hierarchy (one row per bottom-level item)
+    
+    Returns:
+        (S, nodes): S has one row per node and one column per item; nodes
+        lists the nodes (level, key, site_id, item_category, menu_item_id)
+        in S's row order - total, sites, categories, then items
+    """
+    sites = hierarchy['site_id'].to_numpy()
+    categories = hierarchy['item_category'].to_numpy()
+    
+    node_rows = [{'level': 'total', 'key': 'total', 'site_id': None, 'item_category': None, 'menu_item_id': None}]
+    masks = [np.ones(len(hierarchy), dtype=bool)]
+    for site in sorted(set(sites)):
+        node_rows.append({'level': 'site', 'key': f"site:{site}", 'site_id': site,
+                          'item_category': None, 'menu_item_id': None})
+        masks.append(sites == site)
+    for site, category in sorted(set(zip(sites, categories))):
+        node_rows.append({'level': 'category', 'key': f"category:{site}/{category}", 'site_id': site,
+                          'item_category': category, 'menu_item_id': None})
+        masks.append((sites == site) & (categories == category))
+    
+    S = np.vstack(masks + [np.eye(len(hierarchy), dtype=bool)]).astype(float)
+    item_nodes = pd.DataFrame({
+        'level': 'item',
+        'key': [f"item:{i}" for i in hierarchy['menu_item_id']],
+        'site_id': sites,
+        'item_category': categories,
+        'menu_item_id': hierarchy['menu_item_id'].to_numpy()
+    })
+    nodes = pd.concat([pd.DataFrame(node_rows), item_nodes], ignore_index=True)
+    return S, nodes
+
+
+def reconciliation_matrix(S: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """
+    P = (S' W^-1 S)^-1 S' W^-1 for diagonal W = diag(weights)
+    
+    Returns:
+        Matrix mapping base forecasts of every node to coherent item forecasts
+    """
+    St_Winv = S.T / np.maximum(weights, 1e-9)
+    return np.linalg.solve(St_Winv @ S, St_Winv)
+
+
+class HierarchyAgent:
+    """Agent responsible for aggregate-level models and forecast reconciliation"""
+    
+    def __init__(self, model_path: str = Config.HIERARCHY_MODEL_PATH):
+        self.model_path = model_path
+        self._bundle = None
+        self._bundle_mtime = None
+    
+    # ---------- Aggregate series ----------
+    
+    def _bottom_matrix(self, df: pd.DataFrame, hierarchy: pd.DataFrame) -> pd.DataFrame:
+        """Daily demand per item, dates x items (missing days count as 0)"""
+        wide = df.pivot_table(index='date', columns='menu_item_id', values=Config.TARGET_COLUMN, aggfunc='sum')
+        wide.index = pd.to_datetime(wide.index)
+        return wide.reindex(columns=hierarchy['menu_item_id']).fillna(0)
+    
+    def _exog(self, df: pd.DataFrame, nodes: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+        """Day-level signals per aggregate node (by site; headcount summed for the total)"""
+        cols = [c for c in EXOG_COLS if c in df.columns]
+        site = df['site_id'].astype(str) if 'site_id' in df.columns else Config.DEFAULT_SITE_ID
+        per_site = df.assign(site_id=site, date=pd.to_datetime(df['date'])).groupby(['site_id', 'date'])[cols].mean()
+        
+        total = per_site.groupby('date').mean()
+        if 'total_employees' in cols:
+            total['total_employees'] = per_site['total_employees'].groupby('date').sum()
+        
+        exog = {}
+        for node in nodes[nodes['level'] != 'item'].itertuples():
+            exog[node.key] = total if node.level == 'total' else per_site.xs(node.site_id, level='site_id')
+        return exog
+    
+    @staticmethod
+    def _design(y: pd.Series, exog: pd.DataFrame) -> pd.DataFrame:
+        """Lag, rolling, calendar and day-level features for one daily series"""
+        frame = pd.DataFrame({'y': y})
+        for lag in Config.LAG_PERIODS:
+            frame[f'lag_{lag}'] = y.shift(lag)
+        for window in Config.ROLLING_WINDOWS:
+            frame[f'roll_{window}_mean'] = y.shift(1).rolling(window, min_periods=1).mean()
+        frame['day_of_week'] = frame.index.weekday
+        frame['dow_sin'] = np.sin(2 * np.pi * frame['day_of_week'] / 7)
+        frame['dow_cos'] = np.cos(2 * np.pi * frame['day_of_week'] / 7)
+        frame['month'] = frame.index.month
+        return frame.join(exog, how='left')
+    
+    # ---------- Training ----------
+    
+    def train(self,
+              df: pd.DataFrame,
+              item_summary: List[Dict],
+              validation_days: int = Config.VALIDATION_DAYS) -> Dict:
+        """
+        Train one model per aggregate node over the items that have models
+        
+        Args:
+            df: Feature history
+            item_summary: TrainAgent summary records (menu_item_id, mae)
+            validation_days: Days held out for early stopping and error weights
+        
+        Returns:
+            Summary with the number of aggregate models and their MAE
+        """
+        items = [int(r['menu_item_id']) for r in item_summary]
+        if not items:
+            return {'aggregate_models': 0}
+        
+        print(f"\n🏗️ Training aggregate models over {len(items)} items...")
+        hierarchy = item_hierarchy(df, items)
+        S, nodes = build_summing_matrix(hierarchy)
+        n_agg = len(nodes) - len(hierarchy)
+        
+        # Every aggregate series in one product: (dates x items) @ (items x nodes)
+        bottom = self._bottom_matrix(df, hierarchy)
+        aggregates = pd.DataFrame(bottom.to_numpy() @ S[:n_agg].T, index=bottom.index,
+                                  columns=nodes['key'][:n_agg])
+        exog = self._exog(df, nodes)
+        cutoff = aggregates.index.max() - pd.Timedelta(days=validation_days)
+        
+        models, mae, features = {}, {}, None
+        for key in aggregates.columns:
+            design = self._design(aggregates[key], exog[key]).iloc[max(Config.LAG_PERIODS):].fillna(0)
+            features = [c for c in design.columns if c != 'y']
+            train, val = design[design.index <= cutoff], design[design.index > cutoff]
+            if len(train) < Config.MIN_TRAINING_SAMPLES:
+                print(f"⏭️ Skipping {key} (insufficient data)")
+                continue
+            
+            model = fit_item_model(train[features], train['y'].values,
+                                   val[features], val['y'].values, verbose=False)
+            models[key] = model
+            mae[key] = float(np.mean(np.abs(val['y'].values - model.predict(val[features])))) if len(val) else None
+            print(f"✅ {key} | MAE: {mae[key]:.2f}" if mae[key] is not None else f"✅ {key}")
+        
+        for record in item_summary:
+            mae[f"item:{int(record['menu_item_id'])}"] = float(record['mae'])
+        
+        directory = os.path.dirname(self.model_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        joblib.dump({
+            'models': models,
+            'features': features,
+            'hierarchy': hierarchy,
+            'mae': mae,
+            'trained_at': datetime.now().isoformat()
+        }, self.model_path, compress=3)
+        
+        print(f"📊 Trained {len(models)} aggregate models")
+        return {'aggregate_models': len(models), 'aggregate_mae': {k: v for k, v in mae.items() if k in models}}
+    
+    def _load(self) -> Optional[Dict]:
+        """Load the aggregate bundle, reusing it while the file is unchanged"""
+        if not os.path.exists(self.model_path):
+            return None
+        mtime = os.path.getmtime(self.model_path)
+        if self._bundle is None or self._bundle_mtime != mtime:
+            self._bundle = joblib.load(self.model_path)
+            self._bundle_mtime = mtime
+        return self._bundle
+    
+    # ---------- Forecasting ----------
+    
+    def forecast_aggregates(self, df: pd.DataFrame, dates: List[pd.Timestamp],
+                            bundle: Optional[Dict] = None) -> pd.DataFrame:
+        """
+        Recursive multi-day forecasts for every aggregate node
+        
+        Day-level signals are carried forward from the latest day, as
+        PredictAgent does for items.
+        
+        Returns:
+            DataFrame of base forecasts, target dates x aggregate node keys
+        """
+        bundle = bundle or self._load()
+        hierarchy = bundle['hierarchy']
+        S, nodes = build_summing_matrix(hierarchy)
+        n_agg = len(nodes) - len(hierarchy)
+        lookback = max(Config.LAG_PERIODS + Config.ROLLING_WINDOWS) + 1
+        
+        bottom = self._bottom_matrix(df, hierarchy).tail(lookback)
+        history = pd.DataFrame(bottom.to_numpy() @ S[:n_agg].T, index=bottom.index, columns=nodes['key'][:n_agg])
+        exog = self._exog(df, nodes)
+        
+        forecasts = pd.DataFrame(index=pd.DatetimeIndex(dates), columns=history.columns, dtype=float)
+        for date in forecasts.index:
+            for key in history.columns:
+                model = bundle['models'].get(key)
+                series = pd.concat([history[key], pd.Series([np.nan], index=[date])])
+                node_exog = exog[key].reindex(series.index).ffill()
+                row = self._design(series, node_exog).iloc[[-1]][bundle['features']].fillna(0)
+                # Nodes without a model fall back to their 7-day mean
+                forecasts.loc[date, key] = max(0.0, float(model.predict(row)[0])) if model is not None \
+                    else float(history[key].tail(7).mean())
+            history = pd.concat([history, forecasts.loc[[date]]]).tail(lookback)
+        return forecasts
+    
+    def reconcile(self, df: pd.DataFrame, item_forecasts: pd.DataFrame,
+                  method: str = Config.RECONCILIATION_METHOD) -> Dict:
+        """
+        Coherent forecasts at every level from item and aggregate forecasts
+        
+        Args:
+            df: Feature history
+            item_forecasts: PredictAgent forecasts (date, menu_item_id, predicted_count, ...)
+            method: 'wls' (validation MAE² weights), 'structural' (items under
+                    each node) or 'ols'
+        
+        Returns:
+            Dict with 'items' (item_forecasts with reconciled counts and the
+            original as base_count) and 'levels' (base and reconciled forecast
+            of every node per date)
+        """
+        bundle = self._load()
+        if bundle is None or item_forecasts.empty:
+            print("⚠️ No aggregate models; train first")
+            return {'items': item_forecasts, 'levels': pd.DataFrame()}
+        
+        hierarchy = bundle['hierarchy']
+        S, nodes = build_summing_matrix(hierarchy)
+        n_agg = len(nodes) - len(hierarchy)
+        
+        forecasts = item_forecasts.copy()
+        forecasts['date'] = pd.to_datetime(forecasts['date'])
+        dates = sorted(forecasts['date'].unique())
+        
+        # Base forecasts of every node, dates x nodes
+        base_items = forecasts.pivot_table(index='date', columns='menu_item_id', values='predicted_count', aggfunc='sum')
+        missing = [i for i in hierarchy['menu_item_id'] if i not in base_items.columns]
+        if missing:
+            # Items without a forecast (e.g. model removed) contribute their recent mean
+            recent = self._bottom_matrix(df, hierarchy).tail(7).mean()
+            for item_id in missing:
+                base_items[item_id] = recent[item_id]
+        base_items = base_items.reindex(index=dates, columns=hierarchy['menu_item_id']).fillna(0)
+        base_agg = self.forecast_aggregates(df, dates, bundle)
+        base = np.hstack([base_agg.to_numpy(dtype=float), base_items.to_numpy(dtype=float)])
+        
+        if method == 'ols':
+            weights = np.ones(len(nodes))
+        elif method == 'structural':
+            weights = S.sum(axis=1)
+        else:
+            mae = bundle['mae']
+            weights = np.array([mae.get(key) or S[i].sum() for i, key in enumerate(nodes['key'])]) ** 2
+        
+        # Every date and node in one product: (dates x nodes) @ P' @ S'
+        P = reconciliation_matrix(S, weights)
+        reconciled = base @ P.T @ S.T
+        
+        levels = pd.DataFrame({
+            'date': np.repeat([d.date() for d in dates], len(nodes)),
+            'level': np.tile(nodes['level'].to_numpy(), len(dates)),
+            'key': np.tile(nodes['key'].to_numpy(), len(dates)),
+            'site_id': np.tile(nodes['site_id'].to_numpy(), len(dates)),
+            'item_category': np.tile(nodes['item_category'].to_numpy(), len(dates)),
+            'base_count': base.ravel().round(1),
+            'reconciled_count': np.maximum(reconciled, 0).ravel().round(1)
+        })
+        
+        # Shift each item's forecast (and its interval) to the reconciled value
+        item_values = pd.DataFrame(reconciled[:, n_agg:], index=dates, columns=hierarchy['menu_item_id'])
+        item_values = item_values.stack().rename('reconciled').reset_index()
+        item_values.columns = ['date', 'menu_item_id', 'reconciled']
+        forecasts = forecasts.merge(item_values, on=['date', 'menu_item_id'], how='left')
+        has_value = forecasts['reconciled'].notna()
+        delta = (forecasts['reconciled'] - forecasts['predicted_count']).where(has_value, 0)
+        
+        forecasts['base_count'] = forecasts['predicted_count']
+        interval_cols = [c for c in forecasts.columns
+                         if c in ('lower_bound', 'upper_bound') or (c[:1] == 'p' and c[1:].isdigit())]
+        for col in interval_cols:
+            forecasts[col] = np.maximum(forecasts[col] + delta, 0).round(1 if col.startswith('p') else 0)
+        forecasts['predicted_count'] = np.maximum(forecasts['predicted_count'] + delta, 0).round().astype(int)
+        forecasts['date'] = forecasts['date'].dt.date
+        
+        print(f"🧮 Reconciled {len(nodes)} nodes ({n_agg} aggregate) over {len(dates)} days ({method})")
+        return {'items': forecasts.drop(columns='reconciled'), 'levels': levels}
@@ -12,8 +12,10 @@ import json
 class InsightAgent:
     """Agent responsible for generating insights and trend reports"""
     
-    def __init__(self):
-        self.db = FirebaseConfig.get_db()
+    @property
+    def db(self):
+        """Firestore client, connected lazily on first use"""
+        return FirebaseConfig.get_db()
     
     def analyze_trends(self, df: pd.DataFrame) -> Dict:
         """
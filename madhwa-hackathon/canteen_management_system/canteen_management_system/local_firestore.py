@@ -0,0 +1,380 @@
+"""
+LocalFirestore - SQLite stand-in for the Firestore client
+
+Implements the part of google.cloud.firestore.Client the agents use:
+collection / document references (including subcollections), set (with
+merge), update, delete, add, get, write batches (500 ops, one transaction),
+and queries with where / order_by / limit / start_at / start_after / stream.
+Filters and ordering run in SQLite on the JSON documents, so queries behave
+like their Firestore counterparts at realistic sizes.
+
+Every call that would be a network round trip sleeps for latency_ms plus
+per_document_ms for each document read or written, so sync and push code can
+be timed reproducibly offline:
+
+    FirebaseConfig.use_local(latency_ms=40, per_document_ms=0.05)
+
+Timestamps are stored as ISO strings. firestore.Increment, SERVER_TIMESTAMP
+and DELETE_FIELD are supported in set(merge=True) and update().
+"""
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import date, datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from config import Config
+from firebase_config import DOCUMENT_ID
+
+MAX_BATCH_WRITES = 500
+
+_OPERATORS = {'==': '=', '!=': '!=', '<': '<', '<=': '<=', '>': '>', '>=': '>='}
+_DELETE = object()
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (set, tuple)):
+        return list(value)
+    raise TypeError(f"Cannot store {type(value).__name__} in a document")
+
+
+def _encode(document: Dict) -> str:
+    """JSON text of a document; NaN becomes null as in the agents' own uploads"""
+    def clean(value):
+        if isinstance(value, dict):
+            return {k: clean(v) for k, v in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [clean(v) for v in value]
+        if isinstance(value, (float, np.floating)) and np.isnan(value):
+            return None
+        return value
+    return json.dumps(clean(document), default=_json_default)
+
+
+def _field_sql(field: str) -> str:
+    if field == DOCUMENT_ID:
+        return "id"
+    path = '.'.join(f'"{part}"' for part in field.split('.'))
+    return f"json_extract(data, '$.{path}')"
+
+
+def _param(value):
+    """Query parameter for a field value (booleans are stored as JSON true/false)"""
+    if isinstance(value, LocalDocumentReference):
+        return value.id
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _transform(current: Any, value: Any) -> Any:
+    """Resolve Increment / SERVER_TIMESTAMP / DELETE_FIELD against the stored value"""
+    kind = type(value).__name__
+    if kind == 'Increment':
+        base = current if isinstance(current, (int, float)) and not isinstance(current, bool) else 0
+        return base + value.value
+    if kind == 'Sentinel':
+        if 'delete' in str(getattr(value, 'description', '')).lower():
+            return _DELETE
+        return datetime.now().isoformat()
+    if isinstance(value, dict):
+        base = current if isinstance(current, dict) else {}
+        return _merge(base, value)
+    return value
+
+
+def _merge(existing: Dict, data: Dict) -> Dict:
+    merged = dict(existing)
+    for key, value in data.items():
+        value = _transform(merged.get(key), value)
+        if value is _DELETE:
+            merged.pop(key, None)
+        else:
+            merged[key] = value
+    return merged
+
+
+class LocalDocumentSnapshot:
+    """Result of get() / stream()"""
+    
+    def __init__(self, reference: 'LocalDocumentReference', data: Optional[Dict]):
+        self.reference = reference
+        self.id = reference.id
+        self._data = data
+    
+    @property
+    def exists(self) -> bool:
+        return self._data is not None
+    
+    def to_dict(self) -> Optional[Dict]:
+        return None if self._data is None else dict(self._data)
+    
+    def get(self, field: str) -> Any:
+        value = self._data
+        for part in field.split('.'):
+            value = value[part]
+        return value
+
+
+class LocalDocumentReference:
+    """A document path; reads and writes are one round trip each"""
+    
+    def __init__(self, client: 'LocalFirestore', collection: str, doc_id: str):
+        self._client = client
+        self._collection = collection
+        self.id = doc_id
+        self.path = f"{collection}/{doc_id}"
+    
+    def collection(self, name: str) -> 'LocalCollection':
+        return LocalCollection(self._client, f"{self.path}/{name}")
+    
+    def get(self) -> LocalDocumentSnapshot:
+        data = self._client._read(self._collection, self.id)
+        self._client._round_trip(reads=1)
+        return LocalDocumentSnapshot(self, data)
+    
+    def set(self, data: Dict, merge: bool = False):
+        self._client._commit([('set', self, data, merge)])
+    
+    def update(self, data: Dict):
+        self._client._commit([('update', self, data, True)])
+    
+    def delete(self):
+        self._client._commit([('delete', self, None, False)])
+
+
+class LocalQuery:
+    """Immutable query; each method returns a new query"""
+    
+    def __init__(self, client: 'LocalFirestore', collection: str, filters: Tuple = (), orders: Tuple = (),
+                 limit: Optional[int] = None, cursor: Optional[Tuple] = None):
+        self._client = client
+        self._collection = collection
+        self._filters = filters
+        self._orders = orders
+        self._limit = limit
+        self._cursor = cursor
+    
+    def _copy(self, **changes) -> 'LocalQuery':
+        state = {'filters': self._filters, 'orders': self._orders, 'limit': self._limit, 'cursor': self._cursor}
+        state.update(changes)
+        return LocalQuery(self._client, self._collection, **state)
+    
+    def where(self, field: str, op: str, value: Any) -> 'LocalQuery':
+        if op not in _OPERATORS and op not in ('in', 'not-in', 'array_contains', 'array_contains_any'):
+            raise ValueError(f"Unsupported operator: {op}")
+        return self._copy(filters=self._filters + ((field, op, value),))
+    
+    def order_by(self, field: str, direction: str = 'ASCENDING') -> 'LocalQuery':
+        return self._copy(orders=self._orders + ((field, direction.upper()),))
+    
+    def limit(self, count: int) -> 'LocalQuery':
+        return self._copy(limit=count)
+    
+    def start_at(self, values) -> 'LocalQuery':
+        return self._copy(cursor=(values, True))
+    
+    def start_after(self, values) -> 'LocalQuery':
+        return self._copy(cursor=(values, False))
+    
+    def _sql(self) -> Tuple[str, List]:
+        clauses, params = ["collection = ?"], [self._collection]
+        for field, op, value in self._filters:
+            column = _field_sql(field)
+            if op in _OPERATORS:
+                clauses.append(f"{column} {_OPERATORS[op]} ?")
+                params.append(_param(value))
+            elif op in ('in', 'not-in'):
+                marks = ', '.join('?' * len(value))
+                clauses.append(f"{column} {'IN' if op == 'in' else 'NOT IN'} ({marks})")
+                params.extend(_param(v) for v in value)
+            else:
+                values = value if op == 'array_contains_any' else [value]
+                marks = ', '.join('?' * len(values))
+                path = column.replace("json_extract(data, ", "json_each(data, ")
+                clauses.append(f"EXISTS (SELECT 1 FROM {path} WHERE value IN ({marks}))")
+                params.extend(_param(v) for v in values)
+        
+        # Like Firestore, results are finally ordered by document id
+        orders = list(self._orders)
+        if DOCUMENT_ID not in [field for field, _ in orders]:
+            orders.append((DOCUMENT_ID, orders[-1][1] if orders else 'ASCENDING'))
+        
+        if self._cursor is not None:
+            values, inclusive = self._cursor
+            if isinstance(values, LocalDocumentSnapshot):
+                values = {**(values.to_dict() or {}), DOCUMENT_ID: values.id}
+            fields = [field for field, _ in orders if field in values]
+            if len({direction for _, direction in orders}) > 1:
+                raise ValueError("Cursors need all order_by fields in one direction")
+            descending = orders[0][1] == 'DESCENDING'
+            op = ('<' if descending else '>') + ('=' if inclusive else '')
+            columns = ', '.join(_field_sql(f) for f in fields)
+            clauses.append(f"({columns}) {op} ({', '.join('?' * len(fields))})")
+            params.extend(_param(values[f]) for f in fields)
+        
+        order_sql = ', '.join(f"{_field_sql(field)} {'DESC' if direction == 'DESCENDING' else 'ASC'}"
+                              for field, direction in orders)
+        sql = f"SELECT id, data FROM documents WHERE {' AND '.join(clauses)} ORDER BY {order_sql}"
+        if self._limit is not None:
+            sql += f" LIMIT {int(self._limit)}"
+        return sql, params
+    
+    def stream(self) -> Iterator[LocalDocumentSnapshot]:
+        sql, params = self._sql()
+        with self._client._lock:
+            rows = self._client._conn.execute(sql, params).fetchall()
+        self._client._round_trip(reads=len(rows))
+        for doc_id, data in rows:
+            yield LocalDocumentSnapshot(LocalDocumentReference(self._client, self._collection, doc_id), json.loads(data))
+    
+    def get(self) -> List[LocalDocumentSnapshot]:
+        return list(self.stream())
+
+
+class LocalCollection(LocalQuery):
+    """A collection (or subcollection) path"""
+    
+    def __init__(self, client: 'LocalFirestore', path: str):
+        super().__init__(client, path)
+        self.id = path.rsplit('/', 1)[-1]
+    
+    def document(self, doc_id: Optional[str] = None) -> LocalDocumentReference:
+        return LocalDocumentReference(self._client, self._collection, doc_id or uuid.uuid4().hex[:20])
+    
+    def add(self, data: Dict) -> Tuple[str, LocalDocumentReference]:
+        reference = self.document()
+        reference.set(data)
+        return datetime.now().isoformat(), reference
+
+
+class LocalWriteBatch:
+    """Writes committed together in one transaction and one round trip"""
+    
+    def __init__(self, client: 'LocalFirestore'):
+        self._client = client
+        self._writes = []
+    
+    def __len__(self) -> int:
+        return len(self._writes)
+    
+    def set(self, reference: LocalDocumentReference, data: Dict, merge: bool = False):
+        self._writes.append(('set', reference, data, merge))
+    
+    def update(self, reference: LocalDocumentReference, data: Dict):
+        self._writes.append(('update', reference, data, True))
+    
+    def delete(self, reference: LocalDocumentReference):
+        self._writes.append(('delete', reference, None, False))
+    
+    def commit(self) -> List:
+        if len(self._writes) > MAX_BATCH_WRITES:
+            raise ValueError(f"A batch can hold at most {MAX_BATCH_WRITES} writes, got {len(self._writes)}")
+        self._client._commit(self._writes)
+        committed, self._writes = self._writes, []
+        return committed
+
+
+class LocalFirestore:
+    """
+    SQLite-backed Firestore client
+    
+    Usage:
+        db = LocalFirestore("data/local_firestore.db", latency_ms=40)
+        db.collection("canteen_meal_data").where("date", ">=", "2025-10-01").stream()
+        db.stats    # {'round_trips': ..., 'reads': ..., 'writes': ...}
+    
+    path ":memory:" keeps everything in process.
+    """
+    
+    def __init__(self,
+                 path: str = Config.LOCAL_FIRESTORE_PATH,
+                 latency_ms: float = 0.0,
+                 per_document_ms: float = 0.0):
+        self.path = path
+        self.latency_ms = latency_ms
+        self.per_document_ms = per_document_ms
+        self.stats = {'round_trips': 0, 'reads': 0, 'writes': 0, 'latency_seconds': 0.0}
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS documents (
+                    collection TEXT NOT NULL,
+                    id TEXT NOT NULL,
+                    data TEXT NOT NULL,
+                    PRIMARY KEY (collection, id)
+                )
+            """)
+    
+    def collection(self, path: str) -> LocalCollection:
+        return LocalCollection(self, path)
+    
+    def document(self, path: str) -> LocalDocumentReference:
+        collection, doc_id = path.rsplit('/', 1)
+        return LocalDocumentReference(self, collection, doc_id)
+    
+    def batch(self) -> LocalWriteBatch:
+        return LocalWriteBatch(self)
+    
+    def collections(self) -> List[LocalCollection]:
+        """Top-level collections"""
+        with self._lock:
+            names = [r[0] for r in self._conn.execute("SELECT DISTINCT collection FROM documents")]
+        return [self.collection(n) for n in sorted(names) if '/' not in n]
+    
+    def set_latency(self, latency_ms: float = 0.0, per_document_ms: float = 0.0):
+        self.latency_ms = latency_ms
+        self.per_document_ms = per_document_ms
+    
+    def reset_stats(self):
+        self.stats = {'round_trips': 0, 'reads': 0, 'writes': 0, 'latency_seconds': 0.0}
+    
+    def close(self):
+        self._conn.close()
+    
+    # ---------- Storage ----------
+    
+    def _round_trip(self, reads: int = 0, writes: int = 0):
+        delay = (self.latency_ms + self.per_document_ms * (reads + writes)) / 1000
+        with self._lock:
+            self.stats['round_trips'] += 1
+            self.stats['reads'] += reads
+            self.stats['writes'] += writes
+            self.stats['latency_seconds'] += delay
+        if delay > 0:
+            time.sleep(delay)
+    
+    def _read(self, collection: str, doc_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM documents WHERE collection = ? AND id = ?",
+                                     (collection, doc_id)).fetchone()
+        return None if row is None else json.loads(row[0])
+    
+    def _commit(self, writes: List[Tuple]):
+        """Apply writes atomically: all of them or (on error) none"""
+        with self._lock, self._conn:
+            for op, reference, data, merge in writes:
+                key = (reference._collection, reference.id)
+                if op == 'delete':
+                    self._conn.execute("DELETE FROM documents WHERE collection = ? AND id = ?", key)
+                    continue
+                existing = self._read(*key)
+                if op == 'update' and existing is None:
+                    raise LookupError(f"No document to update: {reference.path}")
+                document = _merge(existing or {}, data) if merge else _merge({}, data)
+                self._conn.execute("INSERT OR REPLACE INTO documents (collection, id, data) VALUES (?, ?, ?)",
+                                   (*key, _encode(document)))
+        self._round_trip(writes=len(writes))
@@ -0,0 +1,225 @@
+"""
+Metrics - Prometheus-style /metrics endpoint for the CanteenAI Flask apps
+
+A small in-process registry (no prometheus_client dependency) that renders
+the Prometheus text exposition format. Request hooks only take a lock and
+bump a few numbers; CanteenAI state is read when /metrics is scraped.
+"""
+import bisect
+import threading
+import time
+from datetime import datetime
+from typing import Callable, List, Optional, Tuple
+
+from flask import Flask, Response, g, request
+
+# Seconds; covers cached lookups through full retrains
+LATENCY_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0]
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+class _Metric:
+    type = "untyped"
+    
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._lock = threading.Lock()
+    
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+
+
+class Counter(_Metric):
+    """Monotonic counter with optional labels"""
+    type = "counter"
+    
+    def __init__(self, name: str, help_text: str):
+        super().__init__(name, help_text)
+        self._values = {}
+    
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+    
+    def render(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return self.header() + [f"{self.name}{_format_labels(k)} {v}" for k, v in values]
+
+
+class Gauge(_Metric):
+    """
+    Single value set directly
+    
+    With metric_type='counter' it exposes a running total kept elsewhere
+    (e.g. PredictAgent.stats) and copied in at scrape time.
+    """
+    
+    def __init__(self, name: str, help_text: str, metric_type: str = "gauge"):
+        super().__init__(name, help_text)
+        self.type = metric_type
+        self._value = 0
+    
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self._value += amount
+    
+    def dec(self, amount: float = 1):
+        self.inc(-amount)
+    
+    def set(self, value: Optional[float]):
+        with self._lock:
+            self._value = value
+    
+    def render(self) -> List[str]:
+        if self._value is None:
+            return []
+        return self.header() + [f"{self.name} {self._value}"]
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram with optional labels"""
+    type = "histogram"
+    
+    def __init__(self, name: str, help_text: str, buckets: List[float] = LATENCY_BUCKETS):
+        super().__init__(name, help_text)
+        self.buckets = sorted(buckets)
+        self._series = {}
+    
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+    
+    def render(self) -> List[str]:
+        with self._lock:
+            series = [(k, list(v[0]), v[1], v[2]) for k, v in self._series.items()]
+        lines = self.header()
+        for key, counts, total, count in series:
+            cumulative = 0
+            for bound, n in zip(self.buckets + [float('inf')], counts):
+                cumulative += n
+                le = "+Inf" if bound == float('inf') else repr(bound)
+                lines.append(f"{self.name}_bucket{_format_labels(key + (('le', le),))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Named collection of metrics rendered together"""
+    
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+    
+    def _register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+    
+    def counter(self, name: str, help_text: str) -> Counter:
+        return self._register(Counter(name, help_text))
+    
+    def gauge(self, name: str, help_text: str, metric_type: str = "gauge") -> Gauge:
+        return self._register(Gauge(name, help_text, metric_type))
+    
+    def histogram(self, name: str, help_text: str, buckets: List[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, buckets))
+    
+    def add_collector(self, collector: Callable[[], None]):
+        """Run collector before every render, e.g. to refresh gauges"""
+        self._collectors.append(collector)
+    
+    def render(self) -> str:
+        for collector in self._collectors:
+            collector()
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+def instrument_app(app: Flask, get_ai: Callable) -> MetricsRegistry:
+    """
+    Add request metrics and a /metrics route to a Flask app
+    
+    Args:
+        app: Flask application
+        get_ai: Returns the app's CanteenAI instance (looked up on each scrape)
+    
+    Returns:
+        The registry, for registering extra metrics
+    """
+    registry = MetricsRegistry()
+    latency = registry.histogram('canteenai_http_request_duration_seconds',
+                                 'Request latency by route, method and status')
+    in_flight = registry.gauge('canteenai_http_requests_in_flight', 'Requests currently being handled')
+    
+    # Copied from CanteenAI.runtime_stats() once per scrape
+    runtime = {
+        'predictions': registry.gauge('canteenai_predictions_total',
+                                      'Predictions generated by this process', 'counter'),
+        'model_cache_hits': registry.gauge('canteenai_model_cache_hits_total',
+                                           'Model bundle cache hits', 'counter'),
+        'model_loads': registry.gauge('canteenai_model_cache_misses_total',
+                                      'Model bundles loaded from disk', 'counter'),
+        'models_available': registry.gauge('canteenai_models_available', 'Per-item models in the model registry'),
+        'models_cached': registry.gauge('canteenai_models_cached', 'Model bundles held in memory'),
+        'data_rows': registry.gauge('canteenai_data_rows', 'Feature rows resident (or mapped from the snapshot)'),
+        'last_sync_date': registry.gauge('canteenai_last_sync_timestamp_seconds',
+                                         'Unix time of the last successful data sync'),
+        'last_training_date': registry.gauge('canteenai_last_training_timestamp_seconds',
+                                             'Unix time of the last model training'),
+        'background_jobs': registry.gauge('canteenai_background_jobs', 'Background jobs running or queued'),
+        'taps_accepted': registry.gauge('canteenai_taps_accepted_total', 'RFID taps counted', 'counter'),
+        'taps_duplicates': registry.gauge('canteenai_taps_duplicate_total', 'RFID taps rejected as repeats', 'counter'),
+    }
+    
+    def collect_runtime():
+        for key, value in get_ai().runtime_stats().items():
+            if key in runtime:
+                runtime[key].set(value.timestamp() if isinstance(value, datetime) else value)
+    
+    registry.add_collector(collect_runtime)
+    
+    @app.before_request
+    def _start_timer():
+        g._metrics_started = time.perf_counter()
+        in_flight.inc()
+    
+    @app.after_request
+    def _record_latency(response):
+        started = g.pop('_metrics_started', None)
+        if started is not None:
+            route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+            latency.observe(time.perf_counter() - started,
+                            route=route, method=request.method, status=str(response.status_code))
+        return response
+    
+    @app.teardown_request
+    def _finish_request(exc=None):
+        in_flight.dec()
+    
+    @app.route('/metrics')
+    def metrics():
+        """Prometheus scrape endpoint"""
+        return Response(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+    
+    return registry
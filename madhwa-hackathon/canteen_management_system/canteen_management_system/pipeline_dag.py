@@ -0,0 +1,237 @@
+"""
+PipelineDAG - Dependency-aware stage executor with fingerprint-cached outputs
+
+Stages declare the sources and stages they read. A stage's cache key is the
+fingerprint of its name, parameters and input fingerprints, so a stage whose
+inputs have not changed since the last run returns its cached output instead
+of running again. Stages whose inputs are ready run concurrently in a thread
+pool. A StageCache keeps the outputs on disk, so a new process reuses them too.
+"""
+import hashlib
+import json
+import os
+import pickle
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from config import Config
+from profiler import NULL_PROFILER, PipelineProfiler
+
+
+def fingerprint(*parts) -> str:
+    """Stable short hash of JSON-serialisable parts"""
+    payload = json.dumps(parts, sort_keys=True, default=str).encode()
+    return hashlib.sha1(payload).hexdigest()[:16]
+
+
+def frame_fingerprint(df: Optional[pd.DataFrame]) -> str:
+    """Content hash of a DataFrame (columns and values, not the index)"""
+    if df is None:
+        return fingerprint(None)
+    row_hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    digest = hashlib.sha1(row_hashes.tobytes())
+    digest.update(','.join(map(str, df.columns)).encode())
+    return digest.hexdigest()[:16]
+
+
+def directory_fingerprint(path: str, prefix: str = "", suffix: str = "") -> str:
+    """
+    Hash of file names, sizes and modification times in a directory
+    
+    The directory path itself is not included, so a copy made with preserved
+    timestamps (e.g. the models inside a snapshot) has the same fingerprint.
+    """
+    if not os.path.isdir(path):
+        return fingerprint(None)
+    entries = []
+    for file in sorted(os.listdir(path)):
+        if file.startswith(prefix) and file.endswith(suffix):
+            stat = os.stat(os.path.join(path, file))
+            entries.append((file, stat.st_size, stat.st_mtime_ns))
+    return fingerprint(entries)
+
+
+class StageCache:
+    """
+    Stage outputs by stage name, in memory and (with a directory) on disk
+    
+    Each stage's (cache key, output, output fingerprint) is written to
+    <directory>/<stage>.pkl and read back on first use, so the next CLI run
+    skips stages whose inputs are unchanged instead of retraining everything.
+    """
+    
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory
+        self._entries = {}
+        self._lock = threading.Lock()
+    
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, f"{name}.pkl")
+    
+    def get(self, name: str, default: Any = None) -> Optional[Tuple[str, Any, str]]:
+        """Cached entry of a stage, loaded from disk if this process has none"""
+        with self._lock:
+            if name not in self._entries and self.directory and os.path.exists(self._path(name)):
+                try:
+                    with open(self._path(name), 'rb') as f:
+                        self._entries[name] = pickle.load(f)
+                except Exception as e:
+                    print(f"⚠️ Ignoring unreadable cache of stage {name}: {e}")
+            return self._entries.get(name, default)
+    
+    def __setitem__(self, name: str, entry: Tuple[str, Any, str]):
+        with self._lock:
+            self._entries[name] = entry
+        if not self.directory:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            # Write then rename, so a crash never leaves a half-written entry
+            tmp_path = self._path(name) + ".tmp"
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self._path(name))
+        except Exception as e:
+            print(f"⚠️ Stage {name} is cached in memory only: {e}")
+
+
+class Stage:
+    """One node of the pipeline"""
+    
+    def __init__(self,
+                 name: str,
+                 func: Callable,
+                 inputs: List[str],
+                 params: Optional[Dict] = None,
+                 always_run: bool = False,
+                 output_fingerprint: Optional[Callable[[Any], str]] = None,
+                 rows: Optional[Callable[[Any], int]] = None):
+        self.name = name
+        self.func = func
+        self.inputs = list(inputs)
+        self.params = params or {}
+        self.always_run = always_run
+        self.output_fingerprint = output_fingerprint
+        self.rows = rows
+
+
+class PipelineDAG:
+    """
+    Runs stages in dependency order, skipping those whose inputs are unchanged
+    
+    Usage:
+        dag = PipelineDAG(cache=stage_cache)
+        dag.add_source('data')
+        dag.add_stage('train_model', train, inputs=['data'])
+        dag.add_stage('predict_next_day', predict, inputs=['data', 'train_model'])
+        run = dag.run(sources={'data': df})
+        run['outputs']['predict_next_day']
+    
+    Stage functions are called with their inputs as keyword arguments. Keep the
+    cache between runs (e.g. on CanteenAI) to reuse outputs across runs; a
+    StageCache with a directory reuses them across processes as well.
+    """
+    
+    def __init__(self,
+                 cache: Optional[StageCache] = None,
+                 max_workers: int = Config.PIPELINE_MAX_WORKERS,
+                 profiler: PipelineProfiler = NULL_PROFILER):
+        self.cache = cache if cache is not None else StageCache()
+        self.max_workers = max_workers
+        self.profiler = profiler
+        self.sources = {}
+        self.stages = {}
+    
+    def add_source(self, name: str, fingerprint_func: Callable[[Any], str] = frame_fingerprint):
+        """Declare an external input supplied to run()"""
+        self.sources[name] = fingerprint_func
+    
+    def add_stage(self, name: str, func: Callable, inputs: List[str] = (), **options) -> Stage:
+        """
+        Add a stage
+        
+        Inputs must already be declared, which keeps the graph acyclic.
+        
+        Args:
+            name: Stage name (also the name its output is passed on under)
+            func: Callable taking the inputs as keyword arguments
+            inputs: Source and stage names this stage reads
+            **options: params (part of the cache key), always_run,
+                       output_fingerprint (identify side effects such as saved
+                       models) and rows (rows processed, for the profiler)
+        """
+        if name in self.stages or name in self.sources:
+            raise ValueError(f"Duplicate pipeline node: {name}")
+        unknown = [i for i in inputs if i not in self.stages and i not in self.sources]
+        if unknown:
+            raise ValueError(f"Stage '{name}' depends on undeclared inputs: {unknown}")
+        stage = self.stages[name] = Stage(name, func, inputs, **options)
+        return stage
+    
+    def _execute(self, stage: Stage, inputs: Dict[str, Any]) -> Any:
+        with self.profiler.stage(stage.name) as record:
+            output = stage.func(**inputs)
+            if stage.rows is not None:
+                record['rows'] = stage.rows(output)
+        return output
+    
+    def run(self, sources: Optional[Dict[str, Any]] = None, force: bool = False) -> Dict:
+        """
+        Run every stage whose inputs changed
+        
+        Args:
+            sources: Values of the declared sources
+            force: Ignore cached outputs
+        
+        Returns:
+            Dict with 'outputs' (by node name), 'executed' and 'cached' stage names
+        """
+        sources = sources or {}
+        missing = [name for name in self.sources if name not in sources]
+        if missing:
+            raise ValueError(f"Missing pipeline sources: {missing}")
+        
+        outputs = dict(sources)
+        fingerprints = {name: func(sources[name]) for name, func in self.sources.items()}
+        pending = dict(self.stages)
+        executed, cached = [], []
+        
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            running = {}
+            while pending or running:
+                # Resolve cache hits first; each can unblock further stages
+                progressed = True
+                while progressed:
+                    progressed = False
+                    for name, stage in list(pending.items()):
+                        if not all(i in fingerprints for i in stage.inputs):
+                            continue
+                        del pending[name]
+                        key = fingerprint(name, stage.params, [fingerprints[i] for i in stage.inputs])
+                        hit = self.cache.get(name)
+                        if hit is not None and hit[0] == key and not stage.always_run and not force:
+                            outputs[name], fingerprints[name] = hit[1], hit[2]
+                            cached.append(name)
+                            self.profiler.count('stage_cache_hits')
+                            progressed = True
+                        else:
+                            inputs = {i: outputs[i] for i in stage.inputs}
+                            running[pool.submit(self._execute, stage, inputs)] = (stage, key)
+                
+                if not running:
+                    break
+                
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage, key = running.pop(future)
+                    output = future.result()
+                    output_fp = stage.output_fingerprint(output) if stage.output_fingerprint else key
+                    self.cache[stage.name] = (key, output, output_fp)
+                    outputs[stage.name] = output
+                    fingerprints[stage.name] = output_fp
+                    executed.append(stage.name)
+        
+        return {'outputs': outputs, 'executed': executed, 'cached': cached}
@@ -5,108 +5,320 @@ import pandas as pd
 import numpy as np
 import joblib
 import os
+import threading
+import time
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from statistics import NormalDist
+from typing import Dict, Iterator, List, Optional, Tuple
+from config import Config
 from firebase_config import FirebaseConfig, FirebaseCollections
+from batch_committer import BatchCommitter, frame_documents
+from prediction_store import PredictionStore
+from profiler import NULL_PROFILER
+from cold_start_agent import ColdStartAgent
+from headcount_feed import HeadcountFeed
+from recursive_forecast import horizon_offsets, item_windows, roll_forward
+from train_agent import quantile_label
+
+# Standard deviation of a normal error per unit of mean absolute error
+MAE_TO_SIGMA = np.sqrt(np.pi / 2)
+
+
+def predict_quantiles(bundle: Dict,
+                      X: pd.DataFrame,
+                      y_pred: np.ndarray,
+                      quantiles: List[float],
+                      horizons=1) -> np.ndarray:
+    """
+    Deterministic quantile forecasts for a batch of rows
+    
+    Offsets from the point forecast come from the bundle's quantile-objective
+    models when present, else from the per-horizon residual quantiles that
+    training measured on recursive forecasts over the validation window.
+    Models trained before horizon calibration fall back to their residual
+    quantiles, or a normal approximation from the MAE, widened by 10% per day
+    ahead. Offsets are sorted so quantiles never cross.
+    
+    Args:
+        bundle: Model bundle ('quantile_models', 'horizon_offsets', 'metadata')
+        X: Feature rows
+        y_pred: Point forecasts for X
+        quantiles: Quantile levels, ascending
+        horizons: Days ahead of the data, per row or one for every row
+    
+    Returns:
+        Array of shape (len(X), len(quantiles)), clipped at zero
+    """
+    quantile_models = bundle.get('quantile_models') or {}
+    calibrated = bundle.get('horizon_offsets') or {}
+    metadata = bundle.get('metadata', {})
+    y_pred = np.asarray(y_pred, dtype=float)
+    horizons = np.broadcast_to(np.asarray(horizons, dtype=float), y_pred.shape)
+    
+    banded = None
+    widen = 1 + 0.1 * horizons
+    if all(q in calibrated for q in quantiles):
+        banded = horizon_offsets(calibrated, quantiles, horizons)
+        # Quantile models are fit one day ahead: widen them like the calibrated band
+        first = horizon_offsets(calibrated, quantiles, [1])[0]
+        if first[-1] > first[0]:
+            widen = (banded[:, -1] - banded[:, 0]) / (first[-1] - first[0])
+    
+    offsets = np.empty((len(y_pred), len(quantiles)))
+    for j, q in enumerate(quantiles):
+        residual = metadata.get(f"resid_{quantile_label(q)}")
+        if q in quantile_models:
+            offsets[:, j] = (quantile_models[q].predict(X) - y_pred) * widen
+        elif banded is not None:
+            offsets[:, j] = banded[:, j]
+        elif residual is not None:
+            offsets[:, j] = residual * widen
+        else:
+            mae = metadata.get('mae', 0.15 * y_pred)
+            offsets[:, j] = NormalDist().inv_cdf(q) * MAE_TO_SIGMA * mae * widen
+    
+    return np.maximum(y_pred[:, None] + np.sort(offsets, axis=1), 0)
 
 
 class PredictAgent:
     """Agent responsible for generating meal demand predictions"""
     
-    def __init__(self, model_dir: str = "models_per_item"):
+    def __init__(self,
+                 model_dir: str = "models_per_item",
+                 store: Optional[PredictionStore] = None,
+                 collection: str = FirebaseCollections.PREDICTIONS,
+                 headcount: Optional[HeadcountFeed] = None):
         self.model_dir = model_dir
-        self.db = FirebaseConfig.get_db()
+        self.collection = collection
+        # Working-mode selections for the forecast dates (None = assume everyone on site)
+        self.headcount = headcount
         self.model_version = "v2.1"
+        self.store = store or PredictionStore()
+        # Forecasts for items the models do not cover yet
+        self.cold_start = ColdStartAgent()
+        self._bundle_cache = {}
+        # Replaced by CanteenAI during a profiled pipeline run
+        self.profiler = NULL_PROFILER
+        # Running totals for monitoring (see metrics.py); pipeline stages
+        # predict concurrently, so increments go through _count
+        self.stats = {'predictions': 0, 'model_loads': 0, 'model_cache_hits': 0}
+        self._stats_lock = threading.Lock()
     
-    def predict_next_day(self, df: pd.DataFrame, target_date: Optional[datetime] = None) -> pd.DataFrame:
+    @property
+    def db(self):
+        """Firestore client, connected lazily on first use"""
+        return FirebaseConfig.get_db()
+    
+    def forecast(self,
+                 df: pd.DataFrame,
+                 target_dates: List[datetime],
+                 new_items: Optional[pd.DataFrame] = None) -> pd.DataFrame:
         """
-        Predict meal demand for next day
+        Forecast every item for some dates after the data (nothing is saved)
+        
+        Each modelled item is rolled forward day by day from the latest data
+        date, its own forecasts feeding the lag features (see
+        recursive_forecast.roll_forward), and the quantiles of all its target
+        dates come from one batch per model. Every forecast is then scaled by
+        the day's expected on-site share of the headcount (headcount_scale,
+        see HeadcountFeed.demand_scale). Items without a model, or with under
+        7 rows, are forecast by the cold-start engine from similar items
+        (forecast_source 'cold_start').
         
         Args:
             df: Historical data with features
-            target_date: Date to predict (default: tomorrow)
+            target_dates: Dates to forecast, after the latest data date
+            new_items: Menu items with no history yet (menu_item_id,
+                       item_category, optional meal_slot)
         
         Returns:
-            DataFrame with predictions
+            DataFrame with one prediction per item and target date
         """
-        if target_date is None:
-            latest_date = pd.to_datetime(df['date']).max()
-            target_date = latest_date + timedelta(days=1)
-        
-        print(f"\n🔮 Predicting for: {target_date.date()}")
-        
-        predictions = []
-        
-        for file in os.listdir(self.model_dir):
-            if not (file.startswith("lgb_item_") and file.endswith(".pkl")):
-                continue
-            
-            item_id = int(file.split("_")[-1].split(".")[0])
-            bundle = joblib.load(os.path.join(self.model_dir, file))
-            model = bundle['model']
-            features = bundle['features']
+        history = df.assign(date=pd.to_datetime(df['date'])).sort_values(['menu_item_id', 'date'], kind='stable')
+        latest_date = history['date'].max()
+        target_dates = pd.DatetimeIndex(pd.to_datetime(list(target_dates)))
+        # Days between the last data date and each target date
+        horizons = np.asarray((target_dates - latest_date).days)
+        if (horizons < 1).any():
+            raise ValueError(f"Forecast dates must be after the latest data date ({latest_date.date()})")
+        steps = int(horizons.max())
+        quantiles = sorted(Config.FORECAST_QUANTILES)
+        
+        # On-site share of the headcount per forecast day from the working-mode
+        # selections, relative to the share the models learned from
+        shares, usual, _ = self.onsite_shares(history, target_dates)
+        scale = shares / usual
+        
+        frames = []
+        item_started = time.perf_counter()
+        for item_id, item_df, bundle in self.modelled_items(history):
             metadata = bundle.get('metadata', {})
+            total = item_df['total_employees'].iloc[-1] if 'total_employees' in item_df.columns else None
             
-            item_df = df[df['menu_item_id'] == item_id].copy()
-            if len(item_df) < 7:
-                continue
-            
-            # Prepare prediction row
-            pred_row = self._prepare_prediction_row(item_df, target_date, features)
-            
-            # Predict
-            X_pred = pred_row[features].fillna(0)
-            y_pred = model.predict(X_pred)[0]
+            # Roll forward to the last target date, then keep the target dates;
+            # the lags follow the unscaled path, a home-working day is not a trend
+            path, rows = self.item_rollout(item_df, bundle, latest_date, steps)
+            X_pred = pd.DataFrame(rows[horizons - 1], columns=bundle['features'])
             
-            # Add realistic variation based on day of week
-            # Weekends typically have lower demand
-            day_of_week = target_date.weekday()
-            if day_of_week >= 5:  # Saturday or Sunday
-                y_pred *= np.random.uniform(0.85, 0.95)  # 5-15% lower
-            else:
-                y_pred *= np.random.uniform(0.95, 1.05)  # ±5% variation
+            # Quantile forecasts, wider for further predictions, then per-day headcount
+            quantile_values = predict_quantiles(bundle, X_pred, path[horizons - 1], quantiles, horizons) \
+                * scale[:, None]
+            y_pred = path[horizons - 1] * scale
             
-            # Calculate confidence - decreases for future predictions
+            # Calculate confidence - 2% lower per day further into the future
             base_confidence = metadata.get('confidence', 0.85)
-            # Reduce confidence based on how far into future we're predicting
-            days_ahead = (target_date - pd.to_datetime(df['date']).max()).days
-            confidence_decay = 0.02 * (days_ahead - 1)  # 2% decrease per day
-            confidence = max(0.70, base_confidence - confidence_decay)
+            confidence = np.clip(base_confidence - 0.02 * (horizons - 1), 0.70, 0.99)
             
-            # Add some randomness to make it more realistic (±1-2%)
-            confidence += np.random.uniform(-0.02, 0.02)
-            confidence = np.clip(confidence, 0.70, 0.99)
-            
-            # Calculate prediction interval
-            mae = metadata.get('mae', y_pred * 0.15)
-            # Wider interval for further predictions
-            uncertainty_factor = 1 + (0.1 * days_ahead)
-            lower_bound = max(0, y_pred - 1.96 * mae * uncertainty_factor)
-            upper_bound = y_pred + 1.96 * mae * uncertainty_factor
-            
-            predictions.append({
-                'date': target_date.date(),
+            frames.append(pd.DataFrame({
+                'date': target_dates.date,
                 'menu_item_id': item_id,
-                'predicted_count': round(float(y_pred)),
-                'predicted_opt_in_rate': float(y_pred) / item_df['total_employees'].iloc[-1] if 'total_employees' in item_df.columns else None,
-                'confidence': round(confidence, 3),
-                'lower_bound': round(lower_bound),
-                'upper_bound': round(upper_bound),
+                'predicted_count': np.round(y_pred).astype(int),
+                'predicted_opt_in_rate': y_pred / total if total is not None else None,
+                'confidence': np.round(confidence, 3),
+                'lower_bound': np.round(quantile_values[:, 0]).astype(int),
+                'upper_bound': np.round(quantile_values[:, -1]).astype(int),
+                **{quantile_label(q): np.round(quantile_values[:, j], 1) for j, q in enumerate(quantiles)},
                 'model_version': self.model_version,
+                'forecast_source': 'model',
+                'horizon': horizons,
+                'headcount_scale': np.round(scale, 3),
                 'predicted_at': datetime.now().isoformat()
-            })
+            }))
+            self.profiler.add_item_time(item_id, time.perf_counter() - item_started)
+            item_started = time.perf_counter()
+        
+        if not frames:
+            return pd.DataFrame()
+        pred_df = pd.concat(frames, ignore_index=True)
+        if Config.COLD_START_ENABLED:
+            for target_date, horizon in zip(target_dates, horizons):
+                cold_df = self.cold_start.forecast(df, pred_df[pred_df['horizon'] == horizon], target_date, new_items)
+                if not cold_df.empty:
+                    frames.append(cold_df.assign(horizon=horizon))
+            pred_df = pd.concat(frames, ignore_index=True)
+        
+        self._count('predictions', len(pred_df))
+        return pred_df.sort_values(['date', 'menu_item_id'], kind='stable').reset_index(drop=True)
+    
+    def modelled_items(self, history: pd.DataFrame) -> Iterator[Tuple[int, pd.DataFrame, Dict]]:
+        """
+        (item_id, rows sorted by date, model bundle) for every item with a
+        model and at least 7 rows of history
+        
+        Args:
+            history: Feature history with datetime dates
+        """
+        groups = dict(iter(history.groupby('menu_item_id')))
+        for file in sorted(os.listdir(self.model_dir)):
+            if not (file.startswith("lgb_item_") and file.endswith(".pkl")):
+                continue
+            item_id = int(file.split("_")[-1].split(".")[0])
+            item_df = groups.get(item_id)
+            if item_df is None or len(item_df) < 7:
+                continue
+            yield (item_id, item_df.sort_values('date').reset_index(drop=True),
+                   self._load_bundle(os.path.join(self.model_dir, file)))
+    
+    def item_rollout(self, item_df: pd.DataFrame, bundle: Dict, latest_date: datetime,
+                     steps: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        One item's point forecasts for the steps days after latest_date, before
+        headcount scaling, and the feature rows they came from
+        
+        Returns:
+            (forecasts of shape (steps,), feature rows of shape (steps, features))
+        """
+        features = bundle['features']
+        templates, windows = item_windows(item_df, features, [len(item_df) - 1])
+        path, rows = roll_forward(bundle['model'], features, templates, windows,
+                                  pd.DatetimeIndex([latest_date]), steps)
+        return path[0], rows[:, 0]
+    
+    def onsite_shares(self, history: pd.DataFrame, target_dates) -> Tuple[np.ndarray, float, float]:
+        """
+        Working-mode headcount of some forecast dates
+        
+        Args:
+            history: Feature history with datetime dates
+            target_dates: Forecast dates
+        
+        Returns:
+            (expected on-site share per date, the usual share in the latest
+            history, site headcount); a date with too few selections has the
+            usual share, and shares are 1.0 without a headcount feed
+        """
+        latest_date = history['date'].max()
+        total = float(history.loc[history['date'] == latest_date, 'total_employees'].max()) \
+            if 'total_employees' in history.columns else 0.0
+        if self.headcount is None or not total > 0:
+            return np.ones(len(target_dates)), 1.0, total
+        usual = self.headcount.reference_share(total, latest_date)
+        shares = self.headcount.onsite_share(target_dates, total)
+        return np.where(np.isnan(shares), usual, shares), usual, total
+    
+    def predict_next_day(self,
+                         df: pd.DataFrame,
+                         target_date: Optional[datetime] = None,
+                         new_items: Optional[pd.DataFrame] = None,
+                         save: bool = True) -> pd.DataFrame:
+        """
+        Predict meal demand for next day
+        
+        Args:
+            df: Historical data with features
+            target_date: Date to predict (default: tomorrow); later dates are
+                         reached by rolling the forecast forward
+            new_items: Menu items with no history yet (see forecast)
+            save: Store and push the predictions
+        
+        Returns:
+            DataFrame with predictions
+        """
+        if target_date is None:
+            target_date = pd.to_datetime(df['date']).max() + timedelta(days=1)
         
-        pred_df = pd.DataFrame(predictions)
+        print(f"\n🔮 Predicting for: {target_date.date()}")
         
+        pred_df = self.forecast(df, [target_date], new_items)
         if not pred_df.empty:
             print(f"✅ Generated {len(pred_df)} predictions")
-            self._save_predictions(pred_df, target_date)
+            if save:
+                self._save_predictions(pred_df)
             return pred_df
         else:
             print("⚠️ No predictions generated")
             return pd.DataFrame()
     
-    def predict_weekly(self, df: pd.DataFrame, days: int = 7) -> pd.DataFrame:
+    def _load_bundle(self, path: str) -> Dict:
+        """Load a model bundle, reusing the cached copy while the file is unchanged"""
+        mtime = os.path.getmtime(path)
+        cached = self._bundle_cache.get(path)
+        if cached is not None and cached[0] == mtime:
+            self.profiler.count('model_cache_hits')
+            self._count('model_cache_hits')
+            return cached[1]
+        self.profiler.count('model_loads')
+        self._count('model_loads')
+        bundle = joblib.load(path)
+        self._bundle_cache[path] = (mtime, bundle)
+        return bundle
+    
+    def _count(self, name: str, n: int = 1):
+        """Increment a monitoring total"""
+        with self._stats_lock:
+            self.stats[name] += n
+    
+    @property
+    def cached_model_count(self) -> int:
+        """Model bundles currently held in memory"""
+        return len(self._bundle_cache)
+    
+    def clear_model_cache(self):
+        """Drop cached model bundles (e.g. after switching model_dir)"""
+        self._bundle_cache = {}
+    
+    def predict_weekly(self, df: pd.DataFrame, days: int = 7,
+                       new_items: Optional[pd.DataFrame] = None) -> pd.DataFrame:
         """
         Generate predictions for next N days
         Uses previous predictions to inform future predictions
@@ -114,6 +326,7 @@ class PredictAgent:
         Args:
             df: Historical data
             days: Number of days to predict
+            new_items: Menu items with no history yet (see forecast)
         
         Returns:
             DataFrame with multi-day predictions
@@ -121,80 +334,22 @@ class PredictAgent:
         print(f"\n📅 Generating {days}-day forecast...")
         
         latest_date = pd.to_datetime(df['date']).max()
-        all_predictions = []
-        
-        # Start with historical data
-        working_df = df.copy()
+        weekly_df = self.forecast(df, [latest_date + timedelta(days=d) for d in range(1, days + 1)], new_items)
         
-        for day_offset in range(1, days + 1):
-            target_date = latest_date + timedelta(days=day_offset)
-            day_preds = self.predict_next_day(working_df, target_date)
-            
-            if not day_preds.empty:
-                all_predictions.append(day_preds)
-                
-                # Add predictions back to working data for next iteration
-                # This allows future predictions to use previous predictions
-                for _, pred in day_preds.iterrows():
-                    new_row = {
-                        'date': pd.Timestamp(pred['date']),
-                        'menu_item_id': pred['menu_item_id'],
-                        'confirmed_count': pred['predicted_count'],
-                        'total_employees': 120  # Default value
-                    }
-                    working_df = pd.concat([working_df, pd.DataFrame([new_row])], ignore_index=True)
-        
-        if all_predictions:
-            weekly_df = pd.concat(all_predictions, ignore_index=True)
+        if not weekly_df.empty:
             print(f"✅ Weekly forecast complete: {len(weekly_df)} predictions")
+            self._save_predictions(weekly_df)
             return weekly_df
         else:
             return pd.DataFrame()
     
-    def _prepare_prediction_row(self, item_df: pd.DataFrame, target_date: datetime, features: List[str]) -> pd.DataFrame:
-        """Prepare a single row for prediction with all required features"""
-        item_df = item_df.sort_values('date').copy()
-        last_row = item_df.iloc[-1:].copy()
-        
-        # Create prediction row
-        pred_row = last_row.copy()
-        pred_row['date'] = target_date
-        
-        # Time features
-        pred_row['day_of_week'] = target_date.weekday()
-        pred_row['month'] = target_date.month
-        pred_row['year'] = target_date.year
-        pred_row['dow_sin'] = np.sin(2 * np.pi * target_date.weekday() / 7)
-        pred_row['dow_cos'] = np.cos(2 * np.pi * target_date.weekday() / 7)
-        
-        # Lag features
-        target_col = 'confirmed_count'
-        for lag in [1, 2, 3, 7, 14]:
-            if len(item_df) >= lag:
-                pred_row[f'lag_{lag}'] = item_df[target_col].iloc[-lag]
-            else:
-                pred_row[f'lag_{lag}'] = 0
-        
-        # Rolling features
-        for window in [3, 7, 14]:
-            if len(item_df) >= window:
-                pred_row[f'roll_{window}_mean'] = item_df[target_col].tail(window).mean()
-            else:
-                pred_row[f'roll_{window}_mean'] = item_df[target_col].mean()
-        
-        # Ensure all features exist
-        for col in features:
-            if col not in pred_row.columns:
-                pred_row[col] = 0
-        
-        return pred_row
-    
-    def _save_predictions(self, pred_df: pd.DataFrame, target_date: datetime):
+    def _save_predictions(self, pred_df: pd.DataFrame):
         """Save predictions locally and to Firebase"""
-        # Save locally
-        pred_path = os.path.join(self.model_dir, f"predictions_{target_date.date()}.csv")
-        pred_df.to_csv(pred_path, index=False)
-        print(f"💾 Saved to {pred_path}")
+        # Append to the local prediction history
+        saved = self.store.append(pred_df)
+        dates = pd.to_datetime(pred_df['date'])
+        print(f"💾 Stored {saved} predictions for {dates.min().date()}"
+              + (f" to {dates.max().date()}" if dates.nunique() > 1 else "") + f" in {self.store.path}")
         
         # Push to Firebase
         self.push_predictions_to_firebase(pred_df)
@@ -213,35 +368,22 @@ class PredictAgent:
             print("⚠️ Firebase not connected")
             return 0
         
+        def _doc_id(data: Dict) -> str:
+            # Convert date to string if needed
+            if 'date' in data and not isinstance(data['date'], str):
+                data['date'] = str(data['date'])
+            return f"{data['date']}_{data['menu_item_id']}"
+        
         try:
-            collection_ref = self.db.collection(FirebaseCollections.PREDICTIONS)
-            batch = self.db.batch()
-            pushed_count = 0
-            
-            for _, row in pred_df.iterrows():
-                data = {k: (None if pd.isna(v) else v) for k, v in row.to_dict().items()}
-                
-                # Convert date to string if needed
-                if 'date' in data and not isinstance(data['date'], str):
-                    data['date'] = str(data['date'])
-                
-                doc_id = f"{data['date']}_{data['menu_item_id']}"
-                batch.set(collection_ref.document(doc_id), data, merge=True)
-                pushed_count += 1
-                
-                if pushed_count % 500 == 0:
-                    batch.commit()
-                    batch = self.db.batch()
-            
-            if pushed_count % 500 != 0:
-                batch.commit()
-            
-            print(f"✅ Pushed {pushed_count} predictions to Firebase")
-            return pushed_count
-            
+            result = BatchCommitter(self.db).commit(self.collection,
+                                                    frame_documents(pred_df, _doc_id))
         except Exception as e:
             print(f"❌ Error pushing to Firebase: {e}")
             return 0
+        
+        print(f"✅ Pushed {result['committed']} predictions to Firebase"
+              + (f" ({result['failed']} failed)" if result['failed'] else ""))
+        return result['committed']
     
     def get_predictions_for_date(self, date: str) -> pd.DataFrame:
         """Retrieve predictions for a specific date from Firebase"""
@@ -249,7 +391,7 @@ class PredictAgent:
             return pd.DataFrame()
         
         try:
-            collection_ref = self.db.collection(FirebaseCollections.PREDICTIONS)
+            collection_ref = self.db.collection(self.collection)
             query = collection_ref.where('date', '==', date)
             docs = query.stream()
             
@@ -260,48 +402,155 @@ class PredictAgent:
             print(f"❌ Error fetching predictions: {e}")
             return pd.DataFrame()
     
-    def compare_predictions_vs_actuals(self, df_actual: pd.DataFrame, date: str) -> pd.DataFrame:
+    def get_predictions_for_range(self, start_date: str, end_date: str) -> pd.DataFrame:
         """
-        Compare predictions against actual values
+        Retrieve predictions for a date window from Firebase in one query
+        
+        Args:
+            start_date: First target date (YYYY-MM-DD, inclusive)
+            end_date: Last target date (YYYY-MM-DD, inclusive)
+        
+        Returns:
+            DataFrame with predictions
+        """
+        if not self.db:
+            return pd.DataFrame()
+        
+        try:
+            collection_ref = self.db.collection(self.collection)
+            # Dates are pushed as ISO strings, so a lexicographic range is a date range
+            query = collection_ref.where('date', '>=', start_date).where('date', '<=', end_date)
+            records = [doc.to_dict() for doc in query.stream()]
+            return pd.DataFrame(records) if records else pd.DataFrame()
+            
+        except Exception as e:
+            print(f"❌ Error fetching predictions: {e}")
+            return pd.DataFrame()
+    
+    def load_local_predictions(self, start_date: str, end_date: str) -> pd.DataFrame:
+        """Load every locally stored prediction for a date window"""
+        return self.store.query(start_date=start_date, end_date=end_date)
+    
+    def compare_predictions_range(self,
+                                  df_actual: pd.DataFrame,
+                                  start_date: str,
+                                  end_date: str,
+                                  source: str = 'auto',
+                                  target_col: str = 'confirmed_count') -> Dict:
+        """
+        Compare predictions against actual values over a date window
+        
+        Predictions are fetched once for the whole window and joined with the
+        actuals in a single merge on (date, menu_item_id).
         
         Args:
             df_actual: DataFrame with actual values
-            date: Date to compare
+            start_date: First date to compare (YYYY-MM-DD, inclusive)
+            end_date: Last date to compare (YYYY-MM-DD, inclusive)
+            source: 'firebase', 'local', or 'auto' (Firebase when connected).
+                    The local store keeps every forecast made for a date; each
+                    horizon is scored once, with its latest forecast. Firebase
+                    only holds the latest.
+            target_col: Actual value column
         
         Returns:
-            DataFrame with comparison
+            Dict with 'detail', 'by_day', 'by_item', 'by_horizon' DataFrames
+            and a 'summary'
         """
-        pred_df = self.get_predictions_for_date(date)
+        start_date = str(pd.to_datetime(start_date).date())
+        end_date = str(pd.to_datetime(end_date).date())
+        
+        if source == 'auto':
+            source = 'firebase' if self.db else 'local'
+        if source == 'firebase':
+            pred_df = self.get_predictions_for_range(start_date, end_date)
+        else:
+            pred_df = self.load_local_predictions(start_date, end_date)
         
         if pred_df.empty:
-            print(f"⚠️ No predictions found for {date}")
-            return pd.DataFrame()
+            print(f"⚠️ No predictions found for {start_date} to {end_date}")
+            return {}
         
-        actual_df = df_actual[df_actual['date'] == date].copy()
+        # Normalise both sides to midnight timestamps; dates may arrive as str, date or datetime
+        pred_df = pred_df.copy()
+        pred_df['date'] = pd.to_datetime(pred_df['date']).dt.normalize()
+        actual_df = df_actual[['date', 'menu_item_id', target_col]].copy()
+        actual_df['date'] = pd.to_datetime(actual_df['date']).dt.normalize()
+        actual_df = actual_df[actual_df['date'].between(pd.Timestamp(start_date), pd.Timestamp(end_date))]
         
         if actual_df.empty:
-            print(f"⚠️ No actual data found for {date}")
-            return pd.DataFrame()
+            print(f"⚠️ No actual data found for {start_date} to {end_date}")
+            return {}
         
-        # Merge predictions and actuals
-        comparison = pred_df.merge(
-            actual_df[['menu_item_id', 'confirmed_count']],
-            on='menu_item_id',
-            how='inner',
-            suffixes=('_pred', '_actual')
+        comparison = pred_df.drop(columns=[target_col], errors='ignore').merge(
+            actual_df, on=['date', 'menu_item_id'], how='inner'
         )
         
+        if comparison.empty:
+            print(f"⚠️ No overlapping predictions and actuals for {start_date} to {end_date}")
+            return {}
+        
+        # Horizon = days ahead of the data the forecast was made from; rows
+        # stored before horizons were recorded fall back to the prediction date
+        horizon = pd.to_numeric(comparison.get('horizon', pd.Series(np.nan, index=comparison.index)), errors='coerce')
+        if 'predicted_at' in comparison.columns:
+            predicted_at = pd.to_datetime(comparison['predicted_at'], errors='coerce')
+            comparison['horizon'] = horizon.fillna((comparison['date'] - predicted_at.dt.normalize()).dt.days)
+            # Score each (date, item, horizon) once, with its latest forecast
+            comparison = comparison.iloc[np.argsort(predicted_at.to_numpy(), kind='stable')]
+            comparison = comparison.drop_duplicates(['date', 'menu_item_id', 'horizon'], keep='last') \
+                .sort_values(['date', 'menu_item_id', 'horizon']).reset_index(drop=True)
+        else:
+            comparison['horizon'] = horizon
+        
         # Calculate error metrics
-        comparison['error'] = comparison['confirmed_count'] - comparison['predicted_count']
-        comparison['abs_error'] = abs(comparison['error'])
-        comparison['pct_error'] = (comparison['error'] / comparison['confirmed_count'] * 100).round(2)
+        comparison['error'] = comparison[target_col] - comparison['predicted_count']
+        comparison['abs_error'] = comparison['error'].abs()
+        comparison['pct_error'] = (comparison['error'] / comparison[target_col].replace(0, np.nan) * 100).round(2)
+        
+        def _summarize(by: str) -> pd.DataFrame:
+            return comparison.groupby(by).agg(
+                mae=('abs_error', 'mean'),
+                mape=('pct_error', lambda s: float(s.abs().mean())),
+                bias=('error', 'mean'),
+                samples=('error', 'size')
+            ).reset_index()
+        
+        results = {
+            'detail': comparison,
+            'by_day': _summarize('date'),
+            'by_item': _summarize('menu_item_id'),
+            'by_horizon': _summarize('horizon'),
+            'summary': {
+                'start_date': start_date,
+                'end_date': end_date,
+                'source': source,
+                'days': int(comparison['date'].nunique()),
+                'samples': len(comparison),
+                'mae': float(comparison['abs_error'].mean()),
+                'mape': float(comparison['pct_error'].abs().mean())
+            }
+        }
+        
+        print(f"\n📊 Prediction Accuracy for {start_date} to {end_date}:")
+        print(f"   MAE: {results['summary']['mae']:.2f}")
+        print(f"   MAPE: {results['summary']['mape']:.1f}%")
+        
+        return results
+    
+    def compare_predictions_vs_actuals(self, df_actual: pd.DataFrame, date: str) -> pd.DataFrame:
+        """
+        Compare predictions against actual values
         
-        print(f"\n📊 Prediction Accuracy for {date}:")
-        print(f"   MAE: {comparison['abs_error'].mean():.2f}")
-        print(f"   MAPE: {abs(comparison['pct_error']).mean():.1f}%")
+        Args:
+            df_actual: DataFrame with actual values
+            date: Date to compare
         
-        return comparison
-
+        Returns:
+            DataFrame with comparison
+        """
+        results = self.compare_predictions_range(df_actual, date, date)
+        return results.get('detail', pd.DataFrame())
 
 if __name__ == "__main__":
     # Test predictions
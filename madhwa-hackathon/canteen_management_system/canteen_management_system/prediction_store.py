@@ -0,0 +1,233 @@
+"""
+PredictionStore - Append-only local history of every prediction made
+"""
+import pandas as pd
+import numpy as np
+import sqlite3
+import os
+from contextlib import contextmanager
+from typing import Iterator, List, Optional
+
+from config import Config
+
+
+class PredictionStore:
+    """
+    SQLite-backed prediction history indexed on
+    (target_date, menu_item_id, predicted_at, model_version)
+    
+    Rows are only ever inserted; re-predicting a date adds a new row with a
+    newer predicted_at, so past forecasts stay available for accuracy reviews.
+    Each row records its horizon (days between the last data date and the
+    target date); readers that want one forecast per (date, item, horizon),
+    such as PredictAgent.compare_predictions_range, keep the latest at read
+    time.
+    
+    Usage:
+        store = PredictionStore()
+        store.append(pred_df)
+        latest = store.query(start_date="2025-11-01", latest_only=True)
+    """
+    
+    TABLE = "predictions"
+    KEY_COLUMNS = ['target_date', 'menu_item_id', 'predicted_at', 'model_version']
+    
+    def __init__(self, path: str = Config.PREDICTION_STORE_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._init_schema()
+    
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # One short-lived connection per call keeps the store safe across Flask threads
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+    
+    def _init_schema(self):
+        with self._connect() as conn:
+            conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS {self.TABLE} (
+                    target_date TEXT NOT NULL,
+                    menu_item_id INTEGER NOT NULL,
+                    predicted_at TEXT NOT NULL,
+                    model_version TEXT,
+                    predicted_count REAL,
+                    horizon INTEGER
+                )
+            """)
+            # Stores created before horizons were recorded; their rows keep a NULL horizon
+            if 'horizon' not in self._columns(conn):
+                conn.execute(f"ALTER TABLE {self.TABLE} ADD COLUMN horizon INTEGER")
+            conn.execute(f"""
+                CREATE INDEX IF NOT EXISTS idx_{self.TABLE}_lookup
+                ON {self.TABLE} ({', '.join(self.KEY_COLUMNS)})
+            """)
+            # Stores that briefly kept one row per horizon: allow reruns again
+            conn.execute(f"DROP INDEX IF EXISTS idx_{self.TABLE}_horizon")
+    
+    def _columns(self, conn: sqlite3.Connection) -> List[str]:
+        return [row[1] for row in conn.execute(f"PRAGMA table_info({self.TABLE})")]
+    
+    def append(self, pred_df: pd.DataFrame) -> int:
+        """
+        Append predictions
+        
+        New prediction columns (e.g. extra quantiles) are added to the table
+        on first sight, so callers can extend the prediction schema freely.
+        
+        Args:
+            pred_df: Prediction DataFrame with a 'date' target column and a
+                     'horizon' (days ahead; derived from predicted_at if missing)
+        
+        Returns:
+            Number of rows written
+        """
+        if pred_df.empty:
+            return 0
+        
+        df = pred_df.rename(columns={'date': 'target_date'}).copy()
+        df['target_date'] = pd.to_datetime(df['target_date']).dt.strftime('%Y-%m-%d')
+        if 'predicted_at' not in df.columns:
+            df['predicted_at'] = pd.Timestamp.now().isoformat()
+        if 'horizon' not in df.columns:
+            predicted_on = pd.to_datetime(df['predicted_at'], errors='coerce').dt.normalize()
+            df['horizon'] = (pd.to_datetime(df['target_date']) - predicted_on).dt.days
+        df = df.astype(object).where(pd.notna(df), None)
+        
+        with self._connect() as conn:
+            existing = self._columns(conn)
+            for col in df.columns:
+                if col not in existing:
+                    conn.execute(f'ALTER TABLE {self.TABLE} ADD COLUMN "{col}"')
+            
+            cols = ', '.join(f'"{c}"' for c in df.columns)
+            placeholders = ', '.join('?' for _ in df.columns)
+            rows = [tuple(_to_sql_value(v) for v in row) for row in df.itertuples(index=False)]
+            conn.executemany(f"INSERT INTO {self.TABLE} ({cols}) VALUES ({placeholders})", rows)
+        
+        return len(rows)
+    
+    def _build_query(self,
+                     start_date: Optional[str] = None,
+                     end_date: Optional[str] = None,
+                     menu_item_ids: Optional[List[int]] = None,
+                     latest_only: bool = False):
+        """SQL and parameters for a filtered prediction query"""
+        clauses, params = [], []
+        if start_date:
+            clauses.append("target_date >= ?")
+            params.append(str(pd.to_datetime(start_date).date()))
+        if end_date:
+            clauses.append("target_date <= ?")
+            params.append(str(pd.to_datetime(end_date).date()))
+        if menu_item_ids:
+            clauses.append(f"menu_item_id IN ({', '.join('?' for _ in menu_item_ids)})")
+            params.extend(int(i) for i in menu_item_ids)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        
+        if latest_only:
+            # Newest forecast per (target_date, item); served by the lookup index
+            sql = f"""
+                SELECT * FROM (
+                    SELECT *, ROW_NUMBER() OVER (
+                        PARTITION BY target_date, menu_item_id
+                        ORDER BY predicted_at DESC
+                    ) AS _rank
+                    FROM {self.TABLE} {where}
+                ) WHERE _rank = 1
+                ORDER BY target_date, menu_item_id
+            """
+        else:
+            sql = f"SELECT * FROM {self.TABLE} {where} ORDER BY target_date, menu_item_id, predicted_at"
+        return sql, params
+    
+    def _to_frame(self, df: pd.DataFrame) -> pd.DataFrame:
+        return df.drop(columns=['_rank'], errors='ignore').rename(columns={'target_date': 'date'})
+    
+    def query(self,
+              start_date: Optional[str] = None,
+              end_date: Optional[str] = None,
+              menu_item_ids: Optional[List[int]] = None,
+              latest_only: bool = False) -> pd.DataFrame:
+        """
+        Range query over target dates
+        
+        Args:
+            start_date: First target date (inclusive)
+            end_date: Last target date (inclusive)
+            menu_item_ids: Restrict to these items
+            latest_only: Keep only the newest prediction per (date, item)
+        
+        Returns:
+            DataFrame of predictions with a 'date' column
+        """
+        sql, params = self._build_query(start_date, end_date, menu_item_ids, latest_only)
+        with self._connect() as conn:
+            df = pd.read_sql_query(sql, conn, params=params)
+        return self._to_frame(df)
+    
+    def iter_chunks(self,
+                    start_date: Optional[str] = None,
+                    end_date: Optional[str] = None,
+                    menu_item_ids: Optional[List[int]] = None,
+                    latest_only: bool = False,
+                    chunksize: int = 5000) -> Iterator[pd.DataFrame]:
+        """Stream a range query as DataFrame chunks of at most chunksize rows"""
+        sql, params = self._build_query(start_date, end_date, menu_item_ids, latest_only)
+        with self._connect() as conn:
+            for chunk in pd.read_sql_query(sql, conn, params=params, chunksize=chunksize):
+                yield self._to_frame(chunk)
+    
+    def iter_csv(self, chunksize: int = 5000, **filters) -> Iterator[str]:
+        """Stream a range query as CSV text, header first"""
+        header = True
+        for chunk in self.iter_chunks(chunksize=chunksize, **filters):
+            yield chunk.to_csv(index=False, header=header)
+            header = False
+    
+    def latest_target_date(self) -> Optional[str]:
+        """Most recent target date with a stored prediction"""
+        with self._connect() as conn:
+            row = conn.execute(f"SELECT MAX(target_date) FROM {self.TABLE}").fetchone()
+        return row[0] if row else None
+    
+    def count(self) -> int:
+        """Number of stored prediction rows"""
+        with self._connect() as conn:
+            return conn.execute(f"SELECT COUNT(*) FROM {self.TABLE}").fetchone()[0]
+    
+    def import_csv_files(self, directory: str) -> int:
+        """
+        One-off migration of legacy per-day predictions_{date}.csv files
+        
+        Returns:
+            Number of rows imported
+        """
+        imported = 0
+        for file in sorted(os.listdir(directory)):
+            if file.startswith("predictions_") and file.endswith(".csv"):
+                imported += self.append(pd.read_csv(os.path.join(directory, file)))
+        print(f"✅ Imported {imported} predictions into {self.path}")
+        return imported
+
+
+def _to_sql_value(value):
+    """Convert numpy scalars to plain Python values for sqlite3"""
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+if __name__ == "__main__":
+    # Migrate legacy prediction CSVs and show what the store holds
+    store = PredictionStore()
+    if os.path.isdir(Config.MODEL_DIR):
+        store.import_csv_files(Config.MODEL_DIR)
+    print(f"📦 {store.count()} predictions stored, latest target date: {store.latest_target_date()}")
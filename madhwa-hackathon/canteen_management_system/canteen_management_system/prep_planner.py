@@ -0,0 +1,183 @@
+"""
+PrepPlanner - Kitchen prep quantities from quantile forecasts
+
+Each portion prepared but not eaten costs its ingredients (waste cost); each
+employee who opted in but finds the item gone costs a missed meal (shortage
+cost). The newsvendor optimum is the demand quantile at the critical ratio
+
+    service_level = shortage_cost / (shortage_cost + waste_cost)
+
+read off the forecast's p10/p50/p90 (linear between them, normal tails
+beyond). The plan is solved for every item and day at once, and the recipe
+(bill of materials) table turns portions into ingredient quantities per day.
+
+Recipes CSV (Config.RECIPES_PATH; recipes.csv ships with the sample items),
+one row per item and ingredient:
+    menu_item_id,ingredient,unit,quantity_per_portion,cost_per_unit
+"""
+import os
+from statistics import NormalDist
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+from config import Config
+from train_agent import quantile_label
+
+_inv_cdf = np.vectorize(NormalDist().inv_cdf)
+
+
+def newsvendor_quantity(values: np.ndarray, levels: List[float], service_level: np.ndarray) -> np.ndarray:
+    """
+    Demand quantile at each row's service level
+    
+    Args:
+        values: Quantile forecasts, shape (rows, len(levels)), ascending per row
+        levels: Quantile levels of the columns, ascending
+        service_level: Target quantile per row, in (0, 1)
+    
+    Returns:
+        Array of quantities (one per row), clipped at zero
+    """
+    levels = np.asarray(levels, dtype=float)
+    values = np.asarray(values, dtype=float)
+    service_level = np.clip(np.asarray(service_level, dtype=float), 0.01, 0.99)
+    rows = np.arange(len(values))
+    
+    # Linear interpolation between the neighbouring forecast quantiles
+    idx = np.clip(np.searchsorted(levels, service_level, side='right') - 1, 0, len(levels) - 2)
+    weight = (service_level - levels[idx]) / (levels[idx + 1] - levels[idx])
+    quantity = values[rows, idx] + np.clip(weight, 0, 1) * (values[rows, idx + 1] - values[rows, idx])
+    
+    # Normal tails, scaled by the spread of the outermost quantiles
+    z_low, z_high = _inv_cdf(levels[0]), _inv_cdf(levels[-1])
+    sigma = (values[:, -1] - values[:, 0]) / (z_high - z_low)
+    z = _inv_cdf(service_level)
+    quantity = np.where(service_level > levels[-1], values[:, -1] + (z - z_high) * sigma, quantity)
+    quantity = np.where(service_level < levels[0], values[:, 0] - (z_low - z) * sigma, quantity)
+    return np.maximum(quantity, 0)
+
+
+class PrepPlanner:
+    """
+    Turns forecasts into prep quantities and ingredient requirements
+    
+    Usage:
+        planner = PrepPlanner()
+        plan = planner.plan(weekly_forecasts)
+        planner.ingredients(plan)
+    """
+    
+    def __init__(self, recipes_path: str = Config.RECIPES_PATH):
+        self.recipes_path = recipes_path
+        self._recipes = None
+        self._recipes_mtime = None
+    
+    def recipes_version(self) -> Optional[float]:
+        """Modification time of the recipes file (None if there is none)"""
+        return os.path.getmtime(self.recipes_path) if os.path.exists(self.recipes_path) else None
+    
+    def recipes(self) -> pd.DataFrame:
+        """Recipe table, re-read only when the file changes (empty if there is none)"""
+        mtime = self.recipes_version()
+        if mtime is None:
+            return pd.DataFrame(columns=['menu_item_id', 'ingredient', 'unit', 'quantity_per_portion', 'cost_per_unit'])
+        if mtime != self._recipes_mtime:
+            recipes = pd.read_csv(self.recipes_path)
+            if 'cost_per_unit' not in recipes.columns:
+                recipes['cost_per_unit'] = np.nan
+            recipes['menu_item_id'] = recipes['menu_item_id'].astype(int)
+            self._recipes, self._recipes_mtime = recipes, mtime
+        return self._recipes
+    
+    def item_costs(self, item_ids: np.ndarray, costs: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+        """
+        Waste and shortage cost per portion of each item
+        
+        Waste cost is the item's ingredient cost from the recipes, else
+        Config.PREP_WASTE_COST; shortage cost is Config.PREP_SHORTAGE_COST.
+        Rows of costs (menu_item_id, waste_cost and/or shortage_cost) override both.
+        """
+        items = pd.Index(np.unique(item_ids).astype(int), name='menu_item_id')
+        recipes = self.recipes()
+        ingredient_cost = (recipes['quantity_per_portion'] * recipes['cost_per_unit']) \
+            .groupby(recipes['menu_item_id']).sum(min_count=1)
+        table = pd.DataFrame({
+            'waste_cost': ingredient_cost.reindex(items).fillna(Config.PREP_WASTE_COST),
+            'shortage_cost': float(Config.PREP_SHORTAGE_COST)
+        }, index=items)
+        if costs is not None and not costs.empty:
+            given = costs.set_index(costs['menu_item_id'].astype(int))
+            for col in ['waste_cost', 'shortage_cost']:
+                if col in given.columns:
+                    table[col] = given[col].reindex(items).fillna(table[col])
+        return table
+    
+    def plan(self, forecasts: pd.DataFrame, costs: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+        """
+        Recommended prep quantity per item and day
+        
+        Args:
+            forecasts: Forecasts with date, menu_item_id, predicted_count and the
+                       quantile columns (p10, p50, p90)
+            costs: Optional per-item cost overrides (see item_costs)
+        
+        Returns:
+            DataFrame with the quantiles, waste_cost, shortage_cost,
+            service_level, prep_quantity and buffer (prep over the median)
+        """
+        if forecasts is None or forecasts.empty:
+            return pd.DataFrame()
+        levels = sorted(Config.FORECAST_QUANTILES)
+        labels = [quantile_label(q) for q in levels]
+        plan = forecasts[['date', 'menu_item_id', 'predicted_count']
+                         + [c for c in labels if c in forecasts.columns]].copy()
+        plan['date'] = pd.to_datetime(plan['date']).dt.strftime('%Y-%m-%d')
+        plan['menu_item_id'] = plan['menu_item_id'].astype(int)
+        for label in labels:
+            # Forecasts without quantiles plan on the point forecast
+            if label not in plan.columns:
+                plan[label] = plan['predicted_count']
+            plan[label] = plan[label].fillna(plan['predicted_count']).astype(float)
+        
+        item_costs = self.item_costs(plan['menu_item_id'].to_numpy(), costs).reindex(plan['menu_item_id'])
+        plan['waste_cost'] = item_costs['waste_cost'].to_numpy()
+        plan['shortage_cost'] = item_costs['shortage_cost'].to_numpy()
+        plan['service_level'] = (plan['shortage_cost'] / (plan['shortage_cost'] + plan['waste_cost'])).round(3)
+        
+        values = np.sort(plan[labels].to_numpy(), axis=1)
+        quantity = newsvendor_quantity(values, levels, plan['service_level'].to_numpy())
+        plan['prep_quantity'] = np.ceil(quantity.round(6)).astype(int)
+        median = plan[quantile_label(0.5)] if quantile_label(0.5) in labels else plan['predicted_count']
+        plan['buffer'] = (plan['prep_quantity'] - median).round(1)
+        return plan.sort_values(['date', 'menu_item_id']).reset_index(drop=True)
+    
+    def ingredients(self, plan: pd.DataFrame) -> pd.DataFrame:
+        """
+        Ingredient quantities needed per day for a prep plan
+        
+        Returns:
+            DataFrame with date, ingredient, unit, quantity, cost and the
+            number of items using the ingredient
+        """
+        recipes = self.recipes()
+        if plan.empty or recipes.empty:
+            return pd.DataFrame(columns=['date', 'ingredient', 'unit', 'quantity', 'cost', 'items'])
+        missing = set(plan['menu_item_id']) - set(recipes['menu_item_id'])
+        if missing:
+            print(f"⚠️ No recipe for {len(missing)} planned items")
+        
+        needs = plan[['date', 'menu_item_id', 'prep_quantity']].merge(recipes, on='menu_item_id')
+        needs['quantity'] = needs['prep_quantity'] * needs['quantity_per_portion']
+        needs['cost'] = needs['quantity'] * needs['cost_per_unit']
+        totals = needs.groupby(['date', 'ingredient', 'unit'], as_index=False).agg(
+            quantity=('quantity', 'sum'),
+            cost=('cost', 'sum'),
+            priced=('cost', 'count'),
+            items=('menu_item_id', 'nunique')
+        )
+        totals['quantity'] = totals['quantity'].round(3)
+        # Ingredients without a cost_per_unit have no cost rather than zero
+        totals['cost'] = totals['cost'].where(totals.pop('priced') > 0).round(2)
+        return totals
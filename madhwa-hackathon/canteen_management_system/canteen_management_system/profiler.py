@@ -0,0 +1,223 @@
+"""
+PipelineProfiler - Lightweight per-stage instrumentation for the CanteenAI pipeline
+
+Records wall time, rows processed, per-item time, counters (model loads,
+cache hits) and memory for each pipeline stage. Timing and counters cost a
+couple of perf_counter calls per item; traced peak memory is opt-in because
+tracemalloc slows Python code down.
+"""
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def _max_rss_mb() -> Optional[float]:
+    """Process high-water resident memory in MB (None where unsupported)"""
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS bytes
+    return max_rss / (1024 * 1024) if sys.platform == 'darwin' else max_rss / 1024
+
+
+class PipelineProfiler:
+    """
+    Collects stage timings for one pipeline run
+    
+    Usage:
+        profiler = PipelineProfiler()
+        with profiler.stage('train_model') as stage:
+            for item_id in items:
+                with profiler.item(item_id):
+                    ...
+            stage['rows'] = len(df)
+        profiler.report()
+    
+    A disabled profiler (NULL_PROFILER) makes every hook a no-op, so agents can
+    call it unconditionally.
+    """
+    
+    def __init__(self, enabled: bool = True, trace_memory: bool = False):
+        self.enabled = enabled
+        self.trace_memory = trace_memory
+        self.stages = {}
+        self.counters = {}
+        # Stages may run concurrently (see pipeline_dag.py): one stack per thread
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._tracing_stages = 0
+        self._owns_tracing = False
+        self._started = time.perf_counter()
+    
+    @property
+    def _stack(self) -> list:
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+    
+    @contextmanager
+    def stage(self, name: str) -> Iterator[Dict]:
+        """Time a pipeline stage; the yielded record accepts a 'rows' count"""
+        record = {'seconds': 0.0, 'rows': None, 'items': {}, 'counters': {},
+                  'peak_mb': None, 'max_rss_mb': None}
+        if not self.enabled:
+            yield record
+            return
+        
+        self.stages[name] = record
+        self._stack.append(record)
+        
+        if self.trace_memory:
+            # Peaks are process-wide, so concurrent stages share (and inflate) them
+            with self._lock:
+                if self._tracing_stages == 0 and not tracemalloc.is_tracing():
+                    tracemalloc.start()
+                    self._owns_tracing = True
+                else:
+                    tracemalloc.reset_peak()
+                self._tracing_stages += 1
+        
+        started = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record['seconds'] = time.perf_counter() - started
+            if self.trace_memory:
+                with self._lock:
+                    record['peak_mb'] = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+                    self._tracing_stages -= 1
+                    if self._tracing_stages == 0 and self._owns_tracing:
+                        tracemalloc.stop()
+                        self._owns_tracing = False
+            record['max_rss_mb'] = _max_rss_mb()
+            self._stack.pop()
+    
+    @contextmanager
+    def item(self, item_id) -> Iterator[None]:
+        """Add the enclosed wall time to this item's total in the current stage"""
+        if not self.enabled or not self._stack:
+            yield
+            return
+        
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_item_time(item_id, time.perf_counter() - started)
+    
+    def add_item_time(self, item_id, seconds: float):
+        """Add seconds to an item's total in the current stage"""
+        if not self.enabled or not self._stack:
+            return
+        items = self._stack[-1]['items']
+        items[item_id] = items.get(item_id, 0.0) + seconds
+    
+    def count(self, name: str, n: int = 1):
+        """Increment a counter, both overall and for the current stage"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+            if self._stack:
+                stage_counters = self._stack[-1]['counters']
+                stage_counters[name] = stage_counters.get(name, 0) + n
+    
+    def report(self, slowest: int = 5) -> Dict:
+        """
+        Summary of the run
+        
+        Args:
+            slowest: Number of slowest items listed per stage
+        
+        Returns:
+            Dict with total time, per-stage details and counters
+        """
+        stages = {}
+        for name, record in self.stages.items():
+            items = sorted(record['items'].items(), key=lambda kv: kv[1], reverse=True)
+            rows = record['rows']
+            stages[name] = {
+                'seconds': round(record['seconds'], 4),
+                'rows': rows,
+                'rows_per_second': round(rows / record['seconds'], 1) if rows and record['seconds'] > 0 else None,
+                'items': len(items),
+                'item_seconds': {str(k): round(v, 4) for k, v in record['items'].items()},
+                'slowest_items': [{'menu_item_id': int(k), 'seconds': round(v, 4)} for k, v in items[:slowest]],
+                'counters': dict(record['counters']),
+                'peak_mb': round(record['peak_mb'], 2) if record['peak_mb'] is not None else None,
+                'max_rss_mb': round(record['max_rss_mb'], 1) if record['max_rss_mb'] is not None else None
+            }
+        
+        hits = self.counters.get('model_cache_hits', 0)
+        loads = self.counters.get('model_loads', 0)
+        return {
+            'total_seconds': round(time.perf_counter() - self._started, 4),
+            'stages': stages,
+            'counters': dict(self.counters),
+            'model_cache_hit_rate': round(hits / (hits + loads), 3) if hits + loads else None
+        }
+    
+    def print_report(self):
+        """Print a per-stage timing table"""
+        report = self.report()
+        print("\n⏱️  Pipeline profile")
+        for name, stage in report['stages'].items():
+            rows = f" | {stage['rows']} rows" if stage['rows'] is not None else ""
+            peak = f" | peak {stage['peak_mb']:.1f} MB" if stage['peak_mb'] is not None else ""
+            print(f"   {name:<18} {stage['seconds']:8.3f}s{rows}{peak}")
+            if stage['slowest_items']:
+                slowest = ', '.join(f"{s['menu_item_id']} ({s['seconds']:.3f}s)" for s in stage['slowest_items'][:3])
+                print(f"      slowest items: {slowest}")
+        if report['model_cache_hit_rate'] is not None:
+            print(f"   Model cache hit rate: {report['model_cache_hit_rate']:.0%} "
+                  f"({report['counters'].get('model_loads', 0)} loads)")
+        print(f"   Total: {report['total_seconds']:.3f}s")
+
+
+# Shared no-op profiler used by agents outside a profiled run
+NULL_PROFILER = PipelineProfiler(enabled=False)
+
+
+def run_profiled(func: Callable, output_path: str):
+    """
+    Run func under a call profiler and write the output
+    
+    '.html' paths use pyinstrument when installed; anything else (or a missing
+    pyinstrument) writes cProfile stats, viewable with `python -m pstats`.
+    
+    Returns:
+        Result of func()
+    """
+    if output_path.endswith('.html'):
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            print("💡 pyinstrument not installed, writing cProfile stats instead")
+            output_path = output_path[:-len('.html')] + '.prof'
+        else:
+            profiler = Profiler()
+            profiler.start()
+            try:
+                return func()
+            finally:
+                profiler.stop()
+                with open(output_path, 'w') as f:
+                    f.write(profiler.output_html())
+                print(f"💾 Call profile saved to {output_path}")
+    
+    import cProfile
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(func)
+    finally:
+        profiler.dump_stats(output_path)
+        print(f"💾 Call profile saved to {output_path}")
@@ -0,0 +1,183 @@
+"""
+Recursive multi-day forecasting shared by training, serving and backtests
+
+The item models see recent demand through lag and rolling-mean features, so a
+forecast more than one day ahead feeds each day's prediction back in as the
+next day's history. roll_forward does that for many starting points (paths)
+at once with one predict call per day: serving rolls one path per item from
+the latest data date, and training replays every validation day as an origin
+to measure how the error grows with the horizon.
+
+Exogenous features (headcount, holiday, weather) are carried forward from each
+path's last observed row.
+"""
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from config import Config
+
+LAGS = Config.LAG_PERIODS
+ROLLING_WINDOWS = Config.ROLLING_WINDOWS
+# Trailing target values needed to build every lag and rolling feature
+MAX_LOOKBACK = max(LAGS + ROLLING_WINDOWS)
+
+
+def calendar_features(dates: pd.DatetimeIndex) -> Dict[str, np.ndarray]:
+    """Calendar feature values for each date (as built by DataAgent.prepare_features)"""
+    weekday = dates.weekday.to_numpy()
+    return {
+        'day_of_week': weekday,
+        'month': dates.month.to_numpy(),
+        'year': dates.year.to_numpy(),
+        'dow_sin': np.sin(2 * np.pi * weekday / 7),
+        'dow_cos': np.cos(2 * np.pi * weekday / 7)
+    }
+
+
+def item_windows(item_df: pd.DataFrame,
+                 features: List[str],
+                 positions: np.ndarray,
+                 target_col: str = 'confirmed_count') -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Starting state of a rollout from some rows of one item's history
+    
+    Args:
+        item_df: One item's rows, sorted by date
+        features: Model feature columns (missing ones are 0)
+        positions: Row positions of the origins (the last observed day of each path)
+        target_col: Target column
+    
+    Returns:
+        (templates, histories): the origin rows' feature values, NaN as 0,
+        shape (paths, features), and the MAX_LOOKBACK target values up to and
+        including each origin, oldest first and NaN-padded, shape (paths, MAX_LOOKBACK)
+    """
+    positions = np.asarray(positions, dtype=int)
+    values = item_df.reindex(columns=features).to_numpy(dtype=float)
+    templates = np.nan_to_num(values[positions], nan=0.0)
+    padded = np.concatenate([np.full(MAX_LOOKBACK, np.nan), item_df[target_col].to_numpy(dtype=float)])
+    histories = padded[positions[:, None] + 1 + np.arange(MAX_LOOKBACK)[None, :]]
+    return templates, histories
+
+
+def roll_forward(model,
+                 features: List[str],
+                 templates: np.ndarray,
+                 histories: np.ndarray,
+                 start_dates: pd.DatetimeIndex,
+                 steps: int,
+                 overrides: Optional[Dict[str, np.ndarray]] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Forecast every path 1..steps days past its start date
+    
+    Args:
+        model: Fitted point model
+        features: Model feature columns
+        templates, histories: Starting state per path (see item_windows)
+        start_dates: Last observed date of each path
+        steps: Days to forecast
+        overrides: Optional per-day feature values, {feature: array of shape (steps,) or (paths, steps)}
+    
+    Returns:
+        (predictions, rows): point forecasts clipped at zero, shape (paths, steps),
+        and the feature rows they were made from, shape (steps, paths, features)
+    """
+    column = {c: j for j, c in enumerate(features)}
+    paths = len(templates)
+    history = np.concatenate([histories, np.full((paths, steps), np.nan)], axis=1)
+    offset = histories.shape[1]
+    predictions = np.empty((paths, steps))
+    rows = np.empty((steps, paths, len(features)))
+    
+    for s in range(steps):
+        X = templates.copy()
+        for name, values in calendar_features(start_dates + pd.Timedelta(days=s + 1)).items():
+            if name in column:
+                X[:, column[name]] = values
+        past = history[:, :offset + s]
+        for lag in LAGS:
+            if f'lag_{lag}' in column:
+                X[:, column[f'lag_{lag}']] = np.nan_to_num(past[:, -lag], nan=0.0)
+        for window in ROLLING_WINDOWS:
+            if f'roll_{window}_mean' in column:
+                recent = past[:, -window:]
+                seen = (~np.isnan(recent)).sum(axis=1)
+                X[:, column[f'roll_{window}_mean']] = np.where(
+                    seen > 0, np.nansum(recent, axis=1) / np.maximum(seen, 1), 0.0)
+        for name, values in (overrides or {}).items():
+            if name in column:
+                values = np.asarray(values, dtype=float)
+                X[:, column[name]] = values[s] if values.ndim == 1 else values[:, s]
+        
+        predictions[:, s] = np.maximum(model.predict(pd.DataFrame(X, columns=features)), 0)
+        history[:, offset + s] = predictions[:, s]
+        rows[s] = X
+    
+    return predictions, rows
+
+
+def calibrate_horizons(model,
+                       features: List[str],
+                       item_df: pd.DataFrame,
+                       first_origin: int,
+                       steps: int,
+                       quantiles: List[float],
+                       target_col: str = 'confirmed_count') -> Tuple[Dict[float, np.ndarray], np.ndarray]:
+    """
+    Out-of-sample residual quantiles per horizon from validation rollouts
+    
+    Every row from first_origin on (the day before the validation window) is
+    used as an origin and rolled forward like a served forecast; residuals
+    (actual - forecast) are pooled per horizon. The band only widens with the
+    horizon: lower offsets never rise and upper offsets never fall.
+    
+    Args:
+        model: Point model, fitted without the validation rows
+        features: Model feature columns
+        item_df: The item's training and validation rows, sorted by date
+        first_origin: Position of the last training row
+        steps: Horizons to calibrate (1..steps days, fewer if the validation window is shorter)
+        quantiles: Quantile levels
+        target_col: Target column
+    
+    Returns:
+        ({quantile: offsets per horizon}, MAE per horizon)
+    """
+    actual = item_df[target_col].to_numpy(dtype=float)
+    positions = np.arange(first_origin, len(item_df) - 1)
+    # Each horizon needs at least one origin with an actual that far ahead
+    steps = max(1, min(steps, len(positions)))
+    templates, histories = item_windows(item_df, features, positions, target_col)
+    predicted, _ = roll_forward(model, features, templates, histories,
+                                pd.DatetimeIndex(item_df['date'].to_numpy()[positions]), steps)
+    
+    # residuals[p, h - 1] = actual on day origin + h - forecast, NaN past the data
+    targets = positions[:, None] + np.arange(1, steps + 1)[None, :]
+    residuals = np.where(targets < len(actual), actual[np.minimum(targets, len(actual) - 1)] - predicted, np.nan)
+    
+    offsets = {}
+    for q in quantiles:
+        by_horizon = np.nanquantile(residuals, q, axis=0)
+        if q < 0.5:
+            by_horizon = np.minimum.accumulate(by_horizon)
+        elif q > 0.5:
+            by_horizon = np.maximum.accumulate(by_horizon)
+        offsets[q] = by_horizon
+    return offsets, np.nanmean(np.abs(residuals), axis=0)
+
+
+def horizon_offsets(calibrated: Dict[float, np.ndarray], quantiles: List[float], horizons: np.ndarray) -> np.ndarray:
+    """
+    Calibrated offsets from the point forecast, shape (len(horizons), len(quantiles))
+    
+    Horizons past the calibrated ones widen the last offsets by sqrt(h / steps).
+    """
+    horizons = np.maximum(np.asarray(horizons, dtype=int), 1)
+    out = np.empty((len(horizons), len(quantiles)))
+    for j, q in enumerate(quantiles):
+        table = np.asarray(calibrated[q], dtype=float)
+        steps = len(table)
+        out[:, j] = table[np.minimum(horizons, steps) - 1] * np.sqrt(np.maximum(horizons, steps) / steps)
+    return out
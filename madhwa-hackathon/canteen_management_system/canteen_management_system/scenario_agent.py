@@ -0,0 +1,217 @@
+"""
+ScenarioAgent - What-if demand simulation with batched counterfactual predictions
+
+A scenario overrides some of the models' exogenous features (holiday, company
+event, weather, headcount) on every forecast day. The baseline is the served
+forecast: its feature rows for the next N days (PredictAgent.item_rollout, with
+lags rolled forward along the forecast) are built once per data and model
+version and cached. A request then stacks every scenario x day row of an item
+into one matrix, sets the override columns with numpy and makes a single
+predict call per item model, so dozens of scenarios cost about as much as one
+forecast.
+
+Headcount scales the forecast like the served one does (see
+HeadcountFeed.demand_scale): demand follows the on-site share of each day
+relative to the usual share. A scenario's wfh_share replaces the share from the
+working-mode selections and total_employees the headcount, so both change one
+on-site figure (scenario_onsite).
+
+Deltas are first-order: lags stay on the baseline path, so a rainy Monday does
+not change Tuesday's lag_1 feature.
+"""
+import itertools
+import threading
+from datetime import timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from config import Config
+from predict_agent import PredictAgent
+
+
+def expand_grid(grid: Dict[str, List]) -> List[Dict]:
+    """Cartesian product of override values, e.g. {'precipitation': [0, 12], 'wfh_share': [0, 0.3]}"""
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+
+
+class ScenarioAgent:
+    """
+    Agent responsible for what-if scenarios over the per-item models
+    
+    Usage:
+        agent = ScenarioAgent(predict_agent)
+        results = agent.simulate(history, grid={'precipitation': [0, 15], 'wfh_share': [0, 0.3]})
+        agent.summarize(results)
+    """
+    
+    def __init__(self, predict_agent: PredictAgent):
+        self.predict_agent = predict_agent
+        self._lock = threading.Lock()
+        # (data through, models fingerprint, days) -> {item_id: baseline arrays}
+        self._base_key = None
+        self._base = {}
+    
+    # ---------- Baseline ----------
+    
+    def baseline(self, df: pd.DataFrame, days: int, fingerprint: str = "") -> Dict[int, Dict]:
+        """
+        Each item's served forecast path for the next N days and its feature
+        rows, before headcount scaling (cached per data and model version)
+        
+        The rows come from PredictAgent.item_rollout, the same recursive
+        forecast the prediction endpoints serve.
+        
+        Args:
+            df: Feature history
+            days: Forecast horizon
+            fingerprint: Model directory fingerprint (changes when models are retrained)
+        
+        Returns:
+            {menu_item_id: {'model', 'features', 'rows', 'baseline', 'dates'}}
+        """
+        history = df.assign(date=pd.to_datetime(df['date']))
+        latest = history['date'].max()
+        key = (str(latest), fingerprint, days)
+        with self._lock:
+            if key == self._base_key:
+                return self._base
+        
+        dates = [str((latest + timedelta(days=offset)).date()) for offset in range(1, days + 1)]
+        base = {}
+        for item_id, item_df, bundle in self.predict_agent.modelled_items(history):
+            path, rows = self.predict_agent.item_rollout(item_df, bundle, latest, days)
+            base[item_id] = {'model': bundle['model'], 'features': bundle['features'],
+                             'rows': rows, 'baseline': path, 'dates': dates}
+        
+        with self._lock:
+            self._base_key, self._base = key, base
+        print(f"🧪 Scenario baseline: {len(base)} items x {days} days")
+        return base
+    
+    # ---------- Scenarios ----------
+    
+    def _override_matrix(self, scenarios: List[Dict]) -> Tuple[Dict[str, np.ndarray], np.ndarray, np.ndarray]:
+        """
+        Per-feature override values, headcount and home-working share, one
+        entry per scenario (NaN = keep the baseline's)
+        """
+        overrides = {name: np.full(len(scenarios), np.nan)
+                     for name in Config.SCENARIO_FEATURES if name != 'total_employees'}
+        employees = np.full(len(scenarios), np.nan)
+        home_share = np.full(len(scenarios), np.nan)
+        for s, scenario in enumerate(scenarios):
+            unknown = set(scenario) - set(Config.SCENARIO_FEATURES) - {'wfh_share'}
+            if unknown:
+                raise ValueError(f"Unknown scenario feature(s) {', '.join(sorted(unknown))} "
+                                 f"(use {', '.join(Config.SCENARIO_FEATURES)} or wfh_share)")
+            for name in overrides:
+                if name in scenario:
+                    overrides[name][s] = float(scenario[name])
+            if 'total_employees' in scenario:
+                employees[s] = max(float(scenario['total_employees']), 0)
+            if 'wfh_share' in scenario:
+                home_share[s] = float(np.clip(float(scenario['wfh_share']), 0, 1))
+        return overrides, employees, home_share
+    
+    def simulate(self,
+                 df: pd.DataFrame,
+                 scenarios: Optional[List[Dict]] = None,
+                 grid: Optional[Dict[str, List]] = None,
+                 days: int = 7,
+                 fingerprint: str = "") -> pd.DataFrame:
+        """
+        Demand under each scenario versus the baseline forecast
+        
+        The baseline is the served forecast: the recursive forecast path scaled
+        by the working-mode selections of each day. A scenario's wfh_share
+        replaces that day's on-site share and total_employees the headcount;
+        both move the same on-site figure, reported as scenario_onsite.
+        
+        Args:
+            df: Feature history
+            scenarios: Feature overrides, e.g. [{'precipitation': 15, 'wfh_share': 0.3}];
+                       keys from Config.SCENARIO_FEATURES plus wfh_share (share of
+                       the headcount working from home)
+            grid: Override values to combine into every scenario (see expand_grid);
+                  added after any explicit scenarios
+            days: Forecast horizon
+            fingerprint: Model directory fingerprint for the baseline cache
+        
+        Returns:
+            DataFrame with scenario, date, menu_item_id, baseline_count,
+            scenario_count, delta, baseline_onsite and scenario_onsite per
+            scenario x item x day
+        """
+        scenarios = list(scenarios or []) + (expand_grid(grid) if grid else [])
+        if not scenarios:
+            raise ValueError("No scenarios given")
+        if len(scenarios) > Config.SCENARIO_MAX_SCENARIOS:
+            raise ValueError(f"{len(scenarios)} scenarios exceeds the limit of {Config.SCENARIO_MAX_SCENARIOS}")
+        
+        # One cached baseline serves every horizon up to the forecast table's
+        base = self.baseline(df, max(days, Config.FORECAST_TABLE_DAYS), fingerprint)
+        if not base:
+            return pd.DataFrame()
+        overrides, employees, home_share = self._override_matrix(scenarios)
+        
+        # Headcount per scenario x day, scaled like PredictAgent.forecast:
+        # demand follows the on-site share relative to the usual share
+        dates = next(iter(base.values()))['dates'][:days]
+        history = df.assign(date=pd.to_datetime(df['date']))
+        shares, usual, total = self.predict_agent.onsite_shares(history, dates)
+        scenario_total = np.where(np.isnan(employees), total, employees)
+        scenario_share = np.where(np.isnan(home_share)[:, None], shares[None, :], 1 - home_share[:, None])
+        headcount_ratio = scenario_total / total if total > 0 else np.ones(len(scenarios))
+        scale = (headcount_ratio[:, None] * scenario_share / usual).ravel()
+        baseline_scale = shares / usual
+        
+        n_scenarios = len(scenarios)
+        frames = []
+        for item_id, entry in base.items():
+            features, rows = entry['features'], entry['rows'][:days]
+            # scenario-major stack: rows s * days .. (s + 1) * days - 1 belong to scenario s
+            X = np.tile(rows, (n_scenarios, 1))
+            for name, values in overrides.items():
+                if name in features and not np.isnan(values).all():
+                    j = features.index(name)
+                    per_row = np.repeat(values, len(rows))
+                    X[:, j] = np.where(np.isnan(per_row), X[:, j], per_row)
+            predicted = np.maximum(entry['model'].predict(pd.DataFrame(X, columns=features)), 0) * scale
+            
+            baseline = np.tile(entry['baseline'][:days] * baseline_scale, n_scenarios)
+            frames.append(pd.DataFrame({
+                'scenario': np.repeat(np.arange(n_scenarios), len(rows)),
+                'date': np.tile(dates, n_scenarios),
+                'menu_item_id': item_id,
+                'baseline_count': np.round(baseline, 1),
+                'scenario_count': np.round(predicted, 1),
+                'baseline_onsite': np.round(np.tile(total * shares, n_scenarios), 1),
+                'scenario_onsite': np.round((scenario_total[:, None] * scenario_share).ravel(), 1)
+            }))
+        
+        results = pd.concat(frames, ignore_index=True)
+        results['delta'] = (results['scenario_count'] - results['baseline_count']).round(1)
+        results.attrs['scenarios'] = scenarios
+        return results
+    
+    def summarize(self, results: pd.DataFrame, by: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Total demand per scenario (and by columns, e.g. ['date'])
+        
+        Returns:
+            DataFrame with the scenario's overrides, baseline_count,
+            scenario_count, delta and delta_pct
+        """
+        if results.empty:
+            return results
+        totals = results.groupby(['scenario'] + list(by or []), as_index=False)[
+            ['baseline_count', 'scenario_count', 'delta']].sum().round(1)
+        totals['delta_pct'] = np.round(100 * totals['delta'] / totals['baseline_count'].where(
+            totals['baseline_count'] > 0), 1)
+        scenarios = results.attrs.get('scenarios')
+        if scenarios:
+            totals.insert(1, 'overrides', totals['scenario'].map(lambda s: scenarios[s]))
+        return totals
@@ -0,0 +1,299 @@
+"""
+CanteenScheduler - Long-running sync / retrain / forecast daemon
+
+Runs in one process next to (or instead of) the API:
+- syncs data every Config.SCHEDULER_SYNC_INTERVAL_MINUTES (plus jitter),
+- retrains when Config.RETRAIN_* thresholds trip, counting rows newer than
+  the data the current models were trained on,
+- materializes the forecast table (forecast_table.py) Config.FORECAST_LEAD_MINUTES
+  before the meal-selection deadline (Firestore settings/deadline, as set in
+  the admin dashboard, else Config.MEAL_SELECTION_DEADLINE).
+
+State is persisted to Config.SCHEDULER_STATE_PATH so a restarted daemon
+neither retrains nor re-forecasts needlessly, and a lock file keeps two
+daemons from running the same jobs.
+"""
+import json
+import os
+import random
+import signal
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+import pandas as pd
+
+from config import Config
+from firebase_config import FirebaseConfig, FirebaseCollections
+
+
+def _parse_time(value) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
+
+class SchedulerLock:
+    """
+    Exclusive lock file holding the owner's pid
+    
+    A lock left behind by a process that is no longer running is taken over.
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        self.acquired = False
+    
+    def acquire(self) -> bool:
+        for _ in range(2):
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                if self._owner_alive():
+                    return False
+                # Stale lock from a crashed daemon
+                try:
+                    os.remove(self.path)
+                except FileNotFoundError:
+                    pass
+                continue
+            with os.fdopen(fd, 'w') as f:
+                f.write(str(os.getpid()))
+            self.acquired = True
+            return True
+        return False
+    
+    def _owner_alive(self) -> bool:
+        try:
+            with open(self.path) as f:
+                pid = int(f.read().strip() or 0)
+        except (FileNotFoundError, ValueError):
+            return False
+        if pid <= 0:
+            return False
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        except OSError:
+            # os.kill(pid, 0) is not a liveness probe on Windows
+            return True
+        return True
+    
+    def release(self):
+        if self.acquired:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+            self.acquired = False
+
+
+class CanteenScheduler:
+    """
+    Periodic sync, threshold-based retraining and pre-deadline forecasting
+    
+    Usage:
+        scheduler = CanteenScheduler(CanteenAI())
+        scheduler.run_forever()      # or scheduler.run_once() from a cron job
+    """
+    
+    def __init__(self,
+                 ai,
+                 sync_interval_minutes: int = Config.SCHEDULER_SYNC_INTERVAL_MINUTES,
+                 jitter_seconds: int = Config.SCHEDULER_JITTER_SECONDS,
+                 forecast_days: int = Config.DEFAULT_FORECAST_DAYS,
+                 state_path: str = Config.SCHEDULER_STATE_PATH):
+        self.ai = ai
+        self.sync_interval = timedelta(minutes=sync_interval_minutes)
+        self.jitter_seconds = jitter_seconds
+        self.forecast_days = forecast_days
+        self.state_path = state_path
+        directory = os.path.dirname(state_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.lock = SchedulerLock(state_path + ".lock")
+        self.state = self._load_state()
+        self._stop = threading.Event()
+        self._next_sync = None
+        
+        # Carry the persisted training time over into the retrain check
+        if self.state['last_training'] and ai.last_training_date is None:
+            ai.last_training_date = _parse_time(self.state['last_training'])
+    
+    # ---------- State ----------
+    
+    def _load_state(self) -> Dict:
+        state = {
+            'last_sync': None,
+            'last_training': None,
+            'trained_through': None,
+            'last_forecast_for': None,
+            'last_forecast_at': None,
+            'last_error': None
+        }
+        if os.path.exists(self.state_path):
+            with open(self.state_path) as f:
+                state.update(json.load(f))
+        return state
+    
+    def _save_state(self):
+        """Write state atomically so a crash never leaves a torn file"""
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp_path, self.state_path)
+    
+    # ---------- Timing ----------
+    
+    def meal_selection_deadline(self, day: Optional[datetime] = None) -> datetime:
+        """Today's (or day's) meal-selection deadline in local time"""
+        day = day or datetime.now()
+        hour, minute = (int(p) for p in Config.MEAL_SELECTION_DEADLINE.split(':'))
+        
+        db = FirebaseConfig.get_db()
+        if db:
+            try:
+                doc = db.collection(FirebaseCollections.SETTINGS).document('deadline').get()
+                if doc.exists:
+                    settings = doc.to_dict()
+                    hour = int(settings.get('deadlineHour', hour))
+                    minute = int(settings.get('deadlineMinute', minute))
+            except Exception as e:
+                print(f"⚠️ Could not read deadline setting, using {hour:02d}:{minute:02d}: {e}")
+        
+        return day.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    
+    def _jitter(self) -> timedelta:
+        return timedelta(seconds=random.uniform(0, self.jitter_seconds)) if self.jitter_seconds else timedelta(0)
+    
+    def next_forecast_time(self, now: datetime) -> datetime:
+        """When forecasts for the current deadline are due (lead time before it)"""
+        return self.meal_selection_deadline(now) - timedelta(minutes=Config.FORECAST_LEAD_MINUTES)
+    
+    def forecasts_due(self, now: datetime) -> bool:
+        """True once inside the lead window and today's forecasts are not yet made"""
+        return now >= self.next_forecast_time(now) and self.state['last_forecast_for'] != now.date().isoformat()
+    
+    # ---------- Jobs ----------
+    
+    def count_new_records(self, df: pd.DataFrame) -> int:
+        """Rows dated after the data the current models were trained on"""
+        trained_through = self.state['trained_through']
+        if trained_through is None:
+            return len(df)
+        return int((pd.to_datetime(df['date']) > pd.to_datetime(trained_through)).sum())
+    
+    def sync(self) -> Dict:
+        """Incremental sync; retrains if the thresholds trip"""
+        print(f"\n⏰ [{datetime.now():%Y-%m-%d %H:%M}] Scheduled sync")
+        df = self.ai.update_data()
+        sync = self.ai.data_agent.sync_status
+        self.state['last_sync'] = datetime.now().isoformat()
+        
+        if df.empty:
+            self._save_state()
+            return {'records': 0, 'retrained': False, 'sync': sync}
+        
+        new_records = self.count_new_records(df)
+        models_exist = os.path.isdir(self.ai.predict_agent.model_dir) and any(
+            f.startswith("lgb_item_") for f in os.listdir(self.ai.predict_agent.model_dir))
+        
+        results = self.ai.train_model(force=not models_exist, new_records_count=new_records)
+        retrained = bool(results.get('models_trained'))
+        if retrained:
+            self.state['last_training'] = self.ai.last_training_date.isoformat()
+            self.state['trained_through'] = str(pd.to_datetime(df['date']).max().date())
+        
+        self._save_state()
+        print(f"✅ Sync done: {len(df)} records, {new_records} new, retrained: {retrained}")
+        return {'records': len(df), 'new_records': new_records, 'retrained': retrained, 'sync': sync}
+    
+    def precompute_forecasts(self) -> Dict:
+        """Materialize the next forecast_days of forecasts before the deadline"""
+        print(f"\n⏰ [{datetime.now():%Y-%m-%d %H:%M}] Precomputing forecasts")
+        self.ai.ensure_data()
+        materialized = self.ai.materialize_forecasts(days=self.forecast_days)
+        
+        self.state['last_forecast_for'] = datetime.now().date().isoformat()
+        self.state['last_forecast_at'] = datetime.now().isoformat()
+        self._save_state()
+        print(f"✅ Forecasts ready: {materialized} for the next {self.forecast_days} days")
+        return {'materialized': materialized, 'days': self.forecast_days}
+    
+    def run_pending(self, now: Optional[datetime] = None) -> Dict:
+        """
+        Run every job that is due, one after another
+        
+        Returns:
+            Dict of job name to result for the jobs that ran
+        """
+        now = now or datetime.now()
+        ran = {}
+        
+        try:
+            last_sync = _parse_time(self.state['last_sync'])
+            if self._next_sync is None:
+                self._next_sync = (last_sync + self.sync_interval) if last_sync else now
+            if now >= self._next_sync:
+                ran['sync'] = self.sync()
+                self._next_sync = now + self.sync_interval + self._jitter()
+            
+            if self.forecasts_due(now):
+                ran['forecast'] = self.precompute_forecasts()
+            self.state['last_error'] = None
+        except Exception as e:
+            print(f"❌ Scheduled job failed: {e}")
+            self.state['last_error'] = f"{datetime.now().isoformat()}: {e}"
+            self._save_state()
+            # Try again after the normal interval rather than in a tight loop
+            self._next_sync = now + self.sync_interval + self._jitter()
+        
+        return ran
+    
+    def seconds_until_next_job(self, now: Optional[datetime] = None) -> float:
+        now = now or datetime.now()
+        candidates = [self._next_sync] if self._next_sync else []
+        forecast_at = self.next_forecast_time(now)
+        if self.state['last_forecast_for'] == now.date().isoformat() or now >= forecast_at:
+            forecast_at = self.next_forecast_time(now + timedelta(days=1))
+        candidates.append(forecast_at + self._jitter())
+        return max(1.0, (min(candidates) - now).total_seconds())
+    
+    def run_once(self) -> Dict:
+        """Run due jobs once under the lock (for cron); skipped if a daemon is running"""
+        if not self.lock.acquire():
+            print(f"⏭️ Another scheduler is running (lock: {self.lock.path})")
+            return {}
+        try:
+            return self.run_pending()
+        finally:
+            self.lock.release()
+    
+    def stop(self, *_):
+        self._stop.set()
+    
+    def run_forever(self):
+        """Run jobs until SIGINT/SIGTERM; refuses to start if another daemon holds the lock"""
+        if not self.lock.acquire():
+            print(f"❌ Another scheduler is running (lock: {self.lock.path})")
+            return
+        
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGINT, self.stop)
+            signal.signal(signal.SIGTERM, self.stop)
+        
+        print("\n" + "=" * 60)
+        print(f"🗓️ CanteenAI scheduler: sync every {self.sync_interval}, "
+              f"forecasts {Config.FORECAST_LEAD_MINUTES} min before the {self.meal_selection_deadline():%H:%M} deadline")
+        print("=" * 60)
+        
+        try:
+            while not self._stop.is_set():
+                self.run_pending()
+                wait = self.seconds_until_next_job()
+                print(f"💤 Next job in {wait / 60:.1f} min")
+                self._stop.wait(wait)
+        finally:
+            self.lock.release()
+            print("👋 Scheduler stopped")
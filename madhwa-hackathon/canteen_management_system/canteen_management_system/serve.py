@@ -0,0 +1,118 @@
+"""
+CanteenAI - Production Server
+Runs an API app in several worker processes that share one read-only snapshot
+
+Usage:
+    python serve.py --app app_with_cors --workers 4 --port 5000
+
+The feature table and models are published once as a memory-mapped snapshot
+(see snapshot_store.py); every worker maps it instead of loading its own copy.
+Retraining from any worker publishes a new snapshot and all workers switch to
+it on their next request. RFID taps are deduped and counted in each site's
+shared tap store, so a retried tap is rejected whichever worker receives it.
+
+Several worker processes need gunicorn; without it the app is served by one
+threaded Werkzeug process.
+"""
+import argparse
+import importlib
+import os
+import sys
+
+
+def ensure_snapshot():
+    """Publish an initial snapshot for every site so workers never load data themselves"""
+    from snapshot_store import SnapshotStore
+    from canteen_ai import CanteenAI
+    from config import Config
+    from sites import SitePartition, list_sites
+    
+    site_ids = list_sites()
+    # The apps always serve the default site, even before it has local data
+    if Config.DEFAULT_SITE_ID not in site_ids:
+        site_ids.insert(0, Config.DEFAULT_SITE_ID)
+    
+    for site_id in site_ids:
+        site = SitePartition(site_id)
+        store = SnapshotStore(site.snapshot_dir)
+        if store.current_version() is not None:
+            print(f"📸 Site {site_id}: using snapshot {store.current_version()}")
+            continue
+        
+        print(f"📸 Site {site_id}: no snapshot found, building one...")
+        df = CanteenAI(site_id=site_id).update_data()
+        if df.empty:
+            print(f"⚠️ Site {site_id}: no data available; workers will start without a snapshot")
+            continue
+        store.publish(df, site.model_dir)
+
+
+def run_gunicorn(app_module: str, host: str, port: int, workers: int, threads: int) -> bool:
+    """Serve with gunicorn (optional dependency). Returns False if unavailable."""
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        return False
+    
+    class CanteenAIApplication(BaseApplication):
+        def load_config(self):
+            self.cfg.set('bind', f"{host}:{port}")
+            self.cfg.set('workers', workers)
+            self.cfg.set('threads', threads)
+            # Each worker imports the app itself and maps the snapshot after fork
+            self.cfg.set('preload_app', False)
+        
+        def load(self):
+            return importlib.import_module(app_module).app
+    
+    CanteenAIApplication().run()
+    return True
+
+
+def run_werkzeug(app_module: str, host: str, port: int, workers: int):
+    """
+    Fallback: one threaded Werkzeug process
+    
+    Werkzeug's processes=N forks a child per request, which would drop the
+    model cache, metrics and snapshot refresh with every response.
+    """
+    from werkzeug.serving import run_simple
+    
+    if workers > 1:
+        print(f"⚠️ {workers} worker processes need gunicorn (pip install gunicorn); "
+              "serving with one threaded process instead")
+    app = importlib.import_module(app_module).app
+    run_simple(host, port, app, threaded=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='CanteenAI multi-worker server')
+    parser.add_argument('--app', type=str, default='app_with_cors',
+                        choices=['app', 'app_with_cors', 'simple_app'],
+                        help='Flask app module to serve')
+    parser.add_argument('--host', type=str, default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 2,
+                        help='Worker processes')
+    parser.add_argument('--threads', type=int, default=2,
+                        help='Threads per worker (gunicorn only)')
+    args = parser.parse_args()
+    
+    # Must be set before the app (and config) are imported by the workers
+    os.environ['CANTEENAI_SERVE_FROM_SNAPSHOT'] = '1'
+    from config import Config
+    Config.SERVE_FROM_SNAPSHOT = True
+    
+    ensure_snapshot()
+    
+    print("\n" + "=" * 60)
+    print(f"🚀 Serving {args.app} on http://{args.host}:{args.port} with {args.workers} workers")
+    print("=" * 60 + "\n")
+    
+    if not run_gunicorn(args.app, args.host, args.port, args.workers, args.threads):
+        print("💡 gunicorn not installed, using Werkzeug's development server")
+        run_werkzeug(args.app, args.host, args.port, args.workers)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
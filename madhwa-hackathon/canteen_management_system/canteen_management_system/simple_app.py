@@ -9,23 +9,26 @@ import pandas as pd
 app = Flask(__name__)
 ai = CanteenAI()
 
-# Load data on startup
-print("Loading data...")
-ai.update_data()
-print("Data loaded successfully!")
+# Load data in the background so the server starts accepting requests immediately
+ai.warm_up(background=True)
 
 @app.route('/')
 def index():
     return render_template('simple.html')
 
+@app.route('/api/ready')
+def ready():
+    """Readiness probe: 200 once data is loaded, 503 while warming up"""
+    state = ai.readiness()
+    return jsonify(state), (200 if state['ready'] else 503)
+
 @app.route('/api/predict-next-day', methods=['POST'])
 def predict_next_day():
     try:
         # Ensure data is loaded
-        if ai.data_cache is None or ai.data_cache.empty:
-            ai.update_data()
+        ai.ensure_data()
         
-        predictions = ai.predict_next_day()
+        predictions = ai.forecast_next_day()
         
         if predictions.empty:
             return jsonify({'success': False, 'message': 'No predictions generated. Please train models first.'}), 400
@@ -46,10 +49,9 @@ def predict_next_day():
 def predict_weekly():
     try:
         # Ensure data is loaded
-        if ai.data_cache is None or ai.data_cache.empty:
-            ai.update_data()
+        ai.ensure_data()
         
-        predictions = ai.predict_next_week(days=7)
+        predictions = ai.forecast_week(days=7)
         
         if predictions.empty:
             return jsonify({'success': False, 'message': 'No predictions generated. Please train models first.'}), 400
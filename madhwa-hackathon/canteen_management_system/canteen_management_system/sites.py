@@ -0,0 +1,298 @@
+"""
+Multi-site partitioning - one storage partition and model namespace per canteen
+
+Every site has its own history, processed features, models, prediction
+store, forecast table and tap store under Config.SITES_DIR/<site_id>/, and
+its own Firestore collections under sites/<site_id>/. Each site's pipeline
+therefore scales with that site's items only. The default site
+(Config.DEFAULT_SITE_ID) keeps the original single-canteen layout, so an
+existing deployment is simply the default site.
+
+SiteRegistry holds one CanteenAI per site, trains sites in parallel worker
+processes and answers cross-site queries by combining the per-site results.
+
+Usage:
+    python sites.py --partition all_sites.csv        # split a flat table by site_id
+    python sites.py --train                          # train every site in parallel
+    python sites.py --aggregate --days 7 --by item_category
+"""
+import argparse
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from config import Config
+from firebase_config import FirebaseCollections
+
+
+class SitePartition:
+    """Where one site's data, models and forecasts live"""
+    
+    def __init__(self, site_id: Optional[str] = None):
+        self.site_id = str(site_id or Config.DEFAULT_SITE_ID)
+        self.is_default = self.site_id == Config.DEFAULT_SITE_ID
+        self.root = "" if self.is_default else os.path.join(Config.SITES_DIR, self.site_id)
+        
+        self.local_csv = self._path(Config.LOCAL_CSV_PATH)
+        self.processed_csv = self._path(Config.PROCESSED_CSV_PATH)
+        self.model_dir = self._path(Config.MODEL_DIR)
+        self.hierarchy_model_path = self._path(Config.HIERARCHY_MODEL_PATH)
+        self.prediction_store_path = self._path(Config.PREDICTION_STORE_PATH)
+        self.forecast_table_path = self._path(Config.FORECAST_TABLE_PATH)
+        self.tap_store_path = self._path(Config.TAP_STORE_PATH)
+        self.headcount_store_path = self._path(Config.HEADCOUNT_STORE_PATH)
+        self.sync_checkpoint_dir = self._path(Config.SYNC_CHECKPOINT_DIR)
+        self.pipeline_cache_dir = self._path(Config.PIPELINE_CACHE_DIR)
+        self.snapshot_dir = self._path(Config.SNAPSHOT_DIR)
+        
+        if self.root:
+            os.makedirs(self.root, exist_ok=True)
+    
+    def _path(self, path: str) -> str:
+        return os.path.join(self.root, path) if self.root else path
+    
+    def collection(self, name: str) -> str:
+        """Firestore collection path of this site"""
+        return FirebaseCollections.for_site(name, self.site_id)
+    
+    def __repr__(self) -> str:
+        return f"SitePartition({self.site_id!r})"
+
+
+def list_sites() -> List[str]:
+    """Sites with a partition on disk; the default site if it has local data"""
+    sites = []
+    if os.path.exists(Config.LOCAL_CSV_PATH) or os.path.isdir(Config.MODEL_DIR):
+        sites.append(Config.DEFAULT_SITE_ID)
+    if os.path.isdir(Config.SITES_DIR):
+        sites += sorted(d for d in os.listdir(Config.SITES_DIR)
+                        if os.path.isdir(os.path.join(Config.SITES_DIR, d)) and d != Config.DEFAULT_SITE_ID)
+    return sites
+
+
+def partition_history(df: pd.DataFrame, source_path: Optional[str] = None) -> Dict[str, int]:
+    """
+    Split a flat multi-site table into per-site history files
+    
+    Every site's rows go to its own partition's history file; the default
+    site's is Config.LOCAL_CSV_PATH. The table df was read from is never
+    overwritten.
+    
+    Args:
+        df: History with a site_id column (rows without one go to the default site)
+        source_path: File df was read from
+    
+    Returns:
+        {site_id: rows written}
+    
+    Raises:
+        ValueError: source_path is a site's history file and holds other sites' rows
+    """
+    site_ids = df['site_id'].fillna(Config.DEFAULT_SITE_ID).astype(str) \
+        if 'site_id' in df.columns else pd.Series(Config.DEFAULT_SITE_ID, index=df.index)
+    groups = dict(tuple(df.groupby(site_ids, sort=True)))
+    
+    # Checked before anything is written, so a refused split writes no file
+    source = os.path.abspath(source_path) if source_path else None
+    targets = {site_id: SitePartition(site_id).local_csv for site_id in groups}
+    clashes = [site_id for site_id, path in targets.items() if os.path.abspath(path) == source]
+    if clashes and len(groups) > 1:
+        raise ValueError(f"{source_path} is the history file of site {clashes[0]}; "
+                         f"move it (e.g. to all_sites.csv) before partitioning")
+    
+    written = {}
+    for site_id, rows in groups.items():
+        path = targets[site_id]
+        if site_id in clashes:
+            print(f"📦 Site {site_id}: {len(rows)} rows already in {path}")
+            written[site_id] = 0
+            continue
+        # Write then rename, so an interrupted split never leaves a partial history
+        tmp_path = path + ".tmp"
+        rows.to_csv(tmp_path, index=False)
+        os.replace(tmp_path, path)
+        written[site_id] = len(rows)
+        print(f"📦 Site {site_id}: {len(rows)} rows → {path}")
+    return written
+
+
+def _train_site(site_id: str, n_jobs: int) -> Dict:
+    """Worker process: sync and train one site"""
+    from canteen_ai import CanteenAI
+    
+    ai = CanteenAI(site_id=site_id)
+    ai.train_agent.n_jobs = n_jobs
+    ai.update_data()
+    results = ai.train_model(force=True)
+    return {
+        'site_id': site_id,
+        'models_trained': results.get('models_trained', 0),
+        'avg_mae': float(results['avg_mae']) if results.get('avg_mae') is not None else None,
+        'error': results.get('error')
+    }
+
+
+class SiteRegistry:
+    """
+    One CanteenAI per site, created on first use
+    
+    Usage:
+        sites = SiteRegistry()
+        sites.site("campus-b").forecast_week(7)
+        sites.train_all()
+        sites.aggregate_forecasts(days=7, by=['item_category'])
+    """
+    
+    def __init__(self, site_ids: Optional[List[str]] = None):
+        self.site_ids = list(site_ids) if site_ids is not None else list_sites()
+        self._sites = {}
+        self._lock = threading.Lock()
+    
+    def attach(self, ai) -> None:
+        """Serve ai's site with an existing CanteenAI (e.g. the web app's)"""
+        with self._lock:
+            self._sites[ai.site.site_id] = ai
+            if ai.site.site_id not in self.site_ids:
+                self.site_ids.append(ai.site.site_id)
+    
+    def site(self, site_id: str):
+        """CanteenAI for one site"""
+        from canteen_ai import CanteenAI
+        
+        site_id = str(site_id)
+        with self._lock:
+            if site_id not in self._sites:
+                self._sites[site_id] = CanteenAI(site_id=site_id)
+                if site_id not in self.site_ids:
+                    self.site_ids.append(site_id)
+            return self._sites[site_id]
+    
+    def train_all(self, max_workers: Optional[int] = Config.SITE_TRAIN_MAX_WORKERS) -> pd.DataFrame:
+        """
+        Sync and train every site, one worker process per site
+        
+        Args:
+            max_workers: Worker processes (None = one per site up to the CPU
+                         count, 1 = in this process)
+        
+        Returns:
+            DataFrame with models_trained and avg_mae per site
+        """
+        if not self.site_ids:
+            return pd.DataFrame()
+        workers = max_workers or min(len(self.site_ids), os.cpu_count() or 1)
+        # Share the CPUs between the sites instead of oversubscribing them
+        n_jobs = max(1, (os.cpu_count() or 1) // workers)
+        print(f"\n🏭 Training {len(self.site_ids)} sites with {workers} workers")
+        
+        if workers == 1:
+            results = [_train_site(site_id, n_jobs) for site_id in self.site_ids]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(_train_site, site_id, n_jobs) for site_id in self.site_ids]
+                results = [f.result() for f in futures]
+        
+        # Models on disk changed under any already loaded site
+        with self._lock:
+            for ai in self._sites.values():
+                ai.predict_agent.clear_model_cache()
+                ai.models_fingerprint(refresh=True)
+        return pd.DataFrame(results)
+    
+    def _gather(self, func) -> pd.DataFrame:
+        """Apply func(ai) to every site concurrently and stack the results with a site_id column"""
+        def _one(site_id):
+            frame = func(self.site(site_id))
+            return frame.assign(site_id=site_id) if frame is not None and not frame.empty else None
+        
+        with ThreadPoolExecutor(max_workers=max(1, min(len(self.site_ids), 8))) as pool:
+            frames = [f for f in pool.map(_one, list(self.site_ids)) if f is not None]
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    
+    def aggregate_forecasts(self, days: int = 7, by: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Cross-site demand forecast totals
+        
+        Args:
+            days: Days ahead (each site serves them from its forecast table)
+            by: Extra grouping columns besides date, e.g. ['site_id'] or ['item_category']
+        
+        Returns:
+            DataFrame with predicted_count, items and sites per group
+        """
+        def _forecast(ai):
+            ai.ensure_data()
+            return ai.forecast_week(days)
+        
+        forecasts = self._gather(_forecast)
+        if forecasts.empty:
+            return forecasts
+        if 'item_category' not in forecasts.columns and 'item_category' in (by or []):
+            categories = self._gather(lambda ai: ai.history()[['menu_item_id', 'item_category']]
+                                      .drop_duplicates('menu_item_id', keep='last'))
+            categories['menu_item_id'] = categories['menu_item_id'].astype(forecasts['menu_item_id'].dtype)
+            forecasts = forecasts.merge(categories, on=['site_id', 'menu_item_id'], how='left')
+        forecasts['date'] = pd.to_datetime(forecasts['date']).dt.strftime('%Y-%m-%d')
+        return forecasts.groupby(['date'] + list(by or []), as_index=False).agg(
+            predicted_count=('predicted_count', 'sum'),
+            items=('menu_item_id', 'count'),
+            sites=('site_id', 'nunique')
+        )
+    
+    def aggregate_history(self, start_date: str, end_date: str, by: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Cross-site confirmed meal totals over a date range
+        
+        Returns:
+            DataFrame with confirmed_count, items and sites per date (and by columns)
+        """
+        def _window(ai):
+            ai.ensure_data()
+            history = ai.history()
+            if history is None or history.empty:
+                return None
+            dates = pd.to_datetime(history['date']).dt.strftime('%Y-%m-%d')
+            return history[(dates >= start_date) & (dates <= end_date)].assign(date=dates)
+        
+        history = self._gather(_window)
+        if history.empty:
+            return history
+        return history.groupby(['date'] + list(by or []), as_index=False).agg(
+            confirmed_count=(Config.TARGET_COLUMN, 'sum'),
+            items=('menu_item_id', 'count'),
+            sites=('site_id', 'nunique')
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='CanteenAI multi-site management')
+    parser.add_argument('--partition', type=str, default=None,
+                        help='Split this flat CSV (with a site_id column) into per-site partitions')
+    parser.add_argument('--train', action='store_true', help='Train every site in parallel')
+    parser.add_argument('--workers', type=int, default=Config.SITE_TRAIN_MAX_WORKERS,
+                        help='Worker processes for --train')
+    parser.add_argument('--aggregate', action='store_true', help='Print cross-site forecast totals')
+    parser.add_argument('--days', type=int, default=7, help='Days for --aggregate')
+    parser.add_argument('--by', type=str, default='', help='Comma-separated grouping for --aggregate')
+    args = parser.parse_args()
+    
+    if args.partition:
+        try:
+            partition_history(pd.read_csv(args.partition), source_path=args.partition)
+        except ValueError as e:
+            print(f"❌ {e}")
+            return
+    registry = SiteRegistry()
+    print(f"🏢 Sites: {', '.join(registry.site_ids) or 'none'}")
+    if args.train:
+        print(registry.train_all(max_workers=args.workers))
+    if args.aggregate:
+        by = [c.strip() for c in args.by.split(',') if c.strip()]
+        print(registry.aggregate_forecasts(days=args.days, by=by))
+
+
+if __name__ == "__main__":
+    main()
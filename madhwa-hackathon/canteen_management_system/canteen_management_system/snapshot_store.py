@@ -0,0 +1,282 @@
+"""
+SnapshotStore - Read-only, memory-mapped snapshots of the feature table and models
+
+A snapshot is a directory holding one .npy file per feature column plus a copy
+of the model bundles. Worker processes memory-map the columns, so the feature
+table lives once in the OS page cache instead of once per worker. Publishing a
+new snapshot is atomic: it is written to a temporary directory, renamed into
+place, and only then is the CURRENT pointer swapped.
+
+Workers switch to a new snapshot on their next request and load its models
+lazily, so old snapshots are only pruned once no live process has one open:
+every process records the version it opened in .leases/<pid>.
+"""
+import pandas as pd
+import numpy as np
+import json
+import os
+import shutil
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+from config import Config
+
+
+def _process_alive(pid: int) -> bool:
+    """True if pid is running (always True where it cannot be checked cheaply)"""
+    if os.name != 'posix':
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class Snapshot:
+    """One published, immutable snapshot opened for reading"""
+    
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        self.version = self.meta['version']
+        self.model_dir = os.path.join(path, "models")
+        # Column arrays are memory-mapped, not read into this process
+        self.columns = {
+            col['name']: np.load(os.path.join(path, col['file']), mmap_mode='r')
+            for col in self.meta['columns']
+        }
+        self.item_ranges = {int(k): tuple(v) for k, v in self.meta['items'].items()}
+    
+    def __len__(self) -> int:
+        return self.meta['rows']
+    
+    def _frame_from_index(self, index: np.ndarray) -> pd.DataFrame:
+        return pd.DataFrame({name: np.asarray(arr[index]) for name, arr in self.columns.items()})
+    
+    def recent_frame(self, rows_per_item: int) -> pd.DataFrame:
+        """
+        Last rows_per_item rows of every item
+        
+        Rows are stored sorted by (menu_item_id, date), so each item is a
+        contiguous slice and only the requested tail is copied out of the map.
+        """
+        index = np.concatenate([
+            np.arange(max(start, end - rows_per_item), end)
+            for start, end in self.item_ranges.values()
+        ]) if self.item_ranges else np.array([], dtype=np.int64)
+        return self._frame_from_index(index)
+    
+    def item_frame(self, item_id: int) -> pd.DataFrame:
+        """All rows of one item"""
+        start, end = self.item_ranges.get(int(item_id), (0, 0))
+        return self._frame_from_index(np.arange(start, end))
+    
+    def iter_chunks(self,
+                    start_date: Optional[str] = None,
+                    end_date: Optional[str] = None,
+                    menu_item_ids: Optional[List[int]] = None,
+                    chunksize: int = Config.EXPORT_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+        """
+        Stream rows as DataFrames of at most chunksize rows, ordered by (item, date)
+        
+        Each item's dates are sorted within its slice, so the date range is
+        found by binary search and only matching rows are copied out of the map.
+        """
+        dates = self.columns['date']
+        wanted = {int(i) for i in menu_item_ids} if menu_item_ids else None
+        ranges = []
+        for item_id, (start, end) in sorted(self.item_ranges.items()):
+            if wanted is not None and item_id not in wanted:
+                continue
+            if start_date:
+                start += int(np.searchsorted(dates[start:end], np.datetime64(pd.Timestamp(start_date), 'ns')))
+            if end_date:
+                after = np.datetime64(pd.Timestamp(end_date) + pd.Timedelta(days=1), 'ns')
+                end = start + int(np.searchsorted(dates[start:end], after))
+            if end > start:
+                ranges.append((start, end))
+        
+        pending, size = [], 0
+        for start, end in ranges:
+            while start < end:
+                take = min(end - start, chunksize - size)
+                pending.append(np.arange(start, start + take))
+                size += take
+                start += take
+                if size == chunksize:
+                    yield self._frame_from_index(np.concatenate(pending))
+                    pending, size = [], 0
+        if pending:
+            yield self._frame_from_index(np.concatenate(pending))
+    
+    def frame(self) -> pd.DataFrame:
+        """Materialise the full feature table (copies it into this process)"""
+        return pd.DataFrame({name: np.asarray(arr) for name, arr in self.columns.items()})
+
+
+class SnapshotStore:
+    """
+    Publishes and opens feature/model snapshots
+    
+    Usage:
+        store = SnapshotStore()
+        store.publish(features_df, model_dir="models_per_item")
+        snapshot = store.open()
+    """
+    
+    POINTER = "CURRENT"
+    LEASES = ".leases"
+    
+    def __init__(self, root: str = Config.SNAPSHOT_DIR, keep: int = Config.SNAPSHOT_KEEP):
+        self.root = root
+        self.keep = keep
+        os.makedirs(root, exist_ok=True)
+    
+    def current_version(self) -> Optional[str]:
+        """Version named by the CURRENT pointer, or None if nothing is published"""
+        try:
+            with open(os.path.join(self.root, self.POINTER)) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+    
+    def publish(self, df: pd.DataFrame, model_dir: str = Config.MODEL_DIR) -> str:
+        """
+        Write a new snapshot and atomically make it current
+        
+        Args:
+            df: Feature-engineered DataFrame
+            model_dir: Directory with lgb_item_*.pkl bundles to include
+        
+        Returns:
+            The new snapshot version
+        """
+        version = datetime.now().strftime('%Y%m%d%H%M%S%f')
+        tmp_path = os.path.join(self.root, f".tmp-{version}")
+        final_path = os.path.join(self.root, version)
+        os.makedirs(os.path.join(tmp_path, "models"))
+        
+        df = df.copy()
+        df['date'] = pd.to_datetime(df['date'])
+        df = df.sort_values(['menu_item_id', 'date']).reset_index(drop=True)
+        
+        columns = []
+        for i, name in enumerate(df.columns):
+            values = df[name].to_numpy()
+            if values.dtype == object:
+                # Fixed-width unicode arrays can be memory-mapped; object arrays cannot
+                values = df[name].fillna('').astype(str).to_numpy(dtype=str)
+            file = f"col_{i:03d}.npy"
+            np.save(os.path.join(tmp_path, file), values)
+            columns.append({'name': str(name), 'file': file, 'dtype': str(values.dtype)})
+        
+        item_ids = df['menu_item_id'].to_numpy()
+        boundaries = np.flatnonzero(np.diff(item_ids)) + 1
+        starts = np.concatenate([[0], boundaries]) if len(df) else np.array([], dtype=int)
+        ends = np.concatenate([boundaries, [len(df)]]) if len(df) else np.array([], dtype=int)
+        items = {str(int(item_ids[s])): [int(s), int(e)] for s, e in zip(starts, ends)}
+        
+        model_files = []
+        if os.path.isdir(model_dir):
+            for file in sorted(os.listdir(model_dir)):
+                if file.startswith("lgb_item_") and file.endswith(".pkl"):
+                    shutil.copy2(os.path.join(model_dir, file), os.path.join(tmp_path, "models", file))
+                    model_files.append(file)
+        
+        meta = {
+            'version': version,
+            'created_at': datetime.now().isoformat(),
+            'rows': len(df),
+            'columns': columns,
+            'items': items,
+            'model_files': model_files
+        }
+        with open(os.path.join(tmp_path, "meta.json"), 'w') as f:
+            json.dump(meta, f, indent=2)
+        
+        # Rename the finished directory into place, then swap the pointer
+        os.replace(tmp_path, final_path)
+        pointer_tmp = os.path.join(self.root, f".{self.POINTER}.{version}")
+        with open(pointer_tmp, 'w') as f:
+            f.write(version)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(pointer_tmp, os.path.join(self.root, self.POINTER))
+        
+        print(f"📸 Published snapshot {version} ({len(df)} rows, {len(model_files)} models)")
+        self._prune()
+        return version
+    
+    def open(self, version: Optional[str] = None) -> Optional[Snapshot]:
+        """Open a snapshot (default: the current one) and lease it to this process"""
+        version = version or self.current_version()
+        if not version:
+            return None
+        snapshot = Snapshot(os.path.join(self.root, version))
+        self._lease(version)
+        return snapshot
+    
+    def _lease(self, version: str):
+        """Record the version this process serves, replacing its previous lease"""
+        directory = os.path.join(self.root, self.LEASES)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, str(os.getpid()))
+        with open(f"{path}.tmp", 'w') as f:
+            f.write(version)
+        os.replace(f"{path}.tmp", path)
+    
+    def leased_versions(self) -> set:
+        """Versions a live process still has open; leases of exited processes are removed"""
+        directory = os.path.join(self.root, self.LEASES)
+        if not os.path.isdir(directory):
+            return set()
+        versions = set()
+        for name in os.listdir(directory):
+            if not name.isdigit():
+                continue
+            path = os.path.join(directory, name)
+            if not _process_alive(int(name)):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                continue
+            try:
+                with open(path) as f:
+                    versions.add(f.read().strip())
+            except OSError:
+                continue
+        return versions
+    
+    def versions(self) -> List[str]:
+        """Published versions, oldest first"""
+        return sorted(d for d in os.listdir(self.root)
+                      if not d.startswith('.') and os.path.isdir(os.path.join(self.root, d)))
+    
+    def _prune(self):
+        """
+        Remove old snapshots no live process has open
+        
+        The newest max(keep, 2) versions always stay, so a worker that has
+        not switched yet can still load models from the previous one.
+        """
+        versions = self.versions()
+        protected = set(versions[-max(self.keep, 2):]) | {self.current_version()} | self.leased_versions()
+        for version in versions:
+            if version not in protected:
+                shutil.rmtree(os.path.join(self.root, version), ignore_errors=True)
+
+
+def describe_snapshot(snapshot: Snapshot) -> Dict:
+    """Summary of a snapshot for status endpoints"""
+    return {
+        'version': snapshot.version,
+        'created_at': snapshot.meta['created_at'],
+        'rows': len(snapshot),
+        'items': len(snapshot.item_ranges),
+        'models': len(snapshot.meta['model_files'])
+    }
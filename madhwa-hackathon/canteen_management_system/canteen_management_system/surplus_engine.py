@@ -0,0 +1,290 @@
+"""
+SurplusEngine - Live surplus estimates for NGO pickups
+
+For each item on the day's menu the engine keeps the prepared quantity, the
+expected demand and the served count as arrays. Served counts arrive from
+TapIngestionService as batches of per-item deltas; after each batch the
+estimates are recomputed for all items in one vectorized pass:
+    
+    remaining = (1 - F) * (served + (1 - F) * expected)
+    surplus   = max(prepared - served - remaining, 0)
+
+F is the share of a meal slot's taps that usually happen by now (learned from
+recent tap history, uniform until there is enough of it). Early in service
+the remaining demand follows the forecast; as service progresses it follows
+the observed pace. Once the slot has closed F is 1 and the surplus is simply
+prepared minus served.
+"""
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Hashable, Optional
+
+import numpy as np
+import pandas as pd
+
+from config import Config
+from cold_start_agent import meal_slot
+from tap_ingestion import TapIngestionService, _parse_window
+
+
+def _slot_fraction(t: datetime, window: tuple) -> float:
+    """Position of t within a service window, clipped to [0, 1]"""
+    start = datetime.combine(t.date(), window[0])
+    end = datetime.combine(t.date(), window[1])
+    return float(np.clip((t - start).total_seconds() / max((end - start).total_seconds(), 1), 0, 1))
+
+
+class SurplusEngine:
+    """
+    Incremental surplus estimator fed by tap ingestion
+    
+    Usage:
+        engine = SurplusEngine(taps)
+        engine.load_plan("2025-11-03", forecasts, history)
+        engine.estimates("2025-11-03")      # DataFrame, one row per item
+    """
+    
+    def __init__(self, taps: TapIngestionService):
+        self.taps = taps
+        self._slot_windows = {slot: _parse_window(w) for slot, w in Config.MEAL_SLOT_WINDOWS.items()}
+        self._lock = threading.Lock()
+        # date -> plan (item arrays) and its latest estimates
+        self._plans = {}
+        self.curves = self.learn_curves()
+        taps.add_listener(self.on_served)
+    
+    # ---------- Service curves ----------
+    
+    def learn_curves(self) -> Dict[str, np.ndarray]:
+        """
+        Cumulative share of each slot's taps by position in its service window
+        
+        Returns:
+            {meal_slot: array of Config.SURPLUS_CURVE_BINS + 1 points from 0 to 1}
+        """
+        bins = Config.SURPLUS_CURVE_BINS
+        uniform = np.linspace(0, 1, bins + 1)
+        start = (datetime.now().date() - timedelta(days=Config.SURPLUS_CURVE_DAYS)).isoformat()
+        yesterday = (datetime.now().date() - timedelta(days=1)).isoformat()
+        taps = pd.DataFrame(self.taps.tap_times(start, yesterday), columns=['meal_slot', 'tapped_at'])
+        
+        curves = {}
+        for slot, window in self._slot_windows.items():
+            times = pd.to_datetime(taps.loc[taps['meal_slot'] == slot, 'tapped_at'])
+            if len(times) < Config.SURPLUS_CURVE_MIN_TAPS:
+                curves[slot] = uniform
+                continue
+            fractions = np.array([_slot_fraction(t, window) for t in times])
+            counts, _ = np.histogram(fractions, bins=bins, range=(0, 1))
+            curves[slot] = np.concatenate([[0], np.cumsum(counts) / counts.sum()])
+        return curves
+    
+    def served_share(self, slot: str, now: datetime) -> float:
+        """Expected share of the slot's demand served by now (1 for unknown slots)"""
+        window = self._slot_windows.get(slot)
+        if window is None:
+            return 1.0
+        curve = self.curves.get(slot, np.linspace(0, 1, Config.SURPLUS_CURVE_BINS + 1))
+        return float(np.interp(_slot_fraction(now, window), np.linspace(0, 1, len(curve)), curve))
+    
+    # ---------- Plans ----------
+    
+    def has_plan(self, date: str) -> bool:
+        return date in self._plans
+    
+    def plan_inputs(self, date: str) -> Optional[Hashable]:
+        """The inputs key a date's plan was loaded with (None if no plan)"""
+        plan = self._plans.get(date)
+        return plan['inputs'] if plan is not None else None
+    
+    def load_plan(self,
+                  date: str,
+                  forecasts: pd.DataFrame,
+                  history: Optional[pd.DataFrame] = None,
+                  prepared: Optional[Dict[int, int]] = None,
+                  inputs: Optional[Hashable] = None) -> int:
+        """
+        Set up the items for a date
+        
+        Prepared quantity per item: the kitchen's own figure if given, else the
+        confirmed_count recorded for the date, else the forecast. Expected
+        demand is the forecast where there is one, else the prepared quantity.
+        Reloading a date keeps the kitchen figures already reported for it.
+        
+        Args:
+            date: Service date (YYYY-MM-DD)
+            forecasts: Forecasts for the date (menu_item_id, predicted_count)
+            history: Feature history (confirmed counts and item categories)
+            prepared: Optional {menu_item_id: portions prepared}
+            inputs: Key identifying the forecasts and history used (see
+                    plan_inputs), so callers can tell when to reload
+        
+        Returns:
+            Number of items in the plan
+        """
+        with self._lock:
+            previous = self._plans.get(date)
+            if previous is not None:
+                kitchen = previous['prepared_source'] == 'kitchen'
+                prepared = {**{int(i): int(n) for i, n in zip(previous['items'][kitchen],
+                                                               previous['prepared'][kitchen])},
+                            **(prepared or {})}
+        
+        forecast = forecasts.set_index('menu_item_id')['predicted_count'].astype(float) \
+            if not forecasts.empty else pd.Series(dtype=float)
+        confirmed = pd.Series(dtype=float)
+        categories = pd.Series(dtype=object)
+        if history is not None and not history.empty:
+            categories = history.groupby('menu_item_id')['item_category'].last()
+            day = history[pd.to_datetime(history['date']).dt.strftime('%Y-%m-%d') == date]
+            confirmed = day.set_index('menu_item_id')[Config.TARGET_COLUMN].astype(float)
+        given = pd.Series(prepared or {}, dtype=float)
+        given.index = given.index.astype(int)
+        
+        items = forecast.index.union(confirmed.index).union(given.index)
+        if items.empty:
+            return 0
+        prepared_count = given.reindex(items).fillna(confirmed.reindex(items)).fillna(forecast.reindex(items))
+        source = np.where(given.reindex(items).notna(), 'kitchen',
+                          np.where(confirmed.reindex(items).notna(), 'confirmed', 'forecast'))
+        expected = forecast.reindex(items).fillna(prepared_count)
+        slots = meal_slot(categories.reindex(items).fillna('Other'))
+        
+        served_now = self.taps.served_counts(date)
+        planned = set(items)
+        plan = {
+            'items': items.to_numpy(),
+            'position': {int(item_id): i for i, item_id in enumerate(items)},
+            'prepared': np.array(prepared_count, dtype=float),
+            'prepared_source': np.array(source, dtype=object),
+            'expected': expected.to_numpy(dtype=float),
+            'served': np.array([served_now.get(int(i), 0) for i in items], dtype=float),
+            'slots': slots.to_numpy(),
+            'unplanned': {i: n for i, n in served_now.items() if i not in planned},
+            'inputs': inputs,
+            # Pollers see a reloaded plan as a new version
+            'version': previous['version'] if previous is not None else 0,
+            'estimates': None
+        }
+        with self._lock:
+            self._plans[date] = plan
+            self._recompute(date)
+            # Keep today and the previous service day only
+            for old in sorted(self._plans)[:-2]:
+                del self._plans[old]
+        print(f"🍱 Surplus plan for {date}: {len(items)} items")
+        return len(items)
+    
+    def set_prepared(self, date: str, prepared: Dict[int, int]) -> int:
+        """Replace prepared quantities reported by the kitchen; returns items updated"""
+        with self._lock:
+            plan = self._plans.get(date)
+            if plan is None:
+                return 0
+            updated = 0
+            for item_id, quantity in prepared.items():
+                i = plan['position'].get(int(item_id))
+                if i is not None:
+                    plan['prepared'][i] = float(quantity)
+                    plan['prepared_source'][i] = 'kitchen'
+                    updated += 1
+            self._recompute(date)
+            return updated
+    
+    # ---------- Updates ----------
+    
+    def on_served(self, date: str, deltas: Dict[int, int]):
+        """TapIngestionService listener: add newly served portions and re-estimate"""
+        with self._lock:
+            plan = self._plans.get(date)
+            if plan is None:
+                return
+            for item_id, n in deltas.items():
+                i = plan['position'].get(item_id)
+                if i is None:
+                    plan['unplanned'][item_id] = plan['unplanned'].get(item_id, 0) + n
+                else:
+                    plan['served'][i] += n
+            self._recompute(date)
+    
+    def _set_served(self, date: str, served: Dict[int, int]):
+        """Replace a plan's served counts with the store's (caller holds the lock)"""
+        plan = self._plans[date]
+        counts = np.array([served.get(int(i), 0) for i in plan['items']], dtype=float)
+        unplanned = {i: n for i, n in served.items() if i not in plan['position']}
+        if np.array_equal(counts, plan['served']) and unplanned == plan['unplanned']:
+            return
+        plan['served'], plan['unplanned'] = counts, unplanned
+        self._recompute(date)
+    
+    def _recompute(self, date: str, changed: bool = True, now: Optional[datetime] = None):
+        """
+        Re-estimate every item of a plan (caller holds the lock)
+        
+        changed: the plan's inputs changed (bumps its version for pollers);
+        False when only the clock moved on
+        """
+        plan = self._plans[date]
+        now = now or datetime.now()
+        service_day = datetime.fromisoformat(date)
+        if now.date() < service_day.date():
+            shares = {slot: 0.0 for slot in set(plan['slots'])}
+        elif now.date() > service_day.date():
+            shares = {slot: 1.0 for slot in set(plan['slots'])}
+        else:
+            shares = {slot: self.served_share(slot, now) for slot in set(plan['slots'])}
+        share = np.array([shares[slot] for slot in plan['slots']])
+        
+        served = plan['served']
+        remaining = (1 - share) * (served + (1 - share) * plan['expected'])
+        available = np.maximum(plan['prepared'] - served, 0)
+        surplus = np.maximum(available - remaining, 0)
+        
+        if changed:
+            plan['version'] += 1
+            plan['updated_at'] = now
+        plan['estimates'] = pd.DataFrame({
+            'menu_item_id': plan['items'],
+            'meal_slot': plan['slots'],
+            'prepared_count': plan['prepared'].astype(int),
+            'prepared_source': plan['prepared_source'],
+            'served_count': served.astype(int),
+            'expected_remaining': np.round(remaining, 1),
+            'surplus_count': np.floor(surplus).astype(int),
+            'status': np.where(share >= 1.0, 'final', 'projected')
+        })
+    
+    def estimates(self, date: str, refresh: bool = True) -> pd.DataFrame:
+        """
+        Current surplus estimates for a date
+        
+        Args:
+            date: Service date (YYYY-MM-DD)
+            refresh: Re-estimate for the current time first (the service curve
+                     moves on between tap batches)
+        
+        Returns:
+            DataFrame, one row per item (empty if no plan is loaded)
+        """
+        # Taps counted by other server workers only show up in the shared store
+        served = self.taps.served_counts(date) if refresh and self.taps.shared else None
+        with self._lock:
+            if date not in self._plans:
+                return pd.DataFrame()
+            if served is not None:
+                self._set_served(date, served)
+            if refresh:
+                self._recompute(date, changed=False)
+            return self._plans[date]['estimates']
+    
+    def plan_info(self, date: str) -> Dict:
+        """Version, update time and unplanned served counts of a plan"""
+        with self._lock:
+            plan = self._plans.get(date)
+            if plan is None:
+                return {}
+            return {
+                'version': plan['version'],
+                'updated_at': plan['updated_at'].isoformat(),
+                'unplanned_served': {int(k): int(v) for k, v in plan['unplanned'].items()}
+            }
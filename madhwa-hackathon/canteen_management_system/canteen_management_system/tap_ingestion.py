@@ -0,0 +1,412 @@
+"""
+TapIngestionService - RFID meal-collection taps to served counts
+
+Readers post bursts of tap events. Each card is counted once per (date, meal
+slot): repeats are rejected against an in-memory index. Accepted taps update
+live per-item served counters immediately and are flushed in batches:
+- the accepted tap keys and per (date, item) count deltas go to a local
+  SQLite store (Config.TAP_STORE_PATH) in one transaction; taps the store
+  already has (e.g. a replay for a date no longer indexed in memory) are
+  not counted again;
+- the deltas are written to the served counts collection as one merged
+  increment per (date, item), committed in 500-op batches,
+so a lunch rush of thousands of taps costs a handful of Firestore writes.
+
+Behind several server workers (shared=True, see serve.py) each worker's
+memory only sees its own requests, so taps are deduped and counted in the
+SQLite store itself as they arrive: the (date, card, slot) primary key
+rejects repeats from any worker and served counts are read back from the
+store. Only the Firestore increments are still batched per worker.
+
+Tap event:
+    {"card_id": "04A1B2C3", "timestamp": "2025-11-03T12:41:07",
+     "menu_item_id": 201, "meal_slot": "lunch"}    # meal_slot optional
+"""
+import sqlite3
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime, time as dt_time
+from typing import Callable, Dict, Iterator, List, Optional
+
+from config import Config
+from firebase_config import FirebaseConfig, FirebaseCollections
+
+
+# Add count deltas to the stored served counts
+_ADD_SERVED = """
+    INSERT INTO served_counts (date, menu_item_id, served_count, updated_at)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT(date, menu_item_id)
+    DO UPDATE SET served_count = served_count + excluded.served_count,
+                  updated_at = excluded.updated_at
+"""
+
+
+def _parse_window(window) -> tuple:
+    return tuple(dt_time.fromisoformat(t) for t in window)
+
+
+def _item_counts(taps: List[tuple]) -> Dict[tuple, int]:
+    """(date, menu_item_id) -> number of stored tap tuples"""
+    counts = {}
+    for _, date, _, item_id, _ in taps:
+        if item_id is not None:
+            counts[(date, item_id)] = counts.get((date, item_id), 0) + 1
+    return counts
+
+
+class TapIngestionService:
+    """
+    Deduplicating tap ingestion with live counters and batched flushes
+    
+    Usage:
+        taps = TapIngestionService()
+        taps.start()                         # background flushing
+        taps.ingest(events)                  # from the reader endpoint
+        taps.served_counts("2025-11-03")     # live {menu_item_id: served}
+    """
+    
+    def __init__(self,
+                 store_path: str = Config.TAP_STORE_PATH,
+                 collection: str = FirebaseCollections.SERVED_COUNTS,
+                 shared: bool = False):
+        """
+        Args:
+            store_path: SQLite tap store
+            collection: Collection receiving the served counts. Not the meal
+                        history: merged counts would create documents without
+                        confirmed_count or total_employees
+            shared: Dedupe and count in the store on every ingest, for several
+                    processes sharing store_path
+        """
+        self.store_path = store_path
+        self.collection = collection
+        self.shared = shared
+        directory = os.path.dirname(store_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._slot_windows = {slot: _parse_window(w) for slot, w in Config.MEAL_SLOT_WINDOWS.items()}
+        
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        # date -> {(card_id, meal_slot)}; dates are pruned after TAP_INDEX_DAYS
+        self._seen = {}
+        # (date, menu_item_id) -> served count, and the part not yet flushed
+        self._served = {}
+        self._pending = {}
+        self._pending_taps = []
+        # Deltas already stored locally but not yet accepted by Firestore
+        self._firestore_backlog = {}
+        self._listeners = []
+        self.stats = {'accepted': 0, 'duplicates': 0, 'rejected': 0, 'flushes': 0, 'firestore_writes': 0}
+        
+        self._stop = threading.Event()
+        self._thread = None
+        
+        self._init_schema()
+        if not shared:
+            self._restore()
+    
+    # ---------- Local store ----------
+    
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.store_path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+    
+    def _init_schema(self):
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS taps (
+                    card_id TEXT NOT NULL,
+                    date TEXT NOT NULL,
+                    meal_slot TEXT NOT NULL,
+                    menu_item_id INTEGER,
+                    tapped_at TEXT,
+                    PRIMARY KEY (date, card_id, meal_slot)
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS served_counts (
+                    date TEXT NOT NULL,
+                    menu_item_id INTEGER NOT NULL,
+                    served_count INTEGER NOT NULL,
+                    updated_at TEXT,
+                    PRIMARY KEY (date, menu_item_id)
+                )
+            """)
+    
+    def _restore(self):
+        """Rebuild today's dedupe index and counters after a restart"""
+        today = datetime.now().date().isoformat()
+        with self._connect() as conn:
+            seen = conn.execute("SELECT card_id, meal_slot FROM taps WHERE date = ?", (today,)).fetchall()
+            served = conn.execute("SELECT menu_item_id, served_count FROM served_counts WHERE date = ?",
+                                  (today,)).fetchall()
+        if seen:
+            self._seen[today] = set(seen)
+        for item_id, count in served:
+            self._served[(today, item_id)] = count
+    
+    # ---------- Ingestion ----------
+    
+    def meal_slot_for(self, tapped_at: datetime) -> Optional[str]:
+        """Meal slot whose service window contains the tap time"""
+        t = tapped_at.time()
+        for slot, (start, end) in self._slot_windows.items():
+            if start <= t <= end:
+                return slot
+        return None
+    
+    def add_listener(self, callback: Callable[[str, Dict[int, int]], None]):
+        """
+        Call callback(date, {menu_item_id: newly served}) after every ingested batch
+        
+        A flush that finds taps already in the store (a late or replayed tap
+        for a date whose index is no longer in memory) reports them again as
+        negative counts.
+        """
+        self._listeners.append(callback)
+    
+    def ingest(self, events: List[Dict]) -> Dict:
+        """
+        Count a batch of tap events
+        
+        Args:
+            events: Tap events (card_id, timestamp, menu_item_id, optional meal_slot)
+        
+        Returns:
+            Dict with accepted, duplicates and rejected counts
+        """
+        rejected = 0
+        # (card_id, date, meal_slot, menu_item_id, tapped_at) as stored
+        parsed = []
+        for event in events:
+            try:
+                card_id = str(event['card_id'])
+                tapped_at = datetime.fromisoformat(str(event['timestamp'])) \
+                    if event.get('timestamp') else datetime.now()
+                item_id = int(event['menu_item_id']) if event.get('menu_item_id') is not None else None
+            except (KeyError, TypeError, ValueError):
+                rejected += 1
+                continue
+            slot = event.get('meal_slot') or self.meal_slot_for(tapped_at)
+            if slot is None:
+                rejected += 1
+                continue
+            parsed.append((card_id, tapped_at.date().isoformat(), slot, item_id, tapped_at.isoformat()))
+        
+        if self.shared:
+            taps = self._claim(parsed)
+        deltas = {}
+        
+        with self._lock:
+            if not self.shared:
+                taps = []
+                for tap in parsed:
+                    card_id, date, slot = tap[:3]
+                    seen = self._seen.setdefault(date, set())
+                    if (card_id, slot) not in seen:
+                        seen.add((card_id, slot))
+                        taps.append(tap)
+                self._pending_taps.extend(taps)
+            
+            for _, date, _, item_id, _ in taps:
+                if item_id is None:
+                    continue
+                key = (date, item_id)
+                if not self.shared:
+                    self._served[key] = self._served.get(key, 0) + 1
+                self._pending[key] = self._pending.get(key, 0) + 1
+                day_deltas = deltas.setdefault(date, {})
+                day_deltas[item_id] = day_deltas.get(item_id, 0) + 1
+            
+            accepted, duplicates = len(taps), len(parsed) - len(taps)
+            self.stats['accepted'] += accepted
+            self.stats['duplicates'] += duplicates
+            self.stats['rejected'] += rejected
+            pending = len(self._pending_taps)
+        
+        for date, day_deltas in deltas.items():
+            for listener in self._listeners:
+                listener(date, day_deltas)
+        
+        if pending >= Config.TAP_FLUSH_MAX_PENDING:
+            self.flush()
+        
+        return {'accepted': accepted, 'duplicates': duplicates, 'rejected': rejected}
+    
+    def _claim(self, taps: List[tuple]) -> List[tuple]:
+        """
+        Store and count taps the store does not have yet
+        
+        One transaction, so concurrent workers serialise on the store's write
+        lock and a card is accepted by exactly one of them. Only inserted taps
+        are added to the served counts.
+        
+        Returns:
+            The accepted taps
+        """
+        if not taps:
+            return []
+        now = datetime.now().isoformat()
+        with self._connect() as conn:
+            accepted = [tap for tap in taps
+                        if conn.execute("INSERT OR IGNORE INTO taps VALUES (?, ?, ?, ?, ?)", tap).rowcount]
+            conn.executemany(_ADD_SERVED, [(date, item_id, n, now)
+                                           for (date, item_id), n in _item_counts(accepted).items()])
+        return accepted
+    
+    def served_counts(self, date: Optional[str] = None) -> Dict[int, int]:
+        """Live served count per item for a date (default today)"""
+        date = date or datetime.now().date().isoformat()
+        if self.shared:
+            with self._connect() as conn:
+                return dict(conn.execute("SELECT menu_item_id, served_count FROM served_counts WHERE date = ?",
+                                         (date,)).fetchall())
+        with self._lock:
+            return {item_id: count for (d, item_id), count in self._served.items() if d == date}
+    
+    def tap_times(self, start_date: str, end_date: Optional[str] = None) -> List[tuple]:
+        """Flushed (meal_slot, tapped_at) pairs for a date range, e.g. to learn service curves"""
+        end_date = end_date or datetime.now().date().isoformat()
+        with self._connect() as conn:
+            return conn.execute("SELECT meal_slot, tapped_at FROM taps WHERE date >= ? AND date <= ?",
+                                (start_date, end_date)).fetchall()
+    
+    # ---------- Flushing ----------
+    
+    def flush(self) -> int:
+        """
+        Write pending taps and count deltas to the local store and Firestore
+        
+        Returns:
+            Number of (date, item) counts flushed
+        """
+        with self._flush_lock:
+            with self._lock:
+                taps, self._pending_taps = self._pending_taps, []
+                deltas, self._pending = self._pending, {}
+            if not taps and not deltas:
+                return 0
+            
+            now = datetime.now().isoformat()
+            # Shared mode stored everything on ingest; only Firestore is left
+            if not self.shared:
+                try:
+                    stored = self._claim(taps)
+                except sqlite3.Error:
+                    # Nothing was written (one transaction): keep everything for the next flush
+                    with self._lock:
+                        self._pending_taps = taps + self._pending_taps
+                        for key, n in deltas.items():
+                            self._pending[key] = self._pending.get(key, 0) + n
+                    raise
+                if len(stored) < len(taps):
+                    deltas = self._uncount(deltas, _item_counts(stored))
+            
+            self._push_to_firebase(deltas, now)
+            self._prune()
+            self.stats['flushes'] += 1
+            return len(deltas)
+    
+    def _uncount(self, deltas: Dict, stored: Dict) -> Dict:
+        """
+        Take taps the store already had back out of the live counters
+        
+        Returns:
+            The count deltas of the stored taps only
+        """
+        corrections = {}
+        with self._lock:
+            for key, n in deltas.items():
+                skipped = n - stored.get(key, 0)
+                if not skipped:
+                    continue
+                if key in self._served:
+                    self._served[key] -= skipped
+                corrections.setdefault(key[0], {})[key[1]] = -skipped
+                self.stats['accepted'] -= skipped
+                self.stats['duplicates'] += skipped
+        for date, day_corrections in corrections.items():
+            for listener in self._listeners:
+                listener(date, day_corrections)
+        return stored
+    
+    def _push_to_firebase(self, deltas: Dict, now: str):
+        """One merged increment per (date, item) on the served count documents"""
+        db = FirebaseConfig.get_db()
+        if not db:
+            return
+        
+        for key, n in self._firestore_backlog.items():
+            deltas[key] = deltas.get(key, 0) + n
+        self._firestore_backlog = {}
+        if not deltas:
+            return
+        
+        try:
+            from firebase_admin import firestore
+            
+            collection_ref = db.collection(self.collection)
+            items = list(deltas.items())
+            for start in range(0, len(items), 500):
+                batch = db.batch()
+                for (date, item_id), n in items[start:start + 500]:
+                    batch.set(collection_ref.document(f"{date}_{item_id}"), {
+                        'date': date,
+                        'menu_item_id': item_id,
+                        'served_count': firestore.Increment(n),
+                        'updated_at': now
+                    }, merge=True)
+                batch.commit()
+                self.stats['firestore_writes'] += len(items[start:start + 500])
+        except Exception as e:
+            # Counts are safe locally; retry the whole set on the next flush
+            # (a partly committed set may then be counted twice in Firestore)
+            print(f"⚠️ Could not push served counts to Firebase: {e}")
+            self._firestore_backlog = deltas
+    
+    def _prune(self):
+        """Drop dedupe index and counters older than Config.TAP_INDEX_DAYS"""
+        dates = sorted(self._seen)
+        if len(dates) <= Config.TAP_INDEX_DAYS:
+            return
+        with self._lock:
+            for date in dates[:-Config.TAP_INDEX_DAYS]:
+                self._seen.pop(date, None)
+                for key in [k for k in self._served if k[0] == date and k not in self._pending]:
+                    del self._served[key]
+    
+    # ---------- Background flushing ----------
+    
+    def start(self) -> threading.Thread:
+        """Flush every Config.TAP_FLUSH_INTERVAL_SECONDS in a daemon thread"""
+        if self._thread is not None and self._thread.is_alive():
+            return self._thread
+        
+        def _run():
+            while not self._stop.wait(Config.TAP_FLUSH_INTERVAL_SECONDS):
+                try:
+                    self.flush()
+                except Exception as e:
+                    print(f"❌ Tap flush failed: {e}")
+        
+        self._stop.clear()
+        self._thread = threading.Thread(target=_run, name="tap-flush", daemon=True)
+        self._thread.start()
+        return self._thread
+    
+    def stop(self):
+        """Stop background flushing and flush what is pending"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
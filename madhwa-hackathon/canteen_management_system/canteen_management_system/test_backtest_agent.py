@@ -0,0 +1,35 @@
+"""Tests for rolling-origin backtest folds"""
+import pandas as pd
+
+from backtest_agent import BacktestAgent
+
+
+def test_origins_leave_a_full_horizon_of_actuals(features):
+    agent = BacktestAgent()
+    latest = pd.to_datetime(features['date']).max()
+    
+    origins = agent.get_origins(features, n_origins=3, horizon=7, step_days=7)
+    
+    assert origins == [latest - pd.Timedelta(days=d) for d in (21, 14, 7)]
+
+
+def test_folds_only_see_data_up_to_their_origin(features):
+    agent = BacktestAgent(output_dir="reports")
+    run = lambda df: agent.run_backtest(df, n_origins=2, horizon=3, step_days=7,
+                                        max_workers=1, save=False)['errors']
+    errors = run(features)
+    first = errors['origin'].min()
+    
+    assert sorted(errors['origin'].unique()) == agent.get_origins(features, 2, 3, 7)
+    assert sorted(errors['horizon'].unique()) == [1, 2, 3]
+    assert ((errors['date'] - errors['origin']).dt.days == errors['horizon']).all()
+    
+    # Doubling demand after the first origin changes its actuals, never its forecasts
+    future = pd.to_datetime(features['date']) > first
+    counts = features['confirmed_count']
+    changed = features.assign(confirmed_count=counts.where(~future, counts * 2))
+    replay = run(changed)
+    
+    fold, replayed = (e[e['origin'] == first].reset_index(drop=True) for e in (errors, replay))
+    pd.testing.assert_series_equal(fold['predicted'], replayed['predicted'])
+    assert (replayed['actual'] == 2 * fold['actual']).all()
@@ -0,0 +1,49 @@
+"""Tests for the concurrent Firestore batch writes"""
+import pandas as pd
+
+import local_firestore
+from batch_committer import BatchCommitter, frame_documents
+from local_firestore import LocalFirestore
+
+
+def _documents(count):
+    df = pd.DataFrame({'n': range(count), 'note': [None if i % 2 else "x" for i in range(count)]})
+    return frame_documents(df, lambda record: f"doc{record['n']:04d}", chunk_size=100)
+
+
+def test_documents_are_committed_in_batches_of_the_size_limit():
+    db = LocalFirestore("firestore.db")
+    committer = BatchCommitter(db, max_in_flight=2, batch_size=500, backoff_seconds=0)
+    
+    result = committer.commit("docs", _documents(1234))
+    
+    assert (result['committed'], result['failed'], result['batches'], result['retries']) == (1234, 0, 3, 0)
+    assert db.stats['round_trips'] == 3
+    assert len(db.collection("docs").get()) == 1234
+    assert db.collection("docs").document("doc0001").get().to_dict() == {'n': 1, 'note': None}
+
+
+def test_failed_batches_are_retried_alone_and_reported_in_order(monkeypatch):
+    db = LocalFirestore("firestore.db")
+    commit = local_firestore.LocalWriteBatch.commit
+    attempts = {}
+    
+    def flaky(batch):
+        first = batch._writes[0][1].id
+        attempts[first] = attempts.get(first, 0) + 1
+        if first == "doc0500" and attempts[first] == 1:
+            raise ConnectionError("deadline exceeded")
+        if first in ("doc1000", "doc1500"):
+            raise ValueError("document too large")
+        return commit(batch)
+    
+    monkeypatch.setattr(local_firestore.LocalWriteBatch, "commit", flaky)
+    committer = BatchCommitter(db, max_in_flight=3, batch_size=500, max_retries=2, backoff_seconds=0)
+    
+    result = committer.commit("docs", _documents(1800))
+    
+    assert (result['committed'], result['failed'], result['batches'], result['retries']) == (1000, 800, 4, 1)
+    assert [(e['batch'], e['first_doc_id'], e['last_doc_id'], e['documents'], e['attempts'])
+            for e in result['errors']] == [(2, "doc1000", "doc1499", 500, 1), (3, "doc1500", "doc1799", 300, 1)]
+    assert result['errors'][0]['error'] == "ValueError: document too large"
+    assert len(db.collection("docs").get()) == 1000
@@ -0,0 +1,34 @@
+"""Tests for the benchmark measurements and baseline regression checks"""
+from benchmark import MIN_SECONDS, compare_with_baseline, measure
+
+
+def _run(**stages):
+    return {'scales': {'small': {'stages': {name: {'seconds': s} for name, s in stages.items()}}}}
+
+
+def test_only_real_slowdowns_are_regressions():
+    baseline = _run(train=1.0, predict=0.01, sync=2.0, insights=0.5)
+    current = _run(train=1.5, predict=0.04, sync=2.1, export=9.0)
+    
+    regressions = compare_with_baseline(current, baseline, threshold=0.2)
+    
+    # predict tripled but by less than MIN_SECONDS; sync is within 20%; export is new
+    assert [(r['stage'], r['ratio']) for r in regressions] == [('train', 1.5)]
+    assert 0.04 - 0.01 < MIN_SECONDS
+
+
+def test_scales_missing_from_the_baseline_are_skipped():
+    current = _run(train=5.0)
+    current['scales']['large'] = current['scales'].pop('small')
+    assert compare_with_baseline(current, _run(train=1.0), threshold=0.2) == []
+
+
+def test_measure_reports_the_median_run_and_peak_memory():
+    calls = []
+    
+    stats, result = measure(lambda: calls.append(bytearray(1024 * 1024)) or len(calls), repeat=3)
+    
+    # Three timed runs and one traced run
+    assert result == 4
+    assert stats['runs'] == 3 and stats['min_seconds'] <= stats['seconds']
+    assert stats['peak_mb'] >= 1
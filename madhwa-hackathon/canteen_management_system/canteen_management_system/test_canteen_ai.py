@@ -0,0 +1,46 @@
+"""Tests for the CanteenAI serving paths"""
+import shutil
+
+import pandas as pd
+
+import canteen_ai
+from canteen_ai import CanteenAI
+
+
+def test_models_fingerprint_is_cached_until_the_models_move(model_dir, monkeypatch):
+    calls = []
+    fingerprint = canteen_ai.directory_fingerprint
+    monkeypatch.setattr(canteen_ai, "directory_fingerprint", lambda *args: calls.append(args[0]) or fingerprint(*args))
+    shutil.copytree(model_dir, "models_per_item")
+    ai = CanteenAI()
+    
+    first = ai.models_fingerprint()
+    assert [ai.models_fingerprint() for _ in range(5)] == [first] * 5
+    assert len(calls) == 1
+    
+    # A snapshot swap points the predict agent at another copy of the models
+    shutil.copytree(model_dir, "snapshot_models")
+    ai.predict_agent.model_dir = "snapshot_models"
+    assert ai.models_fingerprint() == first
+    assert calls == ["models_per_item", "snapshot_models"]
+    
+    # Retrained in place: picked up once refreshed (after training / per pipeline run)
+    shutil.rmtree("snapshot_models")
+    assert ai.models_fingerprint(refresh=True) != first
+
+
+def test_surplus_plan_follows_a_rematerialized_forecast_table(features):
+    ai = CanteenAI()
+    ai.data_cache = features
+    forecasts = lambda count: pd.DataFrame({'date': "2025-07-01", 'menu_item_id': [101, 102],
+                                            'predicted_count': count})
+    ai.forecast_table.write(forecasts(40.0), ai.data_through(), "models")
+    assert ai.surplus("2025-07-01")['prepared_count'].tolist() == [40, 40]
+    ai.surplus("2025-07-01", prepared={102: 55})
+    
+    ai.forecast_table.write(forecasts(30.0), ai.data_through(), "models")
+    estimates = ai.surplus("2025-07-01")
+    
+    # New forecasts for 101; the kitchen's own figure for 102 is kept
+    assert estimates['prepared_count'].tolist() == [30, 55]
+    assert estimates['prepared_source'].tolist() == ['forecast', 'kitchen']
@@ -0,0 +1,49 @@
+"""Tests for forecasting new items from similar established items"""
+import pandas as pd
+
+from cold_start_agent import ColdStartAgent
+from predict_agent import PredictAgent
+from prediction_store import PredictionStore
+
+
+def _history(item_id, category, count, days):
+    dates = pd.date_range(end="2025-06-30", periods=days)
+    return pd.DataFrame({'date': dates.strftime('%Y-%m-%d'), 'menu_item_id': item_id, 'item_category': category,
+                         'confirmed_count': count, 'total_employees': 200})
+
+
+def _model_predictions(counts):
+    return pd.DataFrame([{'menu_item_id': item_id, 'predicted_count': n, 'lower_bound': n - 10, 'upper_bound': n + 10,
+                          'p10': n - 10, 'p50': n, 'p90': n + 10, 'confidence': 0.9, 'model_version': "v2.1"}
+                         for item_id, n in counts.items()])
+
+
+def test_new_item_follows_its_neighbours_at_its_own_level():
+    df = pd.concat([_history(201, "Lunch", 100, 60), _history(202, "Lunch", 100, 60),
+                    _history(301, "Snack", 40, 60), _history(203, "Lunch", 50, 7)])
+    predictions = _model_predictions({201: 100, 202: 100, 301: 40})
+    
+    cold = ColdStartAgent().forecast(df, predictions, pd.Timestamp("2025-07-01"),
+                                     new_items=pd.DataFrame({'menu_item_id': [204], 'item_category': ["Lunch"]}))
+    
+    cold = cold.set_index('menu_item_id')
+    assert list(cold.index) == [203, 204] and (cold['forecast_source'] == 'cold_start').all()
+    assert cold.loc[204, 'neighbours'].startswith(("201,202", "202,201"))
+    # No history of its own: mostly the Lunch neighbours' level (the Snack one weighs less)
+    assert 80 <= cold.loc[204, 'predicted_count'] < 100
+    # A week at half the neighbours' level, shrunk back towards them
+    assert 50 < cold.loc[203, 'predicted_count'] < cold.loc[204, 'predicted_count']
+    # Wider than the neighbours' interval
+    assert cold.loc[204, 'upper_bound'] - cold.loc[204, 'lower_bound'] > 20
+
+
+def test_weekly_forecast_covers_items_without_a_model(features, model_dir):
+    agent = PredictAgent(model_dir, store=PredictionStore("preds.db"))
+    new_items = pd.DataFrame({'menu_item_id': [999], 'item_category': ["Lunch"]})
+    
+    weekly = agent.predict_weekly(features, days=3, new_items=new_items)
+    
+    cold = weekly[weekly['menu_item_id'] == 999]
+    assert len(cold) == 3 and (cold['forecast_source'] == 'cold_start').all()
+    assert cold['horizon'].tolist() == [1, 2, 3]
+    assert (cold['p10'] <= cold['p90']).all()
@@ -0,0 +1,74 @@
+"""Tests for the paged, resumable Firestore history sync"""
+import pandas as pd
+
+import local_firestore
+from data_agent import DataAgent
+from firebase_config import FirebaseCollections, FirebaseConfig
+from tap_ingestion import TapIngestionService
+
+
+def _meal_docs(days=10, items=(101, 201)):
+    db = FirebaseConfig.use_local("firestore.db")
+    collection = db.collection(FirebaseCollections.MEAL_DATA)
+    for date in pd.date_range("2025-06-01", periods=days).strftime('%Y-%m-%d'):
+        for item_id in items:
+            fields = {'date': date, 'menu_item_id': item_id, 'confirmed_count': 40, 'total_employees': 120}
+            # Older documents lack fields added later
+            if date >= "2025-06-05":
+                fields['is_holiday'] = 0
+            collection.document(f"{date}_{item_id}").set(fields)
+
+
+def test_pages_are_streamed_into_the_local_csv():
+    _meal_docs()
+    agent = DataAgent("history.csv", checkpoint_dir="checkpoint")
+    
+    df, status = agent.fetch_from_firebase(page_size=3)
+    
+    assert status == {'source': 'firebase', 'records': 20, 'pages': 7, 'error': None}
+    assert len(pd.read_csv("history.csv")) == 20
+    assert df['is_holiday'].isna().sum() == 8
+    assert not df.duplicated(['date', 'menu_item_id']).any()
+
+
+def test_a_failed_sync_reports_where_it_resumes(monkeypatch):
+    _meal_docs()
+    pd.DataFrame({'date': ["2025-05-31"], 'menu_item_id': [101], 'confirmed_count': [38]}).to_csv(
+        "history.csv", index=False)
+    stream = local_firestore.LocalQuery.stream
+    calls = []
+    
+    def flaky(query):
+        calls.append(1)
+        if len(calls) == 3:
+            raise ConnectionError("deadline exceeded")
+        return stream(query)
+    
+    monkeypatch.setattr(local_firestore.LocalQuery, "stream", flaky)
+    agent = DataAgent("history.csv", checkpoint_dir="checkpoint")
+    
+    df, status = agent.fetch_from_firebase(page_size=4)
+    assert status['source'] == 'local' and "deadline exceeded" in status['error']
+    assert (status['resume_after'], status['checkpointed_rows']) == ("2025-06-04_201", 8)
+    assert len(df) == 1
+    
+    df, status = agent.fetch_from_firebase(page_size=4)
+    assert status['source'] == 'firebase' and status['error'] is None
+    assert len(df) == 20 and not df.duplicated(['date', 'menu_item_id']).any()
+
+
+def test_served_counts_never_become_history_rows():
+    _meal_docs()
+    taps = TapIngestionService("taps.db")
+    taps.ingest([{'card_id': "A", 'timestamp': "2025-06-11T12:41:07", 'menu_item_id': 201}])
+    taps.flush()
+    # A partial document merged into the history by an older tap service
+    FirebaseConfig.get_db().collection(FirebaseCollections.MEAL_DATA).document("2025-06-12_101").set(
+        {'date': "2025-06-12", 'menu_item_id': 101, 'served_count': 3}, merge=True)
+    
+    df = DataAgent("history.csv", checkpoint_dir="checkpoint").update_data()
+    
+    served = FirebaseConfig.get_db().collection(FirebaseCollections.SERVED_COUNTS).document("2025-06-11_201").get()
+    assert served.to_dict()['served_count'] == 1
+    assert str(df['date'].max().date()) == "2025-06-10"
+    assert (df['confirmed_count'] == 40).all() and (df['total_employees'] == 120).all()
@@ -0,0 +1,74 @@
+"""Tests for streamed CSV/NDJSON exports and their query validation"""
+import gzip
+import io
+import json
+
+import pandas as pd
+import pytest
+
+from canteen_ai import CanteenAI
+from export_stream import export_stream, iter_csv
+from prediction_store import PredictionStore
+
+
+@pytest.fixture
+def client(monkeypatch):
+    import app as web
+    
+    monkeypatch.setattr(web, "ai", CanteenAI())
+    return web.app.test_client()
+
+
+def _predictions(dates, items=(101, 201)):
+    return pd.DataFrame([{'date': date, 'menu_item_id': item_id, 'predicted_count': 40 + k, 'horizon': 1,
+                          'predicted_at': "2025-06-30T20:00:00", 'model_version': "v2.1"}
+                         for k, date in enumerate(dates) for item_id in items])
+
+
+def test_csv_chunks_share_one_header():
+    chunks = [pd.DataFrame({'date': pd.to_datetime(["2025-07-01"]), 'a': [1], 'b': [2]}),
+              pd.DataFrame(columns=['a', 'b']),
+              pd.DataFrame({'b': [4], 'a': [3], 'date': pd.to_datetime(["2025-07-02"])})]
+    
+    text = "".join(iter_csv(chunks))
+    
+    assert text.splitlines() == ["date,a,b", "2025-07-01,1,2", "2025-07-02,3,4"]
+
+
+def test_gzip_export_is_one_valid_stream():
+    chunks = (pd.DataFrame({'menu_item_id': [i], 'predicted_count': [i * 10]}) for i in range(3))
+    body, mimetype, extension = export_stream(chunks, fmt='ndjson', compress=True)
+    
+    rows = [json.loads(line) for line in gzip.decompress(b"".join(body)).decode().splitlines()]
+    
+    assert (mimetype, extension) == ('application/gzip', 'ndjson.gz')
+    assert [r['predicted_count'] for r in rows] == [0, 10, 20]
+
+
+def test_prediction_export_streams_the_filtered_range(client):
+    PredictionStore().append(_predictions(["2025-07-01", "2025-07-02", "2025-07-03"]))
+    
+    response = client.get("/api/export/predictions?start=2025-07-02&end=2025-07-03&items=201")
+    
+    assert response.status_code == 200
+    assert response.headers['Content-Disposition'].endswith("predictions_2025-07-02_2025-07-03.csv")
+    exported = pd.read_csv(io.StringIO(response.get_data(as_text=True)))
+    assert exported['menu_item_id'].tolist() == [201, 201]
+    assert exported['predicted_count'].tolist() == [41, 42]
+
+
+@pytest.mark.parametrize("query", [
+    "start=2025-13-01",
+    "start=yesterday",
+    "end=2025-07-01&start=2025-07-05",
+    "items=101,lunch",
+    "format=xlsx",
+])
+def test_bad_export_queries_are_rejected_before_streaming(client, query):
+    pd.DataFrame({'date': ["2025-07-01"], 'menu_item_id': [101], 'confirmed_count': [40]}).to_csv(
+        "canteen_history.csv", index=False)
+    
+    for endpoint in ("/api/export/predictions", "/api/export/history"):
+        response = client.get(f"{endpoint}?{query}")
+        assert response.status_code == 400
+        assert response.get_json()['success'] is False
@@ -0,0 +1,48 @@
+"""Tests for lazy Firestore connection and lazy agent imports"""
+import os
+import subprocess
+import sys
+import threading
+import time
+
+from firebase_config import FirebaseConfig
+
+
+def test_concurrent_get_db_waits_for_the_connection(monkeypatch):
+    client = object()
+    FirebaseConfig._db, FirebaseConfig._initialized, FirebaseConfig._attempted = None, False, False
+    
+    def slow_connect(credentials_path, use_project_config):
+        time.sleep(0.2)
+        FirebaseConfig._db, FirebaseConfig._initialized = client, True
+        return client
+    
+    monkeypatch.setattr(FirebaseConfig, "_connect", slow_connect)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(FirebaseConfig.get_db())) for _ in range(4)]
+    for t in threads:
+        t.start()
+        time.sleep(0.02)
+    for t in threads:
+        t.join()
+    
+    assert results == [client] * 4
+
+
+def test_failed_connection_is_attempted_once(monkeypatch):
+    calls = []
+    FirebaseConfig._db, FirebaseConfig._initialized, FirebaseConfig._attempted = None, False, False
+    monkeypatch.setattr(FirebaseConfig, "_connect", lambda *args: calls.append(args))
+    
+    assert FirebaseConfig.get_db() is None
+    assert FirebaseConfig.get_db() is None
+    assert len(calls) == 1
+
+
+def test_importing_canteen_ai_does_not_import_agents():
+    code = ("import sys, canteen_ai; "
+            "print(sorted(m for m in ('data_agent', 'train_agent', 'predict_agent', 'joblib', 'lightgbm') "
+            "if m in sys.modules))")
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                         cwd=os.path.dirname(os.path.abspath(__file__)))
+    assert out.stdout.strip().splitlines()[-1] == "[]"
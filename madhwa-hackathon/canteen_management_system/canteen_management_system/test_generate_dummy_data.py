@@ -0,0 +1,28 @@
+"""Tests for the seeded, vectorized history generator"""
+import pandas as pd
+
+from generate_dummy_data import generate_canteen_data
+
+
+def test_the_same_seed_gives_the_same_data():
+    generate = lambda seed: generate_canteen_data(n_items=3, start="2025-01-01", end="2025-02-28", seed=seed)
+    
+    pd.testing.assert_frame_equal(generate(11), generate(11))
+    assert not generate(11)['confirmed_count'].equals(generate(12)['confirmed_count'])
+
+
+def test_rows_scale_with_items_sites_and_days():
+    df = generate_canteen_data(n_items=40, n_sites=3, start="2024-01-01", end="2024-12-31", seed=3)
+    
+    assert len(df) == 366 * 3 * 40
+    assert not df.duplicated(['date', 'site_id', 'menu_item_id']).any()
+    assert df.groupby('site_id')['menu_item_id'].nunique().eq(40).all()
+    # Demand never exceeds the headcount and the lags follow each series
+    assert (df['confirmed_count'] <= df['total_employees']).all()
+    series = df[(df['site_id'] == "site_2") & (df['menu_item_id'] == df['menu_item_id'].iloc[0])]
+    assert (series['prev_day_count'].iloc[1:].to_numpy() == series['confirmed_count'].iloc[:-1].to_numpy()).all()
+
+
+def test_a_single_site_has_no_site_column():
+    df = generate_canteen_data(n_items=2, start="2025-07-01", end="2025-07-07")
+    assert 'site_id' not in df.columns and len(df) == 14
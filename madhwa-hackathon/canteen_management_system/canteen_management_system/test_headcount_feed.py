@@ -0,0 +1,120 @@
+"""Tests for the working-mode headcount feed and the forecasts it scales"""
+import shutil
+
+import pandas as pd
+
+from canteen_ai import CanteenAI
+from firebase_config import FirebaseConfig
+from headcount_feed import HeadcountFeed
+from predict_agent import PredictAgent
+from prediction_store import PredictionStore
+
+
+def _forecast_dates(features, days):
+    latest = pd.to_datetime(features['date']).max()
+    return [latest + pd.Timedelta(days=d) for d in range(1, days + 1)]
+
+
+def _select(feed, date, office, home):
+    feed.record_many([{'date': date, 'user_id': f"u{i}", 'mode': 'office'} for i in range(office)]
+                     + [{'date': date, 'user_id': f"u{office + i}", 'mode': 'home'} for i in range(home)])
+
+
+def test_sync_reads_both_apps_and_normalises_modes():
+    db = FirebaseConfig.use_local("firestore.db")
+    web = db.collection("workingModes/2025-11-03/users")
+    app = db.collection("workModes/2025-11-03/modes")
+    web.document("uid1").set({'mode': 'office', 'userEmail': "a@corp.com", 'timestamp': "2025-11-02T08:00:00"})
+    web.document("uid2").set({'mode': 'home', 'userEmail': "b@corp.com", 'timestamp': "2025-11-02T08:00:00"})
+    app.document("c@corp.com").set({'mode': 'wfh', 'email': "c@corp.com", 'timestamp': "2025-11-02T09:00:00"})
+    # Chose office on the web, then changed to home in the mobile app
+    app.document("a@corp.com").set({'mode': 'wfh', 'email': "A@corp.com", 'timestamp': "2025-11-02T10:00:00"})
+    
+    feed = HeadcountFeed("headcount.db")
+    assert feed.sync_from_firebase(["2025-11-03"]) == 3
+    
+    counts = feed.counts().iloc[0]
+    assert (counts['office'], counts['home'], counts['responses']) == (0, 3, 3)
+
+
+def test_home_selections_lower_the_forecast(features, model_dir):
+    feed = HeadcountFeed("headcount.db")
+    agent = PredictAgent(model_dir, store=PredictionStore("preds.db"), headcount=feed)
+    dates = _forecast_dates(features, 3)
+    before = agent.forecast(features, dates)
+    
+    # 90% of the site works from home on the first forecast day only
+    total = int(features['total_employees'].iloc[-1])
+    _select(feed, dates[0], office=total // 10, home=total - total // 10)
+    after = agent.forecast(features, dates)
+    
+    by_date = lambda df: df.groupby('date')['predicted_count'].sum()
+    assert by_date(after).iloc[0] < 0.2 * by_date(before).iloc[0]
+    assert (by_date(after).iloc[1:] == by_date(before).iloc[1:]).all()
+    assert after.loc[after['horizon'] == 1, 'headcount_scale'].round(2).eq(0.1).all()
+
+
+def test_usual_home_working_is_not_scaled_twice(features):
+    feed = HeadcountFeed("headcount.db")
+    latest = pd.to_datetime(features['date']).max()
+    total = int(features['total_employees'].iloc[-1])
+    # The last weeks of history already had a third of the site at home
+    for k in range(28):
+        _select(feed, latest - pd.Timedelta(days=k), office=2 * total // 3, home=total - 2 * total // 3)
+    _select(feed, latest + pd.Timedelta(days=1), office=2 * total // 3, home=total - 2 * total // 3)
+    
+    scale = feed.demand_scale([latest + pd.Timedelta(days=d) for d in (1, 2)], total, latest)
+    assert abs(scale[0] - 1) < 1e-9
+    # No selections yet for the second day: the usual share
+    assert scale[1] == 1
+
+
+def test_fingerprint_is_cached_until_the_counts_change(monkeypatch):
+    feed = HeadcountFeed("headcount.db")
+    _select(feed, "2025-11-03", office=5, home=5)
+    queries = []
+    counts = feed.counts
+    monkeypatch.setattr(feed, "counts", lambda *args: queries.append(args) or counts(*args))
+    
+    first = feed.fingerprint("2025-11-01", "2025-11-07")
+    assert [feed.fingerprint("2025-11-01", "2025-11-07") for _ in range(5)] == [first] * 5
+    assert len(queries) == 1
+    
+    feed.record("2025-11-04", "u1", "home")
+    second = feed.fingerprint("2025-11-01", "2025-11-07")
+    feed.import_counts(pd.DataFrame({'date': ["2025-11-05"], 'office': [3], 'home': [1]}))
+    third = feed.fingerprint("2025-11-01", "2025-11-07")
+    # Another process (the scheduler) writing the same store
+    HeadcountFeed("headcount.db").record("2025-11-06", "u2", "office")
+    assert len({first, second, third, feed.fingerprint("2025-11-01", "2025-11-07")}) == 4
+    assert len(queries) == 4
+
+
+def test_forecast_table_goes_stale_when_selections_change(features, model_dir):
+    shutil.copytree(model_dir, "models_per_item")
+    ai = CanteenAI()
+    ai.data_cache = features
+    ai.materialize_forecasts(days=3)
+    assert ai.forecast_table_is_fresh()
+    
+    day = _forecast_dates(features, 1)[0]
+    _select(ai.headcount_feed, day, office=10, home=90)
+    assert not ai.forecast_table_is_fresh()
+    
+    ai.materialize_forecasts(days=3)
+    assert ai.forecast_table_is_fresh()
+    assert ai.forecast_table.for_date(day)['headcount_scale'].lt(1).all()
+
+
+def test_pipeline_reforecasts_when_selections_change(raw_history, features, model_dir):
+    shutil.copytree(model_dir, "models_per_item")
+    raw_history.to_csv("canteen_history.csv", index=False)
+    ai = CanteenAI()
+    ai.run_full_pipeline(retrain=False, forecast_days=3)
+    
+    # Same data and models, new working-mode selections for tomorrow
+    _select(ai.headcount_feed, _forecast_dates(features, 1)[0], office=10, home=90)
+    run = ai.run_full_pipeline(retrain=False, forecast_days=3)
+    
+    assert {'predict_next_day', 'predict_weekly', 'plan_prep'} <= set(run['stages_executed'])
+    assert 'analyze_trends' in run['stages_cached']
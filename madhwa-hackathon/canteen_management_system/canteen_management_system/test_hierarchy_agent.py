@@ -0,0 +1,45 @@
+"""Tests for aggregate models and coherent hierarchical forecasts"""
+import glob
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from hierarchy_agent import HierarchyAgent, build_summing_matrix, reconciliation_matrix
+from predict_agent import PredictAgent
+from prediction_store import PredictionStore
+
+
+def test_summing_matrix_adds_items_up_to_every_level():
+    hierarchy = pd.DataFrame({'menu_item_id': [101, 201, 202, 301],
+                              'site_id': ["main", "main", "main", "campus"],
+                              'item_category': ["Breakfast", "Lunch", "Lunch", "Lunch"]})
+    
+    S, nodes = build_summing_matrix(hierarchy)
+    
+    assert list(nodes['level']) == ['total', 'site', 'site', 'category', 'category', 'category'] + ['item'] * 4
+    assert S.shape == (10, 4)
+    assert S[nodes['key'].tolist().index("category:main/Lunch")].tolist() == [0, 1, 1, 0]
+    # Reconciling coherent forecasts leaves them unchanged
+    P = reconciliation_matrix(S, np.arange(1, 11, dtype=float))
+    assert np.allclose(S @ P @ S, S)
+
+
+def test_reconciled_levels_add_up(features, model_dir):
+    summary = [{'menu_item_id': bundle['metadata']['menu_item_id'], 'mae': bundle['metadata']['mae']}
+               for bundle in map(joblib.load, sorted(glob.glob(os.path.join(model_dir, "lgb_item_*.pkl"))))]
+    agent = HierarchyAgent("hierarchy_models.pkl")
+    assert agent.train(features, summary)['aggregate_models'] > 0
+    forecasts = PredictAgent(model_dir, store=PredictionStore("preds.db")).predict_weekly(features, days=3)
+    
+    result = agent.reconcile(features, forecasts)
+    
+    levels = result['levels']
+    for _, day in levels.groupby('date'):
+        by_level = day.groupby('level')['reconciled_count'].sum()
+        assert abs(by_level['total'] - by_level['item']) <= 0.5
+        assert abs(by_level['category'] - by_level['item']) <= 0.5
+    items = result['items']
+    assert (items['p10'] <= items['p50']).all() and (items['p50'] <= items['p90']).all()
+    assert set(items.columns) >= {'base_count', 'predicted_count'}
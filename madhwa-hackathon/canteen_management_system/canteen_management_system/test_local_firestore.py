@@ -0,0 +1,81 @@
+"""Tests for the SQLite Firestore stand-in's query and batch semantics"""
+import pytest
+from google.cloud import firestore
+
+from firebase_config import DOCUMENT_ID
+from local_firestore import MAX_BATCH_WRITES, LocalFirestore
+
+
+def _meals(db, days=6):
+    collection = db.collection("meals")
+    for day in range(1, days + 1):
+        for item_id in (101, 202):
+            collection.document(f"2025-06-0{day}_{item_id}").set(
+                {'date': f"2025-06-0{day}", 'menu_item_id': item_id, 'confirmed_count': 10 * day + item_id % 100})
+    return collection
+
+
+def test_queries_filter_order_and_page_in_sqlite():
+    db = LocalFirestore("firestore.db")
+    collection = _meals(db)
+    
+    ids = lambda query: [doc.id for doc in query.stream()]
+    assert ids(collection.where('menu_item_id', '==', 202).where('date', '>=', "2025-06-05")) == [
+        "2025-06-05_202", "2025-06-06_202"]
+    top_two = collection.where('menu_item_id', 'in', [101]).order_by('confirmed_count', 'DESCENDING').limit(2)
+    assert ids(top_two) == ["2025-06-06_101", "2025-06-05_101"]
+    
+    # Paging by document id resumes exactly after the last document read
+    pages, cursor = [], None
+    while True:
+        query = collection.order_by(DOCUMENT_ID).limit(5)
+        page = (query.start_after({DOCUMENT_ID: cursor}) if cursor else query).get()
+        if not page:
+            break
+        pages.append(len(page))
+        cursor = page[-1].id
+    assert pages == [5, 5, 2]
+    last_day = collection.order_by('date').start_at({'date': "2025-06-06"})
+    assert ids(last_day) == ["2025-06-06_101", "2025-06-06_202"]
+
+
+def test_merge_applies_increments_and_field_deletes():
+    db = LocalFirestore("firestore.db")
+    doc = db.collection("served").document("2025-06-01_101")
+    
+    doc.set({'served_count': firestore.Increment(2), 'note': "late"}, merge=True)
+    doc.set({'served_count': firestore.Increment(3), 'note': firestore.DELETE_FIELD}, merge=True)
+    assert doc.get().to_dict() == {'served_count': 5}
+    
+    # Without merge the document is replaced
+    doc.set({'date': "2025-06-01"})
+    assert doc.get().to_dict() == {'date': "2025-06-01"}
+    with pytest.raises(LookupError):
+        db.collection("served").document("missing").update({'served_count': 1})
+
+
+def test_a_batch_commits_in_one_round_trip_or_not_at_all():
+    db = LocalFirestore("firestore.db")
+    collection = db.collection("meals")
+    
+    batch = db.batch()
+    for i in range(MAX_BATCH_WRITES):
+        batch.set(collection.document(f"doc{i:03d}"), {'n': i})
+    db.reset_stats()
+    assert len(batch.commit()) == MAX_BATCH_WRITES
+    assert (db.stats['round_trips'], db.stats['writes']) == (1, MAX_BATCH_WRITES)
+    
+    # An update of a missing document rolls the whole batch back
+    batch = db.batch()
+    batch.set(collection.document("doc000"), {'n': -1})
+    batch.update(collection.document("missing"), {'n': 1})
+    with pytest.raises(LookupError):
+        batch.commit()
+    assert collection.document("doc000").get().to_dict() == {'n': 0}
+    
+    batch = db.batch()
+    for i in range(MAX_BATCH_WRITES + 1):
+        batch.delete(collection.document(f"doc{i:03d}"))
+    with pytest.raises(ValueError):
+        batch.commit()
+    assert len(collection.get()) == MAX_BATCH_WRITES
@@ -0,0 +1,64 @@
+"""Tests for the Prometheus-style /metrics endpoint"""
+from flask import Flask
+
+from canteen_ai import CanteenAI
+from metrics import Histogram, instrument_app
+
+
+def _client():
+    app = Flask(__name__)
+    ai = CanteenAI()
+    instrument_app(app, lambda: ai)
+    
+    @app.route('/api/items/<int:item_id>')
+    def item(item_id):
+        return {'menu_item_id': item_id}
+    
+    return app.test_client()
+
+
+def _samples(text):
+    return dict(line.rsplit(' ', 1) for line in text.splitlines() if line and not line.startswith('#'))
+
+
+def test_requests_are_counted_by_route_method_and_status():
+    client = _client()
+    for item_id in (101, 102, 103):
+        client.get(f'/api/items/{item_id}')
+    client.get('/missing')
+    
+    response = client.get('/metrics')
+    samples = _samples(response.get_data(as_text=True))
+    
+    assert response.content_type.startswith('text/plain; version=0.0.4')
+    ok = 'method="GET",route="/api/items/<int:item_id>",status="200"'
+    assert samples[f'canteenai_http_request_duration_seconds_count{{{ok}}}'] == '3'
+    assert samples[f'canteenai_http_request_duration_seconds_bucket{{{ok},le="+Inf"}}'] == '3'
+    missing = 'method="GET",route="unmatched",status="404"'
+    assert samples[f'canteenai_http_request_duration_seconds_count{{{missing}}}'] == '1'
+    # The scrape itself is in flight
+    assert samples['canteenai_http_requests_in_flight'] == '1'
+
+
+def test_runtime_stats_are_exported_without_loading_agents():
+    client = _client()
+    text = client.get('/metrics').get_data(as_text=True)
+    samples = _samples(text)
+    
+    assert "# TYPE canteenai_predictions_total counter" in text
+    assert samples['canteenai_predictions_total'] == '0'
+    assert samples['canteenai_models_available'] == '0'
+    # Never synced: the gauge is left out rather than reported as 0
+    assert 'canteenai_last_sync_timestamp_seconds' not in samples
+
+
+def test_histogram_buckets_are_cumulative():
+    latency = Histogram('latency_seconds', 'Latency', buckets=[0.1, 1.0])
+    for value in (0.05, 0.5, 0.5, 5.0):
+        latency.observe(value, route='/')
+    
+    samples = _samples("\n".join(latency.render()))
+    
+    buckets = [samples[f'latency_seconds_bucket{{route="/",le="{le}"}}'] for le in ('0.1', '1.0', '+Inf')]
+    assert buckets == ['1', '3', '4']
+    assert float(samples['latency_seconds_sum{route="/"}']) == 6.05
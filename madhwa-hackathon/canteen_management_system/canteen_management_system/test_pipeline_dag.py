@@ -0,0 +1,24 @@
+"""Tests for fingerprint-cached pipeline stages"""
+from pipeline_dag import PipelineDAG, StageCache
+
+
+def _dag(cache, calls):
+    dag = PipelineDAG(cache=cache)
+    dag.add_source('data', fingerprint_func=lambda value: str(value))
+    dag.add_stage('double', lambda data: calls.append('double') or data * 2, inputs=['data'])
+    dag.add_stage('report', lambda double: calls.append('report') or f"{double} meals", inputs=['double'])
+    return dag
+
+
+def test_unchanged_stages_are_reused_by_a_new_process():
+    calls = []
+    first = _dag(StageCache("cache"), calls).run(sources={'data': 21})
+    assert first['outputs']['report'] == "42 meals" and calls == ['double', 'report']
+    
+    # A fresh cache object on the same directory, as in the next CLI run
+    rerun = _dag(StageCache("cache"), calls).run(sources={'data': 21})
+    assert rerun['cached'] == ['double', 'report'] and rerun['outputs']['report'] == "42 meals"
+    assert calls == ['double', 'report']
+    
+    changed = _dag(StageCache("cache"), calls).run(sources={'data': 5})
+    assert changed['executed'] == ['double', 'report'] and changed['outputs']['report'] == "10 meals"
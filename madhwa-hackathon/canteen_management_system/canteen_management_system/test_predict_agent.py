@@ -0,0 +1,60 @@
+"""Tests for leak-free features, horizon-calibrated quantiles and batched forecasts"""
+import glob
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+
+import predict_agent
+from config import Config
+from predict_agent import PredictAgent
+from prediction_store import PredictionStore
+from train_agent import get_feature_columns
+
+
+def _bundles(model_dir):
+    return [joblib.load(path) for path in sorted(glob.glob(os.path.join(model_dir, "lgb_item_*.pkl")))]
+
+
+def test_same_day_outcomes_are_not_features(features, model_dir):
+    assert not set(Config.EXCLUDED_FEATURES) & set(get_feature_columns(features))
+    for bundle in _bundles(model_dir):
+        assert not set(Config.EXCLUDED_FEATURES) & set(bundle['features'])
+
+
+def test_calibrated_band_widens_with_the_horizon(model_dir):
+    for bundle in _bundles(model_dir):
+        offsets = bundle['horizon_offsets']
+        width = np.asarray(offsets[0.9]) - np.asarray(offsets[0.1])
+        assert len(width) == Config.QUANTILE_CALIBRATION_DAYS
+        assert (np.diff(width) >= 0).all()
+        # Out-of-sample errors: the 80% band is wider than a single mean error
+        assert width[0] > bundle['metadata']['mae']
+
+
+def test_weekly_forecast_batches_quantiles_per_model(features, model_dir, monkeypatch):
+    calls = []
+    batched = predict_agent.predict_quantiles
+    monkeypatch.setattr(predict_agent, "predict_quantiles",
+                        lambda bundle, X, *args: calls.append(len(X)) or batched(bundle, X, *args))
+    agent = PredictAgent(model_dir, store=PredictionStore("preds.db"))
+    
+    weekly = agent.predict_weekly(features, days=7)
+    
+    assert calls == [7] * len(_bundles(model_dir))
+    model_rows = weekly[weekly['forecast_source'] == 'model']
+    assert (model_rows['p10'] <= model_rows['p50']).all() and (model_rows['p50'] <= model_rows['p90']).all()
+    width = (model_rows['p90'] - model_rows['p10']).groupby(model_rows['horizon']).mean()
+    assert width.loc[7] >= width.loc[1]
+
+
+def test_later_day_forecast_follows_the_weekly_path(features, model_dir):
+    agent = PredictAgent(model_dir, store=PredictionStore("preds.db"))
+    latest = pd.to_datetime(features['date']).max()
+    
+    weekly = agent.forecast(features, [latest + pd.Timedelta(days=d) for d in range(1, 4)])
+    third = agent.predict_next_day(features, latest + pd.Timedelta(days=3), save=False)
+    
+    expected = weekly[weekly['horizon'] == 3].reset_index(drop=True)
+    pd.testing.assert_frame_equal(third.drop(columns='predicted_at'), expected.drop(columns='predicted_at'))
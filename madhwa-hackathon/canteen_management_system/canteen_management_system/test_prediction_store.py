@@ -0,0 +1,88 @@
+"""Tests for the local prediction store and range accuracy reports"""
+import sqlite3
+
+import pandas as pd
+
+from prediction_store import PredictionStore
+from predict_agent import PredictAgent
+
+
+def _predictions(date, items, count, horizon, predicted_at):
+    return pd.DataFrame({
+        'date': date,
+        'menu_item_id': items,
+        'predicted_count': count,
+        'horizon': horizon,
+        'predicted_at': predicted_at,
+        'model_version': 'v2.1'
+    })
+
+
+def test_reruns_are_kept_alongside_other_horizons():
+    store = PredictionStore("preds.db")
+    store.append(_predictions("2025-07-10", [101, 102], 40, 3, "2025-07-07T20:00:00"))
+    store.append(_predictions("2025-07-10", [101, 102], 42, 1, "2025-07-09T20:00:00"))
+    store.append(_predictions("2025-07-10", [101, 102], 44, 1, "2025-07-09T21:00:00"))
+    
+    rows = store.query("2025-07-10", "2025-07-10")
+    assert len(rows) == 6
+    assert sorted(rows[rows['horizon'] == 1]['predicted_count']) == [42, 42, 44, 44]
+    latest = store.query(latest_only=True)
+    assert list(latest['predicted_count']) == [44, 44]
+
+
+def test_horizon_is_derived_when_missing():
+    store = PredictionStore("preds.db")
+    store.append(_predictions("2025-07-10", [101], 40, None, "2025-07-08T20:00:00").drop(columns='horizon'))
+    assert store.query()['horizon'].tolist() == [2]
+
+
+def test_stores_with_the_horizon_unique_index_accept_reruns_again():
+    with sqlite3.connect("upsert.db") as conn:
+        conn.execute("CREATE TABLE predictions (target_date TEXT NOT NULL, menu_item_id INTEGER NOT NULL, "
+                     "predicted_at TEXT NOT NULL, model_version TEXT, predicted_count REAL, horizon INTEGER)")
+        conn.execute("CREATE UNIQUE INDEX idx_predictions_horizon ON predictions (target_date, menu_item_id, horizon)")
+    store = PredictionStore("upsert.db")
+    store.append(_predictions("2025-07-10", [101], 40, 1, "2025-07-09T20:00:00"))
+    store.append(_predictions("2025-07-10", [101], 41, 1, "2025-07-09T22:00:00"))
+    assert store.count() == 2
+
+
+def test_stores_without_a_horizon_column_are_migrated():
+    with sqlite3.connect("legacy.db") as conn:
+        conn.execute("CREATE TABLE predictions (target_date TEXT NOT NULL, menu_item_id INTEGER NOT NULL, "
+                     "predicted_at TEXT NOT NULL, model_version TEXT, predicted_count REAL)")
+        conn.executemany("INSERT INTO predictions VALUES (?, ?, ?, ?, ?)",
+                         [("2025-07-10", 101, "2025-07-09T20:00:00", "v2.1", 40)] * 2)
+    store = PredictionStore("legacy.db")
+    store.append(_predictions("2025-07-10", [101], 41, 1, "2025-07-09T22:00:00"))
+    assert store.count() == 3
+
+
+def test_range_comparison_scores_each_horizon_once():
+    agent = PredictAgent("models", store=PredictionStore("preds.db"))
+    # Rows stored before horizons existed: reruns left duplicates
+    with sqlite3.connect("preds.db") as conn:
+        conn.executemany("INSERT INTO predictions (target_date, menu_item_id, predicted_at, predicted_count) "
+                         "VALUES ('2025-07-10', 101, ?, ?)",
+                         [("2025-07-09T21:00:00", 40), ("2025-07-09T20:00:00", 30), ("2025-07-08T20:00:00", 50)])
+    actuals = pd.DataFrame({'date': ["2025-07-10"], 'menu_item_id': [101], 'confirmed_count': [45]})
+    
+    results = agent.compare_predictions_range(actuals, "2025-07-10", "2025-07-10", source='local')
+    
+    by_horizon = results['by_horizon'].set_index('horizon')
+    assert results['summary']['samples'] == 2
+    assert by_horizon.loc[1, 'mae'] == 5
+    assert by_horizon.loc[2, 'mae'] == 5
+
+
+def test_weekly_forecast_is_stored_once_per_day_and_item(features, model_dir):
+    agent = PredictAgent(model_dir, store=PredictionStore("preds.db"))
+    weekly = agent.predict_weekly(features, days=5)
+    assert agent.store.count() == len(weekly) == 5 * features['menu_item_id'].nunique()
+    
+    # A rerun adds to the history instead of replacing it
+    agent.predict_weekly(features, days=5)
+    assert agent.store.count() == 2 * len(weekly)
+    assert len(agent.store.query(latest_only=True)) == len(weekly)
+    assert sorted(agent.store.query()['horizon'].unique()) == [1, 2, 3, 4, 5]
@@ -0,0 +1,50 @@
+"""Tests for newsvendor prep quantities and the ingredient plan"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from generate_dummy_data import generate_recipes
+from predict_agent import PredictAgent
+from prediction_store import PredictionStore
+from prep_planner import PrepPlanner, newsvendor_quantity
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def test_newsvendor_reads_the_critical_quantile():
+    values = np.array([[10.0, 20.0, 40.0]] * 4)
+    quantity = newsvendor_quantity(values, [0.1, 0.5, 0.9], np.array([0.5, 0.9, 0.7, 0.95]))
+    
+    assert quantity[:3].tolist() == [20.0, 40.0, 30.0]
+    # Past the outermost forecast quantile: a normal tail beyond p90
+    assert quantity[3] > 40
+
+
+def test_shipped_recipes_cover_the_sample_items():
+    history = pd.read_csv(os.path.join(REPO_DIR, "canteen_history.csv"))
+    planner = PrepPlanner(os.path.join(REPO_DIR, "recipes.csv"))
+    assert set(history['menu_item_id']) <= set(planner.recipes()['menu_item_id'])
+    
+    forecasts = pd.DataFrame({
+        'date': ["2025-07-01"] * 5 + ["2025-07-02"] * 5,
+        'menu_item_id': sorted(history['menu_item_id'].unique()) * 2,
+        'predicted_count': 50.0, 'p10': 40.0, 'p50': 50.0, 'p90': 65.0
+    })
+    ingredients = planner.ingredients(planner.plan(forecasts))
+    
+    assert not ingredients.empty
+    assert sorted(ingredients['date'].unique()) == ["2025-07-01", "2025-07-02"]
+    assert ingredients['cost'].notna().all() and (ingredients['quantity'] > 0).all()
+
+
+def test_calibrated_forecasts_give_real_buffers(raw_history, features, model_dir):
+    generate_recipes(raw_history).to_csv("recipes.csv", index=False)
+    agent = PredictAgent(model_dir, store=PredictionStore("preds.db"))
+    planner = PrepPlanner("recipes.csv")
+    
+    plan = planner.plan(agent.predict_weekly(features, days=7))
+    
+    # Out-of-sample bands: the buffer covers real forecast error, not rounding
+    assert plan['buffer'].mean() >= 2
+    assert len(planner.ingredients(plan)) > 0
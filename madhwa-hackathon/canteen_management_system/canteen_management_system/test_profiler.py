@@ -0,0 +1,43 @@
+"""Tests for per-stage pipeline timings and profiling hooks"""
+import shutil
+import time
+
+from canteen_ai import CanteenAI
+from profiler import NULL_PROFILER, PipelineProfiler
+
+
+def test_stages_record_time_rows_items_and_counters():
+    profiler = PipelineProfiler()
+    with profiler.stage('train_model') as stage:
+        for item_id in (101, 102):
+            with profiler.item(item_id):
+                time.sleep(0.01 * (item_id - 100))
+            profiler.count('models_trained')
+        stage['rows'] = 200
+    
+    report = profiler.report()['stages']['train_model']
+    assert report['seconds'] >= 0.03 and report['rows'] == 200
+    assert [s['menu_item_id'] for s in report['slowest_items']] == [102, 101]
+    assert report['counters'] == {'models_trained': 2}
+
+
+def test_the_null_profiler_records_nothing():
+    with NULL_PROFILER.stage('predict') as stage:
+        NULL_PROFILER.count('model_loads')
+        NULL_PROFILER.add_item_time(101, 1.0)
+    assert stage['seconds'] == 0.0
+    assert NULL_PROFILER.stages == {} and NULL_PROFILER.counters == {}
+
+
+def test_pipeline_results_time_every_stage(raw_history, model_dir):
+    shutil.copytree(model_dir, "models_per_item")
+    raw_history.to_csv("canteen_history.csv", index=False)
+    
+    results = CanteenAI().run_full_pipeline(retrain=False, forecast_days=3, profile=True)
+    
+    assert set(results['stage_seconds']) == {'update_data', 'model_registry', 'predict_next_day', 'predict_weekly',
+                                             'plan_prep', 'analyze_trends', 'evaluate_model'}
+    assert all(seconds >= 0 for seconds in results['stage_seconds'].values())
+    profile = results['profile']['stages']
+    assert profile['update_data']['rows'] == len(raw_history)
+    assert profile['predict_weekly']['items'] == raw_history['menu_item_id'].nunique()
@@ -0,0 +1,64 @@
+"""Tests for what-if scenarios against the served forecast"""
+import numpy as np
+import pandas as pd
+
+from headcount_feed import HeadcountFeed
+from predict_agent import PredictAgent
+from prediction_store import PredictionStore
+from scenario_agent import ScenarioAgent
+
+
+def _agents(model_dir):
+    feed = HeadcountFeed("headcount.db")
+    predict_agent = PredictAgent(model_dir, store=PredictionStore("preds.db"), headcount=feed)
+    return feed, predict_agent, ScenarioAgent(predict_agent)
+
+
+def _home_working(feed, date, total, home):
+    feed.record_many([{'date': date, 'user_id': f"u{i}", 'mode': 'home' if i < home else 'office'}
+                      for i in range(total)])
+
+
+def test_baseline_is_the_served_forecast(features, model_dir):
+    feed, predict_agent, scenario_agent = _agents(model_dir)
+    latest = pd.to_datetime(features['date']).max()
+    total = int(features['total_employees'].iloc[-1])
+    _home_working(feed, latest + pd.Timedelta(days=2), total, home=total // 2)
+    
+    served = predict_agent.forecast(features, [latest + pd.Timedelta(days=d) for d in range(1, 6)])
+    results = scenario_agent.simulate(features, [{}], days=5)
+    
+    merged = results.assign(date=pd.to_datetime(results['date']).dt.date).merge(
+        served[['date', 'menu_item_id', 'predicted_count']], on=['date', 'menu_item_id'])
+    assert len(merged) == len(served)
+    assert (merged['baseline_count'] - merged['predicted_count']).abs().max() <= 0.55
+    assert (results['delta'] == 0).all()
+
+
+def test_headcount_scenarios_move_one_onsite_figure(features, model_dir):
+    feed, _, scenario_agent = _agents(model_dir)
+    total = float(features['total_employees'].iloc[-1])
+    
+    results = scenario_agent.simulate(features, [
+        {'wfh_share': 0.3},
+        {'total_employees': 2 * total, 'wfh_share': 0.5},
+    ], days=3)
+    
+    first, second = (results[results['scenario'] == s] for s in (0, 1))
+    assert np.allclose(first['scenario_onsite'], 0.7 * total, atol=0.05)
+    assert np.allclose(first['scenario_count'], 0.7 * first['baseline_count'], atol=0.1)
+    # Twice the staff with half of them at home: the same people on site
+    assert np.allclose(second['scenario_onsite'], second['baseline_onsite'], atol=0.05)
+    assert second['delta'].abs().max() <= 0.1
+
+
+def test_scenario_matching_the_selections_changes_nothing(features, model_dir):
+    feed, _, scenario_agent = _agents(model_dir)
+    latest = pd.to_datetime(features['date']).max()
+    total = int(features['total_employees'].iloc[-1])
+    _home_working(feed, latest + pd.Timedelta(days=1), total, home=total // 2)
+    
+    results = scenario_agent.simulate(features, [{'wfh_share': (total // 2) / total}], days=1)
+    
+    assert np.allclose(results['scenario_onsite'], results['baseline_onsite'], atol=0.05)
+    assert results['delta'].abs().max() <= 0.1
@@ -0,0 +1,74 @@
+"""Tests for the pre-deadline forecast schedule and the scheduler lock"""
+import os
+import subprocess
+import sys
+from datetime import datetime, timedelta
+
+from scheduler import CanteenScheduler, SchedulerLock
+
+
+class _RecordingAI:
+    """Stands in for CanteenAI, counting the forecast runs"""
+    
+    def __init__(self):
+        self.last_training_date = None
+        self.materialized = 0
+    
+    def ensure_data(self):
+        pass
+    
+    def materialize_forecasts(self, days):
+        self.materialized += 1
+        return days
+
+
+def _scheduler(ai, synced_at=None):
+    scheduler = CanteenScheduler(ai, jitter_seconds=0, forecast_days=3, state_path="state/scheduler.json")
+    # Synced recently, so only the forecast job can be due
+    scheduler.state['last_sync'] = (synced_at or datetime.now()).isoformat()
+    return scheduler
+
+
+def test_forecasts_are_due_once_per_day_inside_the_lead_window():
+    ai = _RecordingAI()
+    # Config.MEAL_SELECTION_DEADLINE 21:00 less the 60-minute lead
+    due_at = datetime.now().replace(hour=20, minute=0, second=0, microsecond=0)
+    scheduler = _scheduler(ai, synced_at=due_at)
+    
+    assert not scheduler.forecasts_due(due_at - timedelta(minutes=1))
+    assert scheduler.forecasts_due(due_at)
+    
+    assert scheduler.run_pending(due_at)['forecast'] == {'materialized': 3, 'days': 3}
+    assert scheduler.run_pending(due_at + timedelta(minutes=30)) == {}
+    
+    # A restarted daemon reads the day's forecast from the persisted state
+    restarted = _scheduler(ai, synced_at=due_at)
+    assert not restarted.forecasts_due(due_at + timedelta(minutes=45))
+    assert restarted.forecasts_due(due_at + timedelta(days=1))
+    assert ai.materialized == 1
+
+
+def test_lock_is_exclusive_while_its_owner_runs():
+    first, second = SchedulerLock("scheduler.lock"), SchedulerLock("scheduler.lock")
+    assert first.acquire()
+    assert not second.acquire()
+    
+    scheduler = _scheduler(_RecordingAI())
+    scheduler.lock = second
+    assert scheduler.run_once() == {}
+    
+    first.release()
+    assert not os.path.exists("scheduler.lock")
+    assert second.acquire()
+
+
+def test_lock_left_by_a_dead_process_is_taken_over():
+    crashed = subprocess.Popen([sys.executable, "-c", "pass"])
+    crashed.wait()
+    with open("scheduler.lock", 'w') as f:
+        f.write(str(crashed.pid))
+    
+    lock = SchedulerLock("scheduler.lock")
+    assert lock.acquire()
+    with open("scheduler.lock") as f:
+        assert int(f.read()) == os.getpid()
@@ -0,0 +1,48 @@
+"""Tests for splitting a multi-site history into site partitions and training them"""
+import os
+
+import pandas as pd
+import pytest
+
+from config import Config
+from sites import SitePartition, SiteRegistry, partition_history
+
+
+def _history(site_ids):
+    return pd.DataFrame({'date': "2025-06-30", 'menu_item_id': range(len(site_ids)),
+                         'confirmed_count': 40, 'site_id': site_ids})
+
+
+def test_every_site_gets_its_own_file_and_the_input_is_kept():
+    _history([None, Config.DEFAULT_SITE_ID, "site_2", "site_2"]).to_csv("all_sites.csv", index=False)
+    
+    written = partition_history(pd.read_csv("all_sites.csv"), source_path="all_sites.csv")
+    
+    assert written == {Config.DEFAULT_SITE_ID: 2, "site_2": 2}
+    assert len(pd.read_csv("all_sites.csv")) == 4
+    assert len(pd.read_csv(SitePartition().local_csv)) == 2
+    assert pd.read_csv(SitePartition("site_2").local_csv)['menu_item_id'].tolist() == [2, 3]
+
+
+def test_the_default_history_is_never_overwritten():
+    _history([None, "site_2"]).to_csv(Config.LOCAL_CSV_PATH, index=False)
+    
+    with pytest.raises(ValueError):
+        partition_history(pd.read_csv(Config.LOCAL_CSV_PATH), source_path=Config.LOCAL_CSV_PATH)
+    
+    assert len(pd.read_csv(Config.LOCAL_CSV_PATH)) == 2
+    # Only the default site's rows: already partitioned, nothing to write
+    single = pd.read_csv(Config.LOCAL_CSV_PATH).iloc[:1]
+    single.to_csv(Config.LOCAL_CSV_PATH, index=False)
+    assert partition_history(single, source_path=Config.LOCAL_CSV_PATH) == {Config.DEFAULT_SITE_ID: 0}
+
+
+def test_train_all_reports_each_sites_mae(raw_history):
+    two_items = raw_history[raw_history['menu_item_id'].isin(raw_history['menu_item_id'].unique()[:2])]
+    partition_history(two_items.assign(site_id="site_2"))
+    
+    results = SiteRegistry(["site_2"]).train_all(max_workers=1)
+    
+    summary = pd.read_csv(os.path.join(SitePartition("site_2").model_dir, "training_summary.csv"))
+    assert results['models_trained'].tolist() == [2]
+    assert results['avg_mae'].iloc[0] == pytest.approx(summary['mae'].mean())
@@ -0,0 +1,36 @@
+"""Tests for publishing and pruning serving snapshots"""
+import os
+import subprocess
+import sys
+
+import pandas as pd
+
+from snapshot_store import SnapshotStore
+
+
+def _publish(store, n):
+    return [store.publish(pd.DataFrame({'date': ["2025-06-30"], 'menu_item_id': [101], 'confirmed_count': [i]}),
+                          "no_models") for i in range(n)]
+
+
+def test_pruning_keeps_the_previous_version():
+    store = SnapshotStore("snapshots", keep=1)
+    versions = _publish(store, 4)
+    assert store.versions() == versions[-2:]
+
+
+def test_versions_open_in_a_live_process_are_kept():
+    store = SnapshotStore("snapshots", keep=1)
+    first = _publish(store, 1)[0]
+    store.open(first)
+    # A worker that exited while serving the second version
+    second = _publish(store, 1)[0]
+    exited = subprocess.Popen([sys.executable, "-c", "pass"])
+    exited.wait()
+    with open(os.path.join("snapshots", SnapshotStore.LEASES, str(exited.pid)), 'w') as f:
+        f.write(second)
+    
+    latest = _publish(store, 3)
+    
+    assert store.versions() == [first] + latest[-2:]
+    assert store.leased_versions() == {first}
@@ -0,0 +1,51 @@
+"""Tests for the live surplus estimates"""
+from datetime import datetime
+
+import pandas as pd
+
+from surplus_engine import SurplusEngine
+from tap_ingestion import TapIngestionService
+
+
+def _engine():
+    engine = SurplusEngine(TapIngestionService("taps.db"))
+    forecasts = pd.DataFrame({'menu_item_id': [101, 102], 'predicted_count': [80.0, 50.0]})
+    history = pd.DataFrame({'date': ["2025-06-30"] * 2, 'menu_item_id': [101, 102],
+                            'item_category': ['Lunch', 'Lunch'], 'confirmed_count': [75, 48]})
+    engine.load_plan("2025-07-01", forecasts, history, prepared={101: 100})
+    engine.on_served("2025-07-01", {101: 30, 102: 40})
+    return engine
+
+
+def _estimates_at(engine, now):
+    with engine._lock:
+        engine._recompute("2025-07-01", changed=False, now=now)
+        return engine._plans["2025-07-01"]['estimates'].set_index('menu_item_id')
+
+
+def test_remaining_demand_blends_the_forecast_and_the_observed_pace():
+    engine = _engine()
+    # Halfway through the 11:30-15:00 lunch window; no tap history, so an even pace
+    estimates = _estimates_at(engine, datetime(2025, 7, 1, 13, 15))
+    
+    # remaining = (1 - F) * (served + (1 - F) * expected) with F = 0.5
+    assert estimates['expected_remaining'].tolist() == [35.0, 32.5]
+    # surplus = max(prepared - served - remaining, 0)
+    assert estimates['surplus_count'].tolist() == [35, 0]
+    assert estimates['prepared_source'].tolist() == ['kitchen', 'forecast']
+    assert (estimates['status'] == 'projected').all()
+
+
+def test_surplus_is_prepared_minus_served_once_the_slot_closes():
+    engine = _engine()
+
+    # Before the service day F is 0: served plus the whole forecast is still to come
+    before =_estimates_at(engine, datetime(2025, 6, 30, 18, 0))
+    assert before['expected_remaining'].tolist() == [110.0, 90.0]
+    assert before['surplus_count'].tolist() == [0, 0]
+    
+    closed = _estimates_at(engine, datetime(2025, 7, 1, 15, 30))
+    assert closed['expected_remaining'].tolist() == [0.0, 0.0]
+    assert closed['surplus_count'].tolist() == [70, 10]
+    assert (closed['status'] == 'final').all()
+    assert engine.plan_info("2025-07-01")['unplanned_served'] == {}
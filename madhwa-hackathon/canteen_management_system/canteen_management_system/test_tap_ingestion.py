@@ -0,0 +1,66 @@
+"""Tests for RFID tap deduplication and served counters"""
+from datetime import date
+
+from tap_ingestion import TapIngestionService
+
+
+def _tap(card_id, menu_item_id=201, timestamp="2025-11-03T12:41:07"):
+    return {'card_id': card_id, 'timestamp': timestamp, 'menu_item_id': menu_item_id}
+
+
+def test_repeats_are_rejected_within_and_across_bursts():
+    taps = TapIngestionService("taps.db")
+    
+    first = taps.ingest([_tap("A"), _tap("A"), _tap("B", 202),
+                         {'card_id': "C"}, _tap("D", timestamp="2025-11-03T03:00:00")])
+    second = taps.ingest([_tap("A", 202, "2025-11-03T13:10:00"), _tap("A", timestamp="2025-11-03T08:30:00")])
+    
+    assert first == {'accepted': 2, 'duplicates': 1, 'rejected': 2}
+    # Same card, same lunch slot: a repeat; breakfast is a new meal
+    assert second == {'accepted': 1, 'duplicates': 1, 'rejected': 0}
+    assert taps.served_counts("2025-11-03") == {201: 2, 202: 1}
+
+
+def test_index_and_counts_survive_a_restart():
+    today = date.today().isoformat()
+    taps = TapIngestionService("taps.db")
+    taps.ingest([_tap("A", timestamp=f"{today}T12:41:07"), _tap("B", timestamp=f"{today}T12:42:00")])
+    taps.flush()
+    
+    restarted = TapIngestionService("taps.db")
+    assert restarted.served_counts(today) == {201: 2}
+    assert restarted.ingest([_tap("A", timestamp=f"{today}T12:50:00")])['duplicates'] == 1
+
+
+def test_replayed_taps_for_earlier_dates_are_counted_once():
+    taps = TapIngestionService("taps.db")
+    taps.ingest([_tap("A"), _tap("B")])
+    taps.flush()
+    
+    # After a restart only today's index is in memory
+    restarted = TapIngestionService("taps.db")
+    served = []
+    restarted.add_listener(lambda date, deltas: served.append(deltas))
+    assert restarted.ingest([_tap("A"), _tap("C")])['accepted'] == 2
+    assert restarted.flush() == 1
+    
+    # A was already stored: taken back out of the live counts and listeners
+    assert served == [{201: 2}, {201: -1}]
+    assert restarted.served_counts("2025-11-03") == {201: 1}
+    assert restarted.stats['duplicates'] == 1
+    assert TapIngestionService("taps.db", shared=True).served_counts("2025-11-03") == {201: 3}
+
+
+def test_workers_share_dedupe_and_counts():
+    # Two server workers with their own service on one tap store
+    first, second = TapIngestionService("taps.db", shared=True), TapIngestionService("taps.db", shared=True)
+    
+    assert first.ingest([_tap("A"), _tap("B")])['accepted'] == 2
+    # A reader retrying the burst against another worker
+    assert second.ingest([_tap("A"), _tap("B"), _tap("C", 202)]) == {'accepted': 1, 'duplicates': 2, 'rejected': 0}
+    
+    assert first.served_counts("2025-11-03") == second.served_counts("2025-11-03") == {201: 2, 202: 1}
+    first.flush()
+    second.flush()
+    # Flushing only pushes to Firestore: the store is not counted twice
+    assert first.served_counts("2025-11-03") == {201: 2, 202: 1}
@@ -6,10 +6,80 @@ import numpy as np
 import joblib
 import os
 from datetime import datetime
-from typing import Dict, List, Tuple, Optional
-from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
-from lightgbm import LGBMRegressor, early_stopping, log_evaluation
+from typing import Dict, List, Tuple, Optional, TYPE_CHECKING
+from config import Config
 from firebase_config import FirebaseConfig, FirebaseCollections
+from profiler import NULL_PROFILER
+from recursive_forecast import calibrate_horizons
+
+# lightgbm and sklearn are imported where they are used to keep startup fast
+if TYPE_CHECKING:
+    from lightgbm import LGBMRegressor
+
+
+def get_feature_columns(df: pd.DataFrame, target_col: str = 'confirmed_count') -> List[str]:
+    """Numeric model feature columns of a feature-engineered DataFrame"""
+    exclude_cols = ['date', 'menu_item_id', target_col, 'item_name', 'doc_id'] + Config.EXCLUDED_FEATURES
+    feature_cols = [c for c in df.columns if c not in exclude_cols]
+    return df[feature_cols].select_dtypes(include=[np.number]).columns.tolist()
+
+
+def quantile_label(q: float) -> str:
+    """Column name for a forecast quantile, e.g. 0.1 -> 'p10'"""
+    return f"p{int(round(q * 100))}"
+
+
+def fit_item_model(X_train: pd.DataFrame,
+                   y_train: np.ndarray,
+                   X_val: Optional[pd.DataFrame] = None,
+                   y_val: Optional[np.ndarray] = None,
+                   n_jobs: int = -1,
+                   verbose: bool = True,
+                   quantile: Optional[float] = None) -> 'LGBMRegressor':
+    """
+    Fit a single per-item LightGBM model, early-stopping on the validation set
+    
+    Args:
+        X_train, y_train: Training features and target
+        X_val, y_val: Optional validation features and target
+        n_jobs: LightGBM threads (use 1 inside worker processes)
+        verbose: Print early-stopping progress
+        quantile: Fit this quantile (pinball loss) instead of the mean
+    
+    Returns:
+        Fitted LGBMRegressor
+    """
+    from lightgbm import LGBMRegressor, early_stopping, log_evaluation
+    
+    quantile_params = {'objective': "quantile", 'alpha': quantile} if quantile is not None else {'objective': "regression"}
+    model = LGBMRegressor(
+        **quantile_params,
+        n_estimators=1000,
+        learning_rate=0.05,
+        num_leaves=31,
+        max_depth=7,
+        min_child_samples=10,
+        subsample=0.8,
+        colsample_bytree=0.8,
+        random_state=42,
+        n_jobs=n_jobs,
+        verbose=-1
+    )
+    
+    if X_val is None or len(X_val) == 0:
+        model.fit(X_train, y_train)
+        return model
+    
+    try:
+        model.fit(
+            X_train, y_train,
+            eval_set=[(X_val, y_val)],
+            eval_metric="quantile" if quantile is not None else "mae",
+            callbacks=[early_stopping(20, verbose=verbose), log_evaluation(0)]
+        )
+    except:
+        model.fit(X_train, y_train)
+    return model
 
 
 class TrainAgent:
@@ -18,10 +88,18 @@ class TrainAgent:
     def __init__(self, model_dir: str = "models_per_item"):
         self.model_dir = model_dir
         os.makedirs(model_dir, exist_ok=True)
-        self.db = FirebaseConfig.get_db()
         self.models = {}
         self.training_history = []
         self.model_version = "v2.1"
+        # LightGBM threads per model (1 when sites train in parallel processes)
+        self.n_jobs = -1
+        # Replaced by CanteenAI during a profiled pipeline run
+        self.profiler = NULL_PROFILER
+    
+    @property
+    def db(self):
+        """Firestore client, connected lazily on first use"""
+        return FirebaseConfig.get_db()
     
     def train_model(self, 
                    df: pd.DataFrame,
@@ -45,9 +123,7 @@ class TrainAgent:
         df['date'] = pd.to_datetime(df['date'])
         
         # Define features
-        exclude_cols = ['date', 'menu_item_id', target_col, 'item_name', 'doc_id']
-        feature_cols = [c for c in df.columns if c not in exclude_cols]
-        feature_cols = df[feature_cols].select_dtypes(include=[np.number]).columns.tolist()
+        feature_cols = get_feature_columns(df, target_col)
         
         print(f"📊 Features: {len(feature_cols)} columns")
         
@@ -66,69 +142,8 @@ class TrainAgent:
                 print(f"⏭️ Skipping item {item_id} (insufficient data)")
                 continue
             
-            X_train = train_df[feature_cols].fillna(0)
-            y_train = train_df[target_col].values
-            X_val = val_df[feature_cols].fillna(0)
-            y_val = val_df[target_col].values
-            
-            # Train LightGBM model
-            model = LGBMRegressor(
-                objective="regression",
-                n_estimators=1000,
-                learning_rate=0.05,
-                num_leaves=31,
-                max_depth=7,
-                min_child_samples=10,
-                subsample=0.8,
-                colsample_bytree=0.8,
-                random_state=42,
-                n_jobs=-1,
-                verbose=-1
-            )
-            
-            try:
-                model.fit(
-                    X_train, y_train,
-                    eval_set=[(X_val, y_val)],
-                    eval_metric="mae",
-                    callbacks=[early_stopping(20), log_evaluation(0)]
-                )
-            except:
-                model.fit(X_train, y_train)
-            
-            # Evaluate
-            y_pred = model.predict(X_val)
-            mae = mean_absolute_error(y_val, y_pred)
-            rmse = np.sqrt(mean_squared_error(y_val, y_pred))
-            r2 = r2_score(y_val, y_pred)
-            
-            # Calculate confidence (inverse of normalized MAE)
-            mean_val = y_val.mean() if y_val.mean() > 0 else 1
-            confidence = max(0, 1 - (mae / mean_val))
-            
-            summary.append({
-                'menu_item_id': item_id,
-                'mae': mae,
-                'rmse': rmse,
-                'r2_score': r2,
-                'confidence': confidence,
-                'train_rows': len(train_df),
-                'val_rows': len(val_df),
-                'trained_at': datetime.now().isoformat(),
-                'model_version': self.model_version
-            })
-            
-            print(f"✅ Item {item_id} | MAE: {mae:.2f} | RMSE: {rmse:.2f} | R²: {r2:.3f} | Conf: {confidence:.2%}")
-            
-            # Save model
-            model_path = os.path.join(self.model_dir, f"lgb_item_{item_id}.pkl")
-            joblib.dump({
-                'model': model,
-                'features': feature_cols,
-                'metadata': summary[-1]
-            }, model_path, compress=3)
-            
-            self.models[item_id] = model
+            with self.profiler.item(item_id):
+                self._train_item(item_id, train_df, val_df, feature_cols, target_col, summary)
         
         # Save summary
         if summary:
@@ -150,6 +165,81 @@ class TrainAgent:
             print("❌ No models trained")
             return {'models_trained': 0}
     
+    def _train_item(self,
+                    item_id,
+                    train_df: pd.DataFrame,
+                    val_df: pd.DataFrame,
+                    feature_cols: List[str],
+                    target_col: str,
+                    summary: List[Dict]):
+        """Fit, evaluate and save one item's model, appending its metrics to summary"""
+        from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+        
+        X_train = train_df[feature_cols].fillna(0)
+        y_train = train_df[target_col].values
+        X_val = val_df[feature_cols].fillna(0)
+        y_val = val_df[target_col].values
+        
+        # Train LightGBM model
+        model = fit_item_model(X_train, y_train, X_val, y_val, n_jobs=self.n_jobs)
+        
+        # Evaluate
+        y_pred = model.predict(X_val)
+        mae = mean_absolute_error(y_val, y_pred)
+        rmse = np.sqrt(mean_squared_error(y_val, y_pred))
+        r2 = r2_score(y_val, y_pred)
+        
+        # Calculate confidence (inverse of normalized MAE)
+        mean_val = y_val.mean() if y_val.mean() > 0 else 1
+        confidence = max(0, 1 - (mae / mean_val))
+        
+        # Forecast quantiles from recursive forecasts replayed from every
+        # validation day (the model has not seen them), per horizon; the
+        # one-step residual quantiles stay in the metadata for reporting
+        quantiles = [q for q in Config.FORECAST_QUANTILES if q != 0.5]
+        item_df = pd.concat([train_df, val_df]).sort_values('date').reset_index(drop=True)
+        horizon_offsets, horizon_mae = calibrate_horizons(
+            model, feature_cols, item_df, len(train_df) - 1, Config.QUANTILE_CALIBRATION_DAYS,
+            Config.FORECAST_QUANTILES, target_col)
+        residual_quantiles = {f"resid_{quantile_label(q)}": float(offsets[0])
+                              for q, offsets in horizon_offsets.items()}
+        quantile_models = {}
+        if Config.QUANTILE_METHOD == "lightgbm":
+            for q in quantiles:
+                quantile_models[q] = fit_item_model(X_train, y_train, X_val, y_val, n_jobs=self.n_jobs,
+                                                    verbose=False, quantile=q)
+        
+        summary.append({
+            'menu_item_id': item_id,
+            'mae': mae,
+            'rmse': rmse,
+            'r2_score': r2,
+            'confidence': confidence,
+            'rollout_mae': float(np.nanmean(horizon_mae)),
+            'train_rows': len(train_df),
+            'val_rows': len(val_df),
+            **residual_quantiles,
+            'quantile_method': Config.QUANTILE_METHOD,
+            'trained_at': datetime.now().isoformat(),
+            'model_version': self.model_version
+        })
+        
+        print(f"✅ Item {item_id} | MAE: {mae:.2f} | RMSE: {rmse:.2f} | R²: {r2:.3f} | Conf: {confidence:.2%}"
+              f" | {len(horizon_mae)}-day MAE: {summary[-1]['rollout_mae']:.2f}")
+        
+        # Save model
+        model_path = os.path.join(self.model_dir, f"lgb_item_{item_id}.pkl")
+        joblib.dump({
+            'model': model,
+            'features': feature_cols,
+            'quantile_models': quantile_models,
+            'horizon_offsets': horizon_offsets,
+            'metadata': summary[-1]
+        }, model_path, compress=3)
+        
+        self.models[item_id] = model
+        self.profiler.count('models_trained')
+    
     def evaluate_model(self, df: pd.DataFrame, target_col: str = 'confirmed_count') -> pd.DataFrame:
         """
         Evaluate model accuracy against actual values
@@ -157,6 +247,8 @@ class TrainAgent:
         Returns:
             DataFrame with evaluation metrics
         """
+        from sklearn.metrics import mean_absolute_error, mean_squared_error
+        
         print("\n📈 Evaluating model accuracy...")
         
         results = []
@@ -168,6 +260,7 @@ class TrainAgent:
                 continue
             
             bundle = joblib.load(model_path)
+            self.profiler.count('model_loads')
             model = bundle['model']
             features = bundle['features']
             
@@ -206,12 +299,11 @@ class TrainAgent:
         Returns:
             Boolean indicating if retraining is needed
         """
-        # Retrain if 20+ new records or 7+ days
-        if new_records_count >= 20:
+        if new_records_count >= Config.RETRAIN_NEW_RECORDS_THRESHOLD:
             print(f"🔄 Retraining triggered: {new_records_count} new records")
             return True
         
-        if days_since_training >= 7:
+        if days_since_training >= Config.RETRAIN_DAYS_THRESHOLD:
             print(f"🔄 Retraining triggered: {days_since_training} days since last training")
             return True
         